@@ -5,8 +5,9 @@ This is the main application file for the Naebak News Service. It defines the Fl
 
 The service provides endpoints for retrieving news articles, categories, and tags, as well as for service health checks and administrative tasks.
 '''
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import aliased
 from flask_cors import CORS
 from flask_caching import Cache
 from flask_limiter import Limiter
@@ -16,6 +17,7 @@ from datetime import datetime, timedelta
 import os
 import logging
 from functools import wraps
+import click
 import sqlite3
 
 # App setup
@@ -55,11 +57,67 @@ logger = logging.getLogger(__name__)
 try:
     from app.models import (
         NewsCategory, NewsTag, NewsItem, NewsComment, 
-        NewsStats, NewsSettings
+        NewsStats, NewsSettings, NewsRelated, NewsArchive
     )
+    from app.utils.view_counter import ViewCounterBuffer
+    from app.utils.stats_rollup import EngagementAggregator
+    from app.utils.pagination import keyset_page, InvalidCursor
+    from app.utils.response_cache import ResponseCache, listing_tags, item_tags, comment_tags
+    from app.utils.json_provider import OrjsonProvider
+    from app.utils.projection import news_projection, parse_field_list, InvalidFields
+    from app.utils.search import NewsSearch
+    from app.utils.suggest import NewsSuggestions
+    from app.utils.related import RelatedArticles
+    from app.utils.trending import TrendingNews
+    from app.utils.news_stream import NewsStreamHub
+    from app.utils.archiver import NewsArchiver, resolve_archived_slug
+    from app.utils.retention import RetentionCleanup
+    from app.utils.comments import comment_thread_page
+    from app.utils.moderation import CommentModerationQueue, InvalidComment
+
+    # orjson-backed responses; serializers hand it native datetimes
+    app.json = OrjsonProvider(app)
+
+    # Buffered view counts, flushed to the database in batches
+    view_counter = ViewCounterBuffer(app)
+
+    # Engagement events rolled up into daily news stats
+    engagement = EngagementAggregator(app)
+
+    # Listing and article responses, invalidated when news items change
+    response_cache = ResponseCache(cache, app)
+
+    # Full-text search index, updated when news items are published or edited
+    news_search = NewsSearch(app)
+
+    # Per-worker prefix index of titles and tags for search-as-you-type
+    suggestions = NewsSuggestions(app)
+
+    # Precomputed related articles, recomputed in the background by one worker when news change
+    related_articles = RelatedArticles(app, cache=cache)
+
+    # Time-decayed engagement ranking for the trending news view
+    trending = TrendingNews(app)
+
+    # Push delivery of newly published and breaking news over Server-Sent Events
+    news_stream = NewsStreamHub(app)
+
+    # Scheduled move of expired and old news items to the archive table
+    news_archiver = NewsArchiver(app)
+
+    # Chunked retention cleanup of old daily stats and deleted or spam comments
+    retention_cleanup = RetentionCleanup(app)
+
+    # New comments are saved as pending and moderated in batches in the background
+    comment_moderation = CommentModerationQueue(app)
 except ImportError:
     logger.warning("Data models not found")
 
+def get_visitor_id():
+    '''Build an anonymous visitor fingerprint for unique view estimation.'''
+    return f"{get_remote_address()}|{request.headers.get('User-Agent', '')}"
+
+
 def require_api_key(f):
     '''Decorator to require an API key for an endpoint.'''
     @wraps(f)
@@ -142,6 +200,71 @@ def health_check():
         }), 500
 
 
+def build_news_listing(filters, page, per_page, cursor=None, include_total=False, projection=None):
+    '''
+    Build the GET /api/news payload.
+
+    Args:
+        filters (dict): The category, tag, featured and breaking filters.
+        page (int): The page number for offset pagination.
+        per_page (int): The number of items per page.
+        cursor (str): The cursor for keyset pagination, or None for offset pagination.
+        include_total (bool): In cursor mode, whether to compute the total count.
+        projection (NewsProjection): The fields to load and serialize; all by default.
+
+    Returns:
+        dict: The news items and pagination information.
+    '''
+    projection = projection or news_projection()
+    
+    # Build query
+    query = NewsItem.listing_query(**filters)
+    
+    # Cursor pagination: no OFFSET, and no COUNT(*) unless requested
+    if cursor is not None:
+        total = query.count() if include_total else None
+        news_items, next_cursor = keyset_page(
+            query.options(*projection.options), per_page, cursor
+        )
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
+        if include_total:
+            pagination['total'] = total
+        
+        return {
+            'news': projection.dump_many(news_items),
+            'pagination': pagination
+        }
+    
+    # Order by priority and date
+    query = query.order_by(NewsItem.priority.desc(), NewsItem.published_at.desc())
+    
+    # Load only the requested columns, with categories and tags for the whole page up front
+    query = query.options(*projection.options)
+    
+    # Apply pagination
+    news_items = query.paginate(
+        page=page, 
+        per_page=per_page, 
+        error_out=False
+    )
+    
+    return {
+        'news': projection.dump_many(news_items.items),
+        'pagination': {
+            'page': page,
+            'per_page': per_page,
+            'total': news_items.total,
+            'pages': news_items.pages,
+            'has_next': news_items.has_next,
+            'has_prev': news_items.has_prev
+        }
+    }
+
+
 @app.route('/api/news', methods=['GET'])
 @limiter.limit("50 per minute")
 def get_news():
@@ -158,6 +281,13 @@ def get_news():
         tag (str): The name of the tag to filter by.
         featured (bool): Whether to filter by featured status.
         breaking (bool): Whether to filter by breaking news status.
+        cursor (str): Switches to cursor (keyset) pagination. Pass an empty value for
+            the first page and the returned `next_cursor` for the following ones.
+        include_total (bool): In cursor mode, whether to compute the total count.
+        fields (str): Comma separated item fields to return, e.g. `id,title,slug`.
+            Only the columns those fields need are read from the database.
+        expand (str): Comma separated relations (`category`, `tags`) returned in full
+            when requested in `fields`; otherwise they are returned as `{id, name, name_en}`.
 
     Returns:
         A JSON response with a list of news items and pagination information.
@@ -169,46 +299,251 @@ def get_news():
         tag = request.args.get('tag')
         featured = request.args.get('featured', type=bool)
         breaking = request.args.get('breaking', type=bool)
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        fields = parse_field_list(request.args.get('fields'))
+        expand = parse_field_list(request.args.get('expand'))
+        projection = news_projection(fields, expand)
         
-        # Build query
-        query = NewsItem.query.filter_by(is_published=True)
+        filters = {
+            'category': category,
+            'tag': tag,
+            'featured': featured,
+            'breaking': breaking
+        }
         
-        if category:
-            query = query.join(NewsCategory).filter(NewsCategory.name == category)
+        # Serve from the response cache; entries are invalidated by news item changes
+        cache_key = ResponseCache.make_key(
+            'news:list', page=page, per_page=per_page, cursor=cursor,
+            include_total=include_total, fields=sorted(fields) if fields is not None else None,
+            expand=sorted(expand or ()), **filters
+        )
+        payload = response_cache.get_or_set(
+            cache_key,
+            listing_tags(**filters),
+            lambda: build_news_listing(filters, page, per_page, cursor, include_total, projection)
+        )
         
-        if tag:
-            query = query.join(NewsItem.tags).filter(NewsTag.name == tag)
+        return jsonify(payload)
         
-        if featured is not None:
-            query = query.filter(NewsItem.is_featured == featured)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting news: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/search', methods=['GET'])
+@limiter.limit("30 per minute")
+def search_news():
+    '''
+    Search published news items.
+
+    The query is normalized (Arabic diacritics removed, letter variants folded and
+    words lightly stemmed) and matched against the title, summary and content of
+    each item, in Arabic and English. Items must contain every query term, and are
+    ranked with BM25, weighting title matches above summary and content matches.
+
+    Args (query parameters):
+        q (str): The search query.
+        page (int): The page number for pagination.
+        per_page (int): The number of items per page.
+        fields (str): Comma separated item fields to return, as in GET /api/news.
+        expand (str): Comma separated relations returned in full, as in GET /api/news.
+
+    Returns:
+        A JSON response with the matching news items, best match first, and pagination information.
+    '''
+    try:
+        query = (request.args.get('q') or '').strip()
+        min_length = app.config.get('SEARCH_MIN_LENGTH', 3)
+        max_length = app.config.get('SEARCH_MAX_LENGTH', 100)
+        if not min_length <= len(query) <= max_length:
+            return jsonify({
+                'error': f'Search query must be between {min_length} and {max_length} characters'
+            }), 400
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(request.args.get('per_page', app.config.get('SEARCH_RESULTS_PER_PAGE', 15), type=int), 50)
+        fields = parse_field_list(request.args.get('fields'))
+        expand = parse_field_list(request.args.get('expand'))
+        projection = news_projection(fields, expand)
+        
+        def run_search():
+            ranked, total = news_search.search(query, offset=(page - 1) * per_page, limit=per_page)
+            ids = [news_item_id for news_item_id, _ in ranked]
+            items = NewsItem.query.options(*projection.options) \
+                .filter(NewsItem.id.in_(ids), NewsItem.is_published.is_(True)).all() if ids else []
+            items_by_id = {item.id: item for item in items}
             
-        if breaking is not None:
-            query = query.filter(NewsItem.is_breaking == breaking)
+            return {
+                'query': query,
+                'news': projection.dump_many([items_by_id[i] for i in ids if i in items_by_id]),
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'pages': (total + per_page - 1) // per_page,
+                    'has_next': page * per_page < total,
+                    'has_prev': page > 1
+                }
+            }
+        
+        # Any published item change can change the results, so the entry depends on 'all'
+        payload = response_cache.get_or_set(
+            ResponseCache.make_key(
+                'news:search', q=query, page=page, per_page=per_page,
+                fields=sorted(fields) if fields is not None else None, expand=sorted(expand or ())
+            ),
+            ['all'],
+            run_search
+        )
         
-        # Order by priority and date
-        query = query.order_by(NewsItem.priority.desc(), NewsItem.published_at.desc())
+        return jsonify(payload)
         
-        # Apply pagination
-        news_items = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching news: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/suggest', methods=['GET'])
+@limiter.limit("120 per minute")
+def suggest_news():
+    '''
+    Suggest news titles and tags while the user types.
+
+    Suggestions are served from an in-memory prefix index of published titles and
+    active tags, matching the start of any word, so no database query is made per
+    keystroke. Titles that start with the prefix come first, then the most recent.
+
+    Args (query parameters):
+        q (str): The typed prefix.
+        limit (int): The maximum number of titles and of tags to return.
+
+    Returns:
+        A JSON response with the suggested news titles and tags.
+    '''
+    try:
+        prefix = (request.args.get('q') or '').strip()
+        min_length = app.config.get('SUGGEST_MIN_LENGTH', 2)
+        max_length = app.config.get('SEARCH_MAX_LENGTH', 100)
+        if not min_length <= len(prefix) <= max_length:
+            return jsonify({
+                'error': f'Prefix must be between {min_length} and {max_length} characters'
+            }), 400
+        
+        limit = min(max(request.args.get('limit', app.config.get('SUGGEST_LIMIT', 10), type=int), 1), 20)
+        
+        return jsonify(dict(suggestions.suggest(prefix, limit), query=prefix))
+        
+    except Exception as e:
+        logger.error(f"Error suggesting news: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/trending', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_trending_news():
+    '''
+    Get the news items trending now.
+
+    Items are ranked by their recent views, likes and shares, each event weighted
+    by its type and decayed exponentially with its age (TRENDING_HALF_LIFE). The
+    ranking is maintained incrementally as events are recorded, so reading the top
+    items does not sort the news table.
+
+    Args (query parameters):
+        limit (int): The number of items to return.
+        fields (str): Comma separated item fields to return, as in GET /api/news.
+        expand (str): Comma separated relations returned in full, as in GET /api/news.
+
+    Returns:
+        A JSON response with the trending news items and their current scores, highest first.
+    '''
+    try:
+        limit = min(max(request.args.get('limit', app.config.get('TRENDING_LIMIT', 10), type=int), 1), 50)
+        fields = parse_field_list(request.args.get('fields'))
+        expand = parse_field_list(request.args.get('expand'))
+        projection = news_projection(fields, expand)
+        
+        def load_trending():
+            # Unpublished items may still be ranked, so read a few more than needed
+            ranked = trending.top(limit * 2)
+            ids = [news_item_id for news_item_id, _ in ranked]
+            items = NewsItem.query.options(*projection.options) \
+                .filter(NewsItem.id.in_(ids), NewsItem.is_published.is_(True)).all() if ids else []
+            items_by_id = {item.id: item for item in items}
+            
+            news = [
+                dict(projection.dump(items_by_id[news_item_id]), trending_score=round(score, 3))
+                for news_item_id, score in ranked if news_item_id in items_by_id
+            ]
+            return {'news': news[:limit]}
+        
+        # The ranking moves with every event; a short timeout bounds how stale it gets
+        payload = response_cache.get_or_set(
+            ResponseCache.make_key(
+                'news:trending', limit=limit,
+                fields=sorted(fields) if fields is not None else None, expand=sorted(expand or ())
+            ),
+            ['all'],
+            load_trending,
+            timeout=app.config.get('TRENDING_CACHE_TIMEOUT', 30)
         )
         
-        return jsonify({
-            'news': [item.to_dict() for item in news_items.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': news_items.total,
-                'pages': news_items.pages,
-                'has_next': news_items.has_next,
-                'has_prev': news_items.has_prev
-            }
-        })
+        return jsonify(payload)
         
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error getting news: {str(e)}")
+        logger.error(f"Error getting trending news: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/stream', methods=['GET'])
+@limiter.limit("10 per minute")
+def stream_news():
+    '''
+    Stream newly published and breaking news items with Server-Sent Events.
+
+    The connection stays open and receives a `published` event when a news item is
+    published and a `breaking` event when a published item is breaking news, so
+    clients do not need to poll GET /api/news?breaking=true. A comment is sent every
+    STREAM_KEEPALIVE seconds, and the stream ends after STREAM_MAX_DURATION seconds;
+    EventSource clients reconnect with Last-Event-ID and receive the events they
+    missed, or a `reset` event if those are no longer buffered.
+
+    Args (query parameters):
+        breaking (bool): Only stream breaking news.
+        last_event_id (int): The last received event id, for clients that cannot send
+            the Last-Event-ID header.
+
+    Returns:
+        A text/event-stream response.
+    '''
+    try:
+        if news_stream.full:
+            return jsonify({'error': 'Too many open streams'}), 503
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            if not last_event_id.isdigit():
+                return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+            last_event_id = int(last_event_id)
+        breaking = request.args.get('breaking', type=bool)
+        
+        return Response(
+            news_stream.stream(last_event_id, breaking_only=bool(breaking)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Error opening news stream: {str(e)}")
         return jsonify({'error': 'Server error'}), 500
 
 
@@ -219,44 +554,339 @@ def get_news_item(slug):
     Get a specific news item.
 
     This endpoint returns the details of a specific news item, identified by its slug.
-    It also increments the view count for the news item.
+    It also records a view in the buffered view counter, which is written to the
+    database in batches, so the request itself stays read-only.
 
     Args:
         slug (str): The slug of the news item.
 
+    Args (query parameters):
+        fields (str): Comma separated fields to return, e.g. `id,title,summary`.
+            The `content` and `content_en` columns are only read when requested.
+        expand (str): Comma separated relations (`category`, `tags`) returned in full.
+
     Returns:
-        A JSON response with the details of the news item.
+        A JSON response with the details of the news item, or a permanent redirect
+        to GET /api/news/archive/<id> when the news item has been archived.
     '''
     try:
-        news_item = NewsItem.query.filter_by(slug=slug, is_published=True).first()
-        if not news_item:
+        fields = parse_field_list(request.args.get('fields'))
+        expand = parse_field_list(request.args.get('expand'))
+        projection = news_projection(fields, expand, include_content=True)
+        
+        def load_news_item():
+            news_item = NewsItem.query.options(*projection.options) \
+                .filter_by(slug=slug, is_published=True).first()
+            if not news_item:
+                return None
+            data = projection.dump(news_item)
+            if 'view_count' in data:
+                # Changes with every flush of the view counter; read live below
+                data['view_count'] = None
+            return data
+        
+        data = response_cache.get_or_set(
+            ResponseCache.make_key(
+                'news:item', slug=slug, fields=sorted(fields) if fields is not None else None,
+                expand=sorted(expand or ())
+            ),
+            item_tags(slug),
+            load_news_item
+        )
+        if not data:
+            archive_id = resolve_archived_slug(slug)
+            if archive_id is not None:
+                return redirect(url_for('get_archived_news', archive_id=archive_id), 301)
             return jsonify({'error': 'News item not found'}), 404
         
-        # Update view count
-        news_item.increment_view_count()
+        # Record the view; it is flushed to the database in batches
+        view_counter.increment(data['id'])
+        engagement.record(
+            data['id'], 'view',
+            visitor_id=get_visitor_id(),
+            referrer=request.args.get('ref') or request.referrer
+        )
+        trending.record(data['id'], 'view')
+        
+        if 'view_count' in data:
+            view_count = db.session.query(NewsItem.view_count).filter_by(id=data['id']).scalar()
+            data = dict(data, view_count=(view_count or 0) + view_counter.pending(data['id']))
         
-        return jsonify(news_item.to_dict(include_content=True))
+        return jsonify(data)
         
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting news item: {str(e)}")
         return jsonify({'error': 'Server error'}), 500
 
 
+@app.route('/api/news/archive/<int:archive_id>', methods=['GET'])
+@limiter.limit("30 per minute")
+def get_archived_news(archive_id):
+    '''
+    Get an archived news item.
+
+    News items that expired or are older than AUTO_ARCHIVE_DAYS are moved to the
+    archive by the archiver; their old slugs redirect here.
+
+    Args:
+        archive_id (int): The id of the news item in the archive.
+
+    Returns:
+        A JSON response with the archived news item, with status `archived`.
+    '''
+    try:
+        archived = db.session.get(NewsArchive, archive_id)
+        if archived is None:
+            return jsonify({'error': 'News item not found'}), 404
+        return jsonify(archived.to_dict(native=True))
+        
+    except Exception as e:
+        logger.error(f"Error getting archived news item: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/<slug>/related', methods=['GET'])
+@limiter.limit("30 per minute")
+def get_related_news(slug):
+    '''
+    Get the news items related to a specific news item.
+
+    Related items are precomputed in the background from shared tags and similar
+    titles and summaries, so this endpoint reads them, most similar first, with a
+    single query on the news_related primary key.
+
+    Args:
+        slug (str): The slug of the news item.
+
+    Args (query parameters):
+        limit (int): The maximum number of related items to return.
+        fields (str): Comma separated item fields to return, as in GET /api/news.
+        expand (str): Comma separated relations returned in full, as in GET /api/news.
+
+    Returns:
+        A JSON response with the related news items.
+    '''
+    try:
+        top_k = app.config.get('RELATED_TOP_K', 10)
+        limit = min(max(request.args.get('limit', top_k, type=int), 1), top_k)
+        fields = parse_field_list(request.args.get('fields'))
+        expand = parse_field_list(request.args.get('expand'))
+        projection = news_projection(fields, expand)
+        
+        def load_related():
+            source = aliased(NewsItem)
+            items = NewsItem.query.options(*projection.options) \
+                .join(NewsRelated, NewsRelated.related_item_id == NewsItem.id) \
+                .join(source, source.id == NewsRelated.news_item_id) \
+                .filter(source.slug == slug, source.is_published.is_(True), NewsItem.is_published.is_(True)) \
+                .order_by(NewsRelated.rank).limit(limit).all()
+            if not items and not NewsItem.query.filter_by(slug=slug, is_published=True).first():
+                return None
+            return {'news': projection.dump_many(items)}
+        
+        # Related items change when they are edited or when the job recomputes them
+        payload = response_cache.get_or_set(
+            ResponseCache.make_key(
+                'news:related', slug=slug, limit=limit,
+                fields=sorted(fields) if fields is not None else None, expand=sorted(expand or ())
+            ),
+            item_tags(slug) + ['all', 'related'],
+            load_related
+        )
+        if payload is None:
+            return jsonify({'error': 'News item not found'}), 404
+        
+        return jsonify(payload)
+        
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting related news: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/<slug>/comments', methods=['GET'])
+@limiter.limit("30 per minute")
+def get_news_comments(slug):
+    '''
+    Get the approved comments of a news item as threads.
+
+    Top-level comments are returned newest first, each with its nested replies in
+    chronological order and a `replies_count`. A page of threads and all of their
+    replies is read with one recursive query and assembled in memory.
+
+    Args:
+        slug (str): The slug of the news item.
+
+    Args (query parameters):
+        per_page (int): The number of top-level threads per page.
+        cursor (str): The `next_cursor` of the previous page.
+
+    Returns:
+        A JSON response with the comment threads and pagination information.
+    '''
+    try:
+        if not app.config.get('COMMENTS_ENABLED', True):
+            return jsonify({'error': 'Comments are disabled'}), 403
+        
+        per_page = min(max(request.args.get('per_page', app.config.get('COMMENTS_PER_PAGE', 20), type=int), 1), 50)
+        cursor = request.args.get('cursor') or None
+        
+        def load_comments():
+            news_item = NewsItem.query.with_entities(NewsItem.id, NewsItem.comment_count) \
+                .filter_by(slug=slug, is_published=True).first()
+            if news_item is None:
+                return None
+            threads, next_cursor = comment_thread_page(news_item.id, per_page, cursor)
+            return {
+                'comments': threads,
+                'comment_count': news_item.comment_count or 0,
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': next_cursor,
+                    'has_next': next_cursor is not None
+                }
+            }
+        
+        payload = response_cache.get_or_set(
+            ResponseCache.make_key('news:comments', slug=slug, per_page=per_page, cursor=cursor),
+            item_tags(slug) + comment_tags(slug),
+            load_comments
+        )
+        if payload is None:
+            return jsonify({'error': 'News item not found'}), 404
+        
+        return jsonify(payload)
+        
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        logger.error(f"Error getting comments: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/<slug>/comments', methods=['POST'])
+@limiter.limit(lambda: app.config.get('RATE_LIMIT_COMMENT_CREATE', '20 per hour'))
+def create_news_comment(slug):
+    '''
+    Submit a comment on a news item.
+
+    The comment is saved as pending and the request returns immediately. Spam and
+    profanity scoring runs in the background; clean comments are then approved and
+    counted in the news item's `comment_count`, spam is hidden and comments with
+    severe profanity are held for the moderators.
+
+    Args:
+        slug (str): The slug of the news item.
+
+    Args (JSON body):
+        user_name (str): The name shown with the comment.
+        content (str): The comment, at most MAX_COMMENT_LENGTH characters.
+        parent_id (int): The comment being replied to, if any.
+        user_email (str): The commenter's email, not shown publicly.
+
+    Returns:
+        A JSON response with the id and moderation status of the new comment.
+    '''
+    try:
+        if not app.config.get('COMMENTS_ENABLED', True):
+            return jsonify({'error': 'Comments are disabled'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        news_item = NewsItem.query.with_entities(NewsItem.id) \
+            .filter_by(slug=slug, is_published=True).first()
+        if not news_item:
+            return jsonify({'error': 'News item not found'}), 404
+        
+        parent_id = data.get('parent_id')
+        if parent_id is not None and not isinstance(parent_id, int):
+            return jsonify({'error': 'parent_id must be an integer'}), 400
+        
+        comment = comment_moderation.submit(
+            news_item.id,
+            user_name=data.get('user_name'),
+            content=data.get('content'),
+            parent_id=parent_id,
+            user_email=data.get('user_email'),
+            user_ip=get_remote_address()
+        )
+        
+        return jsonify({
+            'id': comment.id,
+            'status': 'approved' if comment.is_approved else 'pending'
+        }), 201 if comment.is_approved else 202
+        
+    except InvalidComment as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error creating comment: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/news/<slug>/events', methods=['POST'])
+@limiter.limit("30 per minute")
+def record_news_event(slug):
+    '''
+    Record an engagement event for a news item.
+
+    The event is aggregated in memory and rolled up into the daily news stats in
+    batches, so this endpoint does not write to the database.
+
+    Args:
+        slug (str): The slug of the news item.
+
+    Args (JSON body):
+        type (str): The event type, either 'like' or 'share'.
+
+    Returns:
+        A JSON response confirming that the event was accepted.
+    '''
+    try:
+        data = request.get_json(silent=True) or {}
+        event_type = data.get('type')
+        if event_type not in ('like', 'share'):
+            return jsonify({'error': 'Invalid event type'}), 400
+        
+        news_item_id = db.session.query(NewsItem.id).filter_by(slug=slug, is_published=True).scalar()
+        if news_item_id is None:
+            return jsonify({'error': 'News item not found'}), 404
+        
+        engagement.record(news_item_id, event_type, visitor_id=get_visitor_id())
+        trending.record(news_item_id, event_type)
+        
+        return jsonify({'message': 'Event recorded'}), 202
+        
+    except Exception as e:
+        logger.error(f"Error recording news event: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
 @app.route('/api/categories', methods=['GET'])
-@cache.cached(timeout=300)
 def get_categories():
     '''
     Get a list of news categories.
 
     This endpoint returns a list of all active news categories, ordered by display order.
+    The list is served from the response cache; when it expires, one worker rebuilds
+    it while the others keep serving the previous list.
 
     Returns:
         A JSON response with a list of news categories.
     '''
     try:
-        categories = NewsCategory.query.filter_by(is_active=True).order_by(NewsCategory.display_order).all()
+        def load_categories():
+            categories = NewsCategory.query.filter_by(is_active=True).order_by(NewsCategory.display_order).all()
+            return {'categories': NewsCategory.serializer.dump_many(categories, native=True)}
+        
+        payload = response_cache.get_or_set(
+            ResponseCache.make_key('news:categories'),
+            ['categories'],
+            load_categories
+        )
         
-        return jsonify({'categories': [cat.to_dict() for cat in categories]})
+        return jsonify(payload)
         
     except Exception as e:
         logger.error(f"Error getting categories: {str(e)}")
@@ -264,20 +894,28 @@ def get_categories():
 
 
 @app.route('/api/tags', methods=['GET'])
-@cache.cached(timeout=300)
 def get_tags():
     '''
     Get a list of news tags.
 
     This endpoint returns a list of the top 20 most used active news tags.
+    Like the categories, the list is served stale while a single worker rebuilds it.
 
     Returns:
         A JSON response with a list of news tags.
     '''
     try:
-        tags = NewsTag.query.filter_by(is_active=True).order_by(NewsTag.usage_count.desc()).limit(20).all()
+        def load_tags():
+            tags = NewsTag.query.filter_by(is_active=True).order_by(NewsTag.usage_count.desc()).limit(20).all()
+            return {'tags': NewsTag.serializer.dump_many(tags, native=True)}
         
-        return jsonify({'tags': [tag.to_dict() for tag in tags]})
+        payload = response_cache.get_or_set(
+            ResponseCache.make_key('news:tags'),
+            ['tags'],
+            load_tags
+        )
+        
+        return jsonify(payload)
         
     except Exception as e:
         logger.error(f"Error getting tags: {str(e)}")
@@ -302,18 +940,22 @@ def get_stats():
         total_tags = NewsTag.query.filter_by(is_active=True).count()
         total_comments = NewsComment.query.filter_by(is_approved=True).count()
         
-        # Today's stats
+        # Today's stats, summed over all news items
         today = datetime.utcnow().date()
-        today_stats = NewsStats.query.filter_by(date=today).first()
+        today_views, today_likes, today_shares = db.session.query(
+            db.func.coalesce(db.func.sum(NewsStats.views), 0),
+            db.func.coalesce(db.func.sum(NewsStats.likes), 0),
+            db.func.coalesce(db.func.sum(NewsStats.shares), 0)
+        ).filter(NewsStats.date == today).one()
         
         return jsonify({
             'total_news': total_news,
             'total_categories': total_categories,
             'total_tags': total_tags,
             'total_comments': total_comments,
-            'today_views': today_stats.views if today_stats else 0,
-            'today_likes': today_stats.likes if today_stats else 0,
-            'today_shares': today_stats.shares if today_stats else 0
+            'today_views': today_views,
+            'today_likes': today_likes,
+            'today_shares': today_shares
         })
         
     except Exception as e:
@@ -346,6 +988,64 @@ def load_initial_data():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/admin/cleanup', methods=['POST'])
+@require_admin_key
+def run_cleanup():
+    '''
+    Run the retention cleanup.
+
+    This is an admin-only endpoint. Daily stats older than OLD_STATS_CLEANUP_DAYS are
+    rolled up into monthly rows and deleted or spam comments older than
+    OLD_COMMENTS_CLEANUP_DAYS are removed, in small transactions.
+
+    Args (query parameters):
+        dry_run (bool): Only count the rows that would be cleaned up.
+
+    Returns:
+        A JSON response with the rows removed and created, the number of transactions,
+        the longest transaction in milliseconds and the total time in seconds.
+    '''
+    try:
+        dry_run = request.args.get('dry_run', 'false').lower() in ('1', 'true', 'yes')
+        return jsonify(retention_cleanup.run(dry_run=dry_run))
+        
+    except Exception as e:
+        logger.error(f"Error running cleanup: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
+@app.route('/api/admin/comments/moderate', methods=['POST'])
+@require_admin_key
+def bulk_moderate_comments():
+    '''
+    Approve, reject or mark as spam a list of comments.
+
+    This is an admin-only endpoint. The comments are updated with a single UPDATE,
+    the `comment_count` of the affected news items is recomputed with one grouped
+    query and only those news items' cached pages are invalidated.
+
+    Args (JSON body):
+        ids (list): The comment ids, at most COMMENT_BULK_MODERATION_LIMIT.
+        action (str): `approve`, `reject` or `spam`.
+        moderator_id (int): The moderator recorded as approver, if any.
+
+    Returns:
+        A JSON response with the number of updated comments and affected news items.
+    '''
+    try:
+        data = request.get_json(silent=True) or {}
+        report = comment_moderation.bulk_moderate(
+            data.get('ids') or [], data.get('action'), moderator_id=data.get('moderator_id')
+        )
+        return jsonify(report)
+        
+    except InvalidComment as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error moderating comments: {str(e)}")
+        return jsonify({'error': 'Server error'}), 500
+
+
 @app.errorhandler(404)
 def not_found(error):
     '''404 error handler.'''
@@ -364,12 +1064,62 @@ def ratelimit_handler(e):
     '''Ratelimit error handler.'''
     return jsonify({'error': 'Ratelimit exceeded'}), 429
 
+@app.cli.command('reconcile-counts')
+def reconcile_counts():
+    '''Rebuild the materialized per-category published news counters.'''
+    corrected = NewsCategory.reconcile_published_counts()
+    logger.info(f"Reconciled published counts for {corrected} categories")
+
+
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    '''Add new columns and indexes to an existing database.'''
+    from app.utils.migrations import upgrade_schema
+    upgrade_schema()
+
+
+@app.cli.command('reindex-search')
+def reindex_search():
+    '''Rebuild the news search index from the published news items.'''
+    indexed = news_search.rebuild()
+    logger.info(f"Indexed {indexed} news items for search")
+
+
+@app.cli.command('compute-related')
+def compute_related():
+    '''Recompute the related news items of every published news item.'''
+    computed = related_articles.compute()
+    logger.info(f"Computed related news for {computed} news items")
+
+
+@app.cli.command('archive-news')
+def archive_news():
+    '''Move expired and old news items to the archive table.'''
+    report = news_archiver.run()
+    logger.info(f"Archived {report['moved']} news items in {report['batches']} batches "
+                f"({report['seconds']}s), {report['failed']} failed")
+
+
+@app.cli.command('cleanup-data')
+@click.option('--dry-run', is_flag=True, help='Only count the rows that would be cleaned up.')
+def cleanup_data(dry_run):
+    '''Roll up old daily stats and remove old deleted or spam comments.'''
+    report = retention_cleanup.run(dry_run=dry_run)
+    logger.info(f"Cleanup{' (dry run)' if dry_run else ''}: {report}")
+
+
 def create_tables():
-    '''Create database tables.'''
+    '''Create database tables and upgrade existing ones.'''
     try:
         with app.app_context():
             db.create_all()
             logger.info("Database tables created successfully")
+            
+            from app.utils.migrations import upgrade_schema
+            upgrade_schema()
+            
+            # Index existing news items the first time search is enabled
+            news_search.ensure_index()
     except Exception as e:
         logger.error(f"Error creating tables: {str(e)}")
 
@@ -388,4 +1138,3 @@ if __name__ == '__main__':
     logger.info(f"🗄️ Database: {app.config.get('SQLALCHEMY_DATABASE_URI')}")
     
     app.run(host=host, port=port, debug=debug)
-'''
@@ -10,9 +10,10 @@ from django.http import JsonResponse
 from django.conf import settings
 from django.core.cache import cache
 from django.utils.deprecation import MiddlewareMixin
-from .models import AIUsageQuota, AIAuditLog
+from .models import AIModel, AIUsageQuota, AIAuditLog
 from .utils.rate_limiter import RateLimiter
 from .utils.quota_checker import QuotaChecker
+from .utils.audit_writer import get_audit_writer
 
 
 class AIGovernanceMiddleware(MiddlewareMixin):
@@ -28,6 +29,10 @@ class AIGovernanceMiddleware(MiddlewareMixin):
         self.get_response = get_response
         self.rate_limiter = RateLimiter()
         self.quota_checker = QuotaChecker()
+        # Audit records are written in batches off the request path unless AUDIT_ASYNC is off
+        self.audit_writer = None
+        if getattr(settings, 'AI_GOVERNANCE', {}).get('AUDIT_ASYNC', True):
+            self.audit_writer = get_audit_writer()
         super().__init__(get_response)
 
     def process_request(self, request):
@@ -45,20 +50,25 @@ class AIGovernanceMiddleware(MiddlewareMixin):
         user = getattr(request, 'user', None)
         session_id = request.session.session_key
         ip_address = self._get_client_ip(request)
+        ai_model_id = self._get_ai_model_id(request)
 
-        # Rate limiting check
-        if not self.rate_limiter.is_allowed(user, session_id, ip_address):
+        # Rate limiting check (the request is counted in the same round trip)
+        decision = self.rate_limiter.evaluate(user, session_id, ip_address, record=True, ai_model_id=ai_model_id)
+        if not decision.allowed:
             self._log_governance_action(
                 'quota_exceeded',
-                f'Rate limit exceeded for {user or session_id or ip_address}',
+                f'Rate limit exceeded for {user or session_id or ip_address} ({decision.window})',
                 request,
                 user
             )
-            return JsonResponse({
+            response = JsonResponse({
                 'error': 'Rate limit exceeded',
                 'message': 'Too many AI requests. Please try again later.',
-                'retry_after': self.rate_limiter.get_retry_after(user, session_id, ip_address)
+                'retry_after': decision.retry_after,
+                'window': decision.window,
             }, status=429)
+            response['Retry-After'] = str(decision.retry_after)
+            return response
 
         # Quota check
         quota_result = self.quota_checker.check_quota(user, session_id)
@@ -81,7 +91,9 @@ class AIGovernanceMiddleware(MiddlewareMixin):
             'user': user,
             'session_id': session_id,
             'ip_address': ip_address,
+            'ai_model_id': ai_model_id,
             'quota_remaining': quota_result.get('remaining', {}),
+            'rate_limit': decision,
         }
 
         return None
@@ -101,12 +113,13 @@ class AIGovernanceMiddleware(MiddlewareMixin):
         if hasattr(request, 'ai_governance'):
             processing_time = time.time() - request.ai_governance['start_time']
             
-            # Update rate limiter
-            self.rate_limiter.record_request(
+            # Update rate limiter usage (the request itself was counted by acquire)
+            self.rate_limiter.record_usage(
                 request.ai_governance['user'],
                 request.ai_governance['session_id'],
                 request.ai_governance['ip_address'],
-                processing_time
+                processing_time,
+                ai_model_id=request.ai_governance['ai_model_id']
             )
 
             # Log successful request
@@ -140,10 +153,40 @@ class AIGovernanceMiddleware(MiddlewareMixin):
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+    def _get_ai_model_id(self, request):
+        """
+        Id of the AI model the request asks for, from an ai_model_id or model
+        (AIModel name) query parameter or JSON body field, or None
+        """
+        values = request.GET
+        if request.content_type == 'application/json' and request.body:
+            try:
+                body = json.loads(request.body)
+            except ValueError:
+                body = None
+            if isinstance(body, dict):
+                values = body
+        ai_model_id = values.get('ai_model_id') or request.GET.get('ai_model_id')
+        if ai_model_id is not None:
+            try:
+                return int(ai_model_id)
+            except (TypeError, ValueError):
+                return None
+        name = values.get('model') or request.GET.get('model')
+        if not isinstance(name, str) or not name:
+            return None
+        # Model names are resolved once per cache timeout, not per request
+        cache_key = f"ai_model_id:{name}"
+        ai_model_id = cache.get(cache_key)
+        if ai_model_id is None:
+            ai_model_id = AIModel.objects.filter(name=name, is_active=True).values_list('id', flat=True).first() or 0
+            cache.set(cache_key, ai_model_id, 300)
+        return ai_model_id or None
+
     def _log_governance_action(self, action, description, request, user=None, metadata=None):
         """Log governance actions for auditing"""
         try:
-            AIAuditLog.objects.create(
+            fields = dict(
                 action=action,
                 description=description,
                 user=user,
@@ -151,6 +194,10 @@ class AIGovernanceMiddleware(MiddlewareMixin):
                 user_agent=request.META.get('HTTP_USER_AGENT', ''),
                 metadata=metadata or {}
             )
+            if self.audit_writer is not None:
+                self.audit_writer.submit(**fields)
+            else:
+                AIAuditLog.objects.create(**fields)
         except Exception as e:
             # Log error but don't break the request
             import logging
@@ -0,0 +1,16 @@
+"""
+Signal handlers for AI Governance
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AIUsageQuota
+from .utils.quota_table import invalidate_quota_tables
+
+
+@receiver(post_save, sender=AIUsageQuota)
+@receiver(post_delete, sender=AIUsageQuota)
+def reload_usage_quotas(sender, **kwargs):
+    """Reload in-process quota tables after a quota changes"""
+    invalidate_quota_tables()
@@ -0,0 +1,184 @@
+"""
+Asynchronous Audit Log Writer for AI Governance
+
+Takes AIAuditLog records off the request path: records are queued in memory
+and written by a background thread with bulk_create
+"""
+
+import atexit
+import time
+import threading
+import logging
+from collections import deque
+from typing import Any, Dict, Optional
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger('ai_governance')
+
+# What submit() does when the queue is full
+OVERFLOW_POLICIES = ('drop', 'oldest', 'block')
+
+
+class AuditLogWriter:
+    """
+    Bounded in-memory queue of AIAuditLog records drained in batches.
+
+    Overflow policies when max_queue records are waiting:
+    - drop: discard the new record
+    - oldest: discard the oldest queued record to make room
+    - block: wait up to block_timeout for room, then discard the new record
+
+    created_at is the time of submit(), not of the write.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 200, flush_interval: float = 1.0,
+                 overflow: str = 'drop', block_timeout: float = 0.5, background: bool = True):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.background = background
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
+    def submit(self, **fields) -> bool:
+        """
+        Queue one audit record (AIAuditLog field values); returns False when it was dropped
+        """
+        from ..models import AIAuditLog
+
+        record = AIAuditLog(**fields)
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == 'oldest':
+                    self._queue.popleft()
+                    self._counters['dropped'] += 1
+                elif self.overflow == 'block':
+                    self._condition.notify_all()
+                    self._condition.wait_for(lambda: len(self._queue) < self.max_queue, self.block_timeout)
+                if len(self._queue) >= self.max_queue:
+                    self._counters['dropped'] += 1
+                    return False
+            self._queue.append(record)
+            self._counters['enqueued'] += 1
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+        self._ensure_started()
+        return True
+
+    def flush(self) -> int:
+        """
+        Write everything queued now, in the calling thread; returns the number written
+        """
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Stop the background thread and write the remaining records
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Queue depth and counters for monitoring
+        """
+        with self._condition:
+            return dict(self._counters, queue_depth=len(self._queue), max_queue=self.max_queue,
+                        overflow=self.overflow)
+
+    def _ensure_started(self):
+        if not self.background or self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name='ai-audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """
+        Background loop: write a batch when it is full or flush_interval has passed
+        """
+        try:
+            while True:
+                with self._condition:
+                    deadline = time.monotonic() + self.flush_interval
+                    while not self._stopping and len(self._queue) < self.batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    if self._stopping:
+                        return
+                batch = self._take_batch()
+                if batch:
+                    # Drop connections the database closed or that outlived CONN_MAX_AGE while idle
+                    close_old_connections()
+                    self._write(batch)
+        finally:
+            close_old_connections()
+
+    def _take_batch(self):
+        with self._condition:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if batch:
+                # Room for blocked submitters
+                self._condition.notify_all()
+            return batch
+
+    def _write(self, batch) -> int:
+        from ..models import AIAuditLog
+
+        with self._write_lock:
+            try:
+                AIAuditLog.objects.bulk_create(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} audit log records: {e}")
+                with self._condition:
+                    self._counters['failed'] += len(batch)
+                return 0
+            with self._condition:
+                self._counters['written'] += len(batch)
+                self._counters['batches'] += 1
+            return len(batch)
+
+
+_writer: Optional[AuditLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditLogWriter:
+    """
+    Process-wide writer configured from AI_GOVERNANCE, flushed at interpreter exit
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            config = getattr(settings, 'AI_GOVERNANCE', {})
+            _writer = AuditLogWriter(
+                max_queue=config.get('AUDIT_QUEUE_SIZE', 10000),
+                batch_size=config.get('AUDIT_BATCH_SIZE', 200),
+                flush_interval=config.get('AUDIT_FLUSH_INTERVAL', 1.0),
+                overflow=config.get('AUDIT_OVERFLOW', 'drop'),
+                block_timeout=config.get('AUDIT_BLOCK_TIMEOUT', 0.5),
+            )
+            atexit.register(_writer.shutdown)
+        return _writer
@@ -0,0 +1,142 @@
+"""
+Local Pre-Limiter for AI Governance
+
+Answers most rate limit decisions inside the worker process by leasing
+request allotments from the shared (Redis) backend in chunks
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+from .sliding_window import ACQUIRE, SlidingWindowCounter, WindowResult
+
+logger = logging.getLogger('ai_governance')
+
+
+class _Lease:
+    """Allotment held by this worker for one identifier"""
+    __slots__ = ('tokens', 'leased_at', 'expires_at', 'denied_until', 'counts', 'window', 'limits')
+
+    def __init__(self):
+        self.tokens = 0
+        self.leased_at = 0.0
+        self.expires_at = 0.0
+        self.denied_until = 0.0
+        self.counts = {}
+        self.window = None
+        self.limits = {}
+
+
+class LocalPreLimiter:
+    """
+    Two-tier limiter: an in-process allotment per identifier in front of a shared backend.
+
+    A worker takes up to lease_size requests from the shared backend in one
+    round trip (they are counted there immediately) and admits them locally
+    until they are used up or lease_seconds pass. A refusal from the shared
+    backend is remembered until its retry_after, so clients far over their
+    limit are also turned away without a round trip.
+
+    Leased requests are counted in the shared backend when they are taken,
+    so a lease that is not used up holds back allowance that other workers
+    (or the same client, later) could have used. To keep that small, a lease
+    is never more than a quarter of the tightest remaining shared allowance
+    (a quarter of the limit for the first lease), and the unused part is
+    given back to the shared backend when the lease expires or the
+    identifier is evicted. A client under its limit is therefore admitted up
+    to the limit whatever its request rate.
+    """
+
+    def __init__(self, backend: SlidingWindowCounter, lease_size: int = 10,
+                 lease_seconds: float = 1.0, max_identifiers: int = 10000):
+        self.backend = backend
+        self.lease_size = max(1, lease_size)
+        self.lease_seconds = lease_seconds
+        self.max_identifiers = max_identifiers
+        self._leases = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'local': 0, 'shared': 0, 'released': 0}
+
+    def hit(self, identifier: str, limits: Dict[str, int], now: Optional[float] = None) -> WindowResult:
+        """
+        Admit or refuse one request, going to the shared backend only when the lease is spent
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            lease = self._leases.get(identifier)
+            if lease is None:
+                lease = self._leases[identifier] = _Lease()
+                if len(self._leases) > self.max_identifiers:
+                    self._release(*self._leases.popitem(last=False))
+            else:
+                self._leases.move_to_end(identifier)
+
+            if now < lease.denied_until:
+                self.stats['local'] += 1
+                return WindowResult(False, lease.window, lease.counts, lease.denied_until - now)
+            if lease.tokens > 0 and now < lease.expires_at:
+                lease.tokens -= 1
+                self.stats['local'] += 1
+                return WindowResult(True, None, self._counts(lease), 0.0)
+            if lease.tokens > 0:
+                self._release(identifier, lease)
+
+            self.stats['shared'] += 1
+            result = self._renew(lease, identifier, limits, now)
+            return result._replace(counts=self._counts(lease))
+
+    def _renew(self, lease: _Lease, identifier: str, limits: Dict[str, int], now: float) -> WindowResult:
+        """
+        Lease a new allotment (including the current request) from the shared backend
+        """
+        size = self._next_size(lease, limits)
+        result = self.backend.hit(identifier, limits, cost=size, mode=ACQUIRE, now=now)
+        if not result.allowed and size > 1:
+            # Not enough left for a full lease: take what remains, or ask for this
+            # request alone so a refusal carries its own retry_after
+            size = max(1, min(limits[window] - result.counts[window] for window in limits))
+            result = self.backend.hit(identifier, limits, cost=size, mode=ACQUIRE, now=now)
+
+        lease.counts = result.counts
+        lease.window = result.window
+        if not result.allowed:
+            lease.tokens = 0
+            lease.denied_until = now + result.retry_after
+            return result
+        lease.tokens = size - 1
+        lease.leased_at = now
+        lease.limits = limits
+        lease.expires_at = now + self.lease_seconds
+        lease.denied_until = 0.0
+        return result
+
+    def _release(self, identifier: str, lease: _Lease):
+        """
+        Give the unused part of an expired or evicted lease back to the shared backend
+        """
+        if lease.tokens <= 0:
+            return
+        try:
+            self.backend.release(identifier, lease.limits, lease.tokens, lease.leased_at)
+        except Exception as e:
+            # The allotment stays counted until it leaves the window
+            logger.warning(f"Could not release {lease.tokens} leased requests for {identifier}: {e}")
+        self.stats['released'] += lease.tokens
+        lease.counts = self._counts(lease)
+        lease.tokens = 0
+
+    @staticmethod
+    def _counts(lease: _Lease) -> Dict[str, int]:
+        """
+        Shared counts at lease time, less the leased requests this worker has not used yet
+        """
+        return {window: count - lease.tokens for window, count in lease.counts.items()}
+
+    def _next_size(self, lease: _Lease, limits: Dict[str, int]) -> int:
+        """
+        A quarter of the tightest remaining shared allowance, capped at lease_size
+        """
+        remaining = min(limits[window] - lease.counts.get(window, 0) for window in limits)
+        return max(1, min(self.lease_size, remaining // 4))
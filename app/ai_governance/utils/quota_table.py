@@ -0,0 +1,104 @@
+"""
+Quota Lookup Table for AI Governance
+
+Keeps the active AIUsageQuota rows in process memory so rate limits can be
+resolved per request without a database query
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger('ai_governance')
+
+# Bumped by the AIUsageQuota signals; tables reload on their next lookup
+_generation = 0
+
+
+def invalidate_quota_tables():
+    """
+    Make every QuotaTable in this process reload on its next lookup
+    """
+    global _generation
+    _generation += 1
+
+
+class QuotaTable:
+    """
+    In-memory lookup of active AIUsageQuota rows.
+
+    Rows are loaded with one query and reloaded every refresh_interval
+    seconds, or sooner in this process when a quota is saved or deleted.
+    Other workers pick up changes on their next periodic refresh.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._entries = {}
+        self._loaded_at = None
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def limits_for(self, quota_type: str, user_id: Optional[int] = None,
+                   ai_model_id: Optional[int] = None) -> Tuple[Dict[str, int], bool]:
+        """
+        Resolve requests_per_<period> and tokens_per_<period> limits for a target.
+
+        More specific rows override less specific ones: the quota type default,
+        then the model, then the user, then the user and model together.
+
+        Returns:
+            (limits, model_scoped) where model_scoped tells whether a model
+            specific row applied, so usage has to be counted per model
+        """
+        entries = self._current()
+        limits = {}
+        model_scoped = False
+        for target_user, target_model in ((None, None), (None, ai_model_id), (user_id, None), (user_id, ai_model_id)):
+            periods = entries.get((quota_type, target_user, target_model), {})
+            for period, (max_requests, max_tokens) in periods.items():
+                limits[f"requests_per_{period}"] = max_requests
+                limits[f"tokens_per_{period}"] = max_tokens
+                model_scoped = model_scoped or target_model is not None
+        return limits, model_scoped
+
+    def _current(self) -> dict:
+        """
+        Entries, reloaded when stale or invalidated
+        """
+        if self._is_fresh():
+            return self._entries
+        with self._lock:
+            if not self._is_fresh():
+                generation = _generation
+                self._entries = self._load()
+                self._loaded_at = time.monotonic()
+                self._generation = generation
+        return self._entries
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and self._generation == _generation
+            and time.monotonic() - self._loaded_at < self.refresh_interval
+        )
+
+    def _load(self) -> dict:
+        """
+        Read all active quotas: (quota_type, user_id, ai_model_id) -> {period: (max_requests, max_tokens)}
+        """
+        from ..models import AIUsageQuota
+
+        entries = {}
+        try:
+            rows = AIUsageQuota.objects.filter(is_active=True).values_list(
+                'quota_type', 'user_id', 'ai_model_id', 'period', 'max_requests', 'max_tokens'
+            )
+            for quota_type, user_id, ai_model_id, period, max_requests, max_tokens in rows:
+                entries.setdefault((quota_type, user_id, ai_model_id), {})[period] = (max_requests, max_tokens)
+        except Exception as e:
+            # Keep serving the previous table rather than failing requests
+            logger.error(f"Failed to load usage quotas: {e}")
+            return self._entries
+        return entries
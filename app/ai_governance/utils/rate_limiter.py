@@ -4,23 +4,38 @@ Rate Limiter for AI Governance
 Implements sophisticated rate limiting with multiple strategies
 """
 
+import math
 import time
-import json
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, Union
 from django.core.cache import cache
 from django.conf import settings
 from django.contrib.auth.models import User
 import logging
+from .sliding_window import ACQUIRE, PEEK, RECORD, WINDOWS, get_window_backend
+from .quota_table import QuotaTable
+from .local_limiter import LocalPreLimiter
 
 logger = logging.getLogger('ai_governance')
 
 
+@dataclass
+class RateLimitDecision:
+    """Outcome of evaluating every rate limit window for one identifier"""
+    allowed: bool
+    identifier: str
+    window: Optional[str] = None  # first window that refused the request, 'tokens_per_<window>' for token limits
+    retry_after: int = 0  # seconds until the refusing window admits a request
+    remaining: Dict[str, int] = field(default_factory=dict)
+    limits: Dict[str, int] = field(default_factory=dict)
+
+
 class RateLimiter:
     """
     Advanced rate limiter with multiple strategies:
-    - Token bucket algorithm
-    - Sliding window
-    - User-based and IP-based limiting
+    - Sliding window counters (or exact Redis sorted sets), see sliding_window
+    - Token bucket algorithm, see token_bucket
+    - User-based and IP-based limiting, with per-user and per-model limits from AIUsageQuota
     """
     
     def __init__(self):
@@ -33,68 +48,145 @@ class RateLimiter:
             'tokens_per_hour': 100000,
         }
         self.cache_timeout = 3600  # 1 hour
+        self.backend = get_window_backend(self.config)
+        self.quota_table = QuotaTable(self.config.get('QUOTA_REFRESH_SECONDS', 60))
+        # Optional in-process allotments leased from the shared backend
+        self.local = None
+        if self.config.get('LOCAL_LEASE_SIZE', 0) > 0:
+            self.local = LocalPreLimiter(
+                self.backend,
+                lease_size=self.config['LOCAL_LEASE_SIZE'],
+                lease_seconds=self.config.get('LOCAL_LEASE_SECONDS', 1.0),
+            )
 
-    def is_allowed(self, user: Optional[User], session_id: Optional[str], ip_address: str) -> bool:
+    def is_allowed(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                   ai_model_id: Optional[int] = None) -> bool:
         """
         Check if request is allowed based on rate limits
         """
-        # Get identifier for rate limiting
-        identifier = self._get_identifier(user, session_id, ip_address)
-        
-        # Check different rate limit windows
-        checks = [
-            self._check_minute_limit(identifier),
-            self._check_hour_limit(identifier),
-            self._check_day_limit(identifier),
-        ]
-        
-        # All checks must pass
-        return all(checks)
+        return self.evaluate(user, session_id, ip_address, ai_model_id=ai_model_id).allowed
+
+    def acquire(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                ai_model_id: Optional[int] = None) -> bool:
+        """
+        Atomically check every window and record the request if all of them allow it
+        """
+        return self.evaluate(user, session_id, ip_address, record=True, ai_model_id=ai_model_id).allowed
+
+    def evaluate(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                 record: bool = False, ai_model_id: Optional[int] = None) -> RateLimitDecision:
+        """
+        Evaluate all windows in one backend round trip and return the full decision.
+
+        With record=True the request is counted in the same round trip when allowed,
+        or answered in-process from a leased allotment when LOCAL_LEASE_SIZE is set.
+        When an AIUsageQuota row targets ai_model_id, usage is counted per model.
+
+        Token limits are checked first with one more read: the tokens of a request
+        are only known after it ran, so once a window's tokens_per_<window> limit is
+        used up further requests are refused and not recorded.
+        """
+        identifier, all_limits = self._scoped_limits(user, session_id, ip_address, ai_model_id)
+        limits = {window: all_limits[f"requests_per_{window}"] for window in WINDOWS}
+        exhausted = self._exhausted_token_window(identifier, all_limits)
+        if exhausted is not None:
+            counts = self.backend.hit(identifier, limits, mode=PEEK).counts
+            return RateLimitDecision(
+                allowed=False,
+                identifier=identifier,
+                window=f"tokens_per_{exhausted}",
+                # the window's tokens have fully slid out by then
+                retry_after=WINDOWS[exhausted],
+                remaining={window: max(0, limit - counts[window]) for window, limit in limits.items()},
+                limits=limits,
+            )
+        if record and self.local is not None:
+            result = self.local.hit(identifier, limits)
+        else:
+            result = self.backend.hit(identifier, limits, mode=ACQUIRE if record else PEEK)
+
+        return RateLimitDecision(
+            allowed=result.allowed,
+            identifier=identifier,
+            window=result.window,
+            # first whole second at which the request fits again
+            retry_after=math.floor(result.retry_after) + 1 if not result.allowed else 0,
+            remaining={window: max(0, limit - result.counts[window]) for window, limit in limits.items()},
+            limits=limits,
+        )
+
+    def _exhausted_token_window(self, identifier: str, limits: Dict[str, int]) -> Optional[str]:
+        """
+        First window whose tokens_per_<window> limit is used up, or None
+
+        Missing or zero token limits are not enforced.
+        """
+        token_limits = {window: limits.get(f"tokens_per_{window}") for window in WINDOWS}
+        if not any(token_limits.values()):
+            return None
+        tokens = self.backend.totals(identifier, prefix='tokens')
+        for window, limit in token_limits.items():
+            if limit and tokens[window] >= limit:
+                return window
+        return None
 
     def record_request(self, user: Optional[User], session_id: Optional[str], 
-                      ip_address: str, processing_time: float = 0.0, tokens_used: int = 0):
+                      ip_address: str, processing_time: float = 0.0, tokens_used: int = 0,
+                      ai_model_id: Optional[int] = None):
         """
         Record a request for rate limiting tracking
         """
-        identifier = self._get_identifier(user, session_id, ip_address)
+        identifier, limits = self._scoped_limits(user, session_id, ip_address, ai_model_id)
         current_time = time.time()
-        
-        # Record in different time windows
-        self._record_in_window(identifier, 'minute', current_time, tokens_used)
-        self._record_in_window(identifier, 'hour', current_time, tokens_used)
-        self._record_in_window(identifier, 'day', current_time, tokens_used)
-        
-        # Record processing time for adaptive limiting
-        self._record_processing_time(identifier, processing_time)
+        self.backend.hit(identifier, {window: limits[f"requests_per_{window}"] for window in WINDOWS},
+                         mode=RECORD, now=current_time)
+        self.record_usage(user, session_id, ip_address, processing_time, tokens_used, current_time, ai_model_id)
+
+    def record_usage(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                     processing_time: float = 0.0, tokens_used: int = 0, timestamp: Optional[float] = None,
+                     ai_model_id: Optional[int] = None):
+        """
+        Record tokens and processing time of a request already counted by acquire()
 
-    def get_retry_after(self, user: Optional[User], session_id: Optional[str], ip_address: str) -> int:
+        Tokens are counted against the same (possibly model scoped) identifier as
+        the request; request timing for adaptive limiting stays per client.
+        """
+        identifier, _ = self._scoped_limits(user, session_id, ip_address, ai_model_id)
+        timestamp = time.time() if timestamp is None else timestamp
+        if tokens_used > 0:
+            self.backend.add(identifier, tokens_used, prefix='tokens', now=timestamp)
+        self._record_activity(self._get_identifier(user, session_id, ip_address), timestamp, processing_time)
+
+    def get_retry_after(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                        ai_model_id: Optional[int] = None) -> int:
         """
         Get the number of seconds to wait before retrying
         """
-        identifier = self._get_identifier(user, session_id, ip_address)
-        
-        # Check which limit was exceeded and return appropriate retry time
-        if not self._check_minute_limit(identifier):
-            return 60  # Wait 1 minute
-        elif not self._check_hour_limit(identifier):
-            return 3600  # Wait 1 hour
-        elif not self._check_day_limit(identifier):
-            return 86400  # Wait 1 day
-        
-        return 60  # Default
+        decision = self.evaluate(user, session_id, ip_address, ai_model_id=ai_model_id)
+        return decision.retry_after if not decision.allowed else 0
 
-    def get_usage_stats(self, user: Optional[User], session_id: Optional[str], ip_address: str) -> Dict[str, Any]:
+    def get_usage_stats(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                        ai_model_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Get current usage statistics for the identifier
         """
-        identifier = self._get_identifier(user, session_id, ip_address)
-        
-        return {
-            'minute': self._get_window_stats(identifier, 'minute'),
-            'hour': self._get_window_stats(identifier, 'hour'),
-            'day': self._get_window_stats(identifier, 'day'),
-            'limits': self._get_limits_for_identifier(identifier),
+        identifier, limits = self._scoped_limits(user, session_id, ip_address, ai_model_id)
+        window_limits = {window: limits[f"requests_per_{window}"] for window in WINDOWS}
+        requests = self.backend.hit(identifier, window_limits, mode=PEEK).counts
+        tokens = self.backend.totals(identifier, prefix='tokens')
+
+        stats = {
+            window: {
+                'requests_made': requests[window],
+                'requests_limit': limits.get(f"requests_per_{window}", 0),
+                'requests_remaining': max(0, limits.get(f"requests_per_{window}", 0) - requests[window]),
+                'tokens_used': tokens[window],
+                'tokens_limit': limits.get(f"tokens_per_{window}", 0),
+            }
+            for window in WINDOWS
         }
+        stats['limits'] = limits
+        return stats
 
     def _get_identifier(self, user: Optional[User], session_id: Optional[str], ip_address: str) -> str:
         """
@@ -108,145 +200,75 @@ class RateLimiter:
         else:
             return f"ip:{ip_address}"
 
-    def _check_minute_limit(self, identifier: str) -> bool:
-        """Check minute-based rate limit"""
-        return self._check_window_limit(identifier, 'minute', 60, 
-                                      self._get_limits_for_identifier(identifier)['requests_per_minute'])
-
-    def _check_hour_limit(self, identifier: str) -> bool:
-        """Check hour-based rate limit"""
-        return self._check_window_limit(identifier, 'hour', 3600, 
-                                      self._get_limits_for_identifier(identifier)['requests_per_hour'])
+    def _scoped_limits(self, user: Optional[User], session_id: Optional[str], ip_address: str,
+                       ai_model_id: Optional[int] = None):
+        """
+        Identifier usage is counted under, and its limits.
 
-    def _check_day_limit(self, identifier: str) -> bool:
-        """Check day-based rate limit"""
-        return self._check_window_limit(identifier, 'day', 86400, 
-                                      self._get_limits_for_identifier(identifier)['requests_per_day'])
+        The identifier gets a ':model:<id>' suffix when an AIUsageQuota row
+        targets ai_model_id, so every method counts and reads the same usage.
 
-    def _check_window_limit(self, identifier: str, window: str, window_seconds: int, limit: int) -> bool:
-        """
-        Check rate limit for a specific time window using sliding window algorithm
+        Returns:
+            (identifier, limits)
         """
-        cache_key = f"rate_limit:{identifier}:{window}"
-        current_time = time.time()
-        window_start = current_time - window_seconds
-        
-        # Get existing requests in this window
-        requests = cache.get(cache_key, [])
-        
-        # Filter requests within the current window
-        valid_requests = [req_time for req_time in requests if req_time > window_start]
-        
-        # Check if under limit
-        return len(valid_requests) < limit
+        identifier = self._get_identifier(user, session_id, ip_address)
+        limits, model_scoped = self._resolve_limits(identifier, ai_model_id)
+        if model_scoped:
+            identifier = f"{identifier}:model:{ai_model_id}"
+        return identifier, limits
 
-    def _record_in_window(self, identifier: str, window: str, timestamp: float, tokens_used: int = 0):
+    def _record_activity(self, identifier: str, timestamp: float, processing_time: float):
         """
-        Record a request in the specified time window
+        Keep the last request times and processing times for adaptive rate limiting
         """
-        cache_key = f"rate_limit:{identifier}:{window}"
-        
-        # Get existing requests
-        requests = cache.get(cache_key, [])
-        
-        # Add new request
-        requests.append(timestamp)
-        
-        # Clean old requests based on window
-        window_seconds = {'minute': 60, 'hour': 3600, 'day': 86400}[window]
-        cutoff_time = timestamp - window_seconds
-        requests = [req_time for req_time in requests if req_time > cutoff_time]
-        
-        # Store back in cache
-        cache.set(cache_key, requests, self.cache_timeout)
-        
-        # Record tokens if provided
-        if tokens_used > 0:
-            self._record_tokens(identifier, window, tokens_used, timestamp)
+        cache_key = f"activity:{identifier}"
+        activity = cache.get(cache_key) or {'request_times': [], 'processing_times': []}
 
-    def _record_tokens(self, identifier: str, window: str, tokens_used: int, timestamp: float):
-        """
-        Record token usage for the identifier
-        """
-        cache_key = f"tokens:{identifier}:{window}"
-        
-        # Get existing token usage
-        token_data = cache.get(cache_key, {'total': 0, 'requests': []})
-        
-        # Add new token usage
-        token_data['total'] += tokens_used
-        token_data['requests'].append({'timestamp': timestamp, 'tokens': tokens_used})
-        
-        # Clean old requests
-        window_seconds = {'minute': 60, 'hour': 3600, 'day': 86400}[window]
-        cutoff_time = timestamp - window_seconds
-        
-        valid_requests = [req for req in token_data['requests'] if req['timestamp'] > cutoff_time]
-        token_data['requests'] = valid_requests
-        token_data['total'] = sum(req['tokens'] for req in valid_requests)
-        
-        # Store back in cache
-        cache.set(cache_key, token_data, self.cache_timeout)
+        # Keep the last two request times and the last 10 processing times
+        activity['request_times'] = (activity['request_times'] + [timestamp])[-2:]
+        activity['processing_times'] = (activity['processing_times'] + [processing_time])[-10:]
 
-    def _record_processing_time(self, identifier: str, processing_time: float):
-        """
-        Record processing time for adaptive rate limiting
-        """
-        cache_key = f"processing_time:{identifier}"
-        
-        # Get existing processing times (keep last 10)
-        times = cache.get(cache_key, [])
-        times.append(processing_time)
-        
-        # Keep only last 10 processing times
-        if len(times) > 10:
-            times = times[-10:]
-        
-        cache.set(cache_key, times, self.cache_timeout)
+        cache.set(cache_key, activity, self.cache_timeout)
 
-    def _get_window_stats(self, identifier: str, window: str) -> Dict[str, Any]:
+    def _get_limits_for_identifier(self, identifier: str) -> Dict[str, int]:
         """
-        Get statistics for a specific time window
+        Get rate limits for a specific identifier
         """
-        cache_key = f"rate_limit:{identifier}:{window}"
-        requests = cache.get(cache_key, [])
-        
-        token_cache_key = f"tokens:{identifier}:{window}"
-        token_data = cache.get(token_cache_key, {'total': 0, 'requests': []})
-        
-        limits = self._get_limits_for_identifier(identifier)
-        limit_key = f"requests_per_{window}"
-        
-        return {
-            'requests_made': len(requests),
-            'requests_limit': limits.get(limit_key, 0),
-            'requests_remaining': max(0, limits.get(limit_key, 0) - len(requests)),
-            'tokens_used': token_data['total'],
-            'tokens_limit': limits.get(f"tokens_per_{window}", 0),
-        }
+        return self._resolve_limits(identifier)[0]
 
-    def _get_limits_for_identifier(self, identifier: str) -> Dict[str, int]:
+    def _resolve_limits(self, identifier: str, ai_model_id: Optional[int] = None):
         """
-        Get rate limits for a specific identifier
-        Can be customized based on user type, subscription, etc.
+        Default limits for the identifier type overridden by matching AIUsageQuota rows.
+
+        Quotas come from the in-memory quota table, not a query per request.
+        'user' quotas apply to authenticated users and 'session' quotas to
+        anonymous sessions and IPs; global quotas are left to QuotaChecker.
+        Only the minute, hour and day periods of WINDOWS are enforced here: a
+        'month' row yields requests_per_month and tokens_per_month, which no
+        window reads, so monthly quotas are also left to QuotaChecker.
+
+        Returns:
+            (limits, model_scoped)
         """
         # Default limits
         limits = self.default_limits.copy()
         
         # Customize based on identifier type
         if identifier.startswith('user:'):
-            user_id = identifier.split(':')[1]
-            # Here you could load user-specific limits from database
-            # For now, use default limits
-            pass
-        elif identifier.startswith('session:'):
-            # Session-based limits (might be more restrictive)
-            limits['requests_per_minute'] = max(1, limits['requests_per_minute'] // 2)
-        elif identifier.startswith('ip:'):
-            # IP-based limits (most restrictive)
-            limits['requests_per_minute'] = max(1, limits['requests_per_minute'] // 4)
-        
-        return limits
+            quota_limits, model_scoped = self.quota_table.limits_for(
+                'user', int(identifier.split(':')[1]), ai_model_id
+            )
+        else:
+            if identifier.startswith('session:'):
+                # Session-based limits (might be more restrictive)
+                limits['requests_per_minute'] = max(1, limits['requests_per_minute'] // 2)
+            elif identifier.startswith('ip:'):
+                # IP-based limits (most restrictive)
+                limits['requests_per_minute'] = max(1, limits['requests_per_minute'] // 4)
+            quota_limits, model_scoped = self.quota_table.limits_for('session', ai_model_id=ai_model_id)
+
+        limits.update(quota_limits)
+        return limits, model_scoped
 
 
 class AdaptiveRateLimiter(RateLimiter):
@@ -287,25 +309,17 @@ class AdaptiveRateLimiter(RateLimiter):
         Apply adaptive limits based on system load
         """
         # Reduce limits based on load factor
-        adjusted_limit = int(self.default_limits['requests_per_minute'] / self.load_factor)
-        
-        cache_key = f"rate_limit:{identifier}:minute"
-        current_time = time.time()
-        window_start = current_time - 60
-        
-        requests = cache.get(cache_key, [])
-        valid_requests = [req_time for req_time in requests if req_time > window_start]
-        
-        return len(valid_requests) < adjusted_limit
+        adjusted_limit = max(1, int(self.default_limits['requests_per_minute'] / self.load_factor))
+        return self.backend.hit(identifier, {'minute': adjusted_limit}, mode=PEEK).allowed
 
     def _is_suspicious_behavior(self, identifier: str) -> bool:
         """
         Detect suspicious behavior patterns
         """
+        activity = cache.get(f"activity:{identifier}") or {'request_times': [], 'processing_times': []}
+
         # Check for rapid-fire requests
-        cache_key = f"rate_limit:{identifier}:minute"
-        requests = cache.get(cache_key, [])
-        
+        requests = activity['request_times']
         if len(requests) >= 2:
             # Check if last two requests were too close together
             time_diff = requests[-1] - requests[-2]
@@ -314,8 +328,7 @@ class AdaptiveRateLimiter(RateLimiter):
                 return True
         
         # Check processing time patterns
-        processing_cache_key = f"processing_time:{identifier}"
-        processing_times = cache.get(processing_cache_key, [])
+        processing_times = activity['processing_times']
         
         if len(processing_times) >= 5:
             avg_time = sum(processing_times) / len(processing_times)
@@ -0,0 +1,370 @@
+"""
+Sliding Window Backends for AI Governance
+
+Rate limit state stored as O(1) counters (or exact Redis sorted sets),
+checked and recorded for every window in a single round trip
+"""
+
+import math
+import time
+import uuid
+import logging
+from collections import namedtuple
+from typing import Dict, Optional
+from django.core.cache import cache
+
+logger = logging.getLogger('ai_governance')
+
+# Window name -> length in seconds, in evaluation order
+WINDOWS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+# hit() modes
+PEEK = 0      # check only
+ACQUIRE = 1   # check and record when every window allows it
+RECORD = 2    # record without checking
+
+# retry_after: seconds until the tripped window admits the request (0.0 when allowed)
+WindowResult = namedtuple('WindowResult', ['allowed', 'window', 'counts', 'retry_after'])
+
+# KEYS: current and previous bucket of each window
+# ARGV: mode, cost, then ttl, limit and previous-bucket weight of each window
+# Returns the tripped window index and the (current, previous) buckets of each window
+COUNTER_SCRIPT = """
+local mode = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local buckets = {}
+local tripped = 0
+for i = 1, #KEYS / 2 do
+    local limit = tonumber(ARGV[i * 3 + 1])
+    local weight = tonumber(ARGV[i * 3 + 2])
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    buckets[i * 2 - 1] = current
+    buckets[i * 2] = previous
+    if tripped == 0 and mode ~= 2 and current + math.floor(previous * weight) + cost > limit then
+        tripped = i
+    end
+end
+if mode == 2 or (mode == 1 and tripped == 0) then
+    for i = 1, #KEYS / 2 do
+        redis.call('INCRBY', KEYS[i * 2 - 1], cost)
+        redis.call('EXPIRE', KEYS[i * 2 - 1], tonumber(ARGV[i * 3]))
+        buckets[i * 2 - 1] = buckets[i * 2 - 1] + cost
+    end
+end
+return {tripped, unpack(buckets)}
+"""
+
+# KEYS: one sorted set of request timestamps per window
+# ARGV: mode, cost, now (ms), member prefix, then length (ms) and limit of each window
+# Returns the tripped window index, the wait (ms) for its oldest blocking entry
+# to leave the window, and the count of each window
+SORTED_SET_SCRIPT = """
+local mode = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local counts = {}
+local tripped = 0
+local retry = 0
+for i = 1, #KEYS do
+    local window = tonumber(ARGV[i * 2 + 3])
+    local limit = tonumber(ARGV[i * 2 + 4])
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - window)
+    counts[i] = redis.call('ZCARD', KEYS[i])
+    if tripped == 0 and mode ~= 2 and counts[i] + cost > limit then
+        tripped = i
+        local blocking = redis.call('ZRANGE', KEYS[i], counts[i] + cost - limit - 1, counts[i] + cost - limit - 1, 'WITHSCORES')
+        if blocking[2] then
+            retry = tonumber(blocking[2]) + window - now
+        else
+            retry = window
+        end
+    end
+end
+if mode == 2 or (mode == 1 and tripped == 0) then
+    for i = 1, #KEYS do
+        for n = 1, cost do
+            redis.call('ZADD', KEYS[i], now, ARGV[4] .. ':' .. n)
+        end
+        redis.call('PEXPIRE', KEYS[i], tonumber(ARGV[i * 2 + 3]))
+        counts[i] = counts[i] + cost
+    end
+end
+return {tripped, retry, unpack(counts)}
+"""
+
+# KEYS: current bucket of each window at the time the requests were recorded
+# ARGV: amount to give back
+# Decrements each bucket that still exists, never below zero
+RELEASE_COUNTER_SCRIPT = """
+local amount = tonumber(ARGV[1])
+for i = 1, #KEYS do
+    local value = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if value > 0 then
+        redis.call('DECRBY', KEYS[i], math.min(value, amount))
+    end
+end
+return 0
+"""
+
+# KEYS: one sorted set of request timestamps per window
+# ARGV: timestamp (ms) the requests were recorded at, amount to give back
+RELEASE_SORTED_SET_SCRIPT = """
+local amount = tonumber(ARGV[2])
+for i = 1, #KEYS do
+    local members = redis.call('ZRANGEBYSCORE', KEYS[i], ARGV[1], ARGV[1], 'LIMIT', 0, amount)
+    if #members > 0 then
+        redis.call('ZREM', KEYS[i], unpack(members))
+    end
+end
+return 0
+"""
+
+
+def get_redis_connection(alias: str = 'default'):
+    """
+    Raw Redis client behind the Django cache, or None when the cache is not django-redis
+    """
+    try:
+        from django_redis import get_redis_connection as django_redis_connection
+    except ImportError:
+        return None
+    try:
+        return django_redis_connection(alias)
+    except NotImplementedError:
+        return None
+
+
+class SlidingWindowCounter:
+    """
+    Sliding window counter approximation.
+
+    Each window keeps two integer buckets per identifier: the current fixed
+    window and the previous one. The in-window count is the current bucket
+    plus the previous bucket weighted by how much of it still overlaps the
+    sliding window, so memory per identifier is constant whatever the limit.
+
+    With Redis the check and the increment run in one Lua script; on other
+    cache backends the counters are read with one get_many and incremented
+    with cache.incr, which is atomic per counter but not across the check.
+    """
+
+    prefix = 'rate_limit'
+
+    def __init__(self, redis_connection=None):
+        self.redis = redis_connection
+        self._script = redis_connection.register_script(COUNTER_SCRIPT) if redis_connection else None
+        self._release_script = redis_connection.register_script(RELEASE_COUNTER_SCRIPT) if redis_connection else None
+
+    def hit(self, identifier: str, limits: Dict[str, int], cost: int = 1,
+            mode: int = ACQUIRE, now: Optional[float] = None) -> WindowResult:
+        """
+        Evaluate (and depending on mode record) a request against every window in limits
+        """
+        now = time.time() if now is None else now
+        buckets = self._buckets(self.prefix, identifier, limits, now)
+
+        if self._script is not None:
+            keys, args = [], [mode, cost]
+            for window, (current_key, previous_key, weight) in buckets.items():
+                keys += [current_key, previous_key]
+                args += [WINDOWS[window] * 2, limits[window], weight]
+            tripped, *values = self._script(keys=keys, args=args)
+            state = [(int(values[i]), int(values[i + 1])) for i in range(0, len(values), 2)]
+        else:
+            values = cache.get_many([key for bucket in buckets.values() for key in bucket[:2]])
+            state, tripped = [], 0
+            for i, (window, (current_key, previous_key, weight)) in enumerate(buckets.items(), 1):
+                state.append((values.get(current_key, 0), values.get(previous_key, 0)))
+                if not tripped and mode != RECORD and self._estimate(*state[-1], weight) + cost > limits[window]:
+                    tripped = i
+            if mode == RECORD or (mode == ACQUIRE and not tripped):
+                for i, (window, (current_key, _, _)) in enumerate(buckets.items()):
+                    self._incr(current_key, cost, WINDOWS[window] * 2)
+                    state[i] = (state[i][0] + cost, state[i][1])
+
+        windows = list(limits)
+        tripped = int(tripped)
+        retry_after = 0.0
+        if tripped:
+            window = windows[tripped - 1]
+            retry_after = self._retry_after(*state[tripped - 1], now % WINDOWS[window],
+                                            WINDOWS[window], limits[window], cost)
+        counts = [self._estimate(current, previous, buckets[window][2])
+                  for window, (current, previous) in zip(windows, state)]
+        return self._result(windows, tripped, counts, retry_after)
+
+    def release(self, identifier: str, limits: Dict[str, int], amount: int, recorded_at: float):
+        """
+        Give back requests recorded at recorded_at that were never made (e.g. an unused lease)
+        """
+        if amount <= 0:
+            return
+        buckets = self._buckets(self.prefix, identifier, limits, recorded_at)
+        keys = [current_key for current_key, _, _ in buckets.values()]
+        if self._release_script is not None:
+            self._release_script(keys=keys, args=[amount])
+            return
+        for key in keys:
+            try:
+                value = cache.decr(key, amount)
+            except ValueError:
+                # the bucket has already expired
+                continue
+            if value < 0:
+                cache.incr(key, -value)
+
+    def counts(self, identifier: str, windows=WINDOWS, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Current in-window request counts, read with a single round trip
+        """
+        return self._counts(self.prefix, identifier, windows, now)
+
+    def add(self, identifier: str, amount: int, prefix: str = 'tokens', now: Optional[float] = None):
+        """
+        Add an arbitrary amount (e.g. tokens used) to the counters of every window
+        """
+        now = time.time() if now is None else now
+        buckets = self._buckets(prefix, identifier, WINDOWS, now)
+        if self.redis is not None:
+            pipe = self.redis.pipeline()
+            for window, (current_key, _, _) in buckets.items():
+                pipe.incrby(current_key, amount)
+                pipe.expire(current_key, WINDOWS[window] * 2)
+            pipe.execute()
+            return
+        for window, (current_key, _, _) in buckets.items():
+            self._incr(current_key, amount, WINDOWS[window] * 2)
+
+    def totals(self, identifier: str, prefix: str = 'tokens', now: Optional[float] = None) -> Dict[str, int]:
+        """
+        In-window totals of counters written with add()
+        """
+        return self._counts(prefix, identifier, WINDOWS, now)
+
+    def _counts(self, prefix, identifier, windows, now):
+        now = time.time() if now is None else now
+        buckets = self._buckets(prefix, identifier, windows, now)
+        keys = [key for bucket in buckets.values() for key in bucket[:2]]
+        if self.redis is not None:
+            raw = dict(zip(keys, self.redis.mget(keys)))
+            values = {key: int(value) for key, value in raw.items() if value is not None}
+        else:
+            values = cache.get_many(keys)
+        return {
+            window: self._estimate(values.get(current_key, 0), values.get(previous_key, 0), weight)
+            for window, (current_key, previous_key, weight) in buckets.items()
+        }
+
+    @staticmethod
+    def _estimate(current, previous, weight):
+        """
+        Approximate in-window count: the previous bucket weighted by its remaining overlap
+        """
+        return current + math.floor(previous * weight)
+
+    @staticmethod
+    def _retry_after(current, previous, elapsed, seconds, limit, cost):
+        """
+        Seconds until current + floor(previous * weight) + cost fits the limit again,
+        assuming no other requests arrive in the meantime
+        """
+        # The estimate has to drop below this value
+        allowance = limit - cost + 1
+        if allowance <= 0:
+            return float(seconds)
+        remaining = seconds - elapsed
+        if current >= allowance:
+            # Wait for the current bucket to become the previous one, then for it to fade
+            return remaining + seconds * (1 - allowance / current)
+        # previous * (remaining - t) / seconds < allowance - current
+        return max(0.0, remaining - seconds * (allowance - current) / previous)
+
+    @staticmethod
+    def _buckets(prefix, identifier, windows, now):
+        """
+        Current key, previous key and previous-bucket weight of each window
+        """
+        buckets = {}
+        for window in windows:
+            seconds = WINDOWS[window]
+            index, elapsed = divmod(now, seconds)
+            buckets[window] = (
+                f"{prefix}:{identifier}:{window}:{int(index)}",
+                f"{prefix}:{identifier}:{window}:{int(index) - 1}",
+                1.0 - elapsed / seconds,
+            )
+        return buckets
+
+    @staticmethod
+    def _incr(key, amount, timeout):
+        if cache.add(key, amount, timeout):
+            return
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # expired between add() and incr()
+            cache.set(key, amount, timeout)
+
+    @staticmethod
+    def _result(windows, tripped, counts, retry_after=0.0):
+        return WindowResult(
+            allowed=tripped == 0,
+            window=windows[tripped - 1] if tripped else None,
+            counts={window: int(count) for window, count in zip(windows, counts)},
+            retry_after=retry_after,
+        )
+
+
+class SlidingWindowLog(SlidingWindowCounter):
+    """
+    Exact sliding window over Redis sorted sets of request timestamps.
+
+    Memory per identifier grows with the limit (one member per request in
+    the window); token totals still use the counter buckets.
+    """
+
+    def __init__(self, redis_connection):
+        super().__init__(redis_connection)
+        self._log_script = redis_connection.register_script(SORTED_SET_SCRIPT)
+        self._release_log_script = redis_connection.register_script(RELEASE_SORTED_SET_SCRIPT)
+
+    def hit(self, identifier: str, limits: Dict[str, int], cost: int = 1,
+            mode: int = ACQUIRE, now: Optional[float] = None) -> WindowResult:
+        now = time.time() if now is None else now
+        keys = [f"{self.prefix}:{identifier}:{window}:log" for window in limits]
+        args = [mode, cost, int(now * 1000), uuid.uuid4().hex]
+        for window, limit in limits.items():
+            args += [WINDOWS[window] * 1000, limit]
+        tripped, retry_ms, *counts = self._log_script(keys=keys, args=args)
+        return self._result(list(limits), int(tripped), counts, int(retry_ms) / 1000)
+
+    def release(self, identifier: str, limits: Dict[str, int], amount: int, recorded_at: float):
+        if amount <= 0:
+            return
+        keys = [f"{self.prefix}:{identifier}:{window}:log" for window in limits]
+        self._release_log_script(keys=keys, args=[int(recorded_at * 1000), amount])
+
+    def counts(self, identifier: str, windows=WINDOWS, now: Optional[float] = None) -> Dict[str, int]:
+        now = time.time() if now is None else now
+        pipe = self.redis.pipeline()
+        for window in windows:
+            pipe.zcount(f"{self.prefix}:{identifier}:{window}:log", f"({int((now - WINDOWS[window]) * 1000)}", '+inf')
+        return dict(zip(windows, pipe.execute()))
+
+
+def get_window_backend(config: Optional[dict] = None) -> SlidingWindowCounter:
+    """
+    Build the backend selected by AI_GOVERNANCE['RATE_LIMIT_BACKEND']
+    ('counter', 'sorted_set' or 'token_bucket')
+    """
+    config = config or {}
+    redis_connection = get_redis_connection()
+    if config.get('RATE_LIMIT_BACKEND') == 'token_bucket':
+        from .token_bucket import TokenBucket
+        return TokenBucket(redis_connection)
+    if config.get('RATE_LIMIT_BACKEND', 'counter') == 'sorted_set':
+        if redis_connection is not None:
+            return SlidingWindowLog(redis_connection)
+        logger.warning("sorted_set rate limiting needs django-redis, falling back to counters")
+    return SlidingWindowCounter(redis_connection)
@@ -0,0 +1,130 @@
+"""
+Token Bucket Backend for AI Governance
+
+One bucket per window holding two numbers (level and last update time),
+refilled lazily from the elapsed time when it is next read
+"""
+
+import math
+import time
+from typing import Dict, Optional
+from django.core.cache import cache
+from .sliding_window import ACQUIRE, RECORD, WINDOWS, SlidingWindowCounter, WindowResult
+
+# KEYS: one hash (level, ts) per window
+# ARGV: mode, cost, now (ms), then capacity and refill per ms of each window
+# Returns the tripped window index and the level of each window
+TOKEN_BUCKET_SCRIPT = """
+local mode = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local levels = {}
+local tripped = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2 + 2])
+    local rate = tonumber(ARGV[i * 2 + 3])
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    levels[i] = capacity
+    if state[1] then
+        levels[i] = math.min(capacity, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+    end
+    if tripped == 0 and mode ~= 2 and levels[i] < cost then
+        tripped = i
+    end
+end
+if mode == 2 or (mode == 1 and tripped == 0) then
+    for i = 1, #KEYS do
+        local capacity = tonumber(ARGV[i * 2 + 2])
+        local rate = tonumber(ARGV[i * 2 + 3])
+        levels[i] = levels[i] - cost
+        redis.call('HSET', KEYS[i], 'level', levels[i], 'ts', now)
+        -- a bucket that has refilled completely is the same as no bucket
+        if rate > 0 then
+            redis.call('PEXPIRE', KEYS[i], math.ceil((capacity - levels[i]) / rate) + 1000)
+        else
+            redis.call('PEXPIRE', KEYS[i], 86400000)
+        end
+    end
+end
+for i = 1, #levels do
+    levels[i] = tostring(levels[i])
+end
+return {tripped, unpack(levels)}
+"""
+
+
+class TokenBucket(SlidingWindowCounter):
+    """
+    Token bucket rate limiting.
+
+    Each window's limit is the bucket capacity and refills evenly over the
+    window (limit / window seconds per second), so bursts up to the limit are
+    allowed while the sustained rate stays within it. Only the level and the
+    last update time are stored; the refill is computed on the next read.
+
+    Token usage totals (add/totals) still use the sliding window counters.
+    """
+
+    prefix = 'token_bucket'
+
+    def __init__(self, redis_connection=None):
+        super().__init__(redis_connection)
+        self._bucket_script = redis_connection.register_script(TOKEN_BUCKET_SCRIPT) if redis_connection else None
+
+    def hit(self, identifier: str, limits: Dict[str, int], cost: int = 1,
+            mode: int = ACQUIRE, now: Optional[float] = None) -> WindowResult:
+        now = time.time() if now is None else now
+        windows = list(limits)
+        keys = [f"{self.prefix}:{identifier}:{window}" for window in windows]
+        # refill per second
+        rates = [limits[window] / WINDOWS[window] for window in windows]
+
+        if self._bucket_script is not None:
+            args = [mode, cost, int(now * 1000)]
+            for window, rate in zip(windows, rates):
+                args += [limits[window], rate / 1000]
+            tripped, *levels = self._bucket_script(keys=keys, args=args)
+            tripped, levels = int(tripped), [float(level) for level in levels]
+        else:
+            states = cache.get_many(keys)
+            levels, tripped = [], 0
+            for i, (key, window, rate) in enumerate(zip(keys, windows, rates), 1):
+                level, updated_at = states.get(key, (limits[window], now))
+                levels.append(min(limits[window], level + max(0.0, now - updated_at) * rate))
+                if not tripped and mode != RECORD and levels[-1] < cost:
+                    tripped = i
+            if mode == RECORD or (mode == ACQUIRE and not tripped):
+                levels = [level - cost for level in levels]
+                # a bucket that has refilled completely is the same as no bucket
+                timeout = max((limits[window] - level) / rate if rate else WINDOWS[window]
+                              for window, level, rate in zip(windows, levels, rates))
+                cache.set_many({key: (level, now) for key, level in zip(keys, levels)}, math.ceil(timeout) + 1)
+
+        retry_after = 0.0
+        if tripped:
+            rate = rates[tripped - 1]
+            retry_after = (cost - levels[tripped - 1]) / rate if rate else float(WINDOWS[windows[tripped - 1]])
+        # Report usage like the window backends: what has been taken out of the bucket
+        counts = [limits[window] - math.floor(level) for window, level in zip(windows, levels)]
+        return self._result(windows, tripped, counts, retry_after)
+
+    def release(self, identifier: str, limits: Dict[str, int], amount: int, recorded_at: float):
+        """
+        Put unused tokens back in every bucket (the next read caps the level at capacity)
+        """
+        if amount <= 0:
+            return
+        keys = [f"{self.prefix}:{identifier}:{window}" for window in limits]
+        if self.redis is not None:
+            pipe = self.redis.pipeline()
+            for key in keys:
+                # a bucket that has expired is already full
+                pipe.eval("if redis.call('EXISTS', KEYS[1]) == 1 then "
+                          "redis.call('HINCRBYFLOAT', KEYS[1], 'level', ARGV[1]) end return 0", 1, key, amount)
+            pipe.execute()
+            return
+        states = cache.get_many(keys)
+        for key, window in zip(keys, limits):
+            if key in states:
+                level, updated_at = states[key]
+                cache.set(key, (level + amount, updated_at), WINDOWS[window])
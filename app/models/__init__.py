@@ -8,8 +8,17 @@ from .models import (
     NewsItem,
     NewsComment,
     NewsStats,
+    NewsStatsMonthly,
     NewsSettings,
-    news_tags_association
+    NewsSearchTerm,
+    NewsSearchDocument,
+    NewsRelated,
+    NewsArchive,
+    NewsSlugRedirect,
+    news_tags_association,
+    news_comments_archive,
+    news_stats_archive,
+    news_stats_monthly_archive
 )
 
 __all__ = [
@@ -19,6 +28,15 @@ __all__ = [
     'NewsItem',
     'NewsComment',
     'NewsStats',
+    'NewsStatsMonthly',
     'NewsSettings',
-    'news_tags_association'
+    'NewsSearchTerm',
+    'NewsSearchDocument',
+    'NewsRelated',
+    'NewsArchive',
+    'NewsSlugRedirect',
+    'news_tags_association',
+    'news_comments_archive',
+    'news_stats_archive',
+    'news_stats_monthly_archive'
 ]
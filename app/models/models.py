@@ -6,9 +6,13 @@ This module defines the database models for the Naebak News Service.
 It includes models for news categories, tags, news items, comments, statistics, and settings.
 '''
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import defer, joinedload, selectinload
 from datetime import datetime, timedelta
 import json
 
+from app.models.serialization import ModelSerializer
+
 db = SQLAlchemy()
 
 
@@ -25,6 +29,8 @@ class NewsCategory(db.Model):
         color (str): A hex color code for the category.
         display_order (int): The order in which the category should be displayed.
         is_active (bool): Whether the category is active and should be displayed.
+        published_count (int): The number of published news items in this category,
+            maintained on every news item flush (see `_sync_published_counts`).
         created_at (datetime): The timestamp when the category was created.
         news_items (relationship): A relationship to the news items in this category.
     """
@@ -39,6 +45,7 @@ class NewsCategory(db.Model):
     color = db.Column(db.String(7), default='#007BFF')
     display_order = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
+    published_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     news_items = db.relationship('NewsItem', backref='category', lazy='dynamic')
@@ -46,21 +53,35 @@ class NewsCategory(db.Model):
     def __repr__(self):
         return f'<NewsCategory {self.name}>'
 
-    def to_dict(self):
+    @classmethod
+    def reconcile_published_counts(cls):
+        """Rebuilds `published_count` for every category from the news items table.
+
+        Returns:
+            int: The number of categories whose counter was corrected.
+        """
+        actual = db.select(db.func.count(NewsItem.id)) \
+            .where(NewsItem.category_id == cls.id, NewsItem.is_published.is_(True)) \
+            .scalar_subquery()
+        result = db.session.execute(
+            db.update(cls)
+            .where(db.func.coalesce(cls.published_count, -1) != actual)
+            .values(published_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    serializer = ModelSerializer(
+        ('id', 'name', 'name_en', 'description', 'description_en', 'icon', 'color',
+         'display_order', 'is_active', 'created_at'),
+        temporal=('created_at',),
+        news_count=lambda category, native: category.published_count or 0
+    )
+
+    def to_dict(self, native=False):
         """Serializes the object to a dictionary."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'name_en': self.name_en,
-            'description': self.description,
-            'description_en': self.description_en,
-            'icon': self.icon,
-            'color': self.color,
-            'display_order': self.display_order,
-            'is_active': self.is_active,
-            'news_count': self.news_items.filter_by(is_published=True).count(),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return self.serializer.dump(self, native)
 
 
 class NewsTag(db.Model):
@@ -90,18 +111,14 @@ class NewsTag(db.Model):
     def __repr__(self):
         return f'<NewsTag {self.name}>'
 
-    def to_dict(self):
+    serializer = ModelSerializer(
+        ('id', 'name', 'name_en', 'description', 'color', 'usage_count', 'is_active', 'created_at'),
+        temporal=('created_at',)
+    )
+
+    def to_dict(self, native=False):
         """Serializes the object to a dictionary."""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'name_en': self.name_en,
-            'description': self.description,
-            'color': self.color,
-            'usage_count': self.usage_count,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return self.serializer.dump(self, native)
 
 
 # Association table for NewsItem and NewsTag
@@ -149,6 +166,7 @@ class NewsItem(db.Model):
         meta_keywords (str): The meta keywords for SEO.
         comments (relationship): A relationship to the comments on the news item.
         stats (relationship): A relationship to the statistics for the news item.
+        monthly_stats (relationship): A relationship to the monthly rollups of old statistics.
     """
     __tablename__ = 'news_items'
 
@@ -202,6 +220,8 @@ class NewsItem(db.Model):
     # Relationships
     comments = db.relationship('NewsComment', backref='news_item', lazy='dynamic', cascade='all, delete-orphan')
     stats = db.relationship('NewsStats', backref='news_item', lazy='dynamic', cascade='all, delete-orphan')
+    monthly_stats = db.relationship('NewsStatsMonthly', backref='news_item', lazy='dynamic',
+                                    cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<NewsItem {self.title}>'
@@ -232,46 +252,139 @@ class NewsItem(db.Model):
         """Sets the gallery images from a list."""
         self.gallery_images = json.dumps(images) if images else None
 
-    def to_dict(self, include_content=False):
+    @classmethod
+    def listing_query(cls, category=None, tag=None, featured=None, breaking=None):
+        """Builds the filtered query behind the news listing endpoints.
+
+        Args:
+            category (str): The name of the category to filter by.
+            tag (str): The name of the tag to filter by.
+            featured (bool): Whether to filter by featured status.
+            breaking (bool): Whether to filter by breaking news status.
+
+        Returns:
+            Query: The unordered query of published news items.
+        """
+        query = cls.query.filter_by(is_published=True)
+
+        if category:
+            query = query.join(NewsCategory).filter(NewsCategory.name == category)
+
+        if tag:
+            query = query.join(cls.tags).filter(NewsTag.name == tag)
+
+        if featured is not None:
+            query = query.filter(cls.is_featured == featured)
+
+        if breaking is not None:
+            query = query.filter(cls.is_breaking == breaking)
+
+        return query
+
+    @staticmethod
+    def listing_options(include_content=False):
+        """Returns the loader options used by list endpoints.
+
+        The category is joined into the page query and the tags of the whole page are
+        fetched with one additional SELECT ... IN query. The content columns are not
+        read unless `include_content` is set.
+        """
+        options = [joinedload(NewsItem.category), selectinload(NewsItem.tags)]
+        if not include_content:
+            options += [defer(NewsItem.content), defer(NewsItem.content_en)]
+        return options
+
+    serializer = ModelSerializer(
+        ('id', 'title', 'title_en', 'slug', 'summary', 'summary_en', 'featured_image',
+         'featured_image_alt', 'status', 'is_published', 'is_featured', 'is_breaking',
+         'priority', 'published_at', 'expires_at', 'created_at', 'updated_at', 'author_name',
+         'view_count', 'like_count', 'share_count', 'comment_count', 'meta_title',
+         'meta_description'),
+        temporal=('published_at', 'expires_at', 'created_at', 'updated_at'),
+        gallery_images=lambda item, native: item.get_gallery_images(),
+        category=lambda item, native: item.category.to_dict(native) if item.category else None,
+        tags=lambda item, native: NewsTag.serializer.dump_many(item.tags, native),
+        is_active=lambda item, native: item.is_active()
+    )
+    content_serializer = serializer.extend('content', 'content_en')
+
+    @classmethod
+    def serialize_many(cls, items, include_content=False, native=False):
+        """Serializes a page of news items without per-item queries.
+
+        The items should be loaded with `listing_options()`.
+
+        Args:
+            items (list): The news items to serialize.
+            include_content (bool): Whether to include the full content.
+            native (bool): Whether to keep dates as datetime objects for the JSON provider.
+
+        Returns:
+            list: The serialized news items.
+        """
+        serializer = cls.content_serializer if include_content else cls.serializer
+        return serializer.dump_many(items, native)
+
+    def to_dict(self, include_content=False, native=False):
         """Serializes the object to a dictionary."""
-        data = {
-            'id': self.id,
-            'title': self.title,
-            'title_en': self.title_en,
-            'slug': self.slug,
-            'summary': self.summary,
-            'summary_en': self.summary_en,
-            'featured_image': self.featured_image,
-            'featured_image_alt': self.featured_image_alt,
-            'gallery_images': self.get_gallery_images(),
-            'category': self.category.to_dict() if self.category else None,
-            'tags': [tag.to_dict() for tag in self.tags],
-            'status': self.status,
-            'is_published': self.is_published,
-            'is_featured': self.is_featured,
-            'is_breaking': self.is_breaking,
-            'priority': self.priority,
-            'published_at': self.published_at.isoformat() if self.published_at else None,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'author_name': self.author_name,
-            'view_count': self.view_count,
-            'like_count': self.like_count,
-            'share_count': self.share_count,
-            'comment_count': self.comment_count,
-            'meta_title': self.meta_title,
-            'meta_description': self.meta_description,
-            'is_active': self.is_active()
-        }
-
-        if include_content:
-            data.update({
-                'content': self.content,
-                'content_en': self.content_en
-            })
-
-        return data
+        serializer = self.content_serializer if include_content else self.serializer
+        return serializer.dump(self, native)
+
+
+def _published_category_change(target):
+    """Returns the (old, new) category ids a news item counts towards.
+
+    Either side is None when the item was not, or is no longer, published.
+    """
+    state = inspect(target)
+
+    def _old_and_new(key):
+        history = state.attrs[key].history
+        new = getattr(target, key)
+        if history.deleted:
+            return history.deleted[0], new
+        return (new, new) if state.has_identity else (None, new)
+
+    old_published, new_published = _old_and_new('is_published')
+    old_category, new_category = _old_and_new('category_id')
+    return (
+        old_category if old_published else None,
+        new_category if new_published else None
+    )
+
+
+def _adjust_published_count(connection, category_id, delta):
+    """Applies a delta to a category's published counter in the flush transaction."""
+    if category_id is None or not delta:
+        return
+    connection.execute(
+        NewsCategory.__table__.update()
+        .where(NewsCategory.__table__.c.id == category_id)
+        .values(published_count=NewsCategory.__table__.c.published_count + delta)
+    )
+
+
+@event.listens_for(NewsItem.is_published, 'set', active_history=True)
+@event.listens_for(NewsItem.category_id, 'set', active_history=True)
+def _track_published_category(target, value, oldvalue, initiator):
+    """Loads the previous value on assignment so the flush hooks can see it."""
+
+
+@event.listens_for(NewsItem, 'after_insert')
+@event.listens_for(NewsItem, 'after_update')
+def _sync_published_counts(mapper, connection, target):
+    """Keeps `NewsCategory.published_count` in step with inserted and updated items."""
+    old_category, new_category = _published_category_change(target)
+    if old_category != new_category:
+        _adjust_published_count(connection, old_category, -1)
+        _adjust_published_count(connection, new_category, 1)
+
+
+@event.listens_for(NewsItem, 'after_delete')
+def _sync_published_counts_on_delete(mapper, connection, target):
+    """Releases the published counter slot held by a deleted item."""
+    old_category, _ = _published_category_change(target)
+    _adjust_published_count(connection, old_category, -1)
 
 
 class NewsComment(db.Model):
@@ -289,6 +402,7 @@ class NewsComment(db.Model):
         is_approved (bool): Whether the comment is approved.
         is_spam (bool): Whether the comment is marked as spam.
         is_deleted (bool): Whether the comment is deleted.
+        spam_score (float): The automatic moderation spam score, or None until the comment is scored.
         created_at (datetime): The timestamp when the comment was created.
         approved_at (datetime): The timestamp when the comment was approved.
         approved_by (int): The ID of the admin who approved the comment.
@@ -313,6 +427,7 @@ class NewsComment(db.Model):
     is_approved = db.Column(db.Boolean, default=False)
     is_spam = db.Column(db.Boolean, default=False)
     is_deleted = db.Column(db.Boolean, default=False)
+    spam_score = db.Column(db.Float)
 
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -325,21 +440,16 @@ class NewsComment(db.Model):
     def __repr__(self):
         return f'<NewsComment {self.id} by {self.user_name}>'
 
-    def to_dict(self):
+    serializer = ModelSerializer(
+        ('id', 'news_item_id', 'user_name', 'content', 'parent_id', 'is_approved', 'is_spam',
+         'is_deleted', 'created_at', 'approved_at'),
+        temporal=('created_at', 'approved_at'),
+        replies_count=lambda comment, native: comment.replies.filter_by(is_approved=True, is_deleted=False).count()
+    )
+
+    def to_dict(self, native=False):
         """Serializes the object to a dictionary."""
-        return {
-            'id': self.id,
-            'news_item_id': self.news_item_id,
-            'user_name': self.user_name,
-            'content': self.content,
-            'parent_id': self.parent_id,
-            'is_approved': self.is_approved,
-            'is_spam': self.is_spam,
-            'is_deleted': self.is_deleted,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'approved_at': self.approved_at.isoformat() if self.approved_at else None,
-            'replies_count': self.replies.filter_by(is_approved=True, is_deleted=False).count()
-        }
+        return self.serializer.dump(self, native)
 
 
 class NewsStats(db.Model):
@@ -350,7 +460,8 @@ class NewsStats(db.Model):
         news_item_id (int): The foreign key for the news item.
         date (date): The date of the statistics.
         views (int): The number of views.
-        unique_views (int): The number of unique views.
+        unique_views (int): The estimated number of unique views.
+        unique_views_sketch (bytes): The HyperLogLog registers behind `unique_views`.
         likes (int): The number of likes.
         shares (int): The number of shares.
         comments (int): The number of comments.
@@ -372,6 +483,7 @@ class NewsStats(db.Model):
     # Statistics
     views = db.Column(db.Integer, default=0)
     unique_views = db.Column(db.Integer, default=0)
+    unique_views_sketch = db.Column(db.LargeBinary)
     likes = db.Column(db.Integer, default=0)
     shares = db.Column(db.Integer, default=0)
     comments = db.Column(db.Integer, default=0)
@@ -394,26 +506,89 @@ class NewsStats(db.Model):
     def __repr__(self):
         return f'<NewsStats {self.news_item_id} - {self.date}>'
 
-    def to_dict(self):
+    serializer = ModelSerializer(
+        ('id', 'news_item_id', 'date', 'views', 'unique_views', 'likes', 'shares', 'comments',
+         'avg_read_time', 'bounce_rate', 'engagement_rate', 'direct_visits', 'social_visits',
+         'search_visits', 'referral_visits', 'created_at'),
+        temporal=('date', 'created_at')
+    )
+
+    def to_dict(self, native=False):
+        """Serializes the object to a dictionary."""
+        return self.serializer.dump(self, native)
+
+
+class NewsStatsMonthly(db.Model):
+    """Represents monthly statistics for a news item, rolled up from old daily stats.
+
+    The retention cleanup folds `news_stats` rows older than OLD_STATS_CLEANUP_DAYS
+    into one row per news item and month. Counters are summed, unique views are
+    re-estimated from the merged HyperLogLog sketches and the rates are averaged
+    weighted by views.
+
+    Attributes:
+        id (int): The primary key.
+        news_item_id (int): The foreign key for the news item.
+        month (date): The first day of the month.
+        days (int): The number of daily rows folded into the month.
+        views (int): The number of views.
+        unique_views (int): The estimated number of unique views.
+        unique_views_sketch (bytes): The merged HyperLogLog registers behind `unique_views`.
+        likes (int): The number of likes.
+        shares (int): The number of shares.
+        comments (int): The number of comments.
+        avg_read_time (float): The average read time in seconds.
+        bounce_rate (float): The bounce rate.
+        engagement_rate (float): The engagement rate.
+        direct_visits (int): The number of direct visits.
+        social_visits (int): The number of visits from social media.
+        search_visits (int): The number of visits from search engines.
+        referral_visits (int): The number of referral visits.
+        created_at (datetime): The timestamp when the rollup was created.
+    """
+    __tablename__ = 'news_stats_monthly'
+
+    id = db.Column(db.Integer, primary_key=True)
+    news_item_id = db.Column(db.Integer, db.ForeignKey('news_items.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    days = db.Column(db.Integer, default=0)
+
+    # Statistics
+    views = db.Column(db.Integer, default=0)
+    unique_views = db.Column(db.Integer, default=0)
+    unique_views_sketch = db.Column(db.LargeBinary)
+    likes = db.Column(db.Integer, default=0)
+    shares = db.Column(db.Integer, default=0)
+    comments = db.Column(db.Integer, default=0)
+
+    # Engagement metrics
+    avg_read_time = db.Column(db.Float, default=0.0)  # in seconds
+    bounce_rate = db.Column(db.Float, default=0.0)
+    engagement_rate = db.Column(db.Float, default=0.0)
+
+    # Traffic sources
+    direct_visits = db.Column(db.Integer, default=0)
+    social_visits = db.Column(db.Integer, default=0)
+    search_visits = db.Column(db.Integer, default=0)
+    referral_visits = db.Column(db.Integer, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('news_item_id', 'month', name='unique_news_month_stats'),)
+
+    def __repr__(self):
+        return f'<NewsStatsMonthly {self.news_item_id} - {self.month}>'
+
+    serializer = ModelSerializer(
+        ('id', 'news_item_id', 'month', 'days', 'views', 'unique_views', 'likes', 'shares',
+         'comments', 'avg_read_time', 'bounce_rate', 'engagement_rate', 'direct_visits',
+         'social_visits', 'search_visits', 'referral_visits', 'created_at'),
+        temporal=('month', 'created_at')
+    )
+
+    def to_dict(self, native=False):
         """Serializes the object to a dictionary."""
-        return {
-            'id': self.id,
-            'news_item_id': self.news_item_id,
-            'date': self.date.isoformat() if self.date else None,
-            'views': self.views,
-            'unique_views': self.unique_views,
-            'likes': self.likes,
-            'shares': self.shares,
-            'comments': self.comments,
-            'avg_read_time': self.avg_read_time,
-            'bounce_rate': self.bounce_rate,
-            'engagement_rate': self.engagement_rate,
-            'direct_visits': self.direct_visits,
-            'social_visits': self.social_visits,
-            'search_visits': self.search_visits,
-            'referral_visits': self.referral_visits,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return self.serializer.dump(self, native)
 
 
 class NewsSettings(db.Model):
@@ -468,27 +643,242 @@ class NewsSettings(db.Model):
         else:
             self.setting_value = str(value)
 
-    def to_dict(self):
+    serializer = ModelSerializer(
+        ('id', 'setting_key', 'setting_type', 'description', 'category', 'is_public',
+         'created_at', 'updated_at'),
+        temporal=('created_at', 'updated_at'),
+        setting_value=lambda setting, native: setting.get_value()
+    )
+
+    def to_dict(self, native=False):
         """Serializes the object to a dictionary."""
-        return {
-            'id': self.id,
-            'setting_key': self.setting_key,
-            'setting_value': self.get_value(),
-            'setting_type': self.setting_type,
-            'description': self.description,
-            'category': self.category,
-            'is_public': self.is_public,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return self.serializer.dump(self, native)
+
+
+class NewsSearchTerm(db.Model):
+    """Represents one posting of the news search inverted index.
+
+    Used by the pure-Python search backend when SQLite FTS5 is not available.
+
+    Attributes:
+        term (str): The normalized and stemmed search term.
+        news_item_id (int): The news item containing the term.
+        tf (int): The field-weighted frequency of the term in the news item.
+    """
+    __tablename__ = 'news_search_terms'
+
+    term = db.Column(db.String(100), primary_key=True)
+    news_item_id = db.Column(db.Integer, db.ForeignKey('news_items.id'), primary_key=True)
+    tf = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<NewsSearchTerm {self.term} in {self.news_item_id}>'
+
+
+class NewsSearchDocument(db.Model):
+    """Represents an indexed news item and its field-weighted length.
+
+    Attributes:
+        news_item_id (int): The indexed news item.
+        length (int): The field-weighted number of terms, used for BM25 length normalization.
+    """
+    __tablename__ = 'news_search_documents'
+
+    news_item_id = db.Column(db.Integer, db.ForeignKey('news_items.id'), primary_key=True)
+    length = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<NewsSearchDocument {self.news_item_id}>'
+
+
+class NewsRelated(db.Model):
+    """Represents a precomputed related news item.
+
+    Rows are rewritten by the related-articles job, with up to RELATED_TOP_K rows
+    per news item numbered by rank, so an article's related items are one primary
+    key range scan.
+
+    Attributes:
+        news_item_id (int): The news item the related item is shown on.
+        rank (int): The position of the related item, starting at 0 for the most similar.
+        related_item_id (int): The related news item.
+        score (float): The combined tag and text similarity of the two news items.
+    """
+    __tablename__ = 'news_related'
+
+    news_item_id = db.Column(db.Integer, db.ForeignKey('news_items.id'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    related_item_id = db.Column(db.Integer, db.ForeignKey('news_items.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<NewsRelated {self.related_item_id} for {self.news_item_id}>'
+
+
+class NewsArchive(db.Model):
+    """Represents a news item moved out of `news_items` by the archiver.
+
+    The row has its own id, since `news_items` ids can be reused once the item
+    is deleted, and keeps the original id, the content and the final counters.
+    The item's comments and daily and monthly stats move to the
+    `news_comments_archive`, `news_stats_archive` and `news_stats_monthly_archive`
+    tables, keyed by `archive_id`.
+
+    Attributes:
+        id (int): The primary key.
+        news_item_id (int): The id the news item had in `news_items`.
+        title (str): The title of the news item.
+        title_en (str): The English title of the news item.
+        slug (str): The slug the news item was published under.
+        summary (str): A short summary of the news item.
+        summary_en (str): The English summary of the news item.
+        content (str): The full content of the news item.
+        content_en (str): The English content of the news item.
+        featured_image (str): The URL of the featured image.
+        featured_image_alt (str): The alt text for the featured image.
+        gallery_images (str): A JSON array of gallery image URLs.
+        category_id (int): The foreign key for the news category.
+        tags (str): A JSON array of the names of the news item's tags.
+        status (str): Always 'archived'.
+        published_at (datetime): The timestamp when the news item was published.
+        expires_at (datetime): The timestamp when the news item expired.
+        created_at (datetime): The timestamp when the news item was created.
+        updated_at (datetime): The timestamp when the news item was last updated.
+        archived_at (datetime): The timestamp when the news item was archived.
+        author_name (str): The name of the author.
+        view_count (int): The final number of views.
+        like_count (int): The final number of likes.
+        share_count (int): The final number of shares.
+        comment_count (int): The final number of comments.
+        meta_title (str): The meta title for SEO.
+        meta_description (str): The meta description for SEO.
+    """
+    __tablename__ = 'news_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    news_item_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    title_en = db.Column(db.String(200))
+    slug = db.Column(db.String(250), nullable=False)
+    summary = db.Column(db.Text)
+    summary_en = db.Column(db.Text)
+    content = db.Column(db.Text, nullable=False)
+    content_en = db.Column(db.Text)
+    featured_image = db.Column(db.String(500))
+    featured_image_alt = db.Column(db.String(200))
+    gallery_images = db.Column(db.Text)  # JSON array
+    category_id = db.Column(db.Integer, db.ForeignKey('news_categories.id'))
+    tags = db.Column(db.Text)  # JSON array of tag names
+    status = db.Column(db.String(20), default='archived')
+    published_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    author_name = db.Column(db.String(100))
+    view_count = db.Column(db.Integer, default=0)
+    like_count = db.Column(db.Integer, default=0)
+    share_count = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0)
+    meta_title = db.Column(db.String(200))
+    meta_description = db.Column(db.String(300))
+
+    category = db.relationship('NewsCategory')
+
+    def __repr__(self):
+        return f'<NewsArchive {self.title}>'
+
+    def get_tags(self):
+        """Returns the tag names as a list."""
+        return json.loads(self.tags) if self.tags else []
+
+    def get_gallery_images(self):
+        """Returns the gallery images as a list."""
+        if self.gallery_images:
+            try:
+                return json.loads(self.gallery_images)
+            except ValueError:
+                return []
+        return []
+
+    serializer = ModelSerializer(
+        ('id', 'news_item_id', 'title', 'title_en', 'slug', 'summary', 'summary_en', 'content',
+         'content_en', 'featured_image', 'featured_image_alt', 'status', 'published_at', 'expires_at',
+         'created_at', 'updated_at', 'archived_at', 'author_name', 'view_count', 'like_count',
+         'share_count', 'comment_count', 'meta_title', 'meta_description'),
+        temporal=('published_at', 'expires_at', 'created_at', 'updated_at', 'archived_at'),
+        gallery_images=lambda item, native: item.get_gallery_images(),
+        category=lambda item, native: item.category.to_dict(native) if item.category else None,
+        tags=lambda item, native: item.get_tags(),
+        is_published=lambda item, native: False,
+        is_active=lambda item, native: False
+    )
+
+    def to_dict(self, native=False):
+        """Serializes the object to a dictionary."""
+        return self.serializer.dump(self, native)
+
+
+class NewsSlugRedirect(db.Model):
+    """Maps the slug of an archived news item to its archive row.
+
+    The table stays small and keyed by slug, so article lookups that miss
+    `news_items` resolve with one primary key read instead of searching the archive.
+
+    Attributes:
+        slug (str): The slug the news item was published under.
+        archive_id (int): The id of the news item's row in `news_archive`.
+    """
+    __tablename__ = 'news_slug_redirects'
+
+    slug = db.Column(db.String(250), primary_key=True)
+    archive_id = db.Column(db.Integer, db.ForeignKey('news_archive.id'), nullable=False)
+
+    def __repr__(self):
+        return f'<NewsSlugRedirect {self.slug}>'
+
+
+def _archive_table(name, source):
+    """Builds an archive table with the columns of `source`, without its foreign keys,
+    and the `archive_id` of the `news_archive` row the rows belong to."""
+    columns = [
+        db.Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False)
+        for column in source.columns
+    ]
+    return db.Table(
+        name, *columns,
+        db.Column('archive_id', db.Integer, db.ForeignKey('news_archive.id'), nullable=False)
+    )
+
+
+# Comments and stats of archived news items, moved as they were
+news_comments_archive = _archive_table('news_comments_archive', NewsComment.__table__)
+news_stats_archive = _archive_table('news_stats_archive', NewsStats.__table__)
+news_stats_monthly_archive = _archive_table('news_stats_monthly_archive', NewsStatsMonthly.__table__)
 
 
 # Create indexes for performance optimization
+# The listing indexes end with the listing sort key (priority, published_at, id) so that
+# every GET /api/news filter combination is an index seek already in output order
+# (see docs/adrs/002-news-listing-indexes.md).
 db.Index('idx_news_published', NewsItem.is_published, NewsItem.published_at)
-db.Index('idx_news_category', NewsItem.category_id, NewsItem.is_published)
-db.Index('idx_news_featured', NewsItem.is_featured, NewsItem.priority)
-db.Index('idx_news_breaking', NewsItem.is_breaking, NewsItem.created_at)
+db.Index('idx_news_listing', NewsItem.is_published, NewsItem.priority, NewsItem.published_at, NewsItem.id)
+db.Index('idx_news_listing_category', NewsItem.category_id, NewsItem.is_published,
+         NewsItem.priority, NewsItem.published_at, NewsItem.id)
+db.Index('idx_news_listing_featured', NewsItem.is_published, NewsItem.is_featured,
+         NewsItem.priority, NewsItem.published_at, NewsItem.id)
+db.Index('idx_news_listing_breaking', NewsItem.is_published, NewsItem.is_breaking,
+         NewsItem.priority, NewsItem.published_at, NewsItem.id)
+db.Index('idx_news_item_tags_tag', news_tags_association.c.news_tag_id, news_tags_association.c.news_item_id)
 db.Index('idx_news_slug', NewsItem.slug)
 db.Index('idx_comments_approved', NewsComment.is_approved, NewsComment.created_at)
+db.Index('idx_comments_parent', NewsComment.parent_id)
 db.Index('idx_stats_date', NewsStats.date, NewsStats.news_item_id)
-'''
+db.Index('idx_search_terms_item', NewsSearchTerm.news_item_id)
+db.Index('idx_news_related_item', NewsRelated.related_item_id)
+db.Index('idx_news_expires', NewsItem.expires_at)
+db.Index('idx_news_archive_slug', NewsArchive.slug)
+db.Index('idx_news_archive_item', NewsArchive.news_item_id)
+db.Index('idx_comments_archive_archive', news_comments_archive.c.archive_id)
+db.Index('idx_stats_archive_archive', news_stats_archive.c.archive_id)
+db.Index('idx_stats_monthly_archive_archive', news_stats_monthly_archive.c.archive_id)
@@ -0,0 +1,74 @@
+'''
+Model Serializers - Naebak Project
+
+This module defines the precompiled serializers behind the models' `to_dict()` methods.
+'''
+from operator import attrgetter
+
+
+class ModelSerializer:
+    """Serializes model instances to dictionaries from a fixed field schema.
+
+    The column values of an instance are read with a single `attrgetter` call built
+    once per model, and the computed fields are evaluated afterwards.
+
+    Dates and datetimes are converted with `isoformat()` by default. With
+    `native=True` they are kept as `date`/`datetime` objects so the JSON provider
+    encodes them directly; the encoded output is the same.
+
+    Args:
+        fields (tuple): The names of the attributes copied as they are.
+        temporal (tuple): The fields holding a date or datetime.
+        **computed: Computed fields, as callables taking `(obj, native)`.
+    """
+
+    def __init__(self, fields, temporal=(), **computed):
+        self.fields = tuple(fields)
+        self.temporal = tuple(temporal)
+        self.computed = computed
+        if len(self.fields) > 1:
+            self._getter = attrgetter(*self.fields)
+        elif self.fields:
+            getter = attrgetter(*self.fields)
+            self._getter = lambda obj: (getter(obj),)
+        else:
+            self._getter = lambda obj: ()
+
+    def extend(self, *fields, temporal=(), **computed):
+        """Returns a serializer with additional fields."""
+        return ModelSerializer(
+            self.fields + fields,
+            self.temporal + tuple(temporal),
+            **dict(self.computed, **computed)
+        )
+
+    def only(self, fields, **computed):
+        """Returns a serializer restricted to the given fields.
+
+        Args:
+            fields (set): The fields to keep.
+            **computed: Replacements for computed fields that are kept.
+        """
+        computed = {key: compute for key, compute in dict(self.computed, **computed).items() if key in fields}
+        return ModelSerializer(
+            [field for field in self.fields if field in fields],
+            [field for field in self.temporal if field in fields],
+            **computed
+        )
+
+    def dump(self, obj, native=False):
+        """Serializes one instance."""
+        data = dict(zip(self.fields, self._getter(obj)))
+        if not native:
+            for key in self.temporal:
+                value = data[key]
+                if value is not None:
+                    data[key] = value.isoformat()
+        for key, compute in self.computed.items():
+            data[key] = compute(obj, native)
+        return data
+
+    def dump_many(self, objs, native=False):
+        """Serializes a list of instances."""
+        dump = self.dump
+        return [dump(obj, native) for obj in objs]
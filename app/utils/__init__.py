@@ -2,5 +2,7 @@
 أدوات خدمة الأخبار - مشروع نائبك
 """
 from .load_data import load_all_initial_data
+from .view_counter import ViewCounterBuffer
+from .stats_rollup import EngagementAggregator
 
-__all__ = ['load_all_initial_data']
+__all__ = ['load_all_initial_data', 'ViewCounterBuffer', 'EngagementAggregator']
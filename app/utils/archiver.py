@@ -0,0 +1,203 @@
+"""
+أرشفة الأخبار المنتهية والقديمة - مشروع نائبك
+
+تنقل المهمة الأخبار المنشورة التي انتهت صلاحيتها (expires_at) أو نُشرت منذ
+أكثر من AUTO_ARCHIVE_DAYS يوماً من جدول news_items إلى جدول news_archive
+بحالة archived، فيبقى الجدول الأساسي وفهارسه بحجم الأخبار الحية. تنتقل
+تعليقات الخبر وإحصائياته اليومية والشهرية معه إلى جداول الأرشيف المقابلة.
+
+تجري الأرشفة على دفعات محدودة، كل دفعة في معاملة قصيرة مستقلة، فلا تُحجز
+الجداول طويلاً ويمكن إيقاف المهمة بين دفعتين. إذا فشلت دفعة أُعيدت أخبارها
+واحداً واحداً، ويُسجل الخبر الذي يفشل ويُتخطى فلا يوقف أرشفة ما بعده. يُحذف الخبر من news_items عبر
+الجلسة فتحدّث خطافات البحث والاقتراحات والأخبار ذات الصلة وعدادات التصنيفات
+والتخزين المؤقت نفسها، ويُسجل رابطه في news_slug_redirects ليبقى قابلاً للوصول.
+"""
+from app.models import (
+    db, NewsItem, NewsComment, NewsStats, NewsStatsMonthly, NewsArchive, NewsSlugRedirect,
+    news_comments_archive, news_stats_archive, news_stats_monthly_archive
+)
+from app.utils.flusher import PeriodicFlusher
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# الحقول المنسوخة كما هي من الخبر إلى الأرشيف
+ARCHIVED_FIELDS = (
+    'title', 'title_en', 'slug', 'summary', 'summary_en', 'content', 'content_en',
+    'featured_image', 'featured_image_alt', 'gallery_images', 'category_id', 'published_at',
+    'expires_at', 'created_at', 'updated_at', 'author_name', 'view_count', 'like_count',
+    'share_count', 'comment_count', 'meta_title', 'meta_description',
+)
+
+# جداول الصفوف التابعة للخبر وجداول أرشيفها
+DEPENDENT_TABLES = (
+    (NewsComment.__table__, news_comments_archive),
+    (NewsStats.__table__, news_stats_archive),
+    (NewsStatsMonthly.__table__, news_stats_monthly_archive),
+)
+
+
+class NewsArchiver(PeriodicFlusher):
+    """نقل الأخبار المنتهية والقديمة إلى جدول الأرشيف على دفعات
+
+    يعمل خيط الخلفية كل ARCHIVE_INTERVAL ثانية إذا كانت الأرشفة مفعلة،
+    ويمكن تشغيلها يدوياً بالأمر flask archive-news.
+    """
+
+    thread_name = 'news-archiver'
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.enabled = True
+        self.archive_days = 365
+        self.batch_size = 500
+        self.max_batches = 100
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الأرشفة بالتطبيق وبدء التشغيل الدوري إن كانت مفعلة"""
+        self.app = app
+        self.enabled = app.config.get('AUTO_ARCHIVE_ENABLED', True)
+        self.archive_days = app.config.get('AUTO_ARCHIVE_DAYS', 365)
+        self.batch_size = app.config.get('ARCHIVE_BATCH_SIZE', 500)
+        self.max_batches = app.config.get('ARCHIVE_MAX_BATCHES', 100)
+        self.flush_interval = app.config.get('ARCHIVE_INTERVAL', 3600)
+        app.extensions['news_archiver'] = self
+        if self.enabled and self.flush_interval:
+            self._start_background(app)
+
+    def _archivable(self, now):
+        """شرط الأخبار المستحقة للأرشفة: منشورة ومنتهية الصلاحية أو منشورة قبل archive_days يوماً
+
+        المسودات لا تُؤرشف أبداً حتى تبقى قابلة للتعديل ولا يُنشأ لها رابط عام.
+        """
+        conditions = [and_(NewsItem.expires_at.isnot(None), NewsItem.expires_at <= now)]
+        if self.archive_days:
+            conditions.append(NewsItem.published_at < now - timedelta(days=self.archive_days))
+        return and_(NewsItem.is_published.is_(True), or_(*conditions))
+
+    def _query(self, now):
+        return NewsItem.query.options(selectinload(NewsItem.tags)).filter(self._archivable(now))
+
+    def archive_batch(self, now=None, after_id=0):
+        """أرشفة دفعة واحدة من الأخبار بعد المعرف after_id في معاملة واحدة
+
+        إذا فشلت الدفعة تُؤرشف أخبارها كل خبر في معاملة، ويُسجل الخبر الذي
+        يفشل ويُتخطى.
+
+        Returns:
+            tuple: عدد الأخبار المؤرشفة، ومعرفات الأخبار التي فشلت أرشفتها،
+                وآخر معرف في الدفعة أو None إن لم تبق أخبار مستحقة
+        """
+        now = now or datetime.utcnow()
+        items = self._query(now).filter(NewsItem.id > after_id) \
+            .order_by(NewsItem.id) \
+            .limit(self.batch_size).all()
+        if not items:
+            return 0, [], None
+
+        ids = [item.id for item in items]
+        try:
+            self._move(items, now)
+            return len(items), [], ids[-1]
+        except Exception as e:
+            logger.error(f"خطأ في أرشفة دفعة الأخبار {ids[0]}-{ids[-1]}، ستُؤرشف خبراً خبراً: {str(e)}")
+
+        archived, failed = 0, []
+        for news_item_id in ids:
+            item = self._query(now).filter(NewsItem.id == news_item_id).first()
+            if item is None:
+                continue
+            try:
+                self._move([item], now)
+                archived += 1
+            except Exception as e:
+                logger.error(f"خطأ في أرشفة الخبر {news_item_id}، سيتم تخطيه: {str(e)}")
+                failed.append(news_item_id)
+        return archived, failed, ids[-1]
+
+    def _move(self, items, now):
+        """نقل الأخبار مع صفوفها التابعة إلى الأرشيف في معاملة واحدة"""
+        ids = [item.id for item in items]
+        try:
+            archives = []
+            for item in items:
+                archived = NewsArchive(news_item_id=item.id, **{field: getattr(item, field) for field in ARCHIVED_FIELDS})
+                archived.tags = json.dumps([tag.name for tag in item.tags], ensure_ascii=False)
+                archived.status = 'archived'
+                archived.archived_at = now
+                archives.append(archived)
+            db.session.add_all(archives)
+            db.session.flush()
+
+            # نقل التعليقات والإحصائيات بعبارتين لكل جدول بدلاً من تحميلها خبراً خبراً
+            archive_ids = [archived.id for archived in archives]
+            for source, target in DEPENDENT_TABLES:
+                rows = select(*source.columns, NewsArchive.id) \
+                    .join(NewsArchive, NewsArchive.news_item_id == source.c.news_item_id) \
+                    .where(NewsArchive.id.in_(archive_ids))
+                db.session.execute(target.insert().from_select([*source.columns.keys(), 'archive_id'], rows))
+                db.session.execute(source.delete().where(source.c.news_item_id.in_(ids)))
+
+            for item, archived in zip(items, archives):
+                db.session.merge(NewsSlugRedirect(slug=item.slug, archive_id=archived.id))
+            db.session.flush()
+
+            for item in items:
+                db.session.delete(item)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def run(self, now=None, max_batches=None):
+        """أرشفة الأخبار المستحقة على دفعات حتى تنتهي أو يبلغ عدد الدفعات الحد
+
+        Returns:
+            dict: عدد الأخبار المنقولة والتي فشلت أرشفتها وعدد الدفعات والزمن المستغرق بالثواني
+        """
+        now = now or datetime.utcnow()
+        max_batches = max_batches or self.max_batches
+        started = time.perf_counter()
+        moved = failed = batches = 0
+        # الدفعات بترتيب المعرف بعد آخر دفعة، فلا يعيد الخبر الفاشل نفسه في كل دفعة
+        after_id = 0
+        while batches < max_batches and not self._stop.is_set():
+            archived, failed_ids, after_id = self.archive_batch(now, after_id)
+            if after_id is None:
+                break
+            moved += archived
+            failed += len(failed_ids)
+            batches += 1
+
+        report = {
+            'moved': moved, 'failed': failed, 'batches': batches,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        if moved:
+            logger.info(f"تمت أرشفة {moved} خبر في {batches} دفعة خلال {report['seconds']} ثانية")
+        if failed:
+            logger.warning(f"تعذرت أرشفة {failed} خبر، وستُعاد محاولتها في التشغيل التالي")
+        return report
+
+    def flush(self):
+        """تشغيل الأرشفة الدورية"""
+        with self.app.app_context():
+            self.run()
+
+    def shutdown(self):
+        """إيقاف خيط الأرشفة دون تشغيل أخير عند الخروج"""
+        self._stop.set()
+        self._wake.set()
+
+
+def resolve_archived_slug(slug):
+    """معرف صف الأرشيف لرابط لم يعد في news_items، أو None"""
+    redirect = db.session.get(NewsSlugRedirect, slug)
+    return redirect.archive_id if redirect else None
@@ -0,0 +1,135 @@
+"""
+شجرة تعليقات الخبر مع ترقيم المحادثات بالمؤشر - مشروع نائبك
+
+تُجلب صفحة التعليقات باستعلام واحد: تعبير جدول مشترك تكراري (recursive CTE)
+يبدأ من التعليقات الرئيسية للصفحة (بترتيب تنازلي على created_at, id بعد
+المؤشر) وينزل عبر الردود المعتمدة، ثم تُبنى الشجرة في الذاكرة بمرور واحد
+O(n) ويُحسب عدد ردود كل تعليق منها دون استعلامات إضافية.
+
+التعليق المحذوف الذي له ردود ظاهرة يبقى في الشجرة بلا نص حتى لا تنقطع
+المحادثة، ويُحذف من الشجرة إن لم يبق تحته رد.
+"""
+from app.models import NewsComment
+from app.utils.pagination import InvalidCursor
+from sqlalchemy import and_, or_, select, tuple_
+from sqlalchemy.orm import aliased
+from datetime import datetime
+import base64
+import json
+
+# حقول التعليق في الاستجابة العامة
+THREAD_FIELDS = {'id', 'user_name', 'content', 'parent_id', 'created_at', 'is_deleted'}
+
+thread_serializer = NewsComment.serializer.only(THREAD_FIELDS)
+
+
+def encode_thread_cursor(comment):
+    """إنشاء مؤشر مبهم من مفتاح ترتيب التعليق الرئيسي"""
+    raw = json.dumps([comment.created_at.isoformat(), comment.id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_thread_cursor(cursor):
+    """استخراج مفتاح الترتيب (created_at, id) من المؤشر"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, comment_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def _visible():
+    """التعليقات المعتمدة غير المزعجة، ومنها المحذوفة التي تبقى مكاناً لردودها"""
+    return and_(NewsComment.is_approved.is_(True), NewsComment.is_spam.isnot(True))
+
+
+def thread_page_query(news_item_id, per_page, cursor=None):
+    """استعلام تعليقات صفحة من المحادثات مع كل ردودها
+
+    يُجلب تعليق رئيسي إضافي بعد حجم الصفحة لمعرفة وجود صفحة تالية.
+    """
+    reply = aliased(NewsComment)
+    roots = select(NewsComment.id, NewsComment.created_at).where(
+        NewsComment.news_item_id == news_item_id,
+        NewsComment.parent_id.is_(None),
+        _visible(),
+        # لا داعي لمحادثة محذوفة بلا ردود
+        or_(
+            NewsComment.is_deleted.isnot(True),
+            select(reply.id).where(
+                reply.parent_id == NewsComment.id, reply.is_approved.is_(True), reply.is_spam.isnot(True)
+            ).exists()
+        )
+    )
+    if cursor:
+        roots = roots.where(tuple_(NewsComment.created_at, NewsComment.id) < tuple_(*decode_thread_cursor(cursor)))
+    roots = roots.order_by(NewsComment.created_at.desc(), NewsComment.id.desc()).limit(per_page + 1).subquery()
+
+    tree = select(roots.c.id).cte('comment_tree', recursive=True)
+    tree = tree.union(
+        select(NewsComment.id).join(tree, NewsComment.parent_id == tree.c.id).where(_visible())
+    )
+    return NewsComment.query.join(tree, NewsComment.id == tree.c.id) \
+        .order_by(NewsComment.created_at, NewsComment.id)
+
+
+def build_comment_tree(comments):
+    """بناء شجرة المحادثات من تعليقات مرتبة زمنياً تصاعدياً
+
+    Returns:
+        list: التعليقات الرئيسية، كل منها بقائمة replies وعدد replies_count
+    """
+    nodes = {}
+    roots = []
+    for comment in comments:
+        node = thread_serializer.dump(comment, native=True)
+        if comment.is_deleted:
+            node['user_name'] = node['content'] = None
+        node['replies'] = []
+        nodes[comment.id] = node
+        parent = nodes.get(comment.parent_id) if comment.parent_id is not None else None
+        if parent is not None:
+            parent['replies'].append(node)
+        elif comment.parent_id is None:
+            roots.append(node)
+
+    # من الأعمق إلى الأعلى: الرد يسبق أصله عند عكس الترتيب الزمني
+    for comment in reversed(comments):
+        node = nodes[comment.id]
+        node['replies'] = [child for child in node['replies'] if not child.get('_pruned')]
+        node['replies_count'] = len(node['replies'])
+        if comment.is_deleted and not node['replies']:
+            node['_pruned'] = True
+    return [node for node in roots if not node.pop('_pruned', False)]
+
+
+def comment_thread_page(news_item_id, per_page, cursor=None):
+    """صفحة من محادثات تعليقات خبر، الأحدث أولاً وردودها بترتيبها الزمني
+
+    Returns:
+        tuple: (المحادثات، مؤشر الصفحة التالية أو None)
+    """
+    comments = thread_page_query(news_item_id, per_page, cursor).all()
+    root_comments = sorted(
+        (comment for comment in comments if comment.parent_id is None),
+        key=lambda comment: (comment.created_at, comment.id), reverse=True
+    )
+
+    next_cursor = None
+    if len(root_comments) > per_page:
+        extra = root_comments[per_page]
+        next_cursor = encode_thread_cursor(root_comments[per_page - 1])
+        # التعليق الرئيسي الإضافي وردوده للصفحة التالية
+        dropped = {extra.id}
+        kept = []
+        for comment in comments:
+            if comment.id in dropped or comment.parent_id in dropped:
+                dropped.add(comment.id)
+            else:
+                kept.append(comment)
+        comments = kept
+
+    threads = build_comment_tree(comments)
+    threads.reverse()
+    return threads, next_cursor
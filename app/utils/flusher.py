@@ -0,0 +1,83 @@
+"""
+أساس المخازن المؤقتة ذات الكتابة الدورية - مشروع نائبك
+"""
+import threading
+import atexit
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def shared_backend(app, setting):
+    """الخلفية المحددة في الإعداد setting، وإلا redis عند تعدد عمال gunicorn
+
+    gunicorn يقرأ عدد العمال من WEB_CONCURRENCY، وعندها لا تصل حالة الذاكرة
+    في عامل إلى بقية العمال فتكون redis هي الافتراضية.
+    """
+    backend = app.config.get(setting)
+    if backend:
+        return backend
+    return 'redis' if int(os.environ.get('WEB_CONCURRENCY') or 1) > 1 else 'memory'
+
+
+class PeriodicFlusher:
+    """أساس للمخازن التي تجمع البيانات في الذاكرة وتكتبها على دفعات
+
+    يشغّل خيطاً في الخلفية يستدعي flush() كل flush_interval ثانية أو عند
+    تسجيل flush_threshold حدثاً، ويكتب ما تبقى عند إيقاف العملية.
+    """
+
+    thread_name = 'periodic-flusher'
+
+    def __init__(self, flush_interval=5.0, flush_threshold=100):
+        self.app = None
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._events = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._flush_lock = threading.Lock()
+
+    def flush(self):
+        """كتابة البيانات المعلقة؛ يجب أن تنفذها الأصناف الفرعية"""
+        raise NotImplementedError
+
+    def _start_background(self, app):
+        """بدء الكتابة الدورية خارج بيئة الاختبار"""
+        if not app.config.get('TESTING'):
+            self.start()
+            atexit.register(self.shutdown)
+
+    def _notify(self, count=1):
+        """تسجيل أحداث جديدة وإيقاظ خيط الكتابة عند بلوغ الحد"""
+        self._events += count
+        if self._events >= self.flush_threshold:
+            self._wake.set()
+
+    def start(self):
+        """بدء خيط الكتابة الدورية في الخلفية"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"خطأ في الكتابة الدورية ({self.thread_name}): {str(e)}")
+
+    def shutdown(self):
+        """إيقاف خيط الكتابة وحفظ البيانات المتبقية"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval)
+        if self.app is not None:
+            self.flush()
@@ -0,0 +1,70 @@
+"""
+ترميز استجابات JSON باستخدام orjson - مشروع نائبك
+
+orjson يرمّز التواريخ والأوقات مباشرة بصيغة ISO 8601 (نفس ناتج isoformat())
+فتعيد المُسلسِلات كائنات datetime كما هي دون تحويلها إلى نصوص. إذا لم
+تكن المكتبة مثبتة يُستخدم مزود Flask الافتراضي مع نفس صيغة التواريخ.
+"""
+from flask.json.provider import DefaultJSONProvider
+from datetime import date
+from decimal import Decimal
+import dataclasses
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """ترميز الأنواع التي لا يدعمها المرمّز مباشرة"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """مزود JSON لتطبيق Flask يعتمد على orjson
+
+    يُفعَّل بـ app.json = OrjsonProvider(app). المفاتيح لا تُرتب افتراضياً
+    لأن ترتيبها يبطئ الترميز، ويمكن تفعيله بـ sort_keys = True.
+    """
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        """ترميز كائن إلى نص JSON"""
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        """قراءة نص JSON"""
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """إنشاء استجابة JSON دون المرور بنص وسيط"""
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=_default, option=self._options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,62 @@
+"""
+ترقية مخطط قاعدة البيانات لخدمة الأخبار - مشروع نائبك
+
+db.create_all() لا ينشئ إلا الجداول الناقصة، لذلك تضيف هذه الأداة إلى
+قاعدة بيانات قائمة الأعمدة والفهارس الجديدة المعرفة في النماذج وتحذف
+الفهارس التي حلت محلها فهارس أخرى. جميع الخطوات قابلة للتكرار بأمان.
+"""
+from app.models import db, NewsCategory
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+import logging
+
+logger = logging.getLogger(__name__)
+
+# فهارس استبدلت بفهارس القوائم المركبة (idx_news_listing_*)
+OBSOLETE_INDEXES = {
+    'news_items': ('idx_news_category', 'idx_news_featured', 'idx_news_breaking'),
+}
+
+
+def upgrade_schema():
+    """ترقية الجداول الموجودة إلى تعريف النماذج الحالي
+
+    Returns:
+        dict: الأعمدة المضافة والفهارس المنشأة والمحذوفة
+    """
+    report = {'columns_added': [], 'indexes_created': [], 'indexes_dropped': []}
+    inspector = inspect(db.engine)
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            # الأعمدة الجديدة
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}'))
+                    report['columns_added'].append(f'{table.name}.{column.name}')
+
+            # الفهارس المستبدلة
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index_name in OBSOLETE_INDEXES.get(table.name, ()):
+                if index_name in existing_indexes:
+                    connection.execute(text(f'DROP INDEX {index_name}'))
+                    report['indexes_dropped'].append(index_name)
+
+            # الفهارس الجديدة
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    report['indexes_created'].append(index.name)
+
+    if 'news_categories.published_count' in report['columns_added']:
+        NewsCategory.reconcile_published_counts()
+
+    for key, names in report.items():
+        if names:
+            logger.info(f"ترقية المخطط - {key}: {', '.join(names)}")
+    return report
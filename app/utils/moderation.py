@@ -0,0 +1,388 @@
+"""
+استقبال التعليقات والإشراف الآلي عليها في الخلفية - مشروع نائبك
+
+يُحفظ التعليق الجديد معلقاً ويُرد على الطلب فوراً، ثم يُضاف معرفه إلى طابور
+الإشراف. يقرأ خيط الخلفية تعليقات الدفعة باستعلام واحد ويقيّمها:
+
+- درجة الإزعاج من الروابط وتكرار الأحرف وتكرار النص نفسه من العنوان نفسه.
+- الألفاظ المسيئة عبر ProfanityFilter من وحدة حوكمة الذكاء الاصطناعي إن
+  كانت متاحة؛ الألفاظ الخفيفة تُخفى بالنجوم والشديدة تُبقي التعليق معلقاً
+  لمراجعة المشرفين.
+
+ثم تُكتب نتائج الدفعة كلها بعبارة UPDATE واحدة على التعليقات التي لم تُقيَّم بعد،
+ويُضاف عدد ما اعتُمد منها فعلاً إلى NewsItem.comment_count بفروق لكل خبر بدلاً
+من إعادة العد. التعليقات
+المعلقة التي لم تُقيَّم قبل إعادة تشغيل العملية تُعاد إلى الطابور عند أول دفعة.
+
+قرارات المشرفين على قوائم التعليقات تُنفذ بعبارة UPDATE واحدة، ثم يُعاد عد
+التعليقات الظاهرة للأخبار المتأثرة وحدها.
+"""
+from app.models import db, NewsItem, NewsComment
+from app.utils.flusher import PeriodicFlusher
+from app.utils.response_cache import comment_tags, item_tags
+from flask import current_app
+from sqlalchemy import bindparam, case, func, literal, select
+from collections import Counter
+from datetime import datetime, timedelta
+import re
+import logging
+
+try:
+    from app.ai_governance.filters import ProfanityFilter
+except ImportError:
+    ProfanityFilter = None
+
+logger = logging.getLogger(__name__)
+
+LINK_PATTERN = re.compile(r'https?://|www\.', re.IGNORECASE)
+REPEATED_CHARACTERS = re.compile(r'(.)\1{5,}')
+
+# أوزان مؤشرات الإزعاج
+LINK_WEIGHT = 0.4
+REPEATED_CHARACTERS_WEIGHT = 0.3
+DUPLICATE_WEIGHT = 0.6
+
+# المدة التي يُعد فيها تكرار النص نفسه من العنوان نفسه إزعاجاً
+DUPLICATE_WINDOW = timedelta(days=1)
+
+
+# الأعمدة التي يكتبها الإشراف الآلي
+MODERATION_COLUMNS = ('spam_score', 'is_spam', 'is_approved', 'approved_at', 'content')
+
+# قيم أعمدة التعليق لكل إجراء من إجراءات الإشراف الجماعي
+MODERATION_ACTIONS = {
+    'approve': {'is_approved': True, 'is_spam': False, 'is_deleted': False},
+    'reject': {'is_approved': False, 'is_deleted': True},
+    'spam': {'is_approved': False, 'is_spam': True},
+}
+
+
+class InvalidComment(ValueError):
+    """بيانات تعليق غير صالحة"""
+
+
+def spam_score(content, duplicate=False):
+    """درجة إزعاج التعليق بين 0 و1"""
+    score = LINK_WEIGHT * len(LINK_PATTERN.findall(content))
+    if REPEATED_CHARACTERS.search(content):
+        score += REPEATED_CHARACTERS_WEIGHT
+    if duplicate:
+        score += DUPLICATE_WEIGHT
+    return min(score, 1.0)
+
+
+def _unmoderated():
+    """شروط التعليقات التي لم يقيّمها الإشراف الآلي ولم يسبق المشرفون إليها"""
+    return (
+        NewsComment.spam_score.is_(None), NewsComment.is_approved.isnot(True),
+        NewsComment.is_spam.isnot(True), NewsComment.is_deleted.isnot(True)
+    )
+
+
+class CommentModerationQueue(PeriodicFlusher):
+    """طابور الإشراف الآلي على التعليقات مع كتابة النتائج على دفعات"""
+
+    thread_name = 'comment-moderation'
+
+    def __init__(self, app=None):
+        super().__init__(flush_interval=2.0, flush_threshold=200)
+        self.moderation = True
+        self.auto_approve = True
+        self.spam_threshold = 0.6
+        self.max_length = 500
+        self.batch_size = 200
+        self.bulk_limit = 500
+        self.profanity_filter = None
+        self._pending = []
+        self._recovered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الطابور بالتطبيق وبدء الإشراف الدوري"""
+        self.app = app
+        self.moderation = app.config.get('COMMENTS_MODERATION', True)
+        self.auto_approve = app.config.get('COMMENTS_AUTO_APPROVE', True)
+        self.spam_threshold = app.config.get('COMMENT_SPAM_THRESHOLD', 0.6)
+        self.max_length = app.config.get('MAX_COMMENT_LENGTH', 500)
+        self.batch_size = app.config.get('COMMENT_MODERATION_BATCH_SIZE', 200)
+        self.flush_interval = app.config.get('COMMENT_MODERATION_INTERVAL', 2.0)
+        self.flush_threshold = self.batch_size
+        self.bulk_limit = app.config.get('COMMENT_BULK_MODERATION_LIMIT', 500)
+        if ProfanityFilter is not None:
+            self.profanity_filter = ProfanityFilter({'threshold': app.config.get('COMMENT_PROFANITY_THRESHOLD', 0.5)})
+        else:
+            logger.warning("مرشح الألفاظ المسيئة غير متوفر، سيقتصر الإشراف الآلي على درجة الإزعاج")
+        app.extensions['comment_moderation'] = self
+        self._start_background(app)
+
+    # الاستقبال
+
+    def _validate(self, news_item_id, user_name, content, parent_id, user_email):
+        user_name = (user_name or '').strip()
+        content = (content or '').strip()
+        if not user_name or len(user_name) > 100:
+            raise InvalidComment('user_name is required and must be at most 100 characters')
+        if not content:
+            raise InvalidComment('content is required')
+        if len(content) > self.max_length:
+            raise InvalidComment(f'content must be at most {self.max_length} characters')
+        if user_email and len(user_email) > 150:
+            raise InvalidComment('user_email must be at most 150 characters')
+        if parent_id is not None:
+            parent = NewsComment.query.with_entities(NewsComment.id).filter_by(
+                id=parent_id, news_item_id=news_item_id, is_approved=True, is_spam=False, is_deleted=False
+            ).first()
+            if parent is None:
+                raise InvalidComment('parent_id does not refer to a visible comment of this news item')
+        return user_name, content
+
+    def submit(self, news_item_id, user_name, content, parent_id=None, user_email=None, user_ip=None,
+               user_id=None):
+        """حفظ تعليق جديد معلقاً وإضافته إلى طابور الإشراف
+
+        عند تعطيل COMMENTS_MODERATION يُعتمد التعليق مباشرة.
+
+        Raises:
+            InvalidComment: إذا كانت بيانات التعليق غير صالحة.
+
+        Returns:
+            NewsComment: التعليق المحفوظ
+        """
+        user_name, content = self._validate(news_item_id, user_name, content, parent_id, user_email)
+        comment = NewsComment(
+            news_item_id=news_item_id, user_name=user_name, content=content, parent_id=parent_id,
+            user_email=user_email, user_ip=user_ip, user_id=user_id, is_approved=not self.moderation,
+            approved_at=None if self.moderation else datetime.utcnow()
+        )
+        try:
+            db.session.add(comment)
+            db.session.flush()
+            if not self.moderation:
+                self._apply_count_deltas({news_item_id: 1})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if self.moderation:
+            with self._flush_lock:
+                self._pending.append(comment.id)
+            self._notify()
+        else:
+            self._invalidate([news_item_id])
+        return comment
+
+    # الإشراف
+
+    def _drain(self):
+        with self._flush_lock:
+            self._events = 0
+            pending, self._pending = self._pending, []
+        return pending
+
+    def _recover(self):
+        """إعادة التعليقات التي لم تُقيَّم قبل إعادة التشغيل إلى الطابور"""
+        self._recovered = True
+        rows = NewsComment.query.with_entities(NewsComment.id).filter(*_unmoderated()).all()
+        return [row.id for row in rows]
+
+    def _decide(self, comment, duplicate):
+        """نتيجة الإشراف على تعليق واحد: القيم الجديدة لأعمدته"""
+        score = spam_score(comment.content, duplicate)
+        content = comment.content
+        approved = self.auto_approve
+        if self.profanity_filter is not None:
+            allowed, cleaned, _ = self.profanity_filter.filter_prompt(content)
+            if allowed:
+                content = cleaned
+            else:
+                # ألفاظ شديدة: يبقى معلقاً لمراجعة المشرفين
+                approved = False
+        is_spam = score >= self.spam_threshold
+        return {
+            'spam_score': score,
+            'is_spam': is_spam,
+            'is_approved': approved and not is_spam,
+            'approved_at': datetime.utcnow() if approved and not is_spam else None,
+            'content': content,
+        }
+
+    def _duplicates(self, comments):
+        """معرفات تعليقات الدفعة التي تكرر نصاً حديثاً من العنوان نفسه"""
+        seen = Counter()
+        duplicates = set()
+        for comment in sorted(comments, key=lambda comment: comment.id):
+            key = (comment.user_ip, comment.content)
+            if comment.user_ip and seen[key]:
+                duplicates.add(comment.id)
+            seen[key] += 1
+
+        ips = {comment.user_ip for comment in comments if comment.user_ip}
+        if ips:
+            earliest = min(comment.created_at for comment in comments) - DUPLICATE_WINDOW
+            previous = NewsComment.query.with_entities(NewsComment.user_ip, NewsComment.content).filter(
+                NewsComment.user_ip.in_(ips),
+                NewsComment.created_at >= earliest,
+                NewsComment.id.notin_([comment.id for comment in comments])
+            ).all()
+            previous = {(row.user_ip, row.content) for row in previous}
+            duplicates.update(
+                comment.id for comment in comments if (comment.user_ip, comment.content) in previous
+            )
+        return duplicates
+
+    def moderate(self, comment_ids):
+        """تقييم دفعة من التعليقات وكتابة نتائجها في معاملة واحدة
+
+        Returns:
+            dict: أعداد التعليقات المعتمدة والمزعجة والمعلقة للمراجعة
+        """
+        comments = NewsComment.query.filter(NewsComment.id.in_(comment_ids), *_unmoderated()).all()
+        report = {'approved': 0, 'spam': 0, 'held': 0}
+        if not comments:
+            return report
+
+        duplicates = self._duplicates(comments)
+        results = {comment.id: self._decide(comment, comment.id in duplicates) for comment in comments}
+
+        # عبارة UPDATE واحدة لا تمس إلا التعليقات التي لم تُقيَّم بعد، فإذا سبقت عملية
+        # أخرى أو مشرف إلى بعضها لم تُحتسب هنا؛ الفروق تُبنى من الصفوف المعدلة فعلاً
+        table = NewsComment.__table__
+
+        def column(name):
+            return case(
+                {comment_id: literal(result[name], table.c[name].type) for comment_id, result in results.items()},
+                value=table.c.id, else_=table.c[name]
+            )
+
+        deltas = Counter()
+        try:
+            updated = db.session.execute(
+                table.update()
+                .where(table.c.id.in_(list(results)), *_unmoderated())
+                .values(**{name: column(name) for name in MODERATION_COLUMNS})
+                .returning(table.c.id, table.c.news_item_id)
+            ).all()
+            for row in updated:
+                result = results[row.id]
+                if result['is_approved']:
+                    deltas[row.news_item_id] += 1
+                    report['approved'] += 1
+                elif result['is_spam']:
+                    report['spam'] += 1
+                else:
+                    report['held'] += 1
+            self._apply_count_deltas(deltas)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if deltas:
+            self._invalidate(list(deltas))
+        return report
+
+    def bulk_moderate(self, comment_ids, action, moderator_id=None):
+        """اعتماد أو رفض أو تمييز قائمة تعليقات كمزعجة بعبارة UPDATE واحدة
+
+        يُعاد حساب comment_count للأخبار المتأثرة فقط باستعلام مجمّع واحد،
+        وتُبطل صفحاتها وتعليقاتها فقط في الذاكرة المؤقتة.
+
+        Args:
+            comment_ids (list): معرفات التعليقات.
+            action (str): approve أو reject أو spam.
+            moderator_id (int): معرف المشرف، يُحفظ في approved_by عند الاعتماد.
+
+        Raises:
+            InvalidComment: إذا كان الإجراء غير معروف أو القائمة غير صالحة.
+
+        Returns:
+            dict: عدد التعليقات المعدلة وعدد الأخبار المتأثرة
+        """
+        values = MODERATION_ACTIONS.get(action)
+        if values is None:
+            raise InvalidComment(f"action must be one of: {', '.join(MODERATION_ACTIONS)}")
+        if not comment_ids or not all(isinstance(comment_id, int) for comment_id in comment_ids):
+            raise InvalidComment('ids must be a non-empty list of integers')
+        if len(comment_ids) > self.bulk_limit:
+            raise InvalidComment(f'at most {self.bulk_limit} comments can be moderated at once')
+
+        values = dict(values)
+        if action == 'approve':
+            values.update(approved_at=datetime.utcnow(), approved_by=moderator_id)
+        comments = NewsComment.__table__
+        items = NewsItem.__table__
+        try:
+            news_item_ids = [
+                row.news_item_id for row in db.session.execute(
+                    select(comments.c.news_item_id).where(comments.c.id.in_(comment_ids)).distinct()
+                )
+            ]
+            updated = db.session.execute(
+                comments.update().where(comments.c.id.in_(comment_ids)).values(**values)
+            ).rowcount
+            if news_item_ids:
+                visible = select(func.count()).where(
+                    comments.c.news_item_id == items.c.id,
+                    comments.c.is_approved.is_(True),
+                    comments.c.is_spam.isnot(True),
+                    comments.c.is_deleted.isnot(True)
+                ).scalar_subquery()
+                db.session.execute(
+                    items.update().where(items.c.id.in_(news_item_ids))
+                    .values(comment_count=visible, updated_at=items.c.updated_at)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._invalidate(news_item_ids)
+        return {'updated': updated, 'news_items': len(news_item_ids)}
+
+    def _apply_count_deltas(self, deltas):
+        """إضافة فروق عدد التعليقات المعتمدة إلى أخبارها"""
+        if not deltas:
+            return
+        table = NewsItem.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam('item_id'))
+            .values(
+                comment_count=db.func.coalesce(table.c.comment_count, 0) + bindparam('delta'),
+                updated_at=table.c.updated_at
+            ),
+            [{'item_id': news_item_id, 'delta': delta} for news_item_id, delta in deltas.items()]
+        )
+
+    def _invalidate(self, news_item_ids):
+        """إبطال صفحات الأخبار وتعليقاتها التي تغيرت"""
+        response_cache = current_app.extensions.get('response_cache')
+        if response_cache is None or not news_item_ids:
+            return
+        slugs = [row.slug for row in NewsItem.query.with_entities(NewsItem.slug).filter(NewsItem.id.in_(news_item_ids))]
+        response_cache.invalidate(*[tag for slug in slugs for tag in item_tags(slug) + comment_tags(slug)])
+
+    def flush(self):
+        """الإشراف على التعليقات المنتظرة على دفعات
+
+        Returns:
+            int: عدد التعليقات التي تم تقييمها
+        """
+        with self.app.app_context():
+            pending = self._drain()
+            if not self._recovered:
+                pending = sorted(set(pending) | set(self._recover()))
+            moderated = 0
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                try:
+                    report = self.moderate(chunk)
+                    moderated += sum(report.values())
+                except Exception as e:
+                    logger.error(f"خطأ في الإشراف على التعليقات: {str(e)}")
+                    with self._flush_lock:
+                        self._pending.extend(pending[start:])
+                    break
+            return moderated
@@ -0,0 +1,268 @@
+"""
+بث الأخبار العاجلة والمنشورة حديثاً عبر Server-Sent Events - مشروع نائبك
+
+بدلاً من استطلاع /api/news?breaking=true تبقى اتصالات العملاء مفتوحة على
+/api/news/stream وتُدفع إليها الأخبار فور نشرها أو تحويلها إلى عاجلة.
+
+الموزِّع داخل العملية يحفظ آخر الأحداث في مخزن حلقي برقم تسلسلي، وكل اتصال
+ينتظر على شرط مشترك ثم يقرأ ما بعد آخر رقم رآه، فلا توجد طابور أو خيط لكل
+عميل ويكلف النشر O(1) مهما كثرت الاتصالات. مع عمال gevent يصبح الانتظار
+تعاونياً فتبقى آلاف الاتصالات الخاملة مفتوحة بكلفة ضئيلة. عند تعدد العمال
+تُنشر الأحداث عبر Redis Pub/Sub ويستقبلها مستمع واحد في كل عامل.
+"""
+from app.models import NewsItem
+from app.utils.flusher import shared_backend
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from collections import deque
+import json
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_EVENTS_KEY = 'news_stream_events'
+
+# الحقول المرسلة مع كل خبر
+EVENT_FIELDS = ('id', 'slug', 'title', 'title_en', 'summary', 'summary_en', 'category_id',
+                'is_breaking', 'published_at')
+
+
+class StreamEvent:
+    """حدث واحد في البث"""
+
+    __slots__ = ('id', 'type', 'data', 'is_breaking')
+
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.is_breaking = event_type == 'breaking'
+
+    def encode(self):
+        """نص الحدث بصيغة text/event-stream"""
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n'
+
+    def to_message(self):
+        return json.dumps({'id': self.id, 'type': self.type, 'data': self.data}, ensure_ascii=False)
+
+    @classmethod
+    def from_message(cls, message):
+        value = json.loads(message)
+        return cls(value['id'], value['type'], value['data'])
+
+
+class NewsStreamHub:
+    """موزِّع أحداث الأخبار على اتصالات SSE المفتوحة في العملية الحالية"""
+
+    channel = 'news:stream'
+
+    def __init__(self, app=None):
+        self.buffer_size = 100
+        self.keepalive = 15
+        self.max_duration = 300
+        self.max_clients = 5000
+        self.redis = None
+        self.clients = 0
+        self._events = deque(maxlen=self.buffer_size)
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._listener = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الموزِّع بالتطبيق وبدء مستمع Redis عند تعدد العمال"""
+        self.buffer_size = app.config.get('STREAM_BUFFER_SIZE', 100)
+        self.keepalive = app.config.get('STREAM_KEEPALIVE', 15)
+        self.max_duration = app.config.get('STREAM_MAX_DURATION', 300)
+        self.max_clients = app.config.get('STREAM_MAX_CLIENTS', 5000)
+        self._events = deque(maxlen=self.buffer_size)
+        if shared_backend(app, 'STREAM_BACKEND') == 'redis':
+            self.redis = self._create_redis(app)
+        app.extensions['news_stream'] = self
+        if self.redis is not None and not app.config.get('TESTING'):
+            self._start_listener()
+
+    def _create_redis(self, app):
+        try:
+            import redis
+            return redis.Redis(
+                host=app.config.get('REDIS_HOST', 'localhost'),
+                port=app.config.get('REDIS_PORT', 6379),
+                db=app.config.get('REDIS_DB', 0),
+                password=app.config.get('REDIS_PASSWORD')
+            )
+        except ImportError:
+            logger.warning("مكتبة redis غير متوفرة، سيقتصر البث على العامل الحالي")
+            return None
+
+    @property
+    def full(self):
+        """هل بلغ عدد الاتصالات المفتوحة الحد الأقصى"""
+        return self.clients >= self.max_clients
+
+    # النشر
+
+    def publish(self, event_type, data):
+        """نشر حدث لكل العملاء، في كل العمال عند استخدام Redis"""
+        if self.redis is not None:
+            try:
+                event_id = self.redis.incr(f'{self.channel}:sequence')
+                self.redis.publish(self.channel, StreamEvent(event_id, event_type, data).to_message())
+                return
+            except Exception as e:
+                logger.error(f"خطأ في نشر حدث البث عبر Redis: {str(e)}")
+        self.deliver(StreamEvent(None, event_type, data))
+
+    def deliver(self, stream_event):
+        """إضافة حدث إلى المخزن الحلقي وإيقاظ الاتصالات المنتظرة"""
+        with self._condition:
+            if stream_event.id is None:
+                stream_event.id = self._sequence + 1
+            self._sequence = max(self._sequence, stream_event.id)
+            self._events.append(stream_event)
+            self._condition.notify_all()
+
+    def _start_listener(self):
+        self._listener = threading.Thread(target=self._listen, name='news-stream-listener', daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        """استقبال أحداث العمال الأخرى من Redis وتوزيعها محلياً، مع إعادة الاتصال عند الخطأ"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.deliver(StreamEvent.from_message(message['data']))
+            except Exception as e:
+                logger.error(f"خطأ في مستمع البث: {str(e)}")
+                time.sleep(1)
+
+    # الاشتراك
+
+    def events_after(self, last_id, breaking_only=False):
+        """الأحداث المحفوظة بعد رقم معين، ورقم آخر حدث محفوظ"""
+        with self._condition:
+            events = [
+                stream_event for stream_event in self._events
+                if stream_event.id > last_id and (stream_event.is_breaking or not breaking_only)
+            ]
+            return events, self._sequence
+
+    def stream(self, last_event_id=None, breaking_only=False):
+        """مولِّد نص text/event-stream لاتصال واحد
+
+        يبدأ بالأحداث المحفوظة بعد Last-Event-ID إن أُرسل، أو بحدث reset إذا لم
+        تعد محفوظة أو كان المعرف أحدث من تسلسل هذا العامل. يرسل تعليقاً كل keepalive ثانية حتى لا تغلق الوسائط الاتصال
+        الخامل، وينهي الاتصال بعد max_duration ثانية فيعيد العميل الاتصال
+        تلقائياً من آخر حدث استلمه.
+        """
+        with self._condition:
+            self.clients += 1
+            last_id = self._sequence
+            oldest = self._events[0].id if self._events else None
+        try:
+            yield 'retry: 3000\n\n'
+            if last_event_id is not None:
+                if last_event_id > last_id or (oldest is not None and last_event_id < oldest - 1):
+                    # أحداث فاتت العميل لم تعد محفوظة، أو معرف من تسلسل آخر (بعد إعادة
+                    # التشغيل أو من عامل آخر): يعيد تحميل القائمة ويتابع من التسلسل الحالي
+                    yield 'event: reset\ndata: {}\n\n'
+                else:
+                    last_id = last_event_id
+
+            deadline = time.monotonic() + self.max_duration
+            while True:
+                pending, last_id = self.events_after(last_id, breaking_only)
+                if pending:
+                    yield ''.join(stream_event.encode() for stream_event in pending)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                with self._condition:
+                    if self._sequence <= last_id:
+                        self._condition.wait(min(self.keepalive, remaining))
+                    woken = self._sequence > last_id
+                if not woken:
+                    yield ': keepalive\n\n'
+        finally:
+            with self._condition:
+                self.clients -= 1
+
+
+def event_payload(row):
+    """بيانات الخبر المرسلة في الحدث"""
+    data = {field: getattr(row, field) for field in EVENT_FIELDS}
+    if data['published_at'] is not None:
+        data['published_at'] = data['published_at'].isoformat()
+    return data
+
+
+def _app_news_stream():
+    """موزِّع البث المرتبط بالتطبيق الحالي إن وجد"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('news_stream')
+
+
+def _became_true(history, inserted):
+    """هل أصبحت القيمة صحيحة في هذا الحفظ"""
+    if not history.added or not history.added[0]:
+        return False
+    return inserted or not any(history.deleted)
+
+
+def _record_event(mapper, connection, target, inserted):
+    if _app_news_stream() is None or not target.is_published:
+        return
+    state = inspect(target)
+    published = _became_true(state.attrs.is_published.history, inserted)
+    breaking = _became_true(state.attrs.is_breaking.history, inserted)
+    if not (published or (breaking and target.is_breaking)):
+        return
+
+    table = NewsItem.__table__
+    row = connection.execute(
+        select(*[table.c[field] for field in EVENT_FIELDS]).where(table.c.id == target.id)
+    ).first()
+    session = object_session(target)
+    if row is not None and session is not None:
+        event_type = 'breaking' if row.is_breaking else 'published'
+        session.info.setdefault(SESSION_EVENTS_KEY, []).append((event_type, event_payload(row)))
+
+
+@event.listens_for(NewsItem, 'after_insert')
+def _record_inserted(mapper, connection, target):
+    """تسجيل الخبر المنشور عند إنشائه لبثه بعد نجاح الحفظ"""
+    _record_event(mapper, connection, target, inserted=True)
+
+
+@event.listens_for(NewsItem, 'after_update')
+def _record_updated(mapper, connection, target):
+    """تسجيل الخبر عند نشره أو تحويله إلى عاجل لبثه بعد نجاح الحفظ"""
+    _record_event(mapper, connection, target, inserted=False)
+
+
+@event.listens_for(NewsItem.is_published, 'set', active_history=True)
+def _track_published(target, value, oldvalue, initiator):
+    """تحميل القيمة السابقة لمعرفة هل نُشر الخبر الآن"""
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    """بث الأحداث المسجلة بعد نجاح الحفظ فقط"""
+    events = session.info.pop(SESSION_EVENTS_KEY, None)
+    hub = _app_news_stream()
+    if not events or hub is None:
+        return
+    for event_type, data in events:
+        hub.publish(event_type, data)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_events(session, previous_transaction):
+    session.info.pop(SESSION_EVENTS_KEY, None)
@@ -0,0 +1,75 @@
+"""
+ترقيم الصفحات بالمؤشر (Keyset) لقوائم الأخبار - مشروع نائبك
+
+بدلاً من OFFSET و COUNT(*) يُستأنف كل صفحة من مفتاح آخر عنصر في الصفحة
+السابقة (priority, published_at, id)، فتبقى تكلفة الصفحة ثابتة مهما بعدت.
+"""
+from app.models import NewsItem
+from datetime import datetime
+from sqlalchemy import tuple_
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """مؤشر صفحة غير صالح"""
+
+
+def encode_cursor(news_item):
+    """إنشاء مؤشر مبهم من مفتاح ترتيب الخبر"""
+    key = [news_item.priority, news_item.published_at.isoformat(), news_item.id]
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """استخراج مفتاح الترتيب (priority, published_at, id) من المؤشر"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        priority, published_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(priority), datetime.fromisoformat(published_at), int(item_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def listing_sort_key():
+    """أعمدة مفتاح الترتيب لقوائم الأخبار، بنفس ترتيب الفهرس idx_news_listing"""
+    return tuple_(NewsItem.priority, NewsItem.published_at, NewsItem.id)
+
+
+def keyset_query(query, per_page, cursor=None):
+    """تطبيق شرط المؤشر والترتيب والحد على استعلام الأخبار
+
+    يُجلب عنصر إضافي بعد حجم الصفحة لمعرفة وجود صفحة تالية.
+    """
+    query = query.filter(NewsItem.published_at.isnot(None))
+    if cursor:
+        query = query.filter(listing_sort_key() < tuple_(*decode_cursor(cursor)))
+
+    return query.order_by(
+        NewsItem.priority.desc(),
+        NewsItem.published_at.desc(),
+        NewsItem.id.desc()
+    ).limit(per_page + 1)
+
+
+def keyset_page(query, per_page, cursor=None):
+    """جلب صفحة من الأخبار بعد المؤشر المعطى
+
+    الترتيب تنازلي على (priority, published_at, id)، والأخبار التي ليس لها
+    published_at لا تظهر في هذا النمط.
+
+    Args:
+        query: استعلام الأخبار بعد تطبيق المرشحات.
+        per_page (int): عدد العناصر في الصفحة.
+        cursor (str): مؤشر الصفحة التالية من الاستجابة السابقة.
+
+    Returns:
+        tuple: (عناصر الصفحة، مؤشر الصفحة التالية أو None)
+    """
+    items = keyset_query(query, per_page, cursor).all()
+
+    if len(items) > per_page:
+        items = items[:per_page]
+        return items, encode_cursor(items[-1])
+    return items, None
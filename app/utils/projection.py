@@ -0,0 +1,116 @@
+"""
+اختيار حقول استجابات الأخبار (?fields= و ?expand=) - مشروع نائبك
+
+عند تحديد الحقول المطلوبة يُقيَّد الاستعلام بالأعمدة اللازمة لها فقط
+(load_only) فلا تُقرأ أعمدة المحتوى والصور ومعلومات SEO من قاعدة البيانات،
+ويُقيَّد الناتج بنفس الحقول. التصنيف والعلامات تُعرض كمراجع مختصرة
+(id, name, name_en) ما لم تُطلب كاملة في expand.
+"""
+from app.models import NewsCategory, NewsItem, NewsTag
+from app.models.serialization import ModelSerializer
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from functools import lru_cache
+
+# العلاقات التي يمكن عرضها كاملة
+EXPANDABLE = ('category', 'tags')
+
+# الحقول المحسوبة والأعمدة التي تعتمد عليها
+COMPUTED_COLUMNS = {
+    'gallery_images': ('gallery_images',),
+    'is_active': ('is_published', 'expires_at'),
+    'category': ('category_id',),
+    'tags': (),
+}
+
+# أعمدة تُحمّل دائماً: المعرف ومفتاح ترتيب القوائم الذي يُبنى منه المؤشر
+ALWAYS_LOADED = ('id', 'priority', 'published_at')
+
+REFERENCE_FIELDS = ('id', 'name', 'name_en')
+category_reference = ModelSerializer(REFERENCE_FIELDS)
+tag_reference = ModelSerializer(REFERENCE_FIELDS)
+
+
+class InvalidFields(ValueError):
+    """حقول غير معروفة في fields أو expand"""
+
+
+def parse_field_list(value):
+    """قراءة قائمة حقول مفصولة بفواصل، أو None إذا لم تُحدد"""
+    if value is None:
+        return None
+    return frozenset(field.strip() for field in value.split(',') if field.strip())
+
+
+def available_fields(include_content=False):
+    """حقول الخبر المتاحة في القائمة أو في صفحة الخبر"""
+    serializer = NewsItem.content_serializer if include_content else NewsItem.serializer
+    return frozenset(serializer.fields) | frozenset(serializer.computed)
+
+
+class NewsProjection:
+    """المُسلسِل وخيارات التحميل لمجموعة حقول محددة"""
+
+    def __init__(self, serializer, options):
+        self.serializer = serializer
+        self.options = options
+
+    def dump_many(self, items):
+        return self.serializer.dump_many(items, native=True)
+
+    def dump(self, item):
+        return self.serializer.dump(item, native=True)
+
+
+def news_projection(fields=None, expand=None, include_content=False):
+    """إنشاء إسقاط لحقول الخبر المطلوبة
+
+    Args:
+        fields (frozenset): الحقول المطلوبة، أو None لكل الحقول.
+        expand (frozenset): العلاقات المطلوبة كاملة.
+        include_content (bool): هل حقول المحتوى متاحة (صفحة الخبر).
+
+    Returns:
+        NewsProjection: المُسلسِل وخيارات تحميل الاستعلام.
+
+    Raises:
+        InvalidFields: عند طلب حقل غير متاح.
+    """
+    expand = frozenset(expand or ())
+    unknown = expand - set(EXPANDABLE)
+    if fields is not None:
+        unknown |= fields - available_fields(include_content)
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return _build_projection(fields, expand, include_content)
+
+
+@lru_cache(maxsize=256)
+def _build_projection(fields, expand, include_content):
+    if fields is None:
+        serializer = NewsItem.content_serializer if include_content else NewsItem.serializer
+        return NewsProjection(serializer, NewsItem.listing_options(include_content))
+
+    fields = fields | {'id'}
+    base = NewsItem.content_serializer if include_content else NewsItem.serializer
+    overrides = {}
+    columns = set(ALWAYS_LOADED)
+    for field in fields:
+        columns.update(COMPUTED_COLUMNS.get(field, (field,)))
+    options = [load_only(*[getattr(NewsItem, column) for column in sorted(columns)])]
+
+    if 'category' in fields:
+        if 'category' in expand:
+            options.append(joinedload(NewsItem.category))
+        else:
+            options.append(joinedload(NewsItem.category).load_only(NewsCategory.name, NewsCategory.name_en))
+            overrides['category'] = lambda item, native: \
+                category_reference.dump(item.category) if item.category else None
+
+    if 'tags' in fields:
+        if 'tags' in expand:
+            options.append(selectinload(NewsItem.tags))
+        else:
+            options.append(selectinload(NewsItem.tags).load_only(NewsTag.name, NewsTag.name_en))
+            overrides['tags'] = lambda item, native: tag_reference.dump_many(item.tags)
+
+    return NewsProjection(base.only(fields, **overrides), options)
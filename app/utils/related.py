@@ -0,0 +1,414 @@
+"""
+الأخبار ذات الصلة المحسوبة مسبقاً - مشروع نائبك
+
+لكل خبر منشور تُحسب أقرب RELATED_TOP_K خبراً بمزج تشابه العلامات (معامل
+جاكارد) وتشابه النصوص (جيب التمام بين متجهات TF-IDF للعناوين والملخصات)،
+وتُخزن مرتبة في جدول news_related، فتقرأها صفحة الخبر باستعلام واحد على
+المفتاح الأساسي بدلاً من حسابها من جدول العلامات عند كل طلب.
+
+يجري الحساب في خيط خلفي دوري عند تغير الأخبار، أو بالأمر flask compute-related.
+مع تعدد العمال يحجز عامل واحد الحساب بقفل في الذاكرة المؤقتة المشتركة، وتُحفظ
+بصمة آخر حساب فيها فلا يعيده بقية العمال عند بدئهم.
+تُستخدم NumPy على دفعات من الأخبار إن كانت مثبتة، وإلا تنفيذ بايثون مكافئ.
+المصطلحات والعلامات الموجودة في أكثر من نصف الأخبار لا تميز بينها فتُهمل.
+"""
+from app.models import db, NewsItem, NewsRelated, news_tags_association
+from app.utils.flusher import PeriodicFlusher
+from app.utils.search import analyze
+from flask import current_app
+from sqlalchemy import BigInteger, cast, event, func, or_, select
+from collections import Counter, defaultdict
+import heapq
+import math
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# الحقول النصية وأوزانها في متجه الخبر
+TEXT_WEIGHTS = {
+    'title': 2,
+    'summary': 1,
+    'title_en': 2,
+    'summary_en': 1,
+}
+
+# نسبة الأخبار التي يُهمل بعدها المصطلح أو العلامة لشيوعه
+MAX_DOCUMENT_FREQUENCY = 0.5
+
+# عدد الأخبار في كل دفعة من الحساب بـ NumPy، وحد خلايا مصفوفة الدرجات الكثيفة للدفعة
+BLOCK_SIZE = 256
+BLOCK_CELLS = 1 << 21
+
+# تُجمع الدفعة في مصفوفة كثيفة إذا بلغت أزواجها 1/DENSE_RATIO من خلاياها، وإلا بترتيب الأزواج
+DENSE_RATIO = 2
+
+INSERT_BATCH_SIZE = 1000
+
+# ترميز زوج (الخبر، العلامة) برقم واحد في بصمة العلامات
+TAG_PAIR_FACTOR = 1000003
+TAG_PAIR_MODULUS = 1000033
+
+# مفاتيح الذاكرة المؤقتة المشتركة بين العمال
+LOCK_KEY = 'news:related:lock'
+SIGNATURE_KEY = 'news:related:signature'
+
+
+def _features(documents, tag_sets):
+    """أوزان TF-IDF المطبّعة لكل خبر وعلاماته، بعد إهمال المصطلحات والعلامات الشائعة
+
+    Returns:
+        tuple: (قائمة قواميس {مصطلح: وزن}، قائمة قوائم العلامات المميزة، عدد علامات كل خبر)
+    """
+    count = len(documents)
+    max_frequency = max(2, MAX_DOCUMENT_FREQUENCY * count)
+
+    document_frequency = Counter(term for frequencies in documents for term in frequencies)
+    vectors = []
+    for frequencies in documents:
+        weights = {
+            term: (1 + math.log(tf)) * (1 + math.log(count / document_frequency[term]))
+            for term, tf in frequencies.items() if document_frequency[term] <= max_frequency
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        vectors.append({term: weight / norm for term, weight in weights.items()} if norm else {})
+
+    # حجم المجموعة في مقام جاكارد يشمل العلامات المميزة فقط
+    tag_frequency = Counter(tag for tags in tag_sets for tag in set(tags))
+    kept_tags = [
+        sorted(tag for tag in set(tags) if tag_frequency[tag] <= max_frequency)
+        for tags in tag_sets
+    ]
+    return vectors, kept_tags, [len(tags) for tags in kept_tags]
+
+
+def _rank_python(vectors, tag_sets, tag_sizes, top_k, tag_weight, text_weight):
+    """ترتيب الأخبار ذات الصلة بفهارس مقلوبة في بايثون"""
+    term_postings = defaultdict(list)
+    for i, weights in enumerate(vectors):
+        for term, weight in weights.items():
+            term_postings[term].append((i, weight))
+    tag_postings = defaultdict(list)
+    for i, tags in enumerate(tag_sets):
+        for tag in tags:
+            tag_postings[tag].append(i)
+
+    related = []
+    for i in range(len(vectors)):
+        cosine = defaultdict(float)
+        for term, weight in vectors[i].items():
+            for j, other_weight in term_postings[term]:
+                cosine[j] += weight * other_weight
+        shared = Counter(j for tag in tag_sets[i] for j in tag_postings[tag])
+
+        scores = []
+        for j in cosine.keys() | shared.keys():
+            if j == i:
+                continue
+            jaccard = shared[j] / (tag_sizes[i] + tag_sizes[j] - shared[j]) if shared[j] else 0.0
+            scores.append((j, text_weight * cosine.get(j, 0.0) + tag_weight * jaccard))
+        best = heapq.nlargest(top_k, scores, key=lambda pair: (pair[1], -pair[0]))
+        related.extend((i, rank, j, score) for rank, (j, score) in enumerate(best))
+    return related
+
+
+def _csr(rows, dtype):
+    """تمثيل مصفوفة متفرقة بصفوف من أزواج (عمود، قيمة) ومنقولها بمصفوفات NumPy
+
+    Returns:
+        tuple: ((مؤشرات الصفوف، الأعمدة، القيم)، (مؤشرات الأعمدة، الصفوف، القيم))
+    """
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    pointers = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=pointers[1:])
+    columns = np.fromiter((column for row in rows for column, _ in row), dtype=np.int64, count=pointers[-1])
+    values = np.fromiter((value for row in rows for _, value in row), dtype=dtype, count=pointers[-1])
+    owners = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+
+    order = np.argsort(columns, kind='stable')
+    column_count = int(columns.max()) + 1 if len(columns) else 0
+    column_pointers = np.zeros(column_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(columns, minlength=column_count), out=column_pointers[1:])
+    return (pointers, columns, values), (column_pointers, owners[order], values[order])
+
+
+def _pairs(by_row, by_column, start, stop):
+    """أزواج (خبر من الدفعة، خبر آخر) يجمعهما عمود مشترك، مع حاصل ضرب قيمتيهما"""
+    pointers, columns, values = by_row
+    column_pointers, column_rows, column_values = by_column
+    first, last = pointers[start], pointers[stop]
+    columns = columns[first:last]
+    owners = np.repeat(np.arange(start, stop, dtype=np.int64), np.diff(pointers[start:stop + 1]))
+
+    lengths = column_pointers[columns + 1] - column_pointers[columns]
+    offsets = np.repeat(column_pointers[columns] - (np.cumsum(lengths) - lengths), lengths)
+    offsets += np.arange(int(lengths.sum()), dtype=np.int64)
+    products = np.repeat(values[first:last], lengths) * column_values[offsets]
+    return np.repeat(owners, lengths), column_rows[offsets], products
+
+
+def _accumulate(text_keys, products, tag_keys, ones, cells):
+    """جمع جيب التمام والعلامات المشتركة لكل زوج (خلية) ظهر في الدفعة
+
+    الأزواج القليلة تُجمع بترتيب مفاتيحها، والكثيرة في مصفوفة كثيفة من cells خلية
+    بـ bincount دون ترتيب.
+
+    Returns:
+        tuple: (الخلايا مرتبة، جيب التمام لكل خلية، عدد العلامات المشتركة لكل خلية)
+    """
+    if (len(text_keys) + len(tag_keys)) * DENSE_RATIO < cells:
+        touched, inverse = np.unique(np.concatenate((text_keys, tag_keys)), return_inverse=True)
+        cosine = np.bincount(inverse[:len(text_keys)], weights=products, minlength=len(touched))
+        shared = np.bincount(inverse[len(text_keys):], weights=ones, minlength=len(touched))
+        return touched, cosine, shared
+
+    cosine = np.bincount(text_keys, weights=products, minlength=cells)
+    shared = np.bincount(tag_keys, weights=ones, minlength=cells)
+    touched = np.flatnonzero(cosine + shared)
+    return touched, cosine[touched], shared[touched]
+
+
+def _rank_numpy(vectors, tag_sets, tag_sizes, top_k, tag_weight, text_weight):
+    """ترتيب الأخبار ذات الصلة بضرب مصفوفة متفرقة في منقولها على دفعات من الأخبار"""
+    count = len(vectors)
+    vocabulary = {}
+    term_entries = [
+        [(vocabulary.setdefault(term, len(vocabulary)), weight) for term, weight in sorted(weights.items())]
+        for weights in vectors
+    ]
+    tag_ids = {}
+    tag_entries = [[(tag_ids.setdefault(tag, len(tag_ids)), 1) for tag in tags] for tags in tag_sets]
+    terms = _csr(term_entries, np.float64)
+    tags = _csr(tag_entries, np.int64)
+    sizes = np.asarray(tag_sizes, dtype=np.float64)
+
+    block_size = max(1, min(BLOCK_SIZE, BLOCK_CELLS // count))
+    max_score = (tag_weight + text_weight) or 1.0
+    related = []
+    for start in range(0, count, block_size):
+        stop = min(start + block_size, count)
+        text_rows, text_columns, products = _pairs(*terms, start, stop)
+        tag_rows, tag_columns, ones = _pairs(*tags, start, stop)
+        touched, cosine, shared = _accumulate(
+            (text_rows - start) * count + text_columns, products,
+            (tag_rows - start) * count + tag_columns, ones,
+            (stop - start) * count
+        )
+        rows, columns = np.divmod(touched, count)
+        rows += start
+        union = sizes[rows] + sizes[columns] - shared
+        jaccard = np.divide(shared, union, out=np.zeros(len(touched)), where=shared > 0)
+        scores = text_weight * cosine + tag_weight * jaccard
+
+        others = rows != columns
+        rows, columns, scores = rows[others], columns[others], scores[others]
+        # الخلايا مرتبة بالصف ثم العمود، فيكفي ترتيب مستقر بمفتاح واحد: الصف ثم الدرجة تنازلياً
+        order = np.argsort((rows - start) * 2 - scores / max_score, kind='stable')
+        rows, columns, scores = rows[order], columns[order], scores[order]
+        ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        best = ranks < top_k
+        related.extend(zip(
+            rows[best].tolist(), ranks[best].tolist(), columns[best].tolist(), scores[best].tolist()
+        ))
+    return related
+
+
+def rank_related(documents, tag_sets, top_k=10, tag_weight=0.5, text_weight=0.5):
+    """أقرب top_k خبراً لكل خبر
+
+    Args:
+        documents (list): تكرارات المصطلحات الموزونة لكل خبر (Counter).
+        tag_sets (list): معرفات علامات كل خبر.
+        top_k (int): عدد الأخبار ذات الصلة لكل خبر.
+        tag_weight (float): وزن تشابه العلامات.
+        text_weight (float): وزن تشابه النصوص.
+
+    Returns:
+        list: (فهرس الخبر، الترتيب، فهرس الخبر ذي الصلة، الدرجة)، الأعلى درجة أولاً
+    """
+    if not documents:
+        return []
+    vectors, kept_tags, tag_sizes = _features(documents, tag_sets)
+    rank = _rank_numpy if np is not None else _rank_python
+    return rank(vectors, kept_tags, tag_sizes, top_k, tag_weight, text_weight)
+
+
+def _load_documents(connection):
+    """معرفات الأخبار المنشورة ومصطلحات نصوصها وعلاماتها"""
+    table = NewsItem.__table__
+    rows = connection.execute(
+        select(table.c.id, *[table.c[field] for field in TEXT_WEIGHTS])
+        .where(table.c.is_published.is_(True))
+        .order_by(table.c.id)
+    ).all()
+
+    ids = [row.id for row in rows]
+    positions = {news_item_id: i for i, news_item_id in enumerate(ids)}
+    documents = []
+    for row in rows:
+        frequencies = Counter()
+        for field, weight in TEXT_WEIGHTS.items():
+            for term in analyze(getattr(row, field)):
+                frequencies[term] += weight
+        documents.append(frequencies)
+
+    tag_sets = [[] for _ in ids]
+    association = news_tags_association.c
+    for news_item_id, news_tag_id in connection.execute(select(association.news_item_id, association.news_tag_id)):
+        position = positions.get(news_item_id)
+        if position is not None:
+            tag_sets[position].append(news_tag_id)
+    return ids, documents, tag_sets
+
+
+def _signature(connection):
+    """بصمة رخيصة للأخبار المنشورة وعلاماتها تتغير عند أي تعديل يؤثر في النتائج"""
+    published = connection.execute(
+        select(func.count(NewsItem.id), func.max(NewsItem.updated_at)).where(NewsItem.is_published.is_(True))
+    ).one()
+    # مجموع أزواج (الخبر، العلامة) ومجموع مربعاتها بعد الاختزال: يتغير عند استبدال علامة
+    # بأخرى وإن بقي العدد و updated_at كما هما
+    association = news_tags_association.c
+    pair = cast(association.news_item_id, BigInteger) * TAG_PAIR_FACTOR + association.news_tag_id
+    reduced = pair % TAG_PAIR_MODULUS
+    tagged = connection.execute(
+        select(func.count(), func.sum(pair), func.sum(reduced * reduced))
+    ).one()
+    return tuple(published) + tuple(tagged)
+
+
+class RelatedArticles(PeriodicFlusher):
+    """حساب الأخبار ذات الصلة وتخزينها في جدول news_related
+
+    يعيد خيط الخلفية الحساب كل RELATED_REFRESH_INTERVAL ثانية إذا تغيرت
+    الأخبار المنشورة أو علاماتها منذ آخر حساب في أي عامل، ويحسبها عامل واحد
+    فقط في كل مرة.
+    """
+
+    thread_name = 'news-related'
+
+    def __init__(self, app=None, cache=None):
+        super().__init__()
+        self.cache = cache
+        self.top_k = 10
+        self.tag_weight = 0.5
+        self.text_weight = 0.5
+        self.lock_timeout = 600
+        self._computed_signature = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الحساب بالتطبيق وبدء إعادة الحساب الدورية"""
+        self.app = app
+        self.top_k = app.config.get('RELATED_TOP_K', 10)
+        self.tag_weight = app.config.get('RELATED_TAG_WEIGHT', 0.5)
+        self.text_weight = app.config.get('RELATED_TEXT_WEIGHT', 0.5)
+        self.flush_interval = app.config.get('RELATED_REFRESH_INTERVAL', 3600)
+        self.lock_timeout = app.config.get('RELATED_LOCK_TIMEOUT', 600)
+        app.extensions['news_related'] = self
+        if self.flush_interval:
+            self._start_background(app)
+            # الحساب الأول عند بدء العملية دون انتظار الفاصل
+            self._wake.set()
+
+    def compute(self):
+        """إعادة حساب الأخبار ذات الصلة لكل الأخبار المنشورة
+
+        Returns:
+            int: عدد الأخبار المحسوبة
+        """
+        # القراءة في اتصال منفصل حتى لا تُحجز قاعدة البيانات أثناء الحساب
+        with db.engine.connect() as connection:
+            signature = _signature(connection)
+            ids, documents, tag_sets = _load_documents(connection)
+
+        related = rank_related(documents, tag_sets, self.top_k, self.tag_weight, self.text_weight)
+        rows = [
+            {'news_item_id': ids[i], 'rank': rank, 'related_item_id': ids[j], 'score': score}
+            for i, rank, j, score in related
+        ]
+
+        with db.engine.begin() as connection:
+            connection.execute(NewsRelated.__table__.delete())
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                connection.execute(NewsRelated.__table__.insert(), rows[start:start + INSERT_BATCH_SIZE])
+        self._computed_signature = signature
+        self._share_signature(signature)
+
+        response_cache = current_app.extensions.get('response_cache')
+        if response_cache is not None:
+            response_cache.invalidate('related')
+        logger.info(f"تم حساب {len(rows)} خبر ذي صلة لـ {len(ids)} خبر")
+        return len(ids)
+
+    def flush(self):
+        """إعادة الحساب إذا تغيرت الأخبار منذ آخر حساب في أي عامل"""
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                signature = _signature(connection)
+            if signature in (self._computed_signature, self._shared_signature()):
+                return
+            if not self._acquire():
+                # عامل آخر يحسبها الآن
+                return
+            try:
+                # ربما أنهاها عامل آخر بين قراءة البصمة وحجز القفل
+                if signature != self._shared_signature():
+                    self.compute()
+            finally:
+                self._release()
+
+    def _shared_signature(self):
+        """بصمة آخر حساب في أي عامل، أو None"""
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(SIGNATURE_KEY)
+        except Exception as e:
+            logger.error(f"خطأ في قراءة بصمة الأخبار ذات الصلة: {str(e)}")
+            return None
+
+    def _share_signature(self, signature):
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(SIGNATURE_KEY, signature, timeout=0)
+        except Exception as e:
+            logger.error(f"خطأ في حفظ بصمة الأخبار ذات الصلة: {str(e)}")
+
+    def _acquire(self):
+        """حجز الحساب لعامل واحد عبر جميع العمليات"""
+        if self.cache is None:
+            return True
+        try:
+            return bool(self.cache.add(LOCK_KEY, 1, timeout=self.lock_timeout))
+        except Exception as e:
+            logger.error(f"خطأ في حجز قفل الأخبار ذات الصلة: {str(e)}")
+            return True
+
+    def _release(self):
+        if self.cache is None:
+            return
+        try:
+            self.cache.delete(LOCK_KEY)
+        except Exception as e:
+            logger.error(f"خطأ في تحرير قفل الأخبار ذات الصلة: {str(e)}")
+
+    def shutdown(self):
+        """إيقاف خيط إعادة الحساب دون حساب أخير عند الخروج"""
+        self._stop.set()
+        self._wake.set()
+
+
+@event.listens_for(NewsItem, 'before_delete')
+def _remove_related(mapper, connection, target):
+    """حذف صفوف الخبر المحذوف من الأخبار ذات الصلة قبل حذفه"""
+    table = NewsRelated.__table__
+    connection.execute(
+        table.delete().where(or_(table.c.news_item_id == target.id, table.c.related_item_id == target.id))
+    )
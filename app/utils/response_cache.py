@@ -0,0 +1,350 @@
+"""
+تخزين استجابات الأخبار مؤقتاً مع إبطال دقيق بالوسوم - مشروع نائبك
+
+كل مدخل في الذاكرة المؤقتة مرتبط بوسوم (تصنيف، علامة، خبر، ...) ويحفظ
+نسخة كل وسم لحظة إنشائه. عند نشر خبر أو تعديله تتغير نسخ وسومه فقط،
+فتُعتبر المدخلات المرتبطة بها منتهية دون انتظار انتهاء مهلتها، وتبقى
+بقية المدخلات صالحة.
+
+لتجنب تزاحم العمال على قاعدة البيانات عند انتهاء مدخل شائع، يبقى المدخل
+محفوظاً مدة إضافية بعد انتهاء صلاحيته: يعيد حسابه عامل واحد يحمل قفلاً
+قصيراً في الذاكرة المؤقتة بينما يُقدَّم للبقية آخر قيمة محفوظة، وتُدمج
+الطلبات المتزامنة لمفتاح غير موجود داخل العملية في حساب واحد.
+"""
+from app.models import NewsCategory, NewsComment, NewsItem, NewsTag
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+import hashlib
+import json
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_TAGS_KEY = 'response_cache_tags'
+
+# فاصل انتظار قيمة يحسبها عامل آخر يحمل القفل
+LOCK_POLL_INTERVAL = 0.05
+
+# وسم مشترك لكل القوائم وصفحات الأخبار لأنها تتضمن بيانات التصنيف والعلامات؛
+# يتغير عند تعديل أي تصنيف أو علامة
+TAXONOMY_TAG = 'taxonomy'
+
+
+def listing_tags(category=None, tag=None, featured=None, breaking=None):
+    """وسوم قائمة الأخبار حسب مرشحاتها
+
+    القائمة المرشحة تعتمد على وسوم مرشحاتها فقط، وغير المرشحة على وسم all،
+    وكلها على وسم التصنيفات والعلامات.
+    """
+    tags = []
+    if category:
+        tags.append(f'category:{category}')
+    if tag:
+        tags.append(f'tag:{tag}')
+    if featured is not None:
+        tags.append(f'featured:{featured}')
+    if breaking is not None:
+        tags.append(f'breaking:{breaking}')
+    return (tags or ['all']) + [TAXONOMY_TAG]
+
+
+def item_tags(slug):
+    """وسوم صفحة خبر واحد"""
+    return [f'item:{slug}', TAXONOMY_TAG]
+
+
+def comment_tags(slug):
+    """وسوم تعليقات خبر واحد"""
+    return [f'comments:{slug}']
+
+
+def _history_values(state, key):
+    """القيمة الحالية والقيم السابقة لخاصية في نفس عملية الحفظ"""
+    history = state.attrs[key].history
+    return list(history.added) + list(history.unchanged) + list(history.deleted)
+
+
+def news_item_invalidation_tags(news_item, session):
+    """جميع الوسوم التي قد يؤثر فيها تغيير خبر، قبل التعديل وبعده"""
+    state = inspect(news_item)
+    # قراءة أي عمود تحمّل الأعمدة المنتهية كلها فتظهر قيمها في سجل التغييرات
+    news_item.is_published
+    if not any(_history_values(state, 'is_published')):
+        # الخبر لم يكن منشوراً ولم يصبح منشوراً
+        return set()
+
+    # تحميل العلاقات حتى يتضمن سجل التغييرات قيمها الحالية
+    categories = [news_item.category] + _history_values(state, 'category')
+    categories += [
+        session.get(NewsCategory, category_id)
+        for category_id in _history_values(state, 'category_id') if category_id
+    ]
+    tags_list = list(news_item.tags) + _history_values(state, 'tags')
+
+    tags = {'all'}
+    if len(set(_history_values(state, 'is_published'))) > 1 or len(set(_history_values(state, 'category_id'))) > 1 \
+            or news_item in session.new or news_item in session.deleted:
+        # عدد الأخبار المنشورة في التصنيفات قد تغير
+        tags.add('categories')
+    tags.update(f'item:{slug}' for slug in _history_values(state, 'slug') if slug)
+    tags.update(f'featured:{bool(value)}' for value in _history_values(state, 'is_featured'))
+    tags.update(f'breaking:{bool(value)}' for value in _history_values(state, 'is_breaking'))
+    tags.update(f'category:{category.name}' for category in categories if category)
+    tags.update(f'tag:{tag.name}' for tag in tags_list if tag)
+    return tags
+
+
+class _InflightCall:
+    """حساب جارٍ لمفتاح تنتظر نتيجته الطلبات المتزامنة في نفس العملية"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """ذاكرة مؤقتة للاستجابات فوق Flask-Caching مع إبطال بالوسوم
+
+    المدخل صالح خلال timeout ثانية، ثم يبقى قديماً (stale) مدة
+    stale_timeout يُقدَّم خلالها بينما يعيد عامل واحد حسابه.
+    """
+
+    def __init__(self, cache, app=None):
+        self.cache = cache
+        self.timeout = 300
+        self.stale_timeout = 600
+        self.lock_timeout = 10
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الذاكرة المؤقتة بالتطبيق لتُبطل مدخلاتها عند حفظ تعديلات الأخبار"""
+        self.timeout = app.config.get('NEWS_CACHE_TIMEOUT', 300)
+        self.stale_timeout = app.config.get('NEWS_CACHE_STALE_TIMEOUT', 600)
+        self.lock_timeout = app.config.get('NEWS_CACHE_LOCK_TIMEOUT', 10)
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def make_key(prefix, **params):
+        """مفتاح ثابت من بادئة ومعاملات الطلب"""
+        raw = json.dumps(params, sort_keys=True, default=str)
+        return f'{prefix}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+    def _tag_key(self, tag):
+        return f'cache_tag:{tag}'
+
+    def _lock_key(self, key):
+        return f'cache_lock:{key}'
+
+    def _current_versions(self, tags, stored):
+        """نسخ الوسوم الحالية، مع إنشاء نسخة جديدة لأي وسم مفقود"""
+        versions = dict(zip(tags, stored))
+        missing = {self._tag_key(tag): uuid.uuid4().hex for tag, version in versions.items() if version is None}
+        if missing:
+            self.cache.set_many(missing, timeout=0)
+            for tag in tags:
+                versions[tag] = versions[tag] or missing[self._tag_key(tag)]
+        return versions
+
+    def _lookup(self, key, tags):
+        """قراءة مدخل مع حالته
+
+        Returns:
+            tuple: (المدخل أو None، هل هو صالح)؛ المدخل القديم هو الذي انتهت
+            صلاحيته أو تغير أحد وسومه منذ إنشائه.
+        """
+        try:
+            entry, *stored = self.cache.get_many(key, *[self._tag_key(tag) for tag in tags])
+        except Exception as e:
+            logger.error(f"خطأ في قراءة الذاكرة المؤقتة: {str(e)}")
+            return None, False
+        if entry is None:
+            return None, False
+        fresh = (
+            None not in stored
+            and entry.get('versions') == dict(zip(tags, stored))
+            and entry.get('fresh_until', 0) > time.time()
+        )
+        return entry, fresh
+
+    def get(self, key, tags):
+        """قراءة مدخل إذا كان صالحاً ولم يتغير أي من وسومه منذ إنشائه"""
+        entry, fresh = self._lookup(key, tags)
+        return entry['value'] if fresh else None
+
+    def _snapshot(self, tags):
+        """نسخ الوسوم الحالية قبل حساب القيمة، أو None إذا تعذرت قراءتها"""
+        try:
+            return self._current_versions(tags, self.cache.get_many(*[self._tag_key(tag) for tag in tags]))
+        except Exception as e:
+            logger.error(f"خطأ في قراءة الذاكرة المؤقتة: {str(e)}")
+            return None
+
+    def set(self, key, value, tags, timeout=None, versions=None):
+        """حفظ مدخل مع نسخ وسومه
+
+        versions نسخ الوسوم المقروءة قبل حساب القيمة؛ فإذا أُبطل وسم أثناء
+        الحساب بقي المدخل مرتبطاً بالنسخة القديمة ويُعد قديماً عند قراءته.
+        بدونها تُستخدم النسخ الحالية. يُحفظ المدخل مدة timeout + stale_timeout
+        ليبقى متاحاً كقيمة قديمة.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            if versions is None:
+                stored = self.cache.get_many(*[self._tag_key(tag) for tag in tags])
+                versions = self._current_versions(tags, stored)
+            entry = {'value': value, 'versions': versions, 'fresh_until': time.time() + timeout}
+            self.cache.set(key, entry, timeout=timeout + self.stale_timeout)
+        except Exception as e:
+            logger.error(f"خطأ في الكتابة إلى الذاكرة المؤقتة: {str(e)}")
+
+    def _acquire(self, key):
+        """حجز إعادة حساب المفتاح لعامل واحد عبر جميع العمليات"""
+        try:
+            return bool(self.cache.add(self._lock_key(key), 1, timeout=self.lock_timeout))
+        except Exception as e:
+            logger.error(f"خطأ في حجز قفل الذاكرة المؤقتة: {str(e)}")
+            return True
+
+    def _release(self, key):
+        try:
+            self.cache.delete(self._lock_key(key))
+        except Exception as e:
+            logger.error(f"خطأ في تحرير قفل الذاكرة المؤقتة: {str(e)}")
+
+    def _build(self, key, tags, builder, timeout):
+        versions = self._snapshot(tags)
+        value = builder()
+        if versions is not None:
+            self.set(key, value, tags, timeout, versions)
+        return value
+
+    def _build_locked(self, key, tags, builder, timeout):
+        """حساب مدخل مفقود بعد حجز القفل، أو انتظار العامل الذي يحمله"""
+        if self._acquire(key):
+            try:
+                return self._build(key, tags, builder, timeout)
+            finally:
+                self._release(key)
+
+        # عامل في عملية أخرى يحسب القيمة؛ ننتظرها حتى انتهاء مهلة قفله
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry, fresh = self._lookup(key, tags)
+            if fresh:
+                return entry['value']
+        return self._build(key, tags, builder, timeout)
+
+    def _build_coalesced(self, key, tags, builder, timeout):
+        """دمج الطلبات المتزامنة لنفس المفتاح داخل العملية في حساب واحد"""
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+
+        if not leader:
+            if not call.done.wait(self.lock_timeout):
+                return self._build(key, tags, builder, timeout)
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._build_locked(key, tags, builder, timeout)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def get_or_set(self, key, tags, builder, timeout=None):
+        """قراءة مدخل أو حسابه بالدالة builder وحفظه
+
+        المدخل القديم يُقدَّم كما هو ما لم يتمكن هذا الطلب من حجز قفل
+        إعادة حسابه، والمدخل المفقود يُحسب مرة واحدة للطلبات المتزامنة.
+        """
+        entry, fresh = self._lookup(key, tags)
+        if fresh:
+            return entry['value']
+
+        if entry is not None:
+            if not self._acquire(key):
+                return entry['value']
+            try:
+                return self._build(key, tags, builder, timeout)
+            except Exception as e:
+                logger.error(f"خطأ في إعادة حساب مدخل قديم، تُقدَّم القيمة القديمة: {str(e)}")
+                return entry['value']
+            finally:
+                self._release(key)
+
+        return self._build_coalesced(key, tags, builder, timeout)
+
+    def invalidate(self, *tags):
+        """إبطال كل المدخلات المرتبطة بالوسوم المعطاة"""
+        if not tags:
+            return
+        try:
+            self.cache.set_many({self._tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=0)
+        except Exception as e:
+            logger.error(f"خطأ في إبطال الذاكرة المؤقتة: {str(e)}")
+
+
+def _app_response_cache():
+    """ذاكرة الاستجابات المرتبطة بالتطبيق الحالي إن وجدت"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('response_cache')
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_tags(session, flush_context, instances):
+    """جمع وسوم الأخبار المعدلة قبل الحفظ، بينما القيم السابقة متاحة"""
+    if _app_response_cache() is None:
+        return
+    tags = session.info.setdefault(SESSION_TAGS_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, NewsItem):
+            tags.update(news_item_invalidation_tags(obj, session))
+        elif isinstance(obj, NewsCategory):
+            tags.update(('categories', TAXONOMY_TAG))
+        elif isinstance(obj, NewsTag):
+            tags.update(('tags', TAXONOMY_TAG))
+        elif isinstance(obj, NewsComment):
+            # التعليق الجديد لا يحمّل علاقته قبل الحفظ
+            news_item = obj.news_item or (session.get(NewsItem, obj.news_item_id) if obj.news_item_id else None)
+            if news_item is not None:
+                tags.update(comment_tags(news_item.slug))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_collected(session):
+    """إبطال الوسوم المجمعة بعد نجاح الحفظ فقط"""
+    tags = session.info.pop(SESSION_TAGS_KEY, None)
+    response_cache = _app_response_cache()
+    if tags and response_cache is not None:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_collected(session, previous_transaction):
+    session.info.pop(SESSION_TAGS_KEY, None)
+
+
+@event.listens_for(NewsItem.slug, 'set', active_history=True)
+@event.listens_for(NewsItem.is_featured, 'set', active_history=True)
+@event.listens_for(NewsItem.is_breaking, 'set', active_history=True)
+def _track_cached_attributes(target, value, oldvalue, initiator):
+    """تحميل القيمة السابقة عند التعديل لإبطال وسومها أيضاً"""
@@ -0,0 +1,290 @@
+"""
+تنظيف البيانات القديمة حسب سياسة الاحتفاظ - مشروع نائبك
+
+- صفوف news_stats اليومية الأقدم من OLD_STATS_CLEANUP_DAYS يوماً تُدمج في صف
+  شهري لكل خبر في news_stats_monthly ثم تُحذف، أو تُحذف فقط إذا عُطل الدمج.
+- التعليقات المحذوفة أو المزعجة الأقدم من OLD_COMMENTS_CLEANUP_DAYS يوماً تُحذف،
+  بدءاً من الردود حتى لا ينقطع تسلسل تعليق ما زال له ردود.
+
+يجري العمل على أجزاء صغيرة: تُقرأ صفوف الجزء وتُحسب مجاميعه قبل أي كتابة، ثم
+تُنفذ الكتابات في معاملة قصيرة، فلا يُحجز قفل الكتابة في SQLite إلا لأجزاء من
+الثانية، ويُترك فاصل بين الأجزاء لطلبات الكتابة الأخرى. وضع التجربة (dry run)
+يحصي ما سيُنظف دون أي تعديل.
+"""
+from app.models import db, NewsComment, NewsStats, NewsStatsMonthly
+from app.utils.flusher import PeriodicFlusher
+from app.utils.stats_rollup import HyperLogLog
+from sqlalchemy import or_, tuple_
+from sqlalchemy.orm import aliased
+from datetime import datetime, timedelta
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# العدادات التي تُجمع كما هي
+SUMMED_COUNTERS = ('views', 'likes', 'shares', 'comments', 'direct_visits', 'social_visits',
+                   'search_visits', 'referral_visits')
+
+# المعدلات التي يؤخذ متوسطها موزوناً بالمشاهدات
+AVERAGED_RATES = ('avg_read_time', 'bounce_rate', 'engagement_rate')
+
+
+class _MonthBucket:
+    """مجاميع شهر واحد لخبر واحد من صفوف يومية"""
+
+    def __init__(self):
+        self.days = 0
+        self.counters = dict.fromkeys(SUMMED_COUNTERS, 0)
+        self.weighted = dict.fromkeys(AVERAGED_RATES, 0.0)
+        self.weight = 0
+        self.sketch = None
+        self.unsketched_unique_views = 0
+
+    def add(self, days, values, unique_views, sketch_bytes):
+        """إضافة صف يومي أو شهري سابق إلى المجاميع"""
+        self.days += days
+        for name in SUMMED_COUNTERS:
+            self.counters[name] += values[name] or 0
+        weight = max(values['views'] or 0, 1)
+        for name in AVERAGED_RATES:
+            self.weighted[name] += (values[name] or 0.0) * weight
+        self.weight += weight
+        if sketch_bytes:
+            if self.sketch is None:
+                self.sketch = HyperLogLog()
+            self.sketch.merge(HyperLogLog.from_bytes(sketch_bytes))
+        else:
+            # صفوف قديمة بلا سجلات المقدّر: يُضاف عددها كما هو
+            self.unsketched_unique_views += unique_views or 0
+
+    def apply(self, monthly):
+        """كتابة المجاميع في الصف الشهري"""
+        monthly.days = self.days
+        for name in SUMMED_COUNTERS:
+            setattr(monthly, name, self.counters[name])
+        for name in AVERAGED_RATES:
+            setattr(monthly, name, self.weighted[name] / self.weight if self.weight else 0.0)
+        sketched = self.sketch.count() if self.sketch is not None else 0
+        monthly.unique_views_sketch = self.sketch.to_bytes() if self.sketch is not None else None
+        monthly.unique_views = min(sketched + self.unsketched_unique_views, self.counters['views'])
+
+
+def _row_values(row):
+    return {name: getattr(row, name) for name in SUMMED_COUNTERS + AVERAGED_RATES}
+
+
+class RetentionCleanup(PeriodicFlusher):
+    """تنظيف دوري للإحصائيات اليومية والتعليقات القديمة على أجزاء صغيرة
+
+    يعمل خيط الخلفية كل CLEANUP_INTERVAL ثانية إذا كان AUTO_CLEANUP_ENABLED
+    مفعلاً، ويمكن تشغيله يدوياً بالأمر flask cleanup-data.
+    """
+
+    thread_name = 'retention-cleanup'
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.enabled = True
+        self.stats_days = 365
+        self.comments_days = 180
+        self.downsample = True
+        self.chunk_size = 500
+        self.chunk_pause = 0.05
+        self.last_report = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط التنظيف بالتطبيق وبدء التشغيل الدوري إن كان مفعلاً"""
+        self.app = app
+        self.enabled = app.config.get('AUTO_CLEANUP_ENABLED', True)
+        # STATS_RETENTION_DAYS هو الاسم الأقدم للإعداد نفسه
+        self.stats_days = app.config.get('OLD_STATS_CLEANUP_DAYS', app.config.get('STATS_RETENTION_DAYS', 365))
+        self.comments_days = app.config.get('OLD_COMMENTS_CLEANUP_DAYS', 180)
+        self.downsample = app.config.get('STATS_DOWNSAMPLE_MONTHLY', True)
+        self.chunk_size = app.config.get('CLEANUP_CHUNK_SIZE', 500)
+        self.chunk_pause = app.config.get('CLEANUP_CHUNK_PAUSE', 0.05)
+        self.flush_interval = app.config.get('CLEANUP_INTERVAL', 86400)
+        app.extensions['retention_cleanup'] = self
+        if self.enabled and self.flush_interval:
+            self._start_background(app)
+
+    # الإحصائيات
+
+    def _stats_cutoff(self, now):
+        return (now - timedelta(days=self.stats_days)).date()
+
+    def _stats_chunk(self, cutoff, report):
+        """دمج جزء من الإحصائيات اليومية القديمة في صفوفها الشهرية وحذفه
+
+        Returns:
+            int: عدد الصفوف اليومية المعالجة
+        """
+        rows = NewsStats.query.filter(NewsStats.date < cutoff) \
+            .order_by(NewsStats.id).limit(self.chunk_size).all()
+        if not rows:
+            return 0
+        ids = [row.id for row in rows]
+
+        if self.downsample:
+            buckets = {}
+            for row in rows:
+                key = (row.news_item_id, row.date.replace(day=1))
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = _MonthBucket()
+                bucket.add(1, _row_values(row), row.unique_views, row.unique_views_sketch)
+
+            existing = {
+                (monthly.news_item_id, monthly.month): monthly
+                for monthly in NewsStatsMonthly.query.filter(
+                    tuple_(NewsStatsMonthly.news_item_id, NewsStatsMonthly.month).in_(list(buckets))
+                )
+            }
+            for (news_item_id, month), bucket in buckets.items():
+                monthly = existing.get((news_item_id, month))
+                if monthly is None:
+                    monthly = NewsStatsMonthly(news_item_id=news_item_id, month=month)
+                    db.session.add(monthly)
+                    report['monthly_rows_created'] += 1
+                else:
+                    bucket.add(monthly.days or 0, _row_values(monthly), monthly.unique_views,
+                               monthly.unique_views_sketch)
+                bucket.apply(monthly)
+
+        # كل ما سبق قراءة وحساب؛ الكتابة تبدأ هنا وتنتهي مع commit
+        self._commit_chunk(
+            lambda: NewsStats.query.filter(NewsStats.id.in_(ids)).delete(synchronize_session=False),
+            report
+        )
+        report['stats_rows_removed'] += len(ids)
+        return len(ids)
+
+    # التعليقات
+
+    def _purgeable_comments(self, now):
+        """التعليقات المحذوفة أو المزعجة القديمة التي ليس لها ردود"""
+        reply = aliased(NewsComment)
+        return NewsComment.query.filter(
+            or_(NewsComment.is_deleted.is_(True), NewsComment.is_spam.is_(True)),
+            NewsComment.created_at < now - timedelta(days=self.comments_days),
+            ~db.session.query(reply.id).filter(reply.parent_id == NewsComment.id).exists()
+        )
+
+    def _comments_chunk(self, now, report):
+        """حذف جزء من التعليقات القابلة للحذف
+
+        Returns:
+            int: عدد التعليقات المحذوفة
+        """
+        ids = [row.id for row in self._purgeable_comments(now).with_entities(NewsComment.id)
+               .order_by(NewsComment.id).limit(self.chunk_size)]
+        if not ids:
+            return 0
+        self._commit_chunk(
+            lambda: NewsComment.query.filter(NewsComment.id.in_(ids)).delete(synchronize_session=False),
+            report
+        )
+        report['comments_removed'] += len(ids)
+        return len(ids)
+
+    # التشغيل
+
+    def _commit_chunk(self, write, report):
+        """تنفيذ كتابات الجزء في معاملة قصيرة مع قياس مدتها"""
+        started = time.perf_counter()
+        try:
+            write()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        elapsed = (time.perf_counter() - started) * 1000
+        report['chunks'] += 1
+        report['max_chunk_ms'] = max(report['max_chunk_ms'], round(elapsed, 2))
+
+    def _drain(self, step):
+        """تكرار جزء من العمل حتى ينتهي، مع فاصل بين الأجزاء"""
+        while not self._stop.is_set():
+            # حتى جزء فارغ: حذف الردود قد يجعل تعليقاتها الأصلية قابلة للحذف
+            if not step():
+                return
+            if self.chunk_pause:
+                time.sleep(self.chunk_pause)
+
+    def preview(self, now=None):
+        """إحصاء ما سيحذفه التنظيف دون أي تعديل
+
+        عدد التعليقات يشمل ما يمكن حذفه الآن؛ الردود المحذوفة أولاً قد تجعل
+        تعليقات أخرى قابلة للحذف في التشغيل نفسه.
+        """
+        now = now or datetime.utcnow()
+        cutoff = self._stats_cutoff(now)
+        old_stats = NewsStats.query.filter(NewsStats.date < cutoff)
+        months = set()
+        if self.downsample:
+            for news_item_id, date in old_stats.with_entities(NewsStats.news_item_id, NewsStats.date):
+                months.add((news_item_id, date.replace(day=1)))
+        existing = 0
+        if months:
+            existing = NewsStatsMonthly.query.filter(
+                tuple_(NewsStatsMonthly.news_item_id, NewsStatsMonthly.month).in_(list(months))
+            ).count()
+        return {
+            'stats_rows_removed': old_stats.count(),
+            'monthly_rows_created': len(months) - existing,
+            'comments_removed': self._purgeable_comments(now).count(),
+        }
+
+    def run(self, now=None, dry_run=False):
+        """تنظيف الإحصائيات والتعليقات القديمة
+
+        Args:
+            now (datetime): وقت المرجع لحساب الأعمار، والافتراضي الآن.
+            dry_run (bool): الإحصاء فقط دون تعديل.
+
+        Returns:
+            dict: أعداد الصفوف المحذوفة والمنشأة، وعدد الأجزاء وأطول معاملة بالمللي ثانية،
+            والزمن الكلي بالثواني
+        """
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        report = {
+            'dry_run': dry_run,
+            'stats_rows_removed': 0,
+            'monthly_rows_created': 0,
+            'comments_removed': 0,
+            'chunks': 0,
+            'max_chunk_ms': 0.0,
+        }
+
+        if dry_run:
+            report.update(self.preview(now))
+        else:
+            if self.stats_days:
+                cutoff = self._stats_cutoff(now)
+                self._drain(lambda: self._stats_chunk(cutoff, report))
+            if self.comments_days:
+                self._drain(lambda: self._comments_chunk(now, report))
+
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        if not dry_run:
+            self.last_report = report
+        if report['stats_rows_removed'] or report['comments_removed']:
+            action = 'سيُنظف' if dry_run else 'تم تنظيف'
+            logger.info(
+                f"{action} {report['stats_rows_removed']} صف إحصائيات و{report['comments_removed']} تعليق "
+                f"({report['chunks']} جزء، أطولها {report['max_chunk_ms']} مللي ثانية، {report['seconds']} ثانية)"
+            )
+        return report
+
+    def flush(self):
+        """تشغيل التنظيف الدوري"""
+        with self.app.app_context():
+            self.run()
+
+    def shutdown(self):
+        """إيقاف خيط التنظيف دون تشغيل أخير عند الخروج"""
+        self._stop.set()
+        self._wake.set()
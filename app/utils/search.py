@@ -0,0 +1,316 @@
+"""
+البحث في الأخبار بفهرس مقلوب مع دعم اللغة العربية - مشروع نائبك
+
+النصوص تُطبَّع قبل الفهرسة والبحث: حذف التشكيل والتطويل، توحيد أشكال
+الألف والياء والتاء المربوطة، ثم تجذيع خفيف بحذف السوابق واللواحق الشائعة.
+يُرتب الناتج بخوارزمية BM25 مع وزن أكبر للعنوان ثم الملخص.
+
+يُستخدم جدول SQLite FTS5 عند توفره، وإلا فجدولا news_search_terms و
+news_search_documents مع حساب BM25 في بايثون. في الحالتين يُحدَّث الفهرس
+داخل نفس عملية الحفظ عند نشر خبر أو تعديل نصوصه أو إلغاء نشره.
+"""
+from app.models import db, NewsItem, NewsSearchTerm, NewsSearchDocument
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select, text
+from collections import Counter
+from weakref import WeakKeyDictionary
+import math
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# الحقول المفهرسة وأوزانها في الترتيب
+FIELD_WEIGHTS = {
+    'title': 3,
+    'summary': 2,
+    'content': 1,
+    'title_en': 3,
+    'summary_en': 2,
+    'content_en': 1,
+}
+
+FTS_TABLE = 'news_search_fts'
+
+# معاملات BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_TOKEN = re.compile(r'\w+')
+
+# الأزواج تُستبدل بـ str.replace لأنه أسرع بكثير من str.translate للنصوص العربية
+_FOLDING = (
+    ('أ', 'ا'), ('إ', 'ا'), ('آ', 'ا'), ('ٱ', 'ا'),
+    ('ى', 'ي'), ('ئ', 'ي'), ('ؤ', 'و'), ('ة', 'ه'),
+    ('٠', '0'), ('١', '1'), ('٢', '2'), ('٣', '3'), ('٤', '4'),
+    ('٥', '5'), ('٦', '6'), ('٧', '7'), ('٨', '8'), ('٩', '9'),
+)
+
+_ARABIC_LETTER = re.compile('[\u0621-\u064a]')
+
+# سوابق ولواحق التجذيع الخفيف (بعد التطبيع)
+_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+
+STOP_WORDS = frozenset({
+    'في', 'من', 'علي', 'الي', 'عن', 'مع', 'هذا', 'هذه', 'ذلك', 'تلك', 'التي', 'الذي',
+    'الذين', 'ان', 'او', 'ثم', 'كان', 'كانت', 'قد', 'لا', 'ما', 'لم', 'لن', 'هو', 'هي',
+    'بين', 'بعد', 'قبل', 'عند', 'كل', 'و', 'ب', 'ل',
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'to', 'was', 'with',
+})
+
+
+def normalize_arabic(value):
+    """حذف التشكيل والتطويل وتوحيد الحروف المتشابهة وتحويل الأحرف اللاتينية إلى صغيرة"""
+    value = _DIACRITICS.sub('', value or '')
+    for variant, folded in _FOLDING:
+        if variant in value:
+            value = value.replace(variant, folded)
+    return value.lower()
+
+
+def light_stem(word):
+    """تجذيع خفيف لكلمة عربية مطبّعة
+
+    تُحذف واو العطف وأداة التعريف وما يسبقها، ثم لواحق الجمع والضمائر،
+    مع إبقاء حرفين على الأقل.
+    """
+    if not _ARABIC_LETTER.match(word):
+        return word
+    if len(word) > 3 and word.startswith('و'):
+        word = word[1:]
+    for prefix in _PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            word = word[len(prefix):]
+            break
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            word = word[:-len(suffix)]
+    return word
+
+
+def analyze(value):
+    """تحويل نص إلى قائمة مصطلحات البحث"""
+    terms = []
+    for token in _TOKEN.findall(normalize_arabic(value)):
+        if token in STOP_WORDS:
+            continue
+        term = light_stem(token)
+        if term and term not in STOP_WORDS:
+            terms.append(term[:100])
+    return terms
+
+
+class NewsSearch:
+    """فهرس البحث في الأخبار وترتيب نتائجه"""
+
+    def __init__(self, app=None):
+        self.backend_setting = 'auto'
+        self._backends = WeakKeyDictionary()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الفهرس بالتطبيق ليُحدَّث عند حفظ الأخبار"""
+        self.backend_setting = app.config.get('SEARCH_BACKEND', 'auto')
+        app.extensions['news_search'] = self
+
+    def backend(self, connection):
+        """fts5 أو python حسب الإعداد ودعم قاعدة البيانات، مع إنشاء جدول FTS5 عند الحاجة"""
+        engine = connection.engine
+        backend = self._backends.get(engine)
+        if backend is None:
+            backend = self.backend_setting
+            if backend == 'auto':
+                backend = 'fts5' if self._fts5_supported(connection) else 'python'
+            if backend == 'fts5':
+                columns = ', '.join(FIELD_WEIGHTS)
+                connection.execute(text(f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns})'))
+            self._backends[engine] = backend
+        return backend
+
+    @staticmethod
+    def _fts5_supported(connection):
+        if connection.dialect.name != 'sqlite':
+            return False
+        try:
+            return bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+        except Exception:
+            return False
+
+    # الفهرسة
+
+    def index_item(self, connection, news_item_id):
+        """إعادة فهرسة خبر واحد، أو حذفه من الفهرس إذا لم يعد منشوراً"""
+        table = NewsItem.__table__
+        row = connection.execute(
+            select(table.c.is_published, *[table.c[field] for field in FIELD_WEIGHTS])
+            .where(table.c.id == news_item_id)
+        ).first()
+        self.remove_item(connection, news_item_id)
+        if row is None or not row.is_published:
+            return
+
+        fields = {field: analyze(getattr(row, field)) for field in FIELD_WEIGHTS}
+        if self.backend(connection) == 'fts5':
+            values = {field: ' '.join(terms) for field, terms in fields.items()}
+            connection.execute(
+                text(f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FIELD_WEIGHTS)}) "
+                     f"VALUES (:rowid, {', '.join(':' + field for field in FIELD_WEIGHTS)})"),
+                dict(values, rowid=news_item_id)
+            )
+            return
+
+        frequencies = Counter()
+        for field, terms in fields.items():
+            for term in terms:
+                frequencies[term] += FIELD_WEIGHTS[field]
+        connection.execute(
+            NewsSearchDocument.__table__.insert(),
+            {'news_item_id': news_item_id, 'length': sum(frequencies.values())}
+        )
+        if frequencies:
+            connection.execute(
+                NewsSearchTerm.__table__.insert(),
+                [{'term': term, 'news_item_id': news_item_id, 'tf': tf} for term, tf in frequencies.items()]
+            )
+
+    def remove_item(self, connection, news_item_id):
+        """حذف خبر من الفهرس"""
+        if self.backend(connection) == 'fts5':
+            connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :rowid'), {'rowid': news_item_id})
+            return
+        connection.execute(NewsSearchTerm.__table__.delete().where(NewsSearchTerm.news_item_id == news_item_id))
+        connection.execute(NewsSearchDocument.__table__.delete().where(NewsSearchDocument.news_item_id == news_item_id))
+
+    def rebuild(self):
+        """إعادة بناء الفهرس لكل الأخبار المنشورة
+
+        Returns:
+            int: عدد الأخبار المفهرسة
+        """
+        with db.engine.begin() as connection:
+            if self.backend(connection) == 'fts5':
+                connection.execute(text(f'DELETE FROM {FTS_TABLE}'))
+            else:
+                connection.execute(NewsSearchTerm.__table__.delete())
+                connection.execute(NewsSearchDocument.__table__.delete())
+            ids = connection.execute(
+                select(NewsItem.id).where(NewsItem.is_published.is_(True))
+            ).scalars().all()
+            for news_item_id in ids:
+                self.index_item(connection, news_item_id)
+        logger.info(f"تمت فهرسة {len(ids)} خبر للبحث")
+        return len(ids)
+
+    def ensure_index(self):
+        """بناء الفهرس إذا كان فارغاً وهناك أخبار منشورة"""
+        with db.engine.connect() as connection:
+            if self.backend(connection) == 'fts5':
+                indexed = connection.execute(text(f'SELECT count(*) FROM {FTS_TABLE}')).scalar()
+            else:
+                indexed = connection.execute(select(db.func.count()).select_from(NewsSearchDocument)).scalar()
+            connection.commit()
+        if not indexed and NewsItem.query.filter_by(is_published=True).first():
+            self.rebuild()
+
+    # البحث
+
+    def search(self, query, offset=0, limit=15):
+        """البحث عن الأخبار التي تحتوي كل مصطلحات الاستعلام
+
+        Args:
+            query (str): نص البحث.
+            offset (int): عدد النتائج التي تُتخطى.
+            limit (int): عدد النتائج المطلوبة.
+
+        Returns:
+            tuple: (قائمة (معرف الخبر، الدرجة) مرتبة تنازلياً، العدد الكلي)
+        """
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms:
+            return [], 0
+        connection = db.session.connection()
+        if self.backend(connection) == 'fts5':
+            return self._search_fts5(connection, terms, offset, limit)
+        return self._search_python(connection, terms, offset, limit)
+
+    def _search_fts5(self, connection, terms, offset, limit):
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        weights = ', '.join(str(float(weight)) for weight in FIELD_WEIGHTS.values())
+        total = connection.execute(
+            text(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match'), {'match': match}
+        ).scalar()
+        rows = connection.execute(
+            text(f'SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} '
+                 f'WHERE {FTS_TABLE} MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset'),
+            {'match': match, 'limit': limit, 'offset': offset}
+        ).all()
+        # bm25() في FTS5 سالبة، والأصغر أفضل
+        return [(row.rowid, -row.rank) for row in rows], total
+
+    def _search_python(self, connection, terms, offset, limit):
+        postings = {}
+        for term, news_item_id, tf in connection.execute(
+            select(NewsSearchTerm.term, NewsSearchTerm.news_item_id, NewsSearchTerm.tf)
+            .where(NewsSearchTerm.term.in_(terms))
+        ):
+            postings.setdefault(term, {})[news_item_id] = tf
+        if len(postings) < len(terms):
+            return [], 0
+
+        candidates = set.intersection(*[set(docs) for docs in postings.values()])
+        if not candidates:
+            return [], 0
+
+        total_docs, average_length = connection.execute(
+            select(db.func.count(), db.func.avg(NewsSearchDocument.length))
+        ).one()
+        lengths = dict(connection.execute(
+            select(NewsSearchDocument.news_item_id, NewsSearchDocument.length)
+            .where(NewsSearchDocument.news_item_id.in_(candidates))
+        ).all())
+        average_length = float(average_length or 1)
+
+        scores = {}
+        for term, docs in postings.items():
+            idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for news_item_id in candidates:
+                tf = docs[news_item_id]
+                norm = 1 - BM25_B + BM25_B * lengths.get(news_item_id, 0) / average_length
+                scores[news_item_id] = scores.get(news_item_id, 0.0) + \
+                    idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[offset:offset + limit], len(ranked)
+
+
+def _app_news_search():
+    """فهرس البحث المرتبط بالتطبيق الحالي إن وجد"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('news_search')
+
+
+def _search_fields_changed(target):
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in ('is_published', *FIELD_WEIGHTS))
+
+
+@event.listens_for(NewsItem, 'after_insert')
+@event.listens_for(NewsItem, 'after_update')
+def _index_news_item(mapper, connection, target):
+    """تحديث فهرس البحث عند نشر خبر أو تعديل نصوصه"""
+    news_search = _app_news_search()
+    if news_search is not None and _search_fields_changed(target):
+        news_search.index_item(connection, target.id)
+
+
+@event.listens_for(NewsItem, 'before_delete')
+def _unindex_news_item(mapper, connection, target):
+    """حذف الخبر المحذوف من فهرس البحث"""
+    news_search = _app_news_search()
+    if news_search is not None:
+        news_search.remove_item(connection, target.id)
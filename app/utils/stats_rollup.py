@@ -0,0 +1,265 @@
+"""
+تجميع أحداث التفاعل في الإحصائيات اليومية لخدمة الأخبار - مشروع نائبك
+
+تُجمع أحداث المشاهدة والإعجاب والمشاركة في الذاكرة حسب (الخبر، اليوم)
+ثم تُكتب إلى جدول news_stats على دفعات، مع تقدير المشاهدات الفريدة
+باستخدام HyperLogLog بدلاً من تخزين معرفات الزوار.
+"""
+from app.models import db, NewsItem, NewsStats
+from app.utils.flusher import PeriodicFlusher
+from datetime import datetime
+from urllib.parse import urlparse
+from sqlalchemy import bindparam, select, tuple_
+import hashlib
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('view', 'like', 'share')
+
+SOCIAL_DOMAINS = (
+    'facebook.com', 'fb.com', 'twitter.com', 'x.com', 't.co', 'instagram.com',
+    'linkedin.com', 'whatsapp.com', 'telegram.org', 't.me', 'youtube.com', 'tiktok.com'
+)
+SEARCH_DOMAINS = ('google.', 'bing.com', 'yahoo.', 'duckduckgo.com', 'yandex.', 'baidu.com')
+
+
+def classify_referrer(referrer, own_host=None):
+    """تصنيف مصدر الزيارة: direct أو social أو search أو referral"""
+    if not referrer:
+        return 'direct'
+    host = (urlparse(referrer).hostname or '').lower()
+    if not host or host == own_host:
+        return 'direct'
+    if any(host == domain or host.endswith('.' + domain) for domain in SOCIAL_DOMAINS):
+        return 'social'
+    if any(domain in host for domain in SEARCH_DOMAINS):
+        return 'search'
+    return 'referral'
+
+
+class HyperLogLog:
+    """مقدّر HyperLogLog لعدد العناصر الفريدة في مساحة ثابتة (2^precision بايت)"""
+
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+        self._rank_bits = 64 - precision
+
+    @classmethod
+    def from_bytes(cls, data, precision=10):
+        """استرجاع المقدّر من سجلاته المخزنة"""
+        if data and len(data) == 1 << precision:
+            return cls(precision, data)
+        return cls(precision)
+
+    def to_bytes(self):
+        """سجلات المقدّر للتخزين"""
+        return bytes(self.registers)
+
+    def add(self, value):
+        """إضافة عنصر إلى المقدّر"""
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> self._rank_bits
+        remainder = hashed & ((1 << self._rank_bits) - 1)
+        rank = self._rank_bits - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """دمج مقدّر آخر بنفس الدقة"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """تقدير عدد العناصر الفريدة"""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # تصحيح المدى الصغير (Linear Counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+
+class _StatsBucket:
+    """مجاميع يوم واحد لخبر واحد قبل كتابتها"""
+
+    __slots__ = ('views', 'likes', 'shares', 'direct_visits', 'social_visits',
+                 'search_visits', 'referral_visits', 'visitors')
+
+    COUNTERS = ('views', 'likes', 'shares', 'direct_visits', 'social_visits',
+                'search_visits', 'referral_visits')
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.visitors = None
+
+    def merge(self, other):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        if other.visitors is not None:
+            if self.visitors is None:
+                self.visitors = HyperLogLog()
+            self.visitors.merge(other.visitors)
+
+
+class EngagementAggregator(PeriodicFlusher):
+    """مجمّع أحداث التفاعل مع كتابة دورية إلى جدول news_stats
+
+    كل دفعة تقرأ صفوف الأيام الموجودة باستعلام واحد ثم تضيف القيم الجديدة
+    إليها بتعبيرات SQL (views = views + :delta) وتنشئ الصفوف الناقصة.
+    """
+
+    thread_name = 'stats-rollup-flusher'
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.batch_size = 500
+        self.own_host = None
+        self._buckets = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط المجمّع بتطبيق Flask وبدء الكتابة الدورية"""
+        self.app = app
+        self.flush_interval = app.config.get('STATS_FLUSH_INTERVAL', 60)
+        self.flush_threshold = app.config.get('STATS_FLUSH_THRESHOLD', 1000)
+        self.batch_size = app.config.get('STATS_FLUSH_BATCH_SIZE', 500)
+        self.own_host = app.config.get('SERVER_NAME')
+        app.extensions['engagement_aggregator'] = self
+        self._start_background(app)
+
+    def record(self, news_item_id, event_type, visitor_id=None, referrer=None, when=None):
+        """تسجيل حدث تفاعل (view أو like أو share) في الذاكرة"""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f'Unknown event type: {event_type}')
+
+        key = (news_item_id, (when or datetime.utcnow()).date())
+        with self._flush_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _StatsBucket()
+
+            if event_type == 'view':
+                bucket.views += 1
+                source = classify_referrer(referrer, self.own_host)
+                setattr(bucket, f'{source}_visits', getattr(bucket, f'{source}_visits') + 1)
+                if visitor_id:
+                    if bucket.visitors is None:
+                        bucket.visitors = HyperLogLog()
+                    bucket.visitors.add(visitor_id)
+            elif event_type == 'like':
+                bucket.likes += 1
+            else:
+                bucket.shares += 1
+
+        self._notify()
+
+    def _drain(self):
+        with self._flush_lock:
+            self._events = 0
+            buckets, self._buckets = self._buckets, {}
+        return buckets
+
+    def _requeue(self, buckets):
+        with self._flush_lock:
+            for key, bucket in buckets:
+                current = self._buckets.get(key)
+                if current is None:
+                    self._buckets[key] = bucket
+                else:
+                    current.merge(bucket)
+
+    def flush(self):
+        """كتابة الأحداث المجمعة إلى news_stats على دفعات
+
+        Returns:
+            int: عدد صفوف الإحصائيات التي تم إنشاؤها أو تحديثها
+        """
+        pending = list(self._drain().items())
+        if not pending:
+            return 0
+
+        written = 0
+        with self.app.app_context():
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                try:
+                    chunk = self._drop_missing_items(chunk)
+                    if chunk:
+                        self._upsert(chunk)
+                    db.session.commit()
+                    written += len(chunk)
+                except Exception as e:
+                    logger.error(f"خطأ في حفظ إحصائيات التفاعل: {str(e)}")
+                    db.session.rollback()
+                    self._requeue(pending[start:])
+                    break
+        return written
+
+    def _drop_missing_items(self, chunk):
+        """استبعاد أحداث الأخبار المحذوفة أو المؤرشفة
+
+        صفوفها تخالف المفتاح الأجنبي فتفشل الدفعة كلها وتُعاد إلى الطابور في كل
+        مرة. إذا حُذف خبر بعد هذا الفحص فشلت الدفعة مرة واحدة واستُبعد في التالية.
+        """
+        item_ids = {news_item_id for (news_item_id, _), _ in chunk}
+        existing = set(db.session.scalars(select(NewsItem.id).where(NewsItem.id.in_(item_ids))))
+        if len(existing) == len(item_ids):
+            return chunk
+        logger.warning(f"تجاهل إحصائيات {len(item_ids - existing)} خبر لم يعد موجوداً")
+        return [(key, bucket) for key, bucket in chunk if key[0] in existing]
+
+    def _upsert(self, chunk):
+        """إضافة دفعة من المجاميع إلى صفوفها اليومية"""
+        # تُقفل الصفوف حتى نهاية المعاملة: دمج سجلات HyperLogLog قراءة ثم كتابة، فبدون
+        # القفل تكتب عملية أخرى فوق السجلات التي دمجتها هذه العملية. الترتيب الثابت
+        # يمنع الجمود بين عمليتين تقفلان الصفوف نفسها
+        existing = {
+            (stats.news_item_id, stats.date): stats
+            for stats in NewsStats.query.filter(
+                tuple_(NewsStats.news_item_id, NewsStats.date).in_([key for key, _ in chunk])
+            ).order_by(NewsStats.news_item_id, NewsStats.date).with_for_update()
+        }
+
+        item_deltas = []
+        for (news_item_id, date), bucket in chunk:
+            stats = existing.get((news_item_id, date))
+            if stats is None:
+                stats = NewsStats(news_item_id=news_item_id, date=date)
+                for name in _StatsBucket.COUNTERS:
+                    setattr(stats, name, getattr(bucket, name))
+                db.session.add(stats)
+            else:
+                for name in _StatsBucket.COUNTERS:
+                    delta = getattr(bucket, name)
+                    if delta:
+                        setattr(stats, name, getattr(NewsStats, name) + delta)
+
+            if bucket.visitors is not None:
+                sketch = HyperLogLog.from_bytes(stats.unique_views_sketch)
+                sketch.merge(bucket.visitors)
+                stats.unique_views_sketch = sketch.to_bytes()
+                stats.unique_views = sketch.count()
+
+            if bucket.likes or bucket.shares:
+                item_deltas.append({'item_id': news_item_id, 'likes': bucket.likes, 'shares': bucket.shares})
+
+        if item_deltas:
+            # إجماليات الإعجاب والمشاركة على الخبر نفسه
+            table = NewsItem.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('item_id'))
+                .values(
+                    like_count=db.func.coalesce(table.c.like_count, 0) + bindparam('likes'),
+                    share_count=db.func.coalesce(table.c.share_count, 0) + bindparam('shares'),
+                    updated_at=table.c.updated_at
+                ),
+                item_deltas
+            )
@@ -0,0 +1,464 @@
+"""
+اقتراحات البحث أثناء الكتابة من عناوين الأخبار والعلامات - مشروع نائبك
+
+كل عامل يحتفظ في الذاكرة بمصفوفة مرتبة لبدايات الكلمات في النصوص المطبّعة
+(مصفوفة لاحقات مختصرة)، فيكون الاقتراح بحثاً ثنائياً (bisect) ثم قراءة
+النتائج المتتالية دون أي استعلام لقاعدة البيانات. تُبنى المصفوفة في خيط
+خلفي عند أول طلب، وتُحدَّث فوراً بعد حفظ تعديلات العامل نفسه، وبشكل دوري
+في الخيط نفسه من قاعدة البيانات لالتقاط تعديلات العمال الآخرين وحذفهم.
+"""
+from app.models import db, NewsItem, NewsTag
+from app.utils.search import normalize_arabic, STOP_WORDS, _TOKEN
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SESSION_CHANGES_KEY = 'suggest_changes'
+
+_DEFINITE_ARTICLE = 'ال'.encode('utf-8')
+_STOP_WORDS = frozenset(word.encode('utf-8') for word in STOP_WORDS)
+
+# كل موضع في المصفوفة = رقم النص << OFFSET_BITS | بداية الكلمة داخله
+OFFSET_BITS = 16
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+# عدد المرشحين الذين يُرتبون لكل نتيجة مطلوبة
+CANDIDATE_FACTOR = 5
+
+# عدد الإضافات المعلقة قبل دمجها في المصفوفة الرئيسية
+MERGE_THRESHOLD = 2000
+
+
+def normalize_suggestion(value):
+    """تطبيع نص للاقتراحات: نفس تطبيع البحث مع مسافة واحدة بين الكلمات"""
+    return ' '.join(_TOKEN.findall(normalize_arabic(value)))
+
+
+def word_starts(text):
+    """مواضع بدايات الكلمات (بالبايت) في نص مطبّع بترميز UTF-8
+
+    بداية النص مفهرسة دائماً، والكلمات الشائعة لا تُفهرس، والكلمة المعرفة
+    بـ "ال" تُفهرس أيضاً من بعد أداة التعريف.
+    """
+    starts = [0]
+    offset = 0
+    for word in text.split(b' '):
+        if offset and word not in _STOP_WORDS:
+            starts.append(offset)
+        if word.startswith(_DEFINITE_ARTICLE) and len(word) > 8:
+            starts.append(offset + len(_DEFINITE_ARTICLE))
+        offset += len(word) + 1
+    return [start for start in dict.fromkeys(starts) if start <= OFFSET_MASK]
+
+
+class PrefixIndex:
+    """مصفوفة مرتبة لبدايات الكلمات تدعم البحث بالبادئة والإضافة والحذف
+
+    النصوص محفوظة بترميز UTF-8 لأن مقارنة البايتات أسرع من مقارنة النصوص
+    العربية وتحافظ على نفس الترتيب. الإضافات تُجمع في مصفوفة صغيرة تُدمج في
+    الرئيسية كل MERGE_THRESHOLD إضافة، والحذف يُعلِّم النص فقط فيُتجاهل
+    عند البحث ويُزال عند الدمج التالي. إذا زادت خانات النصوص المحذوفة على
+    الحية أُعيد ترقيم النصوص عند الدمج فلا تنمو القوائم مع كثرة التعديل.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._texts = []
+        self._payloads = []
+        self._ranks = []
+        self._slots = {}
+        self._positions = array('Q')
+        self._pending = array('Q')
+        self._removed = []
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def keys(self):
+        """مفاتيح النصوص الموجودة في المصفوفة"""
+        with self._lock:
+            return list(self._slots)
+
+    def _key(self, position):
+        return self._texts[position >> OFFSET_BITS][position & OFFSET_MASK:]
+
+    def _append(self, key, text, payload, rank):
+        slot = len(self._texts)
+        self._texts.append(text)
+        self._payloads.append(payload)
+        self._ranks.append(rank)
+        self._slots[key] = slot
+        return slot
+
+    def build(self, entries):
+        """بناء المصفوفة من (المفتاح، النص، البيانات، الترتيب)"""
+        with self._lock:
+            self._reset()
+            positions = []
+            for key, text, payload, rank in entries:
+                text = normalize_suggestion(text).encode('utf-8')
+                if not text:
+                    continue
+                slot = self._append(key, text, payload, rank)
+                positions.extend((slot << OFFSET_BITS) | offset for offset in word_starts(text))
+            positions.sort(key=self._key)
+            self._positions = array('Q', positions)
+
+    def add(self, key, text, payload, rank=0):
+        """إضافة نص أو استبداله"""
+        text = normalize_suggestion(text).encode('utf-8')
+        with self._lock:
+            self._remove(key)
+            if not text:
+                return
+            slot = self._append(key, text, payload, rank)
+            pending = array('Q', self._pending)
+            for offset in word_starts(text):
+                insort(pending, (slot << OFFSET_BITS) | offset, key=self._key)
+            if len(pending) >= MERGE_THRESHOLD:
+                self._merge(pending)
+            else:
+                self._pending = pending
+
+    def remove(self, key):
+        """حذف نص من المصفوفة"""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._payloads[slot] = None
+            self._removed.append(slot)
+
+    def _locate(self, positions, position):
+        """موضع قيمة في مصفوفة مرتبة، أو None"""
+        index = bisect_left(positions, self._key(position), key=self._key)
+        key = self._key(position)
+        while index < len(positions) and self._key(positions[index]) == key:
+            if positions[index] == position:
+                return index
+            index += 1
+        return None
+
+    def _merge(self, pending):
+        """دمج الإضافات المعلقة وحذف مواضع النصوص المحذوفة
+
+        المصفوفة الجديدة تُبنى من شرائح المصفوفة الحالية بين مواضع الإضافة
+        والحذف، فلا تُقارن إلا القيم المضافة والمحذوفة.
+        """
+        main, payloads = self._positions, self._payloads
+        events = []
+        for slot in self._removed:
+            text = self._texts[slot]
+            for offset in word_starts(text):
+                index = self._locate(main, (slot << OFFSET_BITS) | offset)
+                if index is not None:
+                    events.append((index, 1, 0, None))
+        for order, position in enumerate(pending):
+            if payloads[position >> OFFSET_BITS] is not None:
+                events.append((bisect_left(main, self._key(position), key=self._key), 0, order, position))
+        events.sort()
+
+        merged = array('Q')
+        start = 0
+        for index, is_removal, _, position in events:
+            merged.extend(main[start:index])
+            if is_removal:
+                start = index + 1
+            else:
+                merged.append(position)
+                start = index
+        merged.extend(main[start:])
+
+        self._positions = merged
+        self._pending = array('Q')
+        # لم تعد هناك مواضع تشير إلى النصوص المحذوفة
+        for slot in self._removed:
+            self._texts[slot] = b''
+        self._dead += len(self._removed)
+        self._removed = []
+        if self._dead > len(self._slots):
+            self._compact()
+
+    def _compact(self):
+        """إعادة ترقيم النصوص الحية وحذف خانات النصوص المحذوفة من القوائم
+
+        ترتيب المصفوفة يعتمد على النص فقط، فيبقى صحيحاً بعد تغيير أرقام النصوص.
+        """
+        renumbered = {}
+        texts, payloads, ranks = [], [], []
+        for slot, payload in enumerate(self._payloads):
+            if payload is not None:
+                renumbered[slot] = len(texts)
+                texts.append(self._texts[slot])
+                payloads.append(payload)
+                ranks.append(self._ranks[slot])
+        self._positions = array('Q', (
+            (renumbered[position >> OFFSET_BITS] << OFFSET_BITS) | (position & OFFSET_MASK)
+            for position in self._positions
+        ))
+        self._slots = {key: renumbered[slot] for key, slot in self._slots.items()}
+        self._texts, self._payloads, self._ranks = texts, payloads, ranks
+        self._dead = 0
+
+    def _scan(self, positions, prefix, candidates, limit):
+        texts, payloads = self._texts, self._payloads
+        index = bisect_left(positions, prefix, key=self._key)
+        while index < len(positions) and len(candidates) < limit:
+            position = positions[index]
+            slot, offset = position >> OFFSET_BITS, position & OFFSET_MASK
+            if not texts[slot].startswith(prefix, offset):
+                break
+            if payloads[slot] is not None:
+                candidates[slot] = min(candidates.get(slot, offset), offset)
+            index += 1
+
+    def search(self, prefix, limit=10):
+        """النصوص التي تبدأ إحدى كلماتها بالبادئة
+
+        النصوص التي تبدأ بالبادئة نفسها أولاً، ثم حسب الترتيب المخزن تنازلياً.
+        """
+        prefix = normalize_suggestion(prefix).encode('utf-8')
+        if not prefix or limit <= 0:
+            return []
+
+        candidates = {}
+        # إعادة الترقيم تستبدل القوائم والمصفوفة معاً، فلا يُقرأ بعضها قبلها وبعضها بعدها
+        with self._lock:
+            self._scan(self._positions, prefix, candidates, limit * CANDIDATE_FACTOR)
+            self._scan(self._pending, prefix, candidates, limit * CANDIDATE_FACTOR * 2)
+
+            ranked = sorted(candidates, key=lambda slot: (candidates[slot] != 0, -self._ranks[slot]))
+            return [self._payloads[slot] for slot in ranked[:limit]]
+
+
+def _news_entry(row):
+    published_at = row.published_at.timestamp() if row.published_at else 0
+    return ('news', row.id), row.title, {'id': row.id, 'title': row.title, 'slug': row.slug}, published_at
+
+
+def _tag_entry(row):
+    text = f'{row.name} {row.name_en or ""}'
+    return ('tag', row.id), text, {'id': row.id, 'name': row.name, 'name_en': row.name_en}, row.usage_count or 0
+
+
+class NewsSuggestions:
+    """اقتراحات عناوين الأخبار والعلامات لكل عامل"""
+
+    def __init__(self, app=None):
+        self.titles = PrefixIndex()
+        self.tags = PrefixIndex()
+        self.refresh_interval = 60
+        self._lock = threading.Lock()
+        # يحمي بدء الخيط فقط، فلا ينتظر الطلب قفل التحديث الجاري
+        self._thread_lock = threading.Lock()
+        self._built = False
+        self._refreshed_at = 0.0
+        self._synced_at = None
+        self._build_thread = None
+        self.build_in_background = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الاقتراحات بالتطبيق لتُحدَّث بعد حفظ الأخبار والعلامات"""
+        self.refresh_interval = app.config.get('SUGGEST_REFRESH_INTERVAL', 60)
+        self.build_in_background = not app.config.get('TESTING')
+        app.extensions['news_suggestions'] = self
+
+    @staticmethod
+    def _news_rows(since=None):
+        table = NewsItem.__table__
+        query = select(table.c.id, table.c.title, table.c.slug, table.c.published_at, table.c.is_published)
+        if since is None:
+            query = query.where(table.c.is_published.is_(True))
+        else:
+            query = query.where(table.c.updated_at >= since)
+        return db.session.execute(query).all()
+
+    @staticmethod
+    def _published_ids():
+        table = NewsItem.__table__
+        return set(db.session.scalars(select(table.c.id).where(table.c.is_published.is_(True))))
+
+    @staticmethod
+    def _tag_rows():
+        table = NewsTag.__table__
+        return db.session.execute(
+            select(table.c.id, table.c.name, table.c.name_en, table.c.usage_count)
+            .where(table.c.is_active.is_(True))
+        ).all()
+
+    def build(self):
+        """بناء الاقتراحات من الأخبار المنشورة والعلامات النشطة"""
+        started = time.perf_counter()
+        synced_at = datetime.utcnow()
+        self.titles.build(_news_entry(row) for row in self._news_rows())
+        self.tags.build(_tag_entry(row) for row in self._tag_rows())
+        self._synced_at = synced_at
+        self._refreshed_at = time.monotonic()
+        self._built = True
+        logger.info(f"بناء اقتراحات البحث: {len(self.titles)} عنوان و {len(self.tags)} علامة "
+                    f"في {(time.perf_counter() - started) * 1000:.0f} مللي ثانية")
+
+    def refresh(self):
+        """التقاط تعديلات العمال الآخرين منذ آخر مزامنة
+
+        الأخبار المحذوفة (ومنها ما نقله الأرشيف بحذف مباشر) لا تترك صفاً
+        معدلاً، فتُقارن العناوين المفهرسة بمعرفات الأخبار المنشورة أيضاً.
+        """
+        synced_at = datetime.utcnow()
+        # ما يضيفه العامل بعد هذه اللحظة لا يُحذف حتى لو لم يظهر في الاستعلام
+        indexed = self.titles.keys()
+        # هامش لفروق الساعة بين الخوادم
+        for row in self._news_rows(since=self._synced_at - timedelta(seconds=5)):
+            self.apply_news(row)
+        published = self._published_ids()
+        for key in indexed:
+            if key[1] not in published:
+                self.titles.remove(key)
+        self.tags.build(_tag_entry(row) for row in self._tag_rows())
+        self._synced_at = synced_at
+        self._refreshed_at = time.monotonic()
+
+    def _start_build(self):
+        """بناء الاقتراحات أو تحديثها في خيط خلفي حتى لا ينتظرها الطلب"""
+        with self._thread_lock:
+            if self._build_thread is not None:
+                return
+            app = current_app._get_current_object()
+
+            def run():
+                with app.app_context():
+                    try:
+                        with self._lock:
+                            if not self._built:
+                                self.build()
+                            elif time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                                self.refresh()
+                    except Exception as e:
+                        logger.error(f"خطأ في بناء اقتراحات البحث: {str(e)}")
+                    finally:
+                        self._build_thread = None
+
+            self._build_thread = threading.Thread(target=run, name='news-suggestions-build', daemon=True)
+            self._build_thread.start()
+
+    def _ensure_fresh(self):
+        if self._built and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if self.build_in_background:
+            # لا اقتراحات حتى يكتمل البناء، والتحديث لا يؤخر الطلب فيُقدَّم ما سبق حتى ينتهي
+            self._start_build()
+            return
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+            return
+        with self._lock:
+            if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                self.refresh()
+
+    def apply_news(self, row):
+        """تحديث عنوان خبر واحد من صف (id, title, slug, published_at, is_published) أو حذفه"""
+        if row.is_published:
+            self.titles.add(*_news_entry(row))
+        else:
+            self.titles.remove(('news', row.id))
+
+    def suggest(self, prefix, limit=10):
+        """اقتراحات العناوين والعلامات التي تبدأ إحدى كلماتها بالبادئة"""
+        self._ensure_fresh()
+        return {
+            'news': self.titles.search(prefix, limit),
+            'tags': self.tags.search(prefix, limit),
+        }
+
+
+def _app_suggestions():
+    """اقتراحات البحث المرتبطة بالتطبيق الحالي إن وجدت"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('news_suggestions')
+
+
+def _record_change(target, change):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(SESSION_CHANGES_KEY, []).append(change)
+
+
+@event.listens_for(NewsItem, 'after_insert')
+@event.listens_for(NewsItem, 'after_update')
+def _record_news_change(mapper, connection, target):
+    """تسجيل العناوين التي تغيرت لتطبيقها بعد نجاح الحفظ"""
+    if _app_suggestions() is None:
+        return
+    state = inspect(target)
+    if not any(state.attrs[key].history.has_changes() for key in ('title', 'slug', 'is_published', 'published_at')):
+        return
+    table = NewsItem.__table__
+    row = connection.execute(
+        select(table.c.id, table.c.title, table.c.slug, table.c.published_at, table.c.is_published)
+        .where(table.c.id == target.id)
+    ).first()
+    if row is not None:
+        _record_change(target, ('news', row))
+
+
+@event.listens_for(NewsItem, 'after_delete')
+def _record_news_delete(mapper, connection, target):
+    if _app_suggestions() is not None:
+        _record_change(target, ('remove', ('news', target.id)))
+
+
+@event.listens_for(NewsTag, 'after_insert')
+@event.listens_for(NewsTag, 'after_update')
+def _record_tag_change(mapper, connection, target):
+    if _app_suggestions() is None:
+        return
+    if target.is_active is False:
+        _record_change(target, ('remove', ('tag', target.id)))
+    else:
+        _record_change(target, ('tag', _tag_entry(target)))
+
+
+@event.listens_for(NewsTag, 'after_delete')
+def _record_tag_delete(mapper, connection, target):
+    if _app_suggestions() is not None:
+        _record_change(target, ('remove', ('tag', target.id)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    """تطبيق تعديلات العناوين والعلامات بعد نجاح الحفظ فقط"""
+    changes = session.info.pop(SESSION_CHANGES_KEY, None)
+    suggestions = _app_suggestions()
+    if not changes or suggestions is None or not suggestions._built:
+        return
+    for kind, value in changes:
+        if kind == 'news':
+            suggestions.apply_news(value)
+        elif kind == 'tag':
+            suggestions.tags.add(*value)
+        else:
+            (suggestions.titles if value[0] == 'news' else suggestions.tags).remove(value)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(SESSION_CHANGES_KEY, None)
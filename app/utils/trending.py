@@ -0,0 +1,340 @@
+"""
+ترتيب الأخبار الرائجة بتفاعل يتلاشى مع الزمن - مشروع نائبك
+
+درجة الخبر مجموع أوزان أحداث المشاهدة والإعجاب والمشاركة، كل حدث مضروب في
+exp(-λ × عمره) بحيث ينخفض وزنه إلى النصف كل TRENDING_HALF_LIFE ثانية.
+بدلاً من تحديث كل الدرجات مع مرور الوقت يُخزن وزن الحدث مضروباً في
+exp(λ × (وقته - بداية الحقبة))، فتبقى الدرجات المخزنة بنفس ترتيب الدرجات
+المتلاشية، ويكلف الحدث O(log n) وقراءة أعلى k خبراً O(k) تقريباً.
+
+تتجدد الحقبة كل فترة ثابتة فتُضرب الدرجات المخزنة في معامل التلاشي مرة
+واحدة حتى لا تكبر الأسس بلا حد. تُحفظ الدرجات في كومة داخل العملية، أو في
+Redis Sorted Set مشترك بين العمليات. الخبر المحذوف أو الملغى نشره يُحذف من
+الترتيب بعد نجاح الحفظ.
+"""
+from app.models import db, NewsItem, NewsStats
+from app.utils.flusher import shared_backend
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from datetime import datetime, timedelta
+import heapq
+import math
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# أقصى عدد أنصاف أعمار في الحقبة الواحدة، حتى يبقى معامل الدرجات المخزنة ضمن مدى الأعداد العشرية
+MAX_HALF_LIVES_PER_GENERATION = 200
+
+GENERATION_SECONDS = 7 * 86400
+
+SESSION_REMOVED_KEY = 'trending_removed'
+
+
+class MemoryTrendingStore:
+    """درجات الأخبار الرائجة داخل العملية الحالية
+
+    الدرجة الحالية لكل خبر في قاموس، وكومة عظمى بحذف مؤجل: كل زيادة تضيف
+    مدخلاً جديداً، والمدخلات القديمة تُهمل عند القراءة أو عند ضغط الكومة.
+    """
+
+    def __init__(self, max_items=1000):
+        self.max_items = max_items
+        self._scores = {}
+        self._heap = []
+        self._generation = None
+        self._claims = set()
+        self._lock = threading.Lock()
+
+    def advance(self, generation, factor):
+        """الانتقال إلى حقبة جديدة بضرب كل الدرجات في معامل التلاشي لكل حقبة مضت"""
+        with self._lock:
+            if self._generation is not None and generation > self._generation:
+                scale = factor ** (generation - self._generation)
+                self._scores = {key: score * scale for key, score in self._scores.items() if score * scale > 0}
+                self._rebuild()
+            self._generation = generation
+
+    def claim(self, name, generation):
+        """حجز مهمة تُنفذ مرة واحدة في الحقبة (مثل التعبئة الأولى)"""
+        with self._lock:
+            if (name, generation) in self._claims:
+                return False
+            self._claims.add((name, generation))
+            return True
+
+    def incr(self, generation, key, amount):
+        """زيادة درجة خبر"""
+        with self._lock:
+            score = self._scores.get(key, 0.0) + amount
+            self._scores[key] = score
+            heapq.heappush(self._heap, (-score, key))
+            if len(self._scores) > 2 * self.max_items:
+                self._scores = dict(heapq.nlargest(self.max_items, self._scores.items(), key=lambda item: item[1]))
+                self._rebuild()
+            elif len(self._heap) > 2 * len(self._scores) + 1024:
+                self._rebuild()
+
+    def remove(self, generation, key):
+        """حذف خبر من الترتيب"""
+        with self._lock:
+            self._scores.pop(key, None)
+
+    def top(self, generation, limit):
+        """أعلى الأخبار درجة
+
+        Returns:
+            list: (معرف الخبر، الدرجة المخزنة)، الأعلى أولاً
+        """
+        with self._lock:
+            result = []
+            seen = set()
+            while self._heap and len(result) < limit:
+                negative_score, key = heapq.heappop(self._heap)
+                if key in seen or self._scores.get(key) != -negative_score:
+                    # مدخل قديم لخبر زادت درجته أو حُذف
+                    continue
+                seen.add(key)
+                result.append((key, -negative_score))
+            for key, score in result:
+                heapq.heappush(self._heap, (-score, key))
+            return result
+
+    def _rebuild(self):
+        self._heap = [(-score, key) for key, score in self._scores.items()]
+        heapq.heapify(self._heap)
+
+
+class RedisTrendingStore:
+    """درجات الأخبار الرائجة مشتركة بين العمليات في Redis Sorted Set لكل حقبة"""
+
+    def __init__(self, client, key='news:trending', max_items=1000, generation_seconds=GENERATION_SECONDS):
+        self.client = client
+        self.key = key
+        self.max_items = max_items
+        self.generation_seconds = generation_seconds
+
+    def _key(self, generation):
+        return f'{self.key}:{generation}'
+
+    def advance(self, generation, factor):
+        """نقل درجات الحقبة السابقة إلى الحقبة الجديدة بعد ضربها في معامل التلاشي
+
+        تنفذه عملية واحدة فقط، وZUNIONSTORE يجمع الدرجات المنقولة مع ما أضيف
+        إلى الحقبة الجديدة قبل النقل.
+        """
+        if not self.claim('advance', generation):
+            return
+        current, previous = self._key(generation), self._key(generation - 1)
+        pipe = self.client.pipeline()
+        pipe.zunionstore(current, {current: 1, previous: factor})
+        pipe.expire(current, 2 * self.generation_seconds)
+        pipe.delete(previous)
+        pipe.execute()
+
+    def claim(self, name, generation):
+        """حجز مهمة تُنفذ مرة واحدة بين كل العمليات في الحقبة"""
+        return bool(self.client.set(
+            f'{self.key}:claim:{name}:{generation}', 1, nx=True, ex=2 * self.generation_seconds
+        ))
+
+    def incr(self, generation, key, amount):
+        """زيادة درجة خبر مع الإبقاء على أعلى max_items خبراً فقط"""
+        name = self._key(generation)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zincrby(name, amount, key)
+        pipe.zremrangebyrank(name, 0, -(self.max_items + 1))
+        pipe.expire(name, 2 * self.generation_seconds)
+        pipe.execute()
+
+    def remove(self, generation, key):
+        """حذف خبر من الترتيب"""
+        self.client.zrem(self._key(generation), key)
+
+    def top(self, generation, limit):
+        """أعلى الأخبار درجة
+
+        Returns:
+            list: (معرف الخبر، الدرجة المخزنة)، الأعلى أولاً
+        """
+        members = self.client.zrevrange(self._key(generation), 0, limit - 1, withscores=True)
+        return [(int(member), score) for member, score in members]
+
+
+class TrendingNews:
+    """ترتيب الأخبار حسب التفاعل الحديث المتلاشي مع الزمن"""
+
+    def __init__(self, app=None, store=None):
+        self.app = None
+        self.store = store
+        self.weights = {'view': 1.0, 'like': 3.0, 'share': 5.0}
+        self.seed_days = 2
+        self._set_half_life(6 * 3600)
+        self._generation = None
+        self._seeded = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط الترتيب بالتطبيق وإنشاء مخزن الدرجات حسب الإعدادات"""
+        self.app = app
+        self.weights = dict(self.weights, **app.config.get('TRENDING_WEIGHTS', {}))
+        self.seed_days = app.config.get('TRENDING_SEED_DAYS', 2)
+        self._set_half_life(app.config.get('TRENDING_HALF_LIFE', 6 * 3600))
+        if self.store is None:
+            self.store = self._create_store(app)
+        app.extensions['trending_news'] = self
+
+    def _set_half_life(self, half_life):
+        self.half_life = half_life
+        self.decay_rate = math.log(2) / half_life
+        self.generation_seconds = min(GENERATION_SECONDS, MAX_HALF_LIVES_PER_GENERATION * half_life)
+
+    def _create_store(self, app):
+        """إنشاء مخزن الدرجات حسب الإعدادات"""
+        max_items = app.config.get('TRENDING_MAX_ITEMS', 1000)
+        if shared_backend(app, 'TRENDING_BACKEND') == 'redis':
+            try:
+                import redis
+                client = redis.Redis(
+                    host=app.config.get('REDIS_HOST', 'localhost'),
+                    port=app.config.get('REDIS_PORT', 6379),
+                    db=app.config.get('REDIS_DB', 0),
+                    password=app.config.get('REDIS_PASSWORD')
+                )
+                return RedisTrendingStore(client, max_items=max_items, generation_seconds=self.generation_seconds)
+            except ImportError:
+                logger.warning("مكتبة redis غير متوفرة، سيتم استخدام ترتيب الذاكرة")
+        return MemoryTrendingStore(max_items)
+
+    def _current_generation(self, now):
+        """الحقبة الحالية، مع نقل الدرجات عند بداية حقبة جديدة"""
+        generation = int(now // self.generation_seconds)
+        if generation != self._generation:
+            self.store.advance(generation, math.exp(-self.decay_rate * self.generation_seconds))
+            self._generation = generation
+        return generation
+
+    def _stored_weight(self, generation, weight, when):
+        return weight * math.exp(self.decay_rate * (when - generation * self.generation_seconds))
+
+    def record(self, news_item_id, event_type, when=None):
+        """تسجيل حدث تفاعل في الترتيب
+
+        Args:
+            news_item_id (int): معرف الخبر.
+            event_type (str): view أو like أو share.
+            when (float): وقت الحدث بثواني Unix، والافتراضي الآن.
+        """
+        weight = self.weights.get(event_type)
+        if not weight:
+            return
+        now = time.time()
+        try:
+            generation = self._current_generation(now)
+            self.store.incr(generation, news_item_id, self._stored_weight(generation, weight, when or now))
+        except Exception as e:
+            # فقدان حدث في الترتيب أفضل من فشل الطلب
+            logger.error(f"خطأ في تسجيل حدث الأخبار الرائجة: {str(e)}")
+
+    def remove(self, news_item_id):
+        """حذف خبر من الترتيب عند إلغاء نشره أو حذفه"""
+        self.store.remove(self._current_generation(time.time()), news_item_id)
+
+    def top(self, limit=10):
+        """أعلى الأخبار رواجاً الآن
+
+        Returns:
+            list: (معرف الخبر، الدرجة المتلاشية حتى الآن)، الأعلى أولاً
+        """
+        now = time.time()
+        generation = self._current_generation(now)
+        if not self._seeded:
+            # الترتيب فارغ بعد إعادة التشغيل (أو Redis جديد): تعبئته مرة واحدة من الإحصائيات
+            self._seeded = True
+            if self.seed_days and not self.store.top(generation, 1) and self.store.claim('seed', generation):
+                self.seed(generation)
+        scale = math.exp(-self.decay_rate * (now - generation * self.generation_seconds))
+        return [(news_item_id, score * scale) for news_item_id, score in self.store.top(generation, limit)]
+
+    def seed(self, generation=None):
+        """تعبئة الترتيب من إحصائيات الأيام الأخيرة عند بدء الحقبة
+
+        تُحسب أحداث كل يوم كأنها وقعت في منتصفه، أو الآن إن كان اليوم الحالي.
+
+        Returns:
+            int: عدد صفوف الإحصائيات المستخدمة
+        """
+        now = time.time()
+        if generation is None:
+            generation = self._current_generation(now)
+        today = datetime.utcfromtimestamp(now).date()
+        rows = db.session.query(
+            NewsStats.news_item_id, NewsStats.date, NewsStats.views, NewsStats.likes, NewsStats.shares
+        ).filter(NewsStats.date >= today - timedelta(days=self.seed_days)).all()
+
+        epoch = datetime(1970, 1, 1)
+        for row in rows:
+            when = min(now, (datetime.combine(row.date, datetime.min.time()) - epoch).total_seconds() + 43200)
+            weight = sum(
+                (count or 0) * self.weights.get(event_type, 0)
+                for event_type, count in (('view', row.views), ('like', row.likes), ('share', row.shares))
+            )
+            if weight:
+                self.store.incr(generation, row.news_item_id, self._stored_weight(generation, weight, when))
+        return len(rows)
+
+
+def _app_trending():
+    """ترتيب الأخبار الرائجة المرتبط بالتطبيق الحالي إن وجد"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('trending_news')
+
+
+def _record_removed(target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(SESSION_REMOVED_KEY, []).append(target.id)
+
+
+@event.listens_for(NewsItem, 'after_update')
+def _record_unpublished(mapper, connection, target):
+    """تسجيل الخبر الملغى نشره لحذفه من الترتيب بعد نجاح الحفظ"""
+    if _app_trending() is None or target.is_published:
+        return
+    if any(inspect(target).attrs.is_published.history.deleted):
+        _record_removed(target)
+
+
+@event.listens_for(NewsItem, 'after_delete')
+def _record_deleted(mapper, connection, target):
+    if _app_trending() is not None:
+        _record_removed(target)
+
+
+@event.listens_for(NewsItem.is_published, 'set', active_history=True)
+def _track_published(target, value, oldvalue, initiator):
+    """تحميل القيمة السابقة لمعرفة هل أُلغي نشر الخبر الآن"""
+
+
+@event.listens_for(Session, 'after_commit')
+def _remove_items(session):
+    """حذف الأخبار المسجلة من الترتيب بعد نجاح الحفظ فقط"""
+    removed = session.info.pop(SESSION_REMOVED_KEY, None)
+    trending = _app_trending()
+    if not removed or trending is None:
+        return
+    for news_item_id in removed:
+        try:
+            trending.remove(news_item_id)
+        except Exception as e:
+            logger.error(f"خطأ في حذف خبر من الأخبار الرائجة: {str(e)}")
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_removed(session, previous_transaction):
+    session.info.pop(SESSION_REMOVED_KEY, None)
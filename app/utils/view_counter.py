@@ -0,0 +1,182 @@
+"""
+مخزن مؤقت لعدادات المشاهدة لخدمة الأخبار - مشروع نائبك
+
+يجمع مشاهدات الأخبار في الذاكرة (أو في Redis عند تعدد العمليات) ويكتبها
+إلى قاعدة البيانات على دفعات بدلاً من عملية كتابة مع كل قراءة للخبر.
+"""
+from app.models import db, NewsItem
+from app.utils.flusher import PeriodicFlusher
+from collections import defaultdict
+from sqlalchemy import bindparam
+import threading
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCounterStore:
+    """مخزن عدادات داخل العملية الحالية"""
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def incr(self, key, delta=1):
+        """زيادة عداد عنصر"""
+        with self._lock:
+            self._counts[key] += delta
+
+    def get(self, key):
+        """قيمة الزيادة المعلقة لعنصر واحد"""
+        with self._lock:
+            return self._counts.get(key, 0)
+
+    def drain(self):
+        """سحب جميع الزيادات المعلقة وتصفير المخزن"""
+        with self._lock:
+            counts, self._counts = dict(self._counts), defaultdict(int)
+        return counts
+
+    def merge(self, counts):
+        """إعادة زيادات لم يتم حفظها إلى المخزن"""
+        with self._lock:
+            for key, delta in counts.items():
+                self._counts[key] += delta
+
+
+class RedisCounterStore:
+    """مخزن عدادات مشترك بين العمليات باستخدام Redis Hash"""
+
+    def __init__(self, client, key='news:view_counts'):
+        self.client = client
+        self.key = key
+
+    def incr(self, key, delta=1):
+        """زيادة عداد عنصر"""
+        self.client.hincrby(self.key, key, delta)
+
+    def get(self, key):
+        """قيمة الزيادة المعلقة لعنصر واحد"""
+        value = self.client.hget(self.key, key)
+        return int(value) if value else 0
+
+    def drain(self):
+        """سحب جميع الزيادات المعلقة بشكل ذري عبر إعادة تسمية المفتاح
+
+        لكل عملية سحب مفتاح فريد، فلا يكتب عامل فوق مفتاح يقرؤه عامل آخر
+        في اللحظة نفسها.
+        """
+        flushing_key = f'{self.key}:flushing:{uuid.uuid4().hex}'
+        try:
+            self.client.rename(self.key, flushing_key)
+        except Exception:
+            # المفتاح غير موجود: لا توجد زيادات معلقة
+            return {}
+        pipe = self.client.pipeline()
+        pipe.hgetall(flushing_key)
+        pipe.delete(flushing_key)
+        counts, _ = pipe.execute()
+        return {int(key): int(value) for key, value in counts.items()}
+
+    def merge(self, counts):
+        """إعادة زيادات لم يتم حفظها إلى المخزن"""
+        pipe = self.client.pipeline()
+        for key, delta in counts.items():
+            pipe.hincrby(self.key, key, delta)
+        pipe.execute()
+
+
+class ViewCounterBuffer(PeriodicFlusher):
+    """مخزن مؤقت لعدادات المشاهدة مع كتابة مؤجلة على دفعات
+
+    تُجمع المشاهدات لكل خبر ثم تُكتب بأمر UPDATE واحد متعدد المعاملات
+    (view_count = view_count + :delta) كل VIEW_COUNTER_FLUSH_INTERVAL ثانية
+    أو عند تسجيل VIEW_COUNTER_FLUSH_THRESHOLD مشاهدة في العملية الحالية،
+    وعند إيقاف العملية.
+    """
+
+    thread_name = 'view-counter-flusher'
+
+    def __init__(self, app=None, store=None):
+        super().__init__()
+        self.store = store
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """ربط المخزن بتطبيق Flask وبدء خيط الكتابة في الخلفية"""
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 5.0)
+        self.flush_threshold = app.config.get('VIEW_COUNTER_FLUSH_THRESHOLD', 100)
+        if self.store is None:
+            self.store = self._create_store(app)
+        app.extensions['view_counter'] = self
+        self._start_background(app)
+
+    def _create_store(self, app):
+        """إنشاء مخزن العدادات حسب الإعدادات"""
+        if app.config.get('VIEW_COUNTER_BACKEND', 'memory') == 'redis':
+            try:
+                import redis
+                client = redis.Redis(
+                    host=app.config.get('REDIS_HOST', 'localhost'),
+                    port=app.config.get('REDIS_PORT', 6379),
+                    db=app.config.get('REDIS_DB', 0),
+                    password=app.config.get('REDIS_PASSWORD')
+                )
+                return RedisCounterStore(client)
+            except ImportError:
+                logger.warning("مكتبة redis غير متوفرة، سيتم استخدام عدادات الذاكرة")
+        return MemoryCounterStore()
+
+    def increment(self, news_item_id, delta=1):
+        """تسجيل مشاهدة لخبر دون الكتابة إلى قاعدة البيانات"""
+        try:
+            self.store.incr(news_item_id, delta)
+        except Exception as e:
+            # فقدان مشاهدة أفضل من فشل قراءة الخبر
+            logger.error(f"خطأ في تسجيل المشاهدة: {str(e)}")
+            return
+        self._notify(delta)
+
+    def pending(self, news_item_id):
+        """عدد المشاهدات المعلقة التي لم تُكتب بعد لخبر معين"""
+        try:
+            return self.store.get(news_item_id)
+        except Exception:
+            return 0
+
+    def flush(self):
+        """كتابة جميع المشاهدات المعلقة بأمر UPDATE واحد على دفعة
+
+        Returns:
+            int: عدد الأخبار التي تم تحديثها
+        """
+        with self._flush_lock:
+            self._events = 0
+            counts = {key: delta for key, delta in self.store.drain().items() if delta}
+            if not counts:
+                return 0
+
+            table = NewsItem.__table__
+            statement = table.update() \
+                .where(table.c.id == bindparam('item_id')) \
+                .values(
+                    view_count=db.func.coalesce(table.c.view_count, 0) + bindparam('delta'),
+                    # المشاهدة لا تعد تعديلاً على الخبر
+                    updated_at=table.c.updated_at
+                )
+            params = [{'item_id': key, 'delta': delta} for key, delta in counts.items()]
+
+            with self.app.app_context():
+                try:
+                    db.session.execute(statement, params)
+                    db.session.commit()
+                except Exception as e:
+                    logger.error(f"خطأ في حفظ عدادات المشاهدة: {str(e)}")
+                    db.session.rollback()
+                    self.store.merge(counts)
+                    return 0
+
+            return len(counts)
@@ -34,6 +34,9 @@ class Config:
     CACHE_REDIS_DB = REDIS_DB
     CACHE_REDIS_PASSWORD = REDIS_PASSWORD
     CACHE_DEFAULT_TIMEOUT = 300  # 5 دقائق
+    NEWS_CACHE_TIMEOUT = 300  # مهلة قوائم الأخبار وصفحاتها، وتُبطل فوراً عند تعديل الخبر
+    NEWS_CACHE_STALE_TIMEOUT = 600  # مدة تقديم المدخل القديم بينما يعيد عامل واحد حسابه
+    NEWS_CACHE_LOCK_TIMEOUT = 10  # مهلة قفل إعادة الحساب بالثواني
     
     # إعدادات الخدمة
     SERVICE_NAME = 'naebak-news-service'
@@ -86,25 +89,77 @@ class Config:
     COMMENTS_ENABLED = True
     COMMENTS_MODERATION = True
     COMMENTS_PER_NEWS = 100
+    COMMENTS_AUTO_APPROVE = True  # اعتماد التعليقات التي يجتازها الإشراف الآلي دون مراجعة
+    COMMENT_SPAM_THRESHOLD = 0.6  # درجة الإزعاج التي يُعد التعليق بعدها مزعجاً
+    COMMENT_PROFANITY_THRESHOLD = 0.5  # درجة الألفاظ التي يُعلق بعدها التعليق للمراجعة
+    COMMENT_MODERATION_INTERVAL = 2  # ثانية
+    COMMENT_MODERATION_BATCH_SIZE = 200  # تعليق في كل دفعة
+    COMMENT_BULK_MODERATION_LIMIT = 500  # أقصى عدد تعليقات في طلب إشراف جماعي
     
     # إعدادات الإحصائيات
     STATS_RETENTION_DAYS = 365
     STATS_UPDATE_INTERVAL = 3600  # ساعة
     
+    # إعدادات عدادات المشاهدة المؤجلة
+    VIEW_COUNTER_BACKEND = os.environ.get('VIEW_COUNTER_BACKEND') or 'memory'  # memory, redis
+    VIEW_COUNTER_FLUSH_INTERVAL = 5  # ثوانٍ
+    VIEW_COUNTER_FLUSH_THRESHOLD = 100  # مشاهدة
+    
+    # إعدادات تجميع أحداث التفاعل في الإحصائيات اليومية
+    STATS_FLUSH_INTERVAL = 60  # ثانية
+    STATS_FLUSH_THRESHOLD = 1000  # حدث
+    STATS_FLUSH_BATCH_SIZE = 500  # صف
+    
     # إعدادات التنظيف التلقائي
     AUTO_CLEANUP_ENABLED = True
     CLEANUP_INTERVAL = 86400  # يوم
-    OLD_STATS_CLEANUP_DAYS = 365
-    OLD_COMMENTS_CLEANUP_DAYS = 180
+    OLD_STATS_CLEANUP_DAYS = 365  # الإحصائيات اليومية الأقدم تُدمج في صفوف شهرية
+    OLD_COMMENTS_CLEANUP_DAYS = 180  # التعليقات المحذوفة والمزعجة الأقدم تُحذف
+    STATS_DOWNSAMPLE_MONTHLY = True  # False لحذف الإحصائيات القديمة دون دمجها
+    CLEANUP_CHUNK_SIZE = 500  # صف في كل معاملة
+    CLEANUP_CHUNK_PAUSE = 0.05  # ثانية بين المعاملات لإفساح المجال لطلبات الكتابة الأخرى
     
     # إعدادات البحث
     SEARCH_RESULTS_PER_PAGE = 15
     SEARCH_MIN_LENGTH = 3
     SEARCH_MAX_LENGTH = 100
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'  # auto, fts5, python
+    SUGGEST_MIN_LENGTH = 2
+    SUGGEST_LIMIT = 10
+    SUGGEST_REFRESH_INTERVAL = 60  # ثانية، لالتقاط تعديلات العمال الآخرين
+    
+    # إعدادات الأخبار ذات الصلة
+    RELATED_TOP_K = 10
+    RELATED_TAG_WEIGHT = 0.5  # وزن تشابه العلامات (جاكارد)
+    RELATED_TEXT_WEIGHT = 0.5  # وزن تشابه العناوين والملخصات (TF-IDF)
+    RELATED_REFRESH_INTERVAL = 3600  # ثانية، ويُعاد الحساب فقط إذا تغيرت الأخبار؛ 0 للاكتفاء بالأمر compute-related
+    RELATED_LOCK_TIMEOUT = 600  # ثانية، أقصى مدة يحجز فيها عامل واحد إعادة الحساب
+    
+    # إعدادات الأخبار الرائجة
+    # memory أو redis؛ إن لم يحدد فالافتراضي redis مع تعدد عمال gunicorn (WEB_CONCURRENCY)
+    TRENDING_BACKEND = os.environ.get('TRENDING_BACKEND')
+    TRENDING_HALF_LIFE = 6 * 3600  # ثانية، ينخفض بعدها وزن الحدث إلى النصف
+    TRENDING_WEIGHTS = {'view': 1, 'like': 3, 'share': 5}
+    TRENDING_MAX_ITEMS = 1000
+    TRENDING_SEED_DAYS = 2  # أيام الإحصائيات المستخدمة لتعبئة الترتيب بعد إعادة التشغيل
+    TRENDING_LIMIT = 10
+    TRENDING_CACHE_TIMEOUT = 30
+    
+    # إعدادات بث الأخبار (Server-Sent Events)
+    # memory أو redis؛ إن لم يحدد فالافتراضي redis مع تعدد عمال gunicorn (WEB_CONCURRENCY)
+    # ليصل كل حدث إلى كل العملاء، ويُحسب عند التشغيل فيسري حتى دون تحميل هذا الملف
+    STREAM_BACKEND = os.environ.get('STREAM_BACKEND')
+    STREAM_BUFFER_SIZE = 100  # آخر الأحداث المحفوظة لإعادة إرسالها بعد انقطاع الاتصال
+    STREAM_KEEPALIVE = 15  # ثانية
+    STREAM_MAX_DURATION = 300  # ثانية، ثم يعيد العميل الاتصال
+    STREAM_MAX_CLIENTS = 5000  # لكل عامل
     
     # إعدادات الأرشفة
     AUTO_ARCHIVE_ENABLED = True
-    AUTO_ARCHIVE_DAYS = 365
+    AUTO_ARCHIVE_DAYS = 365  # تؤرشف الأخبار المنشورة قبل هذه المدة، والمنتهية (expires_at) فوراً
+    ARCHIVE_INTERVAL = 3600  # ثانية بين تشغيلين للأرشفة؛ 0 للاكتفاء بالأمر archive-news
+    ARCHIVE_BATCH_SIZE = 500  # أخبار كل دفعة (معاملة)
+    ARCHIVE_MAX_BATCHES = 100  # أقصى عدد دفعات في التشغيل الواحد
     
     # إعدادات الإشعارات
     NOTIFICATION_SERVICE_URL = os.environ.get('NOTIFICATION_SERVICE_URL') or 'http://localhost:8007'
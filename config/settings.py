@@ -196,6 +196,15 @@ AI_GOVERNANCE = {
     ],
     'AUDIT_ENABLED': True,
     'AUDIT_RETENTION_DAYS': 90,
+    # Audit records are queued and written in batches by a background thread
+    'AUDIT_ASYNC': True,
+    'AUDIT_QUEUE_SIZE': 10000,
+    'AUDIT_BATCH_SIZE': 200,
+    'AUDIT_FLUSH_INTERVAL': 1.0,
+    'AUDIT_OVERFLOW': 'drop',  # drop, oldest or block
+    # Requests each worker leases from the shared rate limiter at once (0 disables)
+    'LOCAL_LEASE_SIZE': 0,
+    'LOCAL_LEASE_SECONDS': 1.0,
 }
 
 # Logging configuration
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+JSON Encoding Benchmark
+يقارن عدد الطلبات في الثانية لصفحة من 50 خبراً في /api/news بين ترميز
+jsonify() الافتراضي مع to_dict() والترميز عبر orjson مع المُسلسِلات الأصلية
+
+تُقاس حالتان:
+    cached: الحمولة جاهزة في الذاكرة المؤقتة ولا يبقى إلا ترميزها
+    full:   استعلام الصفحة وتسلسلها وترميزها
+
+الاستخدام:
+    python scripts/benchmark_json.py --per-page 50 --seconds 3
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from app.models import db, NewsCategory, NewsTag, NewsItem
+from app.utils.json_provider import OrjsonProvider
+
+
+def create_app():
+    """إنشاء تطبيق Flask مرتبط بقاعدة بيانات SQLite في الذاكرة"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(rows):
+    """إضافة أخبار منشورة بتصنيفات وعلامات"""
+    categories = [NewsCategory(name=f'تصنيف {i}', name_en=f'Category {i}') for i in range(5)]
+    tags = [NewsTag(name=f'علامة {i}', name_en=f'Tag {i}') for i in range(10)]
+    now = datetime.utcnow()
+    for i in range(rows):
+        item = NewsItem(
+            title=f'عنوان الخبر رقم {i} في خدمة أخبار نائبك',
+            slug=f'news-{i}',
+            summary='ملخص قصير للخبر ' * 5,
+            content='محتوى',
+            category=categories[i % len(categories)],
+            status='published',
+            is_published=True,
+            priority=i % 3,
+            published_at=now - timedelta(minutes=i),
+            expires_at=now + timedelta(days=30),
+            author_name='محرر الأخبار'
+        )
+        item.tags = [tags[i % len(tags)], tags[(i + 3) % len(tags)], tags[(i + 7) % len(tags)]]
+        db.session.add(item)
+    db.session.commit()
+
+
+def load_page(per_page):
+    return NewsItem.query.options(*NewsItem.listing_options()).filter_by(is_published=True) \
+        .order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()).limit(per_page).all()
+
+
+def requests_per_second(app, handler, seconds):
+    """عدد مرات تنفيذ الطلب في الثانية خلال المدة المحددة"""
+    with app.test_request_context('/api/news'):
+        count = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            handler().get_data()
+            count += 1
+        return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='jsonify vs orjson benchmark for the news listing')
+    parser.add_argument('--per-page', type=int, default=50, help='Number of news items per page')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each measurement')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        populate(args.per_page)
+
+        variants = {
+            'before': (DefaultJSONProvider(app), False),
+            'after': (OrjsonProvider(app), True),
+        }
+
+        print(f"{'mode':>8} {'variant':>8} {'req/s':>10}")
+        results = {}
+        for mode in ('cached', 'full'):
+            for name, (provider, native) in variants.items():
+                app.json = provider
+                payload = {'news': NewsItem.serialize_many(load_page(args.per_page), native=native)}
+
+                if mode == 'cached':
+                    handler = lambda: jsonify(payload)
+                else:
+                    handler = lambda: jsonify({'news': NewsItem.serialize_many(load_page(args.per_page), native=native)})
+
+                results[mode, name] = requests_per_second(app, handler, args.seconds)
+                print(f'{mode:>8} {name:>8} {results[mode, name]:>10.0f}')
+            print(f"{mode:>8} {'speedup':>8} {results[mode, 'after'] / results[mode, 'before']:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pagination Benchmark
+يقارن زمن جلب الصفحة N بين ترقيم OFFSET الحالي وترقيم المؤشر (Keyset)
+مع تزايد حجم جدول الأخبار حتى مليون صف
+
+الاستخدام:
+    python scripts/benchmark_pagination.py --rows 10000,100000,1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask
+from app.models import db, NewsCategory, NewsItem
+from app.utils.pagination import keyset_page, encode_cursor
+
+
+PER_PAGE = 20
+DEPTHS = (0.0, 0.1, 0.5, 0.9)
+INSERT_CHUNK = 50000
+
+
+def create_app(database_path):
+    """إنشاء تطبيق Flask مرتبط بقاعدة بيانات SQLite مؤقتة"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(rows):
+    """إضافة صفوف أخبار حتى يصل الجدول إلى العدد المطلوب"""
+    existing = NewsItem.query.count()
+    if existing >= rows:
+        return
+
+    if not NewsCategory.query.first():
+        db.session.add(NewsCategory(name='عام', name_en='General'))
+        db.session.commit()
+    category_id = NewsCategory.query.first().id
+
+    now = datetime.utcnow()
+    table = NewsItem.__table__
+    for start in range(existing, rows, INSERT_CHUNK):
+        db.session.execute(table.insert(), [
+            {
+                'title': f'خبر {i}',
+                'slug': f'news-{i}',
+                'content': 'محتوى',
+                'category_id': category_id,
+                'status': 'published',
+                'is_published': True,
+                'priority': i % 4,
+                'published_at': now - timedelta(seconds=i),
+                'view_count': 0,
+            }
+            for i in range(start, min(start + INSERT_CHUNK, rows))
+        ])
+        db.session.commit()
+
+
+def listing_query():
+    return NewsItem.query.filter_by(is_published=True)
+
+
+def ordered_listing_query():
+    return listing_query().order_by(NewsItem.priority.desc(), NewsItem.published_at.desc(), NewsItem.id.desc())
+
+
+def time_call(func, repeat=5):
+    """أفضل زمن تنفيذ بالمللي ثانية"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def bench_offset(offset):
+    """الطريقة الحالية: OFFSET مع COUNT(*) كامل"""
+    ordered_listing_query().offset(offset).limit(PER_PAGE).all()
+    listing_query().count()
+
+
+def bench_keyset(cursor):
+    """ترقيم المؤشر بدون COUNT(*)"""
+    keyset_page(listing_query(), PER_PAGE, cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offset vs keyset pagination benchmark')
+    parser.add_argument('--rows', default='10000,100000,1000000',
+                        help='Comma separated table sizes to benchmark')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'naebak_pagination_bench.db'),
+                        help='SQLite database file (reused between sizes)')
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.rows.split(','))
+    if os.path.exists(args.database):
+        os.remove(args.database)
+
+    app = create_app(args.database)
+    with app.app_context():
+        db.create_all()
+
+        print(f"{'rows':>10} {'depth':>6} {'offset ms':>10} {'keyset ms':>10}")
+        for rows in sizes:
+            populate(rows)
+            for depth in DEPTHS:
+                offset = int(rows * depth)
+                anchor = ordered_listing_query().offset(max(offset - 1, 0)).first()
+                cursor = encode_cursor(anchor) if offset else ''
+
+                offset_ms = time_call(lambda: bench_offset(offset))
+                keyset_ms = time_call(lambda: bench_keyset(cursor))
+                print(f'{rows:>10} {depth:>6.0%} {offset_ms:>10.2f} {keyset_ms:>10.2f}')
+
+    os.remove(args.database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Benchmark
+يقارن إنتاجية محدد المعدل القائم على قوائم الطوابع الزمنية المخزنة كاملة
+في الكاش مع عدادات النافذة المنزلقة (وسجل Redis المرتب عند توفره)
+مع تزايد عدد الطلبات المسجلة في نافذة اليوم
+
+الاستخدام:
+    python scripts/benchmark_rate_limiter.py --history 0,100,1000
+    python scripts/benchmark_rate_limiter.py --redis redis://localhost:6379/15
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import django
+from django.conf import settings
+
+
+def configure(redis_url):
+    """إعداد Django بكاش في الذاكرة أو Redis دون ملف الإعدادات الكامل"""
+    if redis_url:
+        caches = {'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': redis_url,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }}
+    else:
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        CACHES=caches,
+        AI_GOVERNANCE={'MAX_REQUESTS_PER_MINUTE': 10 ** 9},
+    )
+    django.setup()
+
+
+WINDOW_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+LIMITS = {'minute': 10 ** 9, 'hour': 10 ** 9, 'day': 10 ** 9}
+
+
+class ListLimiter:
+    """الطريقة السابقة: قائمة طوابع زمنية لكل نافذة تُقرأ وتُرشّح وتُكتب كاملة"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def is_allowed(self, identifier):
+        now = time.time()
+        return all(
+            len([t for t in self.cache.get(f"bench_list:{identifier}:{window}", []) if t > now - seconds]) < LIMITS[window]
+            for window, seconds in WINDOW_SECONDS.items()
+        )
+
+    def record(self, identifier, now=None):
+        now = time.time() if now is None else now
+        for window, seconds in WINDOW_SECONDS.items():
+            key = f"bench_list:{identifier}:{window}"
+            requests = self.cache.get(key, [])
+            requests.append(now)
+            self.cache.set(key, [t for t in requests if t > now - seconds], 3600)
+
+    def request(self, identifier):
+        if self.is_allowed(identifier):
+            self.record(identifier)
+
+
+class BackendLimiter:
+    """التحقق والتسجيل في استدعاء واحد للواجهة الجديدة"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def record(self, identifier, now=None):
+        from app.ai_governance.utils.sliding_window import RECORD
+        self.backend.hit(identifier, LIMITS, mode=RECORD, now=now)
+
+    def request(self, identifier):
+        self.backend.hit(identifier, LIMITS)
+
+
+def throughput(limiter, identifier, operations):
+    """عدد الطلبات في الثانية"""
+    started = time.perf_counter()
+    for _ in range(operations):
+        limiter.request(identifier)
+    return operations / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List vs sliding window counter rate limiter benchmark')
+    parser.add_argument('--history', default='0,100,1000',
+                        help='Comma separated numbers of requests already in the day window')
+    parser.add_argument('--operations', type=int, default=2000, help='Requests timed per measurement')
+    parser.add_argument('--redis', default='', help='Redis URL; the in-memory cache is used when omitted')
+    args = parser.parse_args()
+
+    configure(args.redis)
+    from django.core.cache import cache
+    from app.ai_governance.utils.sliding_window import (
+        SlidingWindowCounter, SlidingWindowLog, get_redis_connection
+    )
+
+    redis_connection = get_redis_connection()
+    limiters = {
+        'list': ListLimiter(cache),
+        'counter': BackendLimiter(SlidingWindowCounter(redis_connection)),
+    }
+    if redis_connection is not None:
+        limiters['sorted_set'] = BackendLimiter(SlidingWindowLog(redis_connection))
+
+    print(f"{'history':>8} " + ' '.join(f'{name + " req/s":>16}' for name in limiters))
+    for history in sorted(int(size) for size in args.history.split(',')):
+        cache.clear()
+        results = []
+        for name, limiter in limiters.items():
+            identifier = f'{name}:{history}'
+            # طلبات سابقة موزعة على الساعات الماضية من اليوم
+            now = time.time()
+            for i in range(history):
+                limiter.record(identifier, now=now - 3500 * i / max(history, 1))
+            results.append(throughput(limiter, identifier, args.operations))
+        print(f'{history:>8} ' + ' '.join(f'{result:>16.0f}' for result in results))
+
+
+if __name__ == '__main__':
+    main()
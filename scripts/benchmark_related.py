@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Related Articles Benchmark
+يقيس زمن حساب الأخبار ذات الصلة بـ NumPy وبتنفيذ بايثون البديل لعدد كبير من الأخبار
+
+الاستخدام:
+    python scripts/benchmark_related.py --items 20000 --top-k 10
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils import related
+from app.utils.search import analyze
+
+
+WORDS = (
+    'مجلس', 'النواب', 'يناقش', 'الموازنة', 'العامة', 'للدولة', 'وزير', 'التعليم', 'يعلن',
+    'إطلاق', 'مبادرة', 'جديدة', 'للشباب', 'الحكومة', 'المصرية', 'تقر', 'قانون', 'الاستثمار',
+    'محافظ', 'القاهرة', 'يفتتح', 'مستشفى', 'الصحة', 'جلسة', 'طارئة', 'لمناقشة', 'أزمة',
+    'المياه', 'الزراعة', 'الصناعة', 'التجارة', 'الخارجية', 'الداخلية', 'النقل', 'الكهرباء',
+)
+
+
+def make_document(rng, vocabulary):
+    words = [rng.choice(vocabulary) for _ in range(rng.randint(15, 40))]
+    return Counter(analyze(' '.join(words)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Related articles computation benchmark')
+    parser.add_argument('--items', type=int, default=20000, help='Number of news items')
+    parser.add_argument('--tags', type=int, default=300, help='Number of distinct tags')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--skip-python', action='store_true', help='Only time the NumPy implementation')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # مفردات أوسع من قائمة الكلمات حتى تكون المصطلحات متفاوتة الشيوع كالأخبار الحقيقية
+    vocabulary = list(WORDS) + [f'{word}{i}' for word in WORDS for i in range(400)]
+    documents = [make_document(rng, vocabulary) for _ in range(args.items)]
+    tag_sets = [rng.sample(range(args.tags), rng.randint(1, 5)) for _ in range(args.items)]
+
+    implementations = [('numpy', related.np)]
+    if not args.skip_python:
+        implementations.append(('python', None))
+    for name, module in implementations:
+        if name == 'numpy' and module is None:
+            print('numpy: not installed')
+            continue
+        related.np = module
+        started = time.perf_counter()
+        rows = related.rank_related(documents, tag_sets, args.top_k)
+        print(f'{name}: {args.items} items, {len(rows)} related rows in {time.perf_counter() - started:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Suggest Benchmark
+يقيس زمن بناء فهرس الاقتراحات وزمن الاقتراح (p50/p99) لعدد كبير من العناوين
+
+الاستخدام:
+    python scripts/benchmark_suggest.py --titles 100000 --queries 20000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils.suggest import PrefixIndex
+
+
+WORDS = (
+    'مجلس', 'النواب', 'يناقش', 'الموازنة', 'العامة', 'للدولة', 'وزير', 'التعليم', 'يعلن',
+    'إطلاق', 'مبادرة', 'جديدة', 'للشباب', 'الحكومة', 'المصرية', 'تقر', 'قانون', 'الاستثمار',
+    'محافظ', 'القاهرة', 'يفتتح', 'مستشفى', 'الصحة', 'جلسة', 'طارئة', 'لمناقشة', 'أزمة',
+    'المياه', 'الزراعة', 'الصناعة', 'التجارة', 'الخارجية', 'الداخلية', 'النقل', 'الكهرباء',
+    'البرلمان', 'لجنة', 'الخطة', 'والموازنة', 'تصويت', 'مشروع', 'الطرق', 'الجديدة', 'الإسكان',
+)
+
+
+def make_title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 12))) + f' {rng.randint(1, 9999)}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suggestion prefix index benchmark')
+    parser.add_argument('--titles', type=int, default=100000, help='Number of indexed titles')
+    parser.add_argument('--queries', type=int, default=20000, help='Number of timed suggestions')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    titles = [make_title(rng) for _ in range(args.titles)]
+
+    index = PrefixIndex()
+    started = time.perf_counter()
+    index.build((i, title, {'id': i, 'title': title}, i) for i, title in enumerate(titles))
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f'build: {args.titles} titles, {len(index._positions)} word starts in {build_ms:.0f} ms')
+
+    prefixes = []
+    for _ in range(args.queries):
+        word = rng.choice(WORDS)
+        prefixes.append(word[:rng.randint(2, len(word))])
+
+    timings = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.search(prefix, 10)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+    print(f'suggest: p50 {percentile(0.5):.3f} ms, p99 {percentile(0.99):.3f} ms, max {timings[-1]:.3f} ms')
+
+    started = time.perf_counter()
+    for i in range(1000):
+        index.add(('new', i), make_title(rng), {'id': i}, 0)
+    print(f'incremental add: {(time.perf_counter() - started):.3f} ms per title')
+
+
+if __name__ == '__main__':
+    main()
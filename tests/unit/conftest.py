@@ -0,0 +1,58 @@
+"""
+Shared fixtures for the news service unit tests
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from flask import Flask
+
+from app.models import db, NewsCategory, NewsTag, NewsItem
+
+
+@pytest.fixture
+def news_app():
+    """Flask application bound to an in-memory SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['TESTING'] = True
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def make_news(news_app):
+    """Factory creating published news items spread over a few categories and tags"""
+    def _make_news(count, categories=3, tags=4):
+        category_objs = [
+            NewsCategory(name=f'تصنيف {i}', name_en=f'Category {i}')
+            for i in range(categories)
+        ]
+        tag_objs = [NewsTag(name=f'علامة {i}', name_en=f'Tag {i}') for i in range(tags)]
+        db.session.add_all(category_objs + tag_objs)
+
+        now = datetime.utcnow()
+        items = []
+        for i in range(count):
+            item = NewsItem(
+                title=f'خبر {i}',
+                slug=f'news-{i}',
+                content=f'محتوى الخبر {i}',
+                category=category_objs[i % categories],
+                status='published',
+                is_published=True,
+                priority=i % 3,
+                published_at=now - timedelta(minutes=i)
+            )
+            item.tags = [tag_objs[i % tags], tag_objs[(i + 1) % tags]]
+            items.append(item)
+        db.session.add_all(items)
+        db.session.commit()
+        return items
+
+    return _make_news
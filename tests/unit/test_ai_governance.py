@@ -2,6 +2,10 @@
 Unit tests for AI Governance components
 """
 
+import time
+from datetime import timedelta
+import unittest
+
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from django.test import TestCase, RequestFactory
@@ -9,9 +13,21 @@ from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.conf import settings
 
-from app.ai_governance.models import AIModel, AIRequest, AIUsageQuota, AIContentFilter
+from app.ai_governance.models import AIModel, AIRequest, AIUsageQuota, AIContentFilter, AIAuditLog
 from app.ai_governance.filters import ProfanityFilter, BiasDetectionFilter, FactCheckFilter
-from app.ai_governance.utils.rate_limiter import RateLimiter, AdaptiveRateLimiter
+from app.ai_governance.utils.rate_limiter import RateLimiter, AdaptiveRateLimiter, RateLimitDecision
+from app.ai_governance.utils.sliding_window import SlidingWindowCounter, PEEK, RECORD
+from app.ai_governance.utils.token_bucket import TokenBucket
+from app.ai_governance.utils.quota_table import QuotaTable
+from app.ai_governance.utils.local_limiter import LocalPreLimiter
+from app.ai_governance.utils.sliding_window import SlidingWindowLog
+from app.ai_governance.utils.audit_writer import AuditLogWriter
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 - fakeredis needs it to run Lua scripts
+except ImportError:
+    fakeredis = None
 from app.ai_governance.middleware import AIGovernanceMiddleware
 
 
@@ -222,6 +238,295 @@ class TestRateLimiter(TestCase):
         # This might be allowed or not depending on the adaptive algorithm
         self.assertIsInstance(is_allowed, bool)
 
+    def test_acquire_checks_and_records_together(self):
+        """Test that acquire counts allowed requests and stops at the limit"""
+        results = [self.rate_limiter.acquire(self.user, None, '127.0.0.1') for i in range(11)]
+
+        self.assertEqual(results, [True] * 10 + [False])
+        stats = self.rate_limiter.get_usage_stats(self.user, None, '127.0.0.1')
+        self.assertEqual(stats['minute']['requests_made'], 10)
+
+    def test_evaluate_returns_structured_decision(self):
+        """Test that one evaluation reports the tripped window, retry time and remaining requests"""
+        for i in range(10):
+            self.rate_limiter.record_request(self.user, None, '127.0.0.1')
+
+        decision = self.rate_limiter.evaluate(self.user, None, '127.0.0.1')
+
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.window, 'minute')
+        self.assertTrue(1 <= decision.retry_after <= 60)
+        self.assertEqual(decision.remaining, {'minute': 0, 'hour': 90, 'day': 990})
+
+
+@pytest.mark.unit
+class TestSlidingWindowCounter(TestCase):
+    """Test the sliding window counter backend"""
+
+    def setUp(self):
+        self.backend = SlidingWindowCounter()
+        self.limits = {'minute': 10}
+        cache.clear()
+
+    def test_previous_bucket_is_weighted_by_overlap(self):
+        """Test that requests of the previous minute fade out as the window slides"""
+        for i in range(10):
+            self.backend.hit('user:1', self.limits, mode=RECORD, now=119.0)
+
+        self.assertFalse(self.backend.hit('user:1', self.limits, mode=PEEK, now=120.0).allowed)
+        self.assertEqual(self.backend.hit('user:1', self.limits, mode=PEEK, now=150.0).counts['minute'], 5)
+        self.assertTrue(self.backend.hit('user:1', self.limits, mode=PEEK, now=179.0).allowed)
+
+    def test_retry_after_is_when_the_window_admits_again(self):
+        """Test that retry_after points at the first moment the estimate fits the limit"""
+        for i in range(10):
+            self.backend.hit('user:1', self.limits, mode=RECORD, now=130.0)
+
+        result = self.backend.hit('user:1', self.limits, mode=PEEK, now=150.0)
+
+        self.assertEqual(result.retry_after, 30.0)
+        self.assertFalse(self.backend.hit('user:1', self.limits, mode=PEEK, now=179.9).allowed)
+        self.assertTrue(self.backend.hit('user:1', self.limits, mode=PEEK, now=180.1).allowed)
+
+    def test_tripped_window_is_reported(self):
+        """Test that the first exceeded window is returned and nothing is recorded"""
+        limits = {'minute': 10, 'hour': 2}
+        self.backend.hit('user:1', limits, now=1000.0)
+        self.backend.hit('user:1', limits, now=1001.0)
+
+        result = self.backend.hit('user:1', limits, now=1002.0)
+
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.window, 'hour')
+        self.assertEqual(result.counts, {'minute': 2, 'hour': 2})
+
+    def test_redis_uses_one_script_call_for_all_windows(self):
+        """Test that with Redis the check and record of every window is one round trip"""
+        connection = Mock()
+        connection.register_script.return_value = Mock(return_value=[0, 1, 0, 1, 0, 1, 0])
+        backend = SlidingWindowCounter(connection)
+
+        result = backend.hit('user:1', {'minute': 10, 'hour': 100, 'day': 1000}, now=1000.0)
+
+        self.assertTrue(result.allowed)
+        script = connection.register_script.return_value
+        script.assert_called_once()
+        self.assertEqual(len(script.call_args.kwargs['keys']), 6)
+
+
+@pytest.mark.unit
+class TestTokenBucket(TestCase):
+    """Test the token bucket backend"""
+
+    def setUp(self):
+        self.backend = TokenBucket()
+        self.limits = {'minute': 6}
+        cache.clear()
+
+    def test_burst_then_lazy_refill(self):
+        """Test that a full bucket allows a burst and refills with elapsed time"""
+        results = [self.backend.hit('user:1', self.limits, now=1000.0).allowed for i in range(7)]
+        self.assertEqual(results, [True] * 6 + [False])
+
+        # One request refills every 10 seconds
+        result = self.backend.hit('user:1', self.limits, mode=PEEK, now=1000.0)
+        self.assertEqual(result.retry_after, 10.0)
+        self.assertFalse(self.backend.hit('user:1', self.limits, now=1009.0).allowed)
+        self.assertTrue(self.backend.hit('user:1', self.limits, now=1010.0).allowed)
+
+    def test_state_is_two_numbers_per_window(self):
+        """Test that the stored state is only the level and the update time"""
+        self.backend.hit('user:1', self.limits, now=1000.0)
+
+        self.assertEqual(cache.get('token_bucket:user:1:minute'), (5, 1000.0))
+
+
+@pytest.mark.unit
+class TestQuotaLimits(TestCase):
+    """Test rate limits resolved from AIUsageQuota"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.ai_model = AIModel.objects.create(name='gpt-4', provider='openai', model_type='text')
+        AIUsageQuota.objects.create(quota_type='user', period='minute', max_requests=5, max_tokens=500)
+        AIUsageQuota.objects.create(quota_type='user', period='hour', max_requests=20, max_tokens=2000,
+                                    user=self.user)
+        AIUsageQuota.objects.create(quota_type='user', period='minute', max_requests=2, max_tokens=100,
+                                    user=self.user, ai_model=self.ai_model)
+        self.table = QuotaTable()
+        cache.clear()
+
+    def test_specific_quotas_override_defaults(self):
+        """Test that user and model rows override the quota type defaults"""
+        limits, model_scoped = self.table.limits_for('user', self.user.id)
+        self.assertEqual((limits['requests_per_minute'], limits['requests_per_hour']), (5, 20))
+        self.assertFalse(model_scoped)
+
+        limits, model_scoped = self.table.limits_for('user', self.user.id, self.ai_model.id)
+        self.assertEqual(limits['requests_per_minute'], 2)
+        self.assertTrue(model_scoped)
+
+    def test_lookups_do_not_query_until_refresh(self):
+        """Test that quotas are read once and reloaded after a change"""
+        self.table.limits_for('user', self.user.id)
+        with self.assertNumQueries(0):
+            self.table.limits_for('user', self.user.id, self.ai_model.id)
+
+        AIUsageQuota.objects.filter(user__isnull=True).update(max_requests=7)
+        self.table.refresh_interval = 0
+        self.assertEqual(self.table.limits_for('user', None)[0]['requests_per_minute'], 7)
+
+    def test_rate_limiter_counts_model_quotas_per_model(self):
+        """Test that a model specific quota has its own usage"""
+        rate_limiter = RateLimiter()
+
+        results = [rate_limiter.acquire(self.user, None, '127.0.0.1') for i in range(3)]
+        decision = rate_limiter.evaluate(self.user, None, '127.0.0.1', record=True, ai_model_id=self.ai_model.id)
+
+        self.assertEqual(results, [True, True, True])
+        self.assertTrue(decision.allowed)
+        self.assertEqual(decision.limits['minute'], 2)
+        self.assertEqual(decision.remaining['minute'], 1)
+
+    def test_model_usage_is_recorded_and_read_per_model(self):
+        """Test that tokens and stats use the same model scoped usage as evaluate"""
+        rate_limiter = RateLimiter()
+
+        rate_limiter.acquire(self.user, None, '127.0.0.1', ai_model_id=self.ai_model.id)
+        rate_limiter.record_usage(self.user, None, '127.0.0.1', tokens_used=50, ai_model_id=self.ai_model.id)
+        model_stats = rate_limiter.get_usage_stats(self.user, None, '127.0.0.1', ai_model_id=self.ai_model.id)
+        stats = rate_limiter.get_usage_stats(self.user, None, '127.0.0.1')
+
+        self.assertEqual(model_stats['minute']['requests_made'], 1)
+        self.assertEqual(model_stats['minute']['requests_limit'], 2)
+        self.assertEqual(model_stats['minute']['tokens_used'], 50)
+        self.assertEqual((stats['minute']['requests_made'], stats['minute']['tokens_used']), (0, 0))
+
+    def test_token_quotas_are_enforced(self):
+        """Test that requests are refused, and not counted, once max_tokens is used up"""
+        rate_limiter = RateLimiter()
+
+        rate_limiter.acquire(self.user, None, '127.0.0.1', ai_model_id=self.ai_model.id)
+        rate_limiter.record_usage(self.user, None, '127.0.0.1', tokens_used=100, ai_model_id=self.ai_model.id)
+        decision = rate_limiter.evaluate(self.user, None, '127.0.0.1', record=True, ai_model_id=self.ai_model.id)
+
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.window, 'tokens_per_minute')
+        self.assertEqual(decision.retry_after, 60)
+        self.assertEqual(decision.remaining['minute'], 1)
+        self.assertTrue(rate_limiter.acquire(self.user, None, '127.0.0.1'))
+
+
+@pytest.mark.unit
+class TestLocalPreLimiter(TestCase):
+    """Test the in-process pre-limiter with many simulated workers"""
+
+    workers = 8
+    lease_size = 10
+    limits = {'minute': 100}
+
+    def setUp(self):
+        cache.clear()
+
+    def _simulate(self, backend, requests=3000, interval=0.01, local=True):
+        """Send one client's requests round-robin through the workers on a simulated clock"""
+        if local:
+            workers = [LocalPreLimiter(backend, lease_size=self.lease_size) for i in range(self.workers)]
+            hit = lambda i, now: workers[i % self.workers].hit('user:1', self.limits, now=now)
+        else:
+            workers = []
+            hit = lambda i, now: backend.hit('user:1', self.limits, now=now)
+
+        admitted = []
+        for i in range(requests):
+            now = 1000.0 + i * interval
+            if hit(i, now).allowed:
+                admitted.append(now)
+        return workers, admitted
+
+    @staticmethod
+    def _max_in_window(admitted, seconds=60):
+        """Most requests admitted in any sliding window"""
+        most, start = 0, 0
+        for end, now in enumerate(admitted):
+            while admitted[start] <= now - seconds:
+                start += 1
+            most = max(most, end - start + 1)
+        return most
+
+    def _assert_bounded(self, make_backend):
+        _, direct = self._simulate(make_backend(), local=False)
+        cache.clear()
+        workers, leased = self._simulate(make_backend())
+
+        over_admission = self._max_in_window(leased) - self._max_in_window(direct)
+        self.assertLessEqual(over_admission, self.workers * self.lease_size)
+        return workers
+
+    def test_over_admission_is_bounded_by_leases_in_flight(self):
+        """Test that leasing admits at most workers * lease_size more than the shared limiter"""
+        workers = self._assert_bounded(SlidingWindowCounter)
+
+        shared = sum(worker.stats['shared'] for worker in workers)
+        local = sum(worker.stats['local'] for worker in workers)
+        self.assertGreater(local, shared)
+
+    def test_clients_far_under_the_limit_are_answered_locally(self):
+        """Test that most requests of a busy client are served from leases"""
+        self.limits = {'minute': 10000}
+        workers, admitted = self._simulate(SlidingWindowCounter(), requests=800)
+
+        self.assertEqual(len(admitted), 800)
+        self.assertLess(sum(worker.stats['shared'] for worker in workers), 800 // 5)
+
+    def test_slow_clients_are_admitted_up_to_the_limit(self):
+        """Test that leases expiring unused do not use up a slow client's allowance"""
+        limits = {'minute': 10}
+        for backend in (SlidingWindowCounter(None), TokenBucket(None)):
+            cache.clear()
+            limiter = LocalPreLimiter(backend, lease_size=10)
+            admitted = [limiter.hit('user:1', limits, now=1000.0 + i * 3).allowed for i in range(10)]
+
+            self.assertEqual(admitted.count(True), 10, type(backend).__name__)
+            self.assertGreater(limiter.stats['released'], 0)
+
+    def test_evicted_leases_are_given_back(self):
+        """Test that evicting an identifier returns its unused allotment"""
+        backend = SlidingWindowCounter(None)
+        limiter = LocalPreLimiter(backend, lease_size=10, max_identifiers=1)
+        limiter.hit('user:1', self.limits, now=1000.0)
+        self.assertGreater(backend.counts('user:1', self.limits, now=1000.0)['minute'], 1)
+
+        limiter.hit('user:2', self.limits, now=1000.0)
+        self.assertEqual(backend.counts('user:1', self.limits, now=1000.0)['minute'], 1)
+
+    def test_refusals_are_remembered_until_retry_after(self):
+        """Test that a refused client is turned away locally until the window admits again"""
+        limiter = LocalPreLimiter(SlidingWindowCounter(), lease_size=self.lease_size)
+        for i in range(100):
+            limiter.hit('user:1', self.limits, now=1000.0)
+
+        refused = limiter.hit('user:1', self.limits, now=1000.0)
+        shared = limiter.stats['shared']
+        again = limiter.hit('user:1', self.limits, now=1001.0)
+
+        self.assertFalse(refused.allowed)
+        self.assertFalse(again.allowed)
+        self.assertEqual(limiter.stats['shared'], shared)
+        self.assertAlmostEqual(again.retry_after, refused.retry_after - 1.0)
+
+    @unittest.skipUnless(fakeredis, 'fakeredis with Lua support is not installed')
+    def test_over_admission_with_redis_scripts(self):
+        """Test the bound against the exact sorted set limiter on a fake Redis"""
+        server = fakeredis.FakeServer()
+
+        def make_backend():
+            connection = fakeredis.FakeRedis(server=server)
+            connection.flushall()
+            return SlidingWindowLog(connection)
+
+        self._assert_bounded(make_backend)
+
 
 @pytest.mark.unit
 class TestAIGovernanceMiddleware(TestCase):
@@ -262,10 +567,11 @@ class TestAIGovernanceMiddleware(TestCase):
     @patch('app.ai_governance.middleware.RateLimiter')
     def test_middleware_blocks_rate_limited_requests(self, mock_rate_limiter_class):
         """Test that middleware blocks rate-limited requests"""
-        # Mock rate limiter to return False
+        # Mock rate limiter to refuse the request
         mock_rate_limiter = Mock()
-        mock_rate_limiter.is_allowed.return_value = False
-        mock_rate_limiter.get_retry_after.return_value = 60
+        mock_rate_limiter.evaluate.return_value = RateLimitDecision(
+            allowed=False, identifier='user:1', window='hour', retry_after=42
+        )
         mock_rate_limiter_class.return_value = mock_rate_limiter
         
         # Create new middleware instance with mocked rate limiter
@@ -280,6 +586,30 @@ class TestAIGovernanceMiddleware(TestCase):
         
         self.assertIsNotNone(response)
         self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '42')
+        # The decision is reused instead of querying the limiter again
+        mock_rate_limiter.evaluate.assert_called_once()
+        mock_rate_limiter.get_retry_after.assert_not_called()
+
+    @patch('app.ai_governance.middleware.RateLimiter')
+    def test_middleware_passes_the_requested_model(self, mock_rate_limiter_class):
+        """Test that the model named in the request scopes rate limiting and usage"""
+        ai_model = AIModel.objects.create(name='gpt-4', provider='openai', model_type='text')
+        mock_rate_limiter = Mock()
+        mock_rate_limiter.evaluate.return_value = RateLimitDecision(allowed=True, identifier='user:1')
+        mock_rate_limiter_class.return_value = mock_rate_limiter
+        middleware = AIGovernanceMiddleware(lambda request: None)
+        middleware.quota_checker = Mock(check_quota=Mock(return_value={'allowed': True}))
+        middleware.audit_writer = Mock()
+
+        request = self.factory.post('/api/v1/chat/', data={'model': 'gpt-4'}, content_type='application/json')
+        request.user = self.user
+        request.session = MagicMock()
+        middleware.process_request(request)
+        middleware.process_response(request, Mock(status_code=200))
+
+        self.assertEqual(mock_rate_limiter.evaluate.call_args.kwargs['ai_model_id'], ai_model.id)
+        self.assertEqual(mock_rate_limiter.record_usage.call_args.kwargs['ai_model_id'], ai_model.id)
 
     def test_middleware_validates_request_size(self):
         """Test that middleware validates request size"""
@@ -298,6 +628,68 @@ class TestAIGovernanceMiddleware(TestCase):
         self.assertEqual(response.status_code, 413)
 
 
+@pytest.mark.unit
+class TestAuditLogWriter(TestCase):
+    """Test the batched audit log writer"""
+
+    def _submit(self, writer, count):
+        return [writer.submit(action='request_completed', description=f'Request {i}') for i in range(count)]
+
+    def test_flush_writes_queued_records_with_one_insert(self):
+        """Test that queued records reach the database in a single bulk insert"""
+        writer = AuditLogWriter(background=False)
+        self._submit(writer, 5)
+        self.assertEqual(AIAuditLog.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            writer.flush()
+
+        self.assertEqual(AIAuditLog.objects.count(), 5)
+        metrics = writer.metrics()
+        self.assertEqual((metrics['written'], metrics['batches'], metrics['queue_depth']), (5, 1, 0))
+
+    def test_created_at_is_the_submit_time(self):
+        """Test that records keep the time they were submitted, not the time of the write"""
+        writer = AuditLogWriter(background=False)
+        self._submit(writer, 1)
+        submitted = writer._queue[0].created_at
+
+        with patch('django.utils.timezone.now', return_value=submitted + timedelta(minutes=5)):
+            writer.flush()
+
+        self.assertEqual(AIAuditLog.objects.get().created_at, submitted)
+
+    def test_overflow_policies(self):
+        """Test dropping new records, evicting the oldest and blocking with a timeout"""
+        for overflow, accepted, kept in [('drop', [True, True, False], ['Request 0', 'Request 1']),
+                                         ('oldest', [True, True, True], ['Request 1', 'Request 2']),
+                                         ('block', [True, True, False], ['Request 0', 'Request 1'])]:
+            writer = AuditLogWriter(max_queue=2, overflow=overflow, block_timeout=0.01, background=False)
+
+            self.assertEqual(self._submit(writer, 3), accepted)
+            self.assertEqual([record.description for record in writer._queue], kept)
+            self.assertEqual(writer.metrics()['dropped'], 1)
+            self.assertEqual(writer.metrics()['queue_depth'], 2)
+
+        with self.assertRaises(ValueError):
+            AuditLogWriter(overflow='spill')
+
+    def test_background_batches_and_shutdown_flush(self):
+        """Test that full batches are written in the background and the rest on shutdown"""
+        writer = AuditLogWriter(batch_size=3, flush_interval=60)
+        batches = []
+        writer._write = lambda batch: batches.append(len(batch)) or len(batch)
+
+        self._submit(writer, 7)
+        deadline = time.monotonic() + 5
+        while sum(batches) < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.shutdown()
+
+        self.assertEqual(batches, [3, 3, 1])
+        self.assertEqual(writer.metrics()['queue_depth'], 0)
+
+
 @pytest.mark.unit
 class TestAIGovernanceIntegration(TestCase):
     """Test integration between AI governance components"""
@@ -0,0 +1,170 @@
+"""
+Unit tests for the news archiver
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import (
+    db, NewsItem, NewsComment, NewsStats, NewsArchive, NewsSlugRedirect, news_tags_association,
+    news_comments_archive, news_stats_archive
+)
+from app.utils.archiver import NewsArchiver, resolve_archived_slug
+
+
+@pytest.fixture
+def archiver(news_app):
+    news_app.config['AUTO_ARCHIVE_DAYS'] = 30
+    news_app.config['ARCHIVE_BATCH_SIZE'] = 2
+    return NewsArchiver(news_app)
+
+
+def _age(items, days):
+    now = datetime.utcnow()
+    for item in items:
+        item.published_at = now - timedelta(days=days)
+    db.session.commit()
+
+
+@pytest.mark.unit
+class TestNewsArchiver:
+    """Test which items are archived and what is kept"""
+
+    def test_expired_and_old_items_are_moved_in_batches(self, news_app, make_news, archiver):
+        """Items past expires_at or AUTO_ARCHIVE_DAYS move to the archive, the rest stay"""
+        items = make_news(6)
+        items[0].expires_at = datetime.utcnow() - timedelta(hours=1)
+        items[1].expires_at = datetime.utcnow() + timedelta(days=1)
+        _age(items[2:5], 40)
+        archived_ids = {items[0].id, items[2].id, items[3].id, items[4].id}
+
+        report = archiver.run()
+
+        assert report['moved'] == 4
+        assert report['batches'] == 2
+        assert report['seconds'] >= 0
+        assert {item.news_item_id for item in NewsArchive.query.all()} == archived_ids
+        assert {item.id for item in NewsItem.query.all()} == {items[1].id, items[5].id}
+        assert archiver.run()['moved'] == 0
+
+    def test_archive_keeps_content_tags_and_counters(self, news_app, make_news, archiver):
+        """The archive row has the item's fields, tag names and status archived"""
+        items = make_news(1)
+        items[0].view_count = 42
+        items[0].expires_at = datetime.utcnow() - timedelta(days=1)
+        db.session.commit()
+        item_id, tag_names = items[0].id, sorted(tag.name for tag in items[0].tags)
+
+        archiver.run()
+
+        archived = NewsArchive.query.filter_by(news_item_id=item_id).one()
+        assert archived.status == 'archived'
+        assert archived.slug == 'news-0'
+        assert archived.view_count == 42
+        assert sorted(archived.get_tags()) == tag_names
+        assert archived.to_dict()['is_active'] is False
+
+    def test_dependent_rows_move_to_the_archive_tables(self, news_app, make_news, archiver):
+        """Comments and stats of archived items move to the archive tables, tag links are removed"""
+        items = make_news(2)
+        db.session.add_all([
+            NewsComment(news_item_id=items[0].id, user_name='زائر', content='تعليق'),
+            NewsStats(news_item_id=items[0].id, date=datetime.utcnow().date(), views=3),
+        ])
+        _age(items[:1], 40)
+        category = items[0].category
+
+        archiver.run()
+
+        archive_id = NewsArchive.query.one().id
+        assert NewsComment.query.count() == 0
+        assert NewsStats.query.count() == 0
+        comments = db.session.execute(news_comments_archive.select()).all()
+        stats = db.session.execute(news_stats_archive.select()).all()
+        assert [(row.archive_id, row.content) for row in comments] == [(archive_id, 'تعليق')]
+        assert [(row.archive_id, row.views) for row in stats] == [(archive_id, 3)]
+        assert db.session.query(news_tags_association).filter_by(news_item_id=items[1].id).count() == 2
+        assert db.session.query(news_tags_association).count() == 2
+        db.session.refresh(category)
+        assert category.published_count == 0
+
+    def test_reused_item_ids_are_archived_again(self, news_app, make_news, archiver):
+        """An item that got the id of an archived item is archived under a new archive id"""
+        items = make_news(1)
+        item_id = items[0].id
+        _age(items, 40)
+        archiver.run()
+
+        item = NewsItem(id=item_id, title='خبر جديد', slug='news-new', content='محتوى',
+                        category_id=items[0].category_id, is_published=True,
+                        published_at=datetime.utcnow() - timedelta(days=40))
+        db.session.add(item)
+        db.session.commit()
+
+        assert archiver.run()['moved'] == 1
+        archived = NewsArchive.query.order_by(NewsArchive.id).all()
+        assert [row.news_item_id for row in archived] == [item_id, item_id]
+        assert resolve_archived_slug('news-new') == archived[1].id
+        assert NewsItem.query.count() == 0
+
+    def test_drafts_are_never_archived(self, news_app, make_news, archiver):
+        """Old or expired unpublished drafts stay editable and get no public redirect"""
+        items = make_news(1)
+        items[0].is_published = False
+        items[0].expires_at = datetime.utcnow() - timedelta(days=1)
+        _age(items, 400)
+
+        assert archiver.run()['moved'] == 0
+
+
+@pytest.mark.unit
+class TestSlugRedirects:
+    """Test that archived slugs stay resolvable"""
+
+    def test_archived_slug_resolves_to_the_archive(self, news_app, make_news, archiver):
+        """The redirect index maps the old slug to the archive row"""
+        items = make_news(2)
+        _age(items[:1], 40)
+        item_id = items[0].id
+
+        archiver.run()
+
+        assert resolve_archived_slug('news-0') == NewsArchive.query.filter_by(news_item_id=item_id).one().id
+        assert resolve_archived_slug('news-1') is None
+        assert NewsSlugRedirect.query.count() == 1
+
+    def test_failed_batch_is_rolled_back(self, news_app, make_news, archiver, monkeypatch):
+        """An error leaves the batch's items in news_items"""
+        items = make_news(2)
+        _age(items, 40)
+        monkeypatch.setattr(db.session, 'delete', lambda item: (_ for _ in ()).throw(RuntimeError('boom')))
+
+        report = archiver.run()
+        monkeypatch.undo()
+
+        assert (report['moved'], report['failed']) == (0, 2)
+        assert NewsItem.query.count() == 2
+        assert NewsArchive.query.count() == 0
+        assert NewsSlugRedirect.query.count() == 0
+
+    def test_failing_item_does_not_block_the_rest(self, news_app, make_news, archiver, monkeypatch):
+        """The failing batch is retried item by item and the failing item is skipped"""
+        items = make_news(5)
+        _age(items, 40)
+        failing_id = items[1].id
+        delete = db.session.delete
+
+        def fail_for_one_item(item):
+            if item.id == failing_id:
+                raise RuntimeError('boom')
+            delete(item)
+
+        monkeypatch.setattr(db.session, 'delete', fail_for_one_item)
+        report = archiver.run()
+
+        assert (report['moved'], report['failed'], report['batches']) == (4, 1, 3)
+        assert [item.id for item in NewsItem.query.all()] == [failing_id]
+        assert NewsArchive.query.filter_by(news_item_id=failing_id).count() == 0
+        assert resolve_archived_slug('news-1') is None
+
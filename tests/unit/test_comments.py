@@ -0,0 +1,148 @@
+"""
+Unit tests for the threaded comments page
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, NewsComment, NewsItem
+from app.utils.comments import build_comment_tree, comment_thread_page, decode_thread_cursor
+from app.utils.pagination import InvalidCursor
+
+START = datetime(2024, 5, 1, 8, 0)
+
+
+@pytest.fixture
+def article(make_news):
+    return make_news(2)[0]
+
+
+@pytest.fixture
+def add_comment(article):
+    minutes = iter(range(10 ** 6))
+
+    def _add_comment(parent=None, news_item=article, **flags):
+        flags.setdefault('is_approved', True)
+        comment = NewsComment(
+            news_item_id=news_item.id, user_name='زائر', content='تعليق', parent=parent,
+            created_at=START + timedelta(minutes=next(minutes)), **flags
+        )
+        db.session.add(comment)
+        db.session.flush()
+        return comment
+
+    return _add_comment
+
+
+def _shape(threads):
+    return [(thread['id'], _shape(thread['replies'])) for thread in threads]
+
+
+@pytest.mark.unit
+class TestCommentTree:
+    """Test the in-memory assembly of reply trees"""
+
+    def test_replies_nest_under_their_parents_with_counts(self, news_app, add_comment, article):
+        """Nested replies are attached in chronological order and counted per node"""
+        first = add_comment()
+        second = add_comment()
+        reply = add_comment(parent=first)
+        nested = add_comment(parent=reply)
+        other_reply = add_comment(parent=first)
+        db.session.commit()
+
+        threads, next_cursor = comment_thread_page(article.id, per_page=10)
+
+        assert _shape(threads) == [
+            (second.id, []),
+            (first.id, [(reply.id, [(nested.id, [])]), (other_reply.id, [])]),
+        ]
+        assert threads[1]['replies_count'] == 2
+        assert threads[1]['replies'][0]['replies_count'] == 1
+        assert next_cursor is None
+
+    def test_hidden_comments_are_left_out(self, news_app, add_comment, article):
+        """Pending, spam and other articles' comments, and the replies under them, are not shown"""
+        visible = add_comment()
+        pending = add_comment(is_approved=False)
+        add_comment(parent=pending)
+        add_comment(is_spam=True)
+        add_comment(news_item=NewsItem.query.filter_by(slug='news-1').one())
+        db.session.commit()
+
+        threads, _ = comment_thread_page(article.id, per_page=10)
+
+        assert _shape(threads) == [(visible.id, [])]
+
+    def test_deleted_comments_keep_their_replies(self, news_app, add_comment, article):
+        """A deleted comment with replies stays as a placeholder, without replies it is dropped"""
+        deleted_parent = add_comment(is_deleted=True)
+        reply = add_comment(parent=deleted_parent)
+        add_comment(is_deleted=True)
+        kept = add_comment()
+        add_comment(parent=kept, is_deleted=True)
+        db.session.commit()
+
+        threads, _ = comment_thread_page(article.id, per_page=10)
+
+        assert _shape(threads) == [(kept.id, []), (deleted_parent.id, [(reply.id, [])])]
+        assert threads[0]['replies_count'] == 0
+        assert threads[1]['content'] is None and threads[1]['user_name'] is None
+
+    def test_build_comment_tree_is_linear(self):
+        """A deep chain of replies is assembled without recursion limits"""
+        comments = [
+            NewsComment(id=i, parent_id=i - 1 if i else None, user_name='زائر', content='تعليق',
+                        is_deleted=False, created_at=START + timedelta(seconds=i))
+            for i in range(5000)
+        ]
+
+        threads = build_comment_tree(comments)
+
+        assert len(threads) == 1 and threads[0]['replies_count'] == 1
+
+
+@pytest.mark.unit
+class TestThreadPagination:
+    """Test cursor pagination over top-level threads"""
+
+    def test_pages_cover_every_thread_once(self, news_app, add_comment, article):
+        """Following next_cursor walks the threads newest first, replies included"""
+        roots = [add_comment() for _ in range(5)]
+        for root in roots:
+            add_comment(parent=root)
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            threads, cursor = comment_thread_page(article.id, per_page=2, cursor=cursor)
+            assert all(thread['replies_count'] == 1 for thread in threads)
+            seen += [thread['id'] for thread in threads]
+            if cursor is None:
+                break
+
+        assert seen == [root.id for root in reversed(roots)]
+
+    def test_a_page_is_one_query(self, news_app, add_comment, article):
+        """Threads and replies are read with a single SELECT"""
+        for _ in range(3):
+            add_comment(parent=add_comment(parent=add_comment()))
+        db.session.commit()
+        article_id = article.id
+        db.session.expire_all()
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            comment_thread_page(article_id, per_page=2)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert len(statements) == 1
+
+    def test_invalid_cursor(self):
+        """Malformed cursors are rejected"""
+        with pytest.raises(InvalidCursor):
+            decode_thread_cursor('not-a-cursor')
@@ -0,0 +1,79 @@
+"""
+Unit tests for the orjson JSON provider and the model serializers
+"""
+
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.models import NewsItem, NewsCategory
+from app.utils import json_provider
+from app.utils.json_provider import OrjsonProvider
+
+
+@pytest.fixture
+def provider(news_app):
+    news_app.json = OrjsonProvider(news_app)
+    return news_app.json
+
+
+def _page():
+    return NewsItem.query.options(*NewsItem.listing_options()) \
+        .order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()) \
+        .all()
+
+
+@pytest.mark.unit
+class TestModelSerializer:
+    """Test the schema-driven serializers behind to_dict()"""
+
+    def test_native_output_encodes_like_to_dict(self, news_app, make_news, provider):
+        """Native datetimes encode to the same ISO strings to_dict() produces"""
+        make_news(10)
+        items = _page()
+
+        native = provider.loads(provider.dumps(NewsItem.serialize_many(items, include_content=True, native=True)))
+        assert native == [item.to_dict(include_content=True) for item in items]
+        assert native[0]['published_at'] == items[0].published_at.isoformat()
+
+    def test_to_dict_keeps_string_dates(self, news_app, make_news):
+        """to_dict() output stays serializable by the standard json module"""
+        make_news(2)
+        data = NewsItem.query.first().to_dict(include_content=True)
+
+        assert isinstance(data['created_at'], str)
+        assert data['content'] == 'محتوى الخبر 0'
+        assert data['category']['news_count'] == NewsCategory.query.get(data['category']['id']).published_count
+        json.dumps(data)
+
+
+@pytest.mark.unit
+class TestOrjsonProvider:
+    """Test the orjson-backed Flask JSON provider"""
+
+    def test_response_encodes_native_types(self, news_app, make_news, provider):
+        """jsonify() output handles datetimes, decimals and UUIDs"""
+        make_news(1)
+        item = NewsItem.query.first()
+        token = uuid.uuid4()
+
+        with news_app.test_request_context():
+            response = provider.response({'item': item.to_dict(native=True), 'score': Decimal('1.5'), 'token': token})
+
+        assert response.mimetype == 'application/json'
+        body = json.loads(response.get_data())
+        assert body['item']['published_at'] == item.published_at.isoformat()
+        assert body['score'] == '1.5'
+        assert body['token'] == str(token)
+
+    def test_fallback_without_orjson_uses_iso_dates(self, news_app, make_news, provider, monkeypatch):
+        """Without orjson the default provider still emits ISO dates"""
+        make_news(3)
+        expected = provider.dumps(NewsItem.serialize_many(_page(), native=True))
+
+        monkeypatch.setattr(json_provider, 'orjson', None)
+        fallback = provider.dumps(NewsItem.serialize_many(_page(), native=True))
+
+        assert json.loads(fallback) == json.loads(expected)
@@ -0,0 +1,89 @@
+"""
+Query plan regression tests for the news listing indexes
+"""
+
+import itertools
+import re
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app.models import db, NewsItem
+from app.utils.migrations import upgrade_schema
+from app.utils.pagination import keyset_query, encode_cursor
+
+
+FILTER_VALUES = {
+    'category': (None, 'تصنيف 1'),
+    'tag': (None, 'علامة 2'),
+    'featured': (None, True),
+    'breaking': (None, True),
+}
+
+# A bare "SCAN <table>" (no index) in SQLite's plan is a full table scan
+FULL_SCAN = re.compile(r'^SCAN (news_items|news_item_tags|news_categories|news_tags)\b(?!.*USING)')
+
+
+def _listing_statements(filters, cursor):
+    """The offset, first cursor page and next cursor page statements of GET /api/news"""
+    query = NewsItem.listing_query(**filters)
+    yield query.order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()).limit(10).statement
+    yield keyset_query(query, 10).statement
+    yield keyset_query(query, 10, cursor).statement
+
+
+def _query_plan(statement):
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestListingQueryPlans:
+    """Every listing filter combination must be served by an index"""
+
+    def test_no_listing_combination_scans_a_table(self, news_app, make_news):
+        """EXPLAIN QUERY PLAN never reports a full table scan"""
+        items = make_news(40)
+        cursor = encode_cursor(items[20])
+        db.session.execute(text('ANALYZE'))
+
+        for values in itertools.product(*FILTER_VALUES.values()):
+            filters = dict(zip(FILTER_VALUES, values))
+            for statement in _listing_statements(filters, cursor):
+                plan = _query_plan(statement)
+                scans = [step for step in plan if FULL_SCAN.match(step)]
+                assert not scans, f'{filters}: {plan}'
+
+    def test_unfiltered_listing_needs_no_sort(self, news_app, make_news):
+        """The plain listing is read in index order without a temporary sort"""
+        make_news(40)
+        statement = NewsItem.listing_query() \
+            .order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()) \
+            .limit(10).statement
+        plan = _query_plan(statement)
+        assert any('idx_news_listing' in step for step in plan), plan
+        assert not any('TEMP B-TREE' in step for step in plan), plan
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestUpgradeSchema:
+    """Test upgrading an existing database to the current index plan"""
+
+    def test_upgrade_replaces_obsolete_indexes(self, news_app):
+        """Old indexes are dropped, missing ones created, and reruns are no-ops"""
+        db.session.execute(text('DROP INDEX idx_news_listing_category'))
+        db.session.execute(text('DROP INDEX idx_news_item_tags_tag'))
+        db.session.execute(text('CREATE INDEX idx_news_category ON news_items (category_id, is_published)'))
+        db.session.commit()
+
+        report = upgrade_schema()
+
+        assert report['indexes_dropped'] == ['idx_news_category']
+        assert sorted(report['indexes_created']) == ['idx_news_item_tags_tag', 'idx_news_listing_category']
+        index_names = {index['name'] for index in inspect(db.engine).get_indexes('news_items')}
+        assert 'idx_news_listing_category' in index_names
+        assert 'idx_news_category' not in index_names
+        assert upgrade_schema() == {'columns_added': [], 'indexes_created': [], 'indexes_dropped': []}
@@ -0,0 +1,221 @@
+"""
+Unit tests for comment submission and background moderation
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, NewsItem, NewsComment
+from app.utils import moderation as moderation_module
+from app.utils.moderation import CommentModerationQueue, InvalidComment, spam_score
+
+
+@pytest.fixture
+def moderation(news_app):
+    return CommentModerationQueue(news_app)
+
+
+@pytest.fixture
+def article(make_news):
+    return make_news(1)[0]
+
+
+def _comment_count(news_item_id):
+    return db.session.get(NewsItem, news_item_id).comment_count
+
+
+@pytest.mark.unit
+class TestSubmission:
+    """Test accepting new comments"""
+
+    def test_comments_are_saved_pending_and_queued(self, news_app, article, moderation):
+        """Submitting writes a pending comment without touching comment_count"""
+        comment = moderation.submit(article.id, 'زائر', '  تعليق جميل  ', user_ip='10.0.0.1')
+
+        assert comment.is_approved is False
+        assert comment.content == 'تعليق جميل'
+        assert moderation._pending == [comment.id]
+        assert _comment_count(article.id) == 0
+
+    @pytest.mark.parametrize('fields', [
+        {'user_name': '', 'content': 'تعليق'},
+        {'user_name': 'زائر', 'content': '   '},
+        {'user_name': 'زائر', 'content': 'x' * 501},
+        {'user_name': 'زائر', 'content': 'تعليق', 'parent_id': 999},
+    ])
+    def test_invalid_comments_are_rejected(self, news_app, article, moderation, fields):
+        """Missing names, empty or long content and unknown parents are refused"""
+        with pytest.raises(InvalidComment):
+            moderation.submit(article.id, **fields)
+        assert NewsComment.query.count() == 0
+
+    def test_without_moderation_comments_are_approved_at_once(self, news_app, article):
+        """With COMMENTS_MODERATION disabled the comment is approved and counted immediately"""
+        news_app.config['COMMENTS_MODERATION'] = False
+        moderation = CommentModerationQueue(news_app)
+
+        comment = moderation.submit(article.id, 'زائر', 'تعليق')
+
+        assert comment.is_approved is True
+        assert _comment_count(article.id) == 1
+        assert moderation._pending == []
+
+
+@pytest.mark.unit
+class TestModeration:
+    """Test the batched background moderation"""
+
+    def test_clean_comments_are_approved_and_counted(self, news_app, article, moderation):
+        """Approved comments add to comment_count as one delta per news item"""
+        for i in range(3):
+            moderation.submit(article.id, 'زائر', f'تعليق رقم {i}', user_ip=f'10.0.0.{i}')
+
+        assert moderation.flush() == 3
+
+        assert NewsComment.query.filter_by(is_approved=True).count() == 3
+        assert _comment_count(article.id) == 3
+        assert all(comment.spam_score == 0 for comment in NewsComment.query)
+
+    def test_spam_is_hidden_and_not_counted(self, news_app, article, moderation):
+        """Links, repeated characters and repeated posts are scored as spam"""
+        moderation.submit(article.id, 'زائر', 'اشتر الآن http://a.example http://b.example', user_ip='10.0.0.1')
+        moderation.submit(article.id, 'زائر', 'رائع', user_ip='10.0.0.2')
+        moderation.submit(article.id, 'زائر', 'رائع', user_ip='10.0.0.2')
+
+        moderation.flush()
+
+        spam = NewsComment.query.filter_by(is_spam=True).all()
+        assert len(spam) == 2
+        assert all(not comment.is_approved for comment in spam)
+        assert _comment_count(article.id) == 1
+
+    def test_severe_profanity_is_held_for_review(self, news_app, article, moderation):
+        """Comments rejected by ProfanityFilter stay pending with their score recorded"""
+        if moderation.profanity_filter is None:
+            pytest.skip('ProfanityFilter is not available')
+        moderation.profanity_filter.threshold = 0.2
+
+        comment = moderation.submit(article.id, 'زائر', 'أنت حمار')
+        moderation.flush()
+        db.session.refresh(comment)
+
+        assert (comment.is_approved, comment.is_spam) == (False, False)
+        assert comment.spam_score is not None
+        assert _comment_count(article.id) == 0
+
+    def test_unscored_comments_are_recovered_after_a_restart(self, news_app, article, moderation):
+        """Pending comments left by a previous process are moderated by the first batch"""
+        moderation.submit(article.id, 'زائر', 'تعليق')
+        restarted = CommentModerationQueue(news_app)
+
+        assert restarted.flush() == 1
+        assert _comment_count(article.id) == 1
+        assert restarted.flush() == 0
+
+    def test_comments_moderated_concurrently_are_counted_once(self, news_app, article, moderation, monkeypatch):
+        """A worker that loses the race to another worker neither rewrites nor recounts the comment"""
+        moderation.submit(article.id, 'زائر', 'تعليق')
+        other = CommentModerationQueue(news_app)
+        duplicates = moderation._duplicates
+
+        def race(comments):
+            # The other worker recovers and moderates the same comment after this one read it
+            assert other.flush() == 1
+            return duplicates(comments)
+
+        monkeypatch.setattr(moderation, '_duplicates', race)
+        report = moderation.moderate(moderation._drain())
+
+        assert report == {'approved': 0, 'spam': 0, 'held': 0}
+        assert NewsComment.query.filter_by(is_approved=True).count() == 1
+        assert _comment_count(article.id) == 1
+
+    def test_failed_batch_is_requeued(self, news_app, article, moderation, monkeypatch):
+        """A failed write keeps the comments queued for the next batch"""
+        comment = moderation.submit(article.id, 'زائر', 'تعليق')
+        monkeypatch.setattr(moderation, '_apply_count_deltas', lambda deltas: 1 / 0)
+
+        assert moderation.flush() == 0
+        assert moderation._pending == [comment.id]
+        assert NewsComment.query.filter_by(is_approved=True).count() == 0
+
+
+@pytest.mark.unit
+class TestSpamScore:
+    """Test the spam heuristics"""
+
+    def test_scores(self):
+        """Each indicator raises the score, capped at one"""
+        assert spam_score('خبر مهم') == 0
+        assert spam_score('رااااااائع') == pytest.approx(moderation_module.REPEATED_CHARACTERS_WEIGHT)
+        assert spam_score('www.a.com http://b.com http://c.com') == 1.0
+        assert spam_score('خبر مهم', duplicate=True) == pytest.approx(moderation_module.DUPLICATE_WEIGHT)
+
+
+@pytest.mark.unit
+class TestBulkModeration:
+    """Test set-based moderation of comment lists"""
+
+    @pytest.fixture
+    def comments(self, news_app, make_news):
+        items = make_news(3)
+        comments = [
+            NewsComment(news_item_id=items[i % 2].id, user_name='زائر', content=f'تعليق {i}')
+            for i in range(6)
+        ]
+        db.session.add_all(comments)
+        db.session.commit()
+        return items, comments
+
+    def test_approve_recomputes_counts_of_affected_items(self, news_app, moderation, comments):
+        """Approved comments are counted on their own news items only"""
+        items, comments = comments
+        items[2].comment_count = 7
+        db.session.commit()
+
+        report = moderation.bulk_moderate([comment.id for comment in comments[:3]], 'approve', moderator_id=9)
+
+        assert report == {'updated': 3, 'news_items': 2}
+        assert (_comment_count(items[0].id), _comment_count(items[1].id)) == (2, 1)
+        assert _comment_count(items[2].id) == 7
+        assert {comment.approved_by for comment in NewsComment.query.filter_by(is_approved=True)} == {9}
+
+    def test_reject_and_spam_hide_comments(self, news_app, moderation, comments):
+        """Rejected and spam comments leave the counts"""
+        items, comments = comments
+        ids = [comment.id for comment in comments]
+        moderation.bulk_moderate(ids, 'approve')
+
+        moderation.bulk_moderate(ids[:2], 'reject')
+        moderation.bulk_moderate(ids[2:3], 'spam')
+
+        assert (_comment_count(items[0].id), _comment_count(items[1].id)) == (1, 2)
+        assert NewsComment.query.filter_by(is_deleted=True).count() == 2
+        assert NewsComment.query.filter_by(is_spam=True).count() == 1
+
+    def test_a_batch_is_one_update_per_table(self, news_app, moderation, comments):
+        """The comments and the counters are each written with a single statement"""
+        _, comments = comments
+        statements = []
+        listener = lambda *args: statements.append(args[2].split()[0])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            moderation.bulk_moderate([comment.id for comment in comments], 'approve')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert statements.count('UPDATE') == 2
+
+    def test_moderated_comments_are_skipped_by_the_queue(self, news_app, article, moderation):
+        """A comment approved by a moderator is not scored and counted again"""
+        comment = moderation.submit(article.id, 'زائر', 'تعليق')
+        moderation.bulk_moderate([comment.id], 'approve')
+
+        assert moderation.flush() == 0
+        assert _comment_count(article.id) == 1
+
+    @pytest.mark.parametrize('ids, action', [([1], 'delete'), ([], 'approve'), (['1'], 'approve'), ([1] * 501, 'spam')])
+    def test_invalid_requests(self, news_app, moderation, ids, action):
+        """Unknown actions and empty, malformed or oversized id lists are rejected"""
+        with pytest.raises(InvalidComment):
+            moderation.bulk_moderate(ids, action)
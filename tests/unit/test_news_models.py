@@ -0,0 +1,120 @@
+"""
+Unit tests for the news service models
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, NewsCategory, NewsItem
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on an engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _callback(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._callback)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._callback)
+
+
+def _serialize_page(per_page):
+    """Load and serialize a listing page the way GET /api/news does"""
+    db.session.expire_all()
+    items = NewsItem.query.filter_by(is_published=True) \
+        .order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()) \
+        .options(*NewsItem.listing_options()) \
+        .limit(per_page) \
+        .all()
+    return NewsItem.serialize_many(items)
+
+
+@pytest.mark.unit
+class TestNewsItemBatchSerialization:
+    """Test the batched serialization path used by list endpoints"""
+
+    def test_query_count_is_bounded_regardless_of_page_size(self, news_app, make_news):
+        """Serializing a page must not issue per-item queries"""
+        make_news(50)
+
+        with QueryCounter(db.engine) as small_page:
+            _serialize_page(5)
+        with QueryCounter(db.engine) as large_page:
+            _serialize_page(50)
+
+        assert small_page.count == large_page.count
+        assert large_page.count <= 3
+
+    def test_batch_output_matches_per_item_serialization(self, news_app, make_news):
+        """The batched path must produce the same payload as to_dict()"""
+        make_news(12)
+
+        batched = _serialize_page(12)
+        items = NewsItem.query.filter_by(is_published=True) \
+            .order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()) \
+            .all()
+
+        assert batched == [item.to_dict() for item in items]
+
+
+@pytest.mark.unit
+class TestCategoryPublishedCount:
+    """Test the materialized per-category published counter"""
+
+    def _counts(self):
+        db.session.expire_all()
+        return {cat.id: cat.published_count for cat in NewsCategory.query.all()}
+
+    def _actual_counts(self):
+        return {
+            cat.id: cat.news_items.filter_by(is_published=True).count()
+            for cat in NewsCategory.query.all()
+        }
+
+    def test_counter_follows_inserts(self, news_app, make_news):
+        """Published inserts increment the owning category"""
+        make_news(10)
+        assert self._counts() == self._actual_counts()
+        assert sum(self._counts().values()) == 10
+
+    def test_counter_follows_publish_and_category_changes(self, news_app, make_news):
+        """Unpublishing, republishing, moving and deleting keep the counter exact"""
+        items = make_news(6)
+        first, second, third = items[0], items[1], items[2]
+
+        first.is_published = False
+        db.session.commit()
+        assert self._counts() == self._actual_counts()
+
+        first.is_published = True
+        second.category_id = third.category_id
+        db.session.commit()
+        assert self._counts() == self._actual_counts()
+
+        third.category = first.category
+        db.session.commit()
+        assert self._counts() == self._actual_counts()
+
+        db.session.delete(first)
+        db.session.commit()
+        assert self._counts() == self._actual_counts()
+
+    def test_reconcile_rebuilds_drifted_counters(self, news_app, make_news):
+        """Counters changed behind the ORM's back are repaired by reconcile"""
+        make_news(9)
+        db.session.execute(db.update(NewsCategory).values(published_count=42))
+        db.session.commit()
+
+        corrected = NewsCategory.reconcile_published_counts()
+
+        assert corrected == 3
+        assert self._counts() == self._actual_counts()
+        assert NewsCategory.reconcile_published_counts() == 0
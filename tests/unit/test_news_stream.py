@@ -0,0 +1,150 @@
+"""
+Unit tests for the Server-Sent Events news stream
+"""
+
+import importlib.util
+import os
+import threading
+
+import pytest
+
+from app.models import db, NewsItem
+from app.utils.news_stream import NewsStreamHub
+
+
+@pytest.fixture
+def hub(news_app):
+    news_app.config['STREAM_KEEPALIVE'] = 0.01
+    news_app.config['STREAM_MAX_DURATION'] = 0.05
+    return NewsStreamHub(news_app)
+
+
+def _events(hub, last_id=0, breaking_only=False):
+    events, _ = hub.events_after(last_id, breaking_only)
+    return [(stream_event.type, stream_event.data['slug']) for stream_event in events]
+
+
+@pytest.mark.unit
+class TestPublishedEvents:
+    """Test which committed changes are streamed"""
+
+    def test_publishing_and_breaking_are_streamed_after_commit(self, news_app, make_news, hub):
+        """New published items, publishing a draft and marking breaking news are events"""
+        items = make_news(1)
+        draft = NewsItem(title='مسودة', slug='draft', content='.', category=items[0].category)
+        db.session.add(draft)
+        db.session.commit()
+        assert _events(hub) == [('published', 'news-0')]
+
+        draft.is_published = True
+        db.session.commit()
+        items[0].is_breaking = True
+        db.session.commit()
+        items[0].title = 'عنوان معدل'
+        db.session.commit()
+
+        assert _events(hub) == [('published', 'news-0'), ('published', 'draft'), ('breaking', 'news-0')]
+
+    def test_rolled_back_changes_are_not_streamed(self, news_app, make_news, hub):
+        """Only committed publications reach the clients"""
+        items = make_news(1)
+        items[0].is_breaking = True
+        db.session.flush()
+        db.session.rollback()
+
+        assert _events(hub) == [('published', 'news-0')]
+
+
+@pytest.mark.unit
+class TestNewsStreamHub:
+    """Test the per-connection event stream"""
+
+    def test_stream_sends_events_and_keepalives(self, hub):
+        """Waiting connections receive new events, and comments while idle"""
+        chunks = []
+        stream = hub.stream()
+        chunks.append(next(stream))
+        timer = threading.Timer(0.02, hub.publish, ('breaking', {'slug': 'urgent'}))
+        timer.start()
+        chunks.extend(stream)
+        timer.join()
+
+        body = ''.join(chunks)
+        assert body.startswith('retry: 3000\n\n')
+        assert 'id: 1\nevent: breaking\ndata: {"slug": "urgent"}\n\n' in body
+        assert ': keepalive\n\n' in body
+        assert hub.clients == 0
+
+    def test_reconnecting_clients_get_missed_events(self, news_app):
+        """Last-Event-ID replays buffered events, or asks for a reset when they were dropped"""
+        news_app.config['STREAM_BUFFER_SIZE'] = 2
+        news_app.config['STREAM_MAX_DURATION'] = 0
+        hub = NewsStreamHub(news_app)
+        for slug in ('a', 'b', 'c'):
+            hub.publish('published', {'slug': slug})
+
+        replayed = ''.join(hub.stream(last_event_id=2))
+        assert 'data: {"slug": "c"}' in replayed and '"b"' not in replayed
+
+        assert 'event: reset' in ''.join(hub.stream(last_event_id=0))
+
+    def test_ids_ahead_of_the_sequence_reset_the_client(self, news_app):
+        """A Last-Event-ID from another worker or before a restart resets and follows this sequence"""
+        news_app.config['STREAM_MAX_DURATION'] = 0.05
+        news_app.config['STREAM_KEEPALIVE'] = 0.01
+        hub = NewsStreamHub(news_app)
+        hub.publish('published', {'slug': 'a'})
+
+        stream = hub.stream(last_event_id=50)
+        body = next(stream) + next(stream)
+        hub.publish('published', {'slug': 'b'})
+        body += ''.join(stream)
+
+        assert 'event: reset' in body
+        assert 'id: 2\nevent: published\ndata: {"slug": "b"}' in body
+        assert '"a"' not in body
+
+    def test_breaking_only_streams_skip_other_events(self, hub):
+        """A breaking-only connection ignores published events without busy waiting"""
+        hub.publish('published', {'slug': 'regular'})
+        hub.publish('breaking', {'slug': 'urgent'})
+
+        assert _events(hub, breaking_only=True) == [('breaking', 'urgent')]
+        body = ''.join(hub.stream(last_event_id=0, breaking_only=True))
+        assert '"urgent"' in body and '"regular"' not in body
+
+
+@pytest.mark.unit
+class TestStreamBackend:
+    """Test which backend the hub picks for the deployed worker count"""
+
+    @staticmethod
+    def _load_config():
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        spec = importlib.util.spec_from_file_location('news_config', os.path.join(root, 'config.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    @pytest.mark.parametrize('load_config', [True, False])
+    def test_several_workers_default_to_redis(self, news_app, monkeypatch, load_config):
+        """With WEB_CONCURRENCY=2 and no STREAM_BACKEND, redis is used with or without config.py"""
+        monkeypatch.delenv('STREAM_BACKEND', raising=False)
+        monkeypatch.setenv('WEB_CONCURRENCY', '2')
+        if load_config:
+            news_app.config.from_object(self._load_config().ProductionConfig)
+            news_app.config['TESTING'] = True
+        client = object()
+        monkeypatch.setattr(NewsStreamHub, '_create_redis', lambda self, app: client)
+
+        assert NewsStreamHub(news_app).redis is client
+
+    def test_single_worker_and_explicit_backend(self, news_app, monkeypatch):
+        """One worker stays in memory, and an explicit STREAM_BACKEND always wins"""
+        monkeypatch.setattr(NewsStreamHub, '_create_redis', lambda self, app: object())
+        monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+        assert NewsStreamHub(news_app).redis is None
+
+        monkeypatch.setenv('WEB_CONCURRENCY', '4')
+        news_app.config['STREAM_BACKEND'] = 'memory'
+        assert NewsStreamHub(news_app).redis is None
@@ -0,0 +1,56 @@
+"""
+Unit tests for cursor (keyset) pagination of news listings
+"""
+
+import pytest
+
+from app.models import db, NewsItem
+from app.utils.pagination import keyset_page, encode_cursor, decode_cursor, InvalidCursor
+
+
+def _listing_query():
+    return NewsItem.query.filter_by(is_published=True)
+
+
+@pytest.mark.unit
+class TestKeysetPagination:
+    """Test walking the news listing page by page with cursors"""
+
+    def test_pages_cover_listing_in_order_without_overlap(self, news_app, make_news):
+        """Following next_cursor visits every item exactly once in listing order"""
+        items = make_news(23)
+        # Force ties on (priority, published_at) so the id tie-breaker matters
+        for item in items[:6]:
+            item.published_at = items[0].published_at
+            item.priority = 2
+        db.session.commit()
+
+        expected = [item.id for item in _listing_query().order_by(
+            NewsItem.priority.desc(), NewsItem.published_at.desc(), NewsItem.id.desc()
+        )]
+
+        seen, cursor = [], ''
+        while True:
+            page, cursor = keyset_page(_listing_query(), 5, cursor)
+            seen.extend(item.id for item in page)
+            if cursor is None:
+                break
+
+        assert seen == expected
+
+    def test_last_page_has_no_cursor(self, news_app, make_news):
+        """An exactly full final page does not advertise a next page"""
+        make_news(4)
+        page, cursor = keyset_page(_listing_query(), 4)
+        assert len(page) == 4
+        assert cursor is None
+
+    def test_cursor_round_trip(self, news_app, make_news):
+        """Cursors decode back to the item's sort key"""
+        item = make_news(1)[0]
+        assert decode_cursor(encode_cursor(item)) == (item.priority, item.published_at, item.id)
+
+    def test_invalid_cursor(self):
+        """Tampered cursors are rejected"""
+        with pytest.raises(InvalidCursor):
+            decode_cursor('not-a-cursor')
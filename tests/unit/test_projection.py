@@ -0,0 +1,124 @@
+"""
+Unit tests for ?fields= / ?expand= projections of news items
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, NewsItem
+from app.utils.pagination import keyset_page
+from app.utils.projection import InvalidFields, news_projection, parse_field_list
+
+
+class StatementRecorder:
+    """Records the SQL statements executed on an engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _callback(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._callback)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._callback)
+
+    def selects_column(self, column):
+        return any(f'news_items.{column}' in statement for statement in self.statements)
+
+
+def _load_page(projection, per_page=5):
+    db.session.expire_all()
+    return NewsItem.listing_query() \
+        .order_by(NewsItem.priority.desc(), NewsItem.published_at.desc()) \
+        .options(*projection.options) \
+        .limit(per_page) \
+        .all()
+
+
+@pytest.mark.unit
+class TestNewsProjection:
+    """Test restricting loaded columns and serialized fields"""
+
+    def test_output_is_restricted_to_requested_fields(self, news_app, make_news):
+        """Only the requested fields, plus the id, are serialized"""
+        make_news(5)
+        projection = news_projection(parse_field_list('title, slug'))
+
+        data = projection.dump_many(_load_page(projection))
+
+        assert set(data[0]) == {'id', 'title', 'slug'}
+
+    def test_headline_query_skips_heavy_columns(self, news_app, make_news):
+        """Content, gallery and SEO columns are not selected for headlines"""
+        make_news(5)
+        projection = news_projection(frozenset({'title', 'published_at'}))
+
+        with StatementRecorder(db.engine) as recorder:
+            projection.dump_many(_load_page(projection))
+
+        assert len(recorder.statements) == 1
+        for column in ('content', 'content_en', 'gallery_images', 'meta_title', 'meta_description'):
+            assert not recorder.selects_column(column)
+
+    def test_default_listing_defers_content(self, news_app, make_news):
+        """The full listing no longer reads the article bodies"""
+        make_news(5)
+        projection = news_projection()
+
+        with StatementRecorder(db.engine) as recorder:
+            data = projection.dump_many(_load_page(projection))
+
+        assert not recorder.selects_column('content')
+        assert data[0]['category']['name'] and data[0]['tags']
+
+    def test_relations_are_references_unless_expanded(self, news_app, make_news):
+        """Category and tags are compact references unless listed in expand"""
+        make_news(5)
+        compact = news_projection(frozenset({'category', 'tags'}))
+        expanded = news_projection(frozenset({'category', 'tags'}), frozenset({'category'}))
+
+        compact_item = compact.dump_many(_load_page(compact))[0]
+        expanded_item = expanded.dump_many(_load_page(expanded))[0]
+
+        assert set(compact_item['category']) == {'id', 'name', 'name_en'}
+        assert set(compact_item['tags'][0]) == {'id', 'name', 'name_en'}
+        assert 'news_count' in expanded_item['category']
+        assert set(expanded_item['tags'][0]) == {'id', 'name', 'name_en'}
+
+    def test_detail_fields_include_content_only_when_requested(self, news_app, make_news):
+        """The detail projection can select the content columns"""
+        make_news(2)
+        projection = news_projection(frozenset({'title', 'content'}), include_content=True)
+
+        db.session.expire_all()
+        item = NewsItem.query.options(*projection.options).filter_by(slug='news-1').first()
+
+        assert projection.dump(item) == {'id': item.id, 'title': 'خبر 1', 'content': 'محتوى الخبر 1'}
+
+    def test_cursor_pages_work_with_projections(self, news_app, make_news):
+        """The sort key is always loaded so cursors need no extra queries"""
+        make_news(8)
+        projection = news_projection(frozenset({'title'}))
+        query = NewsItem.listing_query().options(*projection.options)
+
+        with StatementRecorder(db.engine) as recorder:
+            items, next_cursor = keyset_page(query, 3)
+        following, _ = keyset_page(query, 3, next_cursor)
+
+        assert len(recorder.statements) == 1
+        assert {item.id for item in items}.isdisjoint(item.id for item in following)
+
+    @pytest.mark.parametrize('fields,expand,include_content', [
+        ('title,unknown', None, False),
+        ('title,content', None, False),
+        ('title', 'comments', True),
+    ])
+    def test_unknown_fields_are_rejected(self, news_app, fields, expand, include_content):
+        """Unknown fields, content on listings and unknown relations are errors"""
+        with pytest.raises(InvalidFields):
+            news_projection(parse_field_list(fields), parse_field_list(expand), include_content)
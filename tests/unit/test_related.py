@@ -0,0 +1,182 @@
+"""
+Unit tests for the precomputed related articles
+"""
+
+import random
+from collections import Counter
+
+import pytest
+from flask_caching import Cache
+
+from app.models import db, NewsItem, NewsRelated
+from app.utils import related
+from app.utils.related import RelatedArticles, rank_related
+from app.utils.search import analyze
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """Rank on the NumPy implementation and on the pure-Python fallback"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(related, 'np', None)
+    return request.param
+
+
+@pytest.fixture
+def related_articles(news_app):
+    return RelatedArticles(news_app)
+
+
+def _documents(titles):
+    return [Counter(analyze(title)) for title in titles]
+
+
+def _related_ids(news_item):
+    rows = NewsRelated.query.filter_by(news_item_id=news_item.id).order_by(NewsRelated.rank).all()
+    return [row.related_item_id for row in rows]
+
+
+@pytest.mark.unit
+class TestRankRelated:
+    """Test the tag and text similarity ranking"""
+
+    def test_shared_tags_and_words_rank_first(self, backend):
+        """Items sharing more tags and title words are more related"""
+        documents = _documents([
+            'وزير الصحة يفتتح مستشفى',
+            'افتتاح مستشفى جديد بحضور وزير الصحة',
+            'مباراة كرة القدم',
+            'وزير التعليم يزور مدرسة',
+        ])
+        tag_sets = [[1, 2], [1, 2], [3], [1, 4]]
+
+        ranked = rank_related(documents, tag_sets, top_k=2)
+        best = {(i, rank): j for i, rank, j, _ in ranked}
+
+        assert best[(0, 0)] == 1
+        assert best[(1, 0)] == 0
+        assert (2, 0) not in best
+        assert all(i != j for i, _, j, _ in ranked)
+
+    def test_scores_combine_jaccard_and_cosine(self, backend):
+        """With identical texts the score is the text weight plus the weighted Jaccard index"""
+        documents = _documents(['قانون الاستثمار', 'قانون الاستثمار', 'الطقس غدا', 'رياضة'])
+        tag_sets = [[1, 2], [2, 3], [4], [5]]
+
+        ranked = rank_related(documents, tag_sets, top_k=1, tag_weight=0.6, text_weight=0.4)
+
+        assert ranked[0][:3] == (0, 0, 1)
+        assert ranked[0][3] == pytest.approx(0.4 + 0.6 / 3)
+
+    def test_common_terms_and_tags_are_ignored(self, backend, monkeypatch):
+        """Terms and tags found in most items do not make items related"""
+        monkeypatch.setattr(related, 'MAX_DOCUMENT_FREQUENCY', 0.5)
+        documents = _documents(['خبر عاجل'] * 6)
+        tag_sets = [[1]] * 6
+
+        assert rank_related(documents, tag_sets) == []
+
+    @pytest.mark.parametrize('dense_ratio', [0, 10 ** 6])
+    def test_numpy_and_python_agree(self, monkeypatch, dense_ratio):
+        """Both implementations produce the same ranking across blocks, sparse or dense"""
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(related, 'BLOCK_SIZE', 7)
+        monkeypatch.setattr(related, 'DENSE_RATIO', dense_ratio)
+        rng = random.Random(5)
+        words = ['مجلس', 'النواب', 'الموازنة', 'وزير', 'الصحة', 'مبادرة', 'الشباب', 'قانون', 'الطرق', 'الزراعة']
+        documents = _documents([' '.join(rng.sample(words, rng.randint(1, 4))) for _ in range(60)])
+        tag_sets = [rng.sample(range(12), rng.randint(0, 3)) for _ in range(60)]
+
+        vectorized = rank_related(documents, tag_sets, top_k=5)
+        monkeypatch.setattr(related, 'np', None)
+        fallback = rank_related(documents, tag_sets, top_k=5)
+
+        assert [row[:3] for row in vectorized] == [row[:3] for row in fallback]
+        assert [row[3] for row in vectorized] == pytest.approx([row[3] for row in fallback])
+
+
+@pytest.mark.unit
+class TestRelatedArticles:
+    """Test storing and refreshing the related news table"""
+
+    def test_compute_stores_ranked_rows_for_published_items(self, news_app, make_news, related_articles):
+        """Drafts are neither related nor given related items"""
+        items = make_news(8)
+        items[0].title = 'افتتاح مستشفى الصحة'
+        items[4].title = 'مستشفى الصحة الجديد'
+        items[5].is_published = False
+        db.session.commit()
+
+        assert related_articles.compute() == 7
+
+        assert _related_ids(items[0])[0] == items[4].id
+        assert _related_ids(items[5]) == []
+        assert NewsRelated.query.filter_by(related_item_id=items[5].id).count() == 0
+        assert NewsRelated.query.filter_by(news_item_id=items[1].id).count() <= related_articles.top_k
+
+    def test_flush_recomputes_only_after_changes(self, news_app, make_news, related_articles, monkeypatch):
+        """The periodic job skips the computation while news items are unchanged"""
+        items = make_news(4)
+        related_articles.flush()
+        computed = []
+        monkeypatch.setattr(related_articles, 'compute', lambda: computed.append(True))
+
+        related_articles.flush()
+        assert computed == []
+
+        items[0].tags = []
+        db.session.commit()
+        related_articles.flush()
+        assert computed == [True]
+
+    def test_swapped_tags_trigger_a_recompute(self, news_app, make_news, related_articles, monkeypatch):
+        """Replacing an item's tags without changing their number still changes the signature"""
+        items = make_news(4)
+        related_articles.flush()
+        computed = []
+        monkeypatch.setattr(related_articles, 'compute', lambda: computed.append(True))
+
+        items[0].tags = list(items[2].tags)
+        db.session.commit()
+        related_articles.flush()
+        assert computed == [True]
+
+    def test_deleting_an_item_removes_its_rows(self, news_app, make_news, related_articles):
+        """Rows pointing at or from a deleted item are removed with it"""
+        items = make_news(6)
+        related_articles.compute()
+        deleted_id = items[0].id
+
+        db.session.delete(items[0])
+        db.session.commit()
+
+        assert NewsRelated.query.filter(
+            (NewsRelated.news_item_id == deleted_id) | (NewsRelated.related_item_id == deleted_id)
+        ).count() == 0
+        assert NewsItem.query.count() == 5
+
+    def test_one_worker_recomputes_for_all(self, news_app, make_news, monkeypatch):
+        """Workers sharing a cache skip a recompute that is done or in progress elsewhere"""
+        cache = Cache(news_app, config={'CACHE_TYPE': 'SimpleCache'})
+        first, second = RelatedArticles(news_app, cache=cache), RelatedArticles(news_app, cache=cache)
+        items = make_news(4)
+        first.flush()
+        computed = []
+        monkeypatch.setattr(second, 'compute', lambda: computed.append(True))
+
+        second.flush()
+        assert computed == []
+
+        items[0].tags = []
+        db.session.commit()
+        cache.add(related.LOCK_KEY, 1)
+        second.flush()
+        assert computed == []
+
+        cache.delete(related.LOCK_KEY)
+        second.flush()
+        assert computed == [True]
+        assert cache.get(related.LOCK_KEY) is None
+
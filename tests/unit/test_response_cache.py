@@ -0,0 +1,263 @@
+"""
+Unit tests for the tag-invalidated response cache
+"""
+
+import threading
+import time
+
+import pytest
+from flask_caching import Cache
+
+from app.models import db, NewsCategory, NewsComment
+from app.utils.response_cache import ResponseCache, listing_tags, item_tags, comment_tags
+
+
+@pytest.fixture
+def response_cache(news_app):
+    """Response cache backed by an in-process SimpleCache"""
+    cache = Cache(news_app, config={'CACHE_TYPE': 'SimpleCache'})
+    return ResponseCache(cache, news_app)
+
+
+class CountingBuilder:
+    """Builder that records how many times the payload was recomputed"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'build': self.calls}
+
+
+class SlowBuilder(CountingBuilder):
+    """Builder that takes long enough for concurrent requests to overlap"""
+
+    def __call__(self):
+        time.sleep(0.1)
+        return super().__call__()
+
+
+class FailingBuilder(CountingBuilder):
+    """Builder whose recomputation fails, e.g. because the database is down"""
+
+    def __call__(self):
+        super().__call__()
+        raise RuntimeError('database unavailable')
+
+
+def _cached(response_cache, builder, **filters):
+    key = ResponseCache.make_key('news:list', **filters)
+    return response_cache.get_or_set(key, listing_tags(**filters), builder)
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """Test precise invalidation of cached listings and articles"""
+
+    def test_hits_until_a_dependency_changes(self, news_app, make_news, response_cache):
+        """A cached listing is reused until an item in it is edited"""
+        items = make_news(4)
+        builder = CountingBuilder()
+
+        _cached(response_cache, builder)
+        _cached(response_cache, builder)
+        assert builder.calls == 1
+
+        items[0].title = 'عنوان جديد'
+        db.session.commit()
+        _cached(response_cache, builder)
+        assert builder.calls == 2
+
+    def test_only_affected_categories_are_invalidated(self, news_app, make_news, response_cache):
+        """Editing an item keeps the listings of unrelated categories cached"""
+        items = make_news(6)
+        own_category = items[0].category.name
+        other_category = next(cat.name for cat in NewsCategory.query if cat.name != own_category)
+        own, other = CountingBuilder(), CountingBuilder()
+
+        _cached(response_cache, own, category=own_category)
+        _cached(response_cache, other, category=other_category)
+
+        items[0].summary = 'ملخص محدث'
+        db.session.commit()
+        _cached(response_cache, own, category=own_category)
+        _cached(response_cache, other, category=other_category)
+
+        assert own.calls == 2
+        assert other.calls == 1
+
+    def test_moving_an_item_invalidates_old_and_new_category(self, news_app, make_news, response_cache):
+        """Both the category an item leaves and the one it joins are refreshed"""
+        items = make_news(6)
+        source, target = items[0].category, items[1].category
+        source_builder, target_builder = CountingBuilder(), CountingBuilder()
+        _cached(response_cache, source_builder, category=source.name)
+        _cached(response_cache, target_builder, category=target.name)
+
+        db.session.expire_all()
+        items[0].category_id = target.id
+        db.session.commit()
+        _cached(response_cache, source_builder, category=source.name)
+        _cached(response_cache, target_builder, category=target.name)
+
+        assert (source_builder.calls, target_builder.calls) == (2, 2)
+
+    def test_article_is_invalidated_by_its_own_edits(self, news_app, make_news, response_cache):
+        """Article detail entries depend on the item's slug only"""
+        items = make_news(2)
+        first, second = CountingBuilder(), CountingBuilder()
+        key = lambda slug: ResponseCache.make_key('news:item', slug=slug)
+
+        response_cache.get_or_set(key(items[0].slug), item_tags(items[0].slug), first)
+        response_cache.get_or_set(key(items[1].slug), item_tags(items[1].slug), second)
+        items[0].content = 'محتوى جديد'
+        db.session.commit()
+        response_cache.get_or_set(key(items[0].slug), item_tags(items[0].slug), first)
+        response_cache.get_or_set(key(items[1].slug), item_tags(items[1].slug), second)
+
+        assert (first.calls, second.calls) == (2, 1)
+
+    def test_category_and_tag_edits_invalidate_listings_and_articles(self, news_app, make_news, response_cache):
+        """Listings and articles embed category and tag data, so editing either refreshes them"""
+        items = make_news(2)
+        listing, article = CountingBuilder(), CountingBuilder()
+        key = ResponseCache.make_key('news:item', slug=items[0].slug)
+
+        for change in (lambda: setattr(items[0].category, 'name_en', 'Renamed'),
+                       lambda: setattr(items[0].tags[0], 'color', '#000000')):
+            _cached(response_cache, listing, featured=True)
+            response_cache.get_or_set(key, item_tags(items[0].slug), article)
+            change()
+            db.session.commit()
+        _cached(response_cache, listing, featured=True)
+        response_cache.get_or_set(key, item_tags(items[0].slug), article)
+
+        assert (listing.calls, article.calls) == (3, 3)
+
+    def test_invalidation_during_a_build_keeps_the_entry_stale(self, news_app, make_news, response_cache):
+        """A value built from data changed mid-build is not stored as fresh"""
+        items = make_news(1)
+        calls = []
+
+        def builder():
+            calls.append(True)
+            if len(calls) == 1:
+                # Committed by another request while this one is still building
+                items[0].title = 'عنوان جديد'
+                db.session.commit()
+            return {'build': len(calls)}
+
+        assert _cached(response_cache, builder) == {'build': 1}
+        assert _cached(response_cache, builder) == {'build': 2}
+
+    def test_comments_are_invalidated_by_their_article_comments(self, news_app, make_news, response_cache):
+        """Adding a comment invalidates that article's comment pages only"""
+        items = make_news(2)
+        first, second = CountingBuilder(), CountingBuilder()
+        key = lambda slug: ResponseCache.make_key('news:comments', slug=slug)
+
+        response_cache.get_or_set(key(items[0].slug), comment_tags(items[0].slug), first)
+        response_cache.get_or_set(key(items[1].slug), comment_tags(items[1].slug), second)
+        db.session.add(NewsComment(news_item_id=items[0].id, user_name='زائر', content='تعليق'))
+        db.session.commit()
+        response_cache.get_or_set(key(items[0].slug), comment_tags(items[0].slug), first)
+        response_cache.get_or_set(key(items[1].slug), comment_tags(items[1].slug), second)
+
+        assert (first.calls, second.calls) == (2, 1)
+
+    def test_drafts_and_rollbacks_do_not_invalidate(self, news_app, make_news, response_cache):
+        """Unpublished edits and rolled back changes leave the cache intact"""
+        items = make_news(3)
+        items[0].is_published = False
+        db.session.commit()
+        builder = CountingBuilder()
+        _cached(response_cache, builder)
+
+        items[0].title = 'مسودة'
+        db.session.commit()
+        items[1].title = 'تعديل ملغى'
+        db.session.flush()
+        db.session.rollback()
+        _cached(response_cache, builder)
+
+        assert builder.calls == 1
+
+
+@pytest.mark.unit
+class TestStaleWhileRevalidate:
+    """Test stale serving and miss coalescing in the response cache"""
+
+    def test_stale_entry_is_served_while_another_worker_recomputes(self, news_app, make_news, response_cache):
+        """Only the worker holding the lock recomputes an invalidated entry"""
+        items = make_news(3)
+        builder = CountingBuilder()
+        key = ResponseCache.make_key('news:list')
+        _cached(response_cache, builder)
+
+        items[0].title = 'عنوان جديد'
+        db.session.commit()
+        assert response_cache._acquire(key)
+        assert _cached(response_cache, builder) == {'build': 1}
+        assert builder.calls == 1
+
+        response_cache._release(key)
+        assert _cached(response_cache, builder) == {'build': 2}
+        assert _cached(response_cache, builder) == {'build': 2}
+
+    def test_expired_entry_is_kept_for_the_stale_window(self, news_app, response_cache, monkeypatch):
+        """An entry past its timeout is still served while it is being rebuilt"""
+        clock = [1000.0]
+        monkeypatch.setattr('app.utils.response_cache.time.time', lambda: clock[0])
+        builder = CountingBuilder()
+        key = ResponseCache.make_key('news:categories')
+
+        response_cache.get_or_set(key, ['categories'], builder, timeout=300)
+        clock[0] += 301
+        assert response_cache.get(key, ['categories']) is None
+
+        assert response_cache._acquire(key)
+        assert response_cache.get_or_set(key, ['categories'], builder, timeout=300) == {'build': 1}
+        response_cache._release(key)
+        assert response_cache.get_or_set(key, ['categories'], builder, timeout=300) == {'build': 2}
+
+    def test_failed_recompute_serves_the_stale_entry(self, news_app, response_cache):
+        """A stale entry outlives a failing rebuild instead of surfacing an error"""
+        key = ResponseCache.make_key('news:tags')
+        response_cache.get_or_set(key, ['tags'], CountingBuilder())
+        response_cache.invalidate('tags')
+
+        failing = FailingBuilder()
+        assert response_cache.get_or_set(key, ['tags'], failing) == {'build': 1}
+        assert failing.calls == 1
+
+    def test_concurrent_misses_are_coalesced(self, news_app, response_cache):
+        """Identical concurrent misses run the builder once and share its result"""
+        builder = SlowBuilder()
+        key = ResponseCache.make_key('news:categories')
+        start = threading.Barrier(8)
+        results = []
+
+        def request():
+            with news_app.app_context():
+                start.wait()
+                results.append(response_cache.get_or_set(key, ['categories'], builder))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert builder.calls == 1
+        assert results == [{'build': 1}] * 8
+
+    def test_coalesced_requests_see_the_builder_error(self, news_app, response_cache):
+        """A failing build is not cached and fails every request waiting for it"""
+        key = ResponseCache.make_key('news:tags')
+        with pytest.raises(RuntimeError):
+            response_cache.get_or_set(key, ['tags'], FailingBuilder())
+
+        builder = CountingBuilder()
+        assert response_cache.get_or_set(key, ['tags'], builder) == {'build': 1}
+        assert response_cache._acquire(key)
@@ -0,0 +1,144 @@
+"""
+Unit tests for the retention cleanup of old stats and comments
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models import db, NewsComment, NewsStats, NewsStatsMonthly
+from app.utils.retention import RetentionCleanup
+from app.utils.stats_rollup import HyperLogLog
+
+NOW = datetime(2024, 6, 15, 12, 0)
+
+
+@pytest.fixture
+def cleanup(news_app):
+    news_app.config['OLD_STATS_CLEANUP_DAYS'] = 30
+    news_app.config['OLD_COMMENTS_CLEANUP_DAYS'] = 10
+    news_app.config['CLEANUP_CHUNK_SIZE'] = 3
+    news_app.config['CLEANUP_CHUNK_PAUSE'] = 0
+    return RetentionCleanup(news_app)
+
+
+def _sketch(*visitors):
+    sketch = HyperLogLog()
+    for visitor in visitors:
+        sketch.add(visitor)
+    return sketch.to_bytes()
+
+
+def _comment(news_item, days_old, parent=None, **flags):
+    comment = NewsComment(
+        news_item_id=news_item.id, user_name='زائر', content='تعليق', parent=parent,
+        created_at=NOW - timedelta(days=days_old), **flags
+    )
+    db.session.add(comment)
+    return comment
+
+
+@pytest.mark.unit
+class TestStatsRollup:
+    """Test folding old daily stats into monthly rows"""
+
+    def test_old_daily_rows_become_monthly_rows(self, news_app, make_news, cleanup):
+        """Counters are summed per month, unique views merged and recent days kept"""
+        items = make_news(1)
+        days = [(date(2024, 3, 1), 10, ('a', 'b')), (date(2024, 3, 20), 5, ('b', 'c')),
+                (date(2024, 4, 2), 7, ('d',)), (date(2024, 6, 10), 1, ('e',))]
+        db.session.add_all([
+            NewsStats(news_item_id=items[0].id, date=day, views=views, likes=1,
+                      avg_read_time=float(views), unique_views_sketch=_sketch(*visitors))
+            for day, views, visitors in days
+        ])
+        db.session.commit()
+
+        report = cleanup.run(now=NOW)
+
+        assert report['stats_rows_removed'] == 3
+        assert report['monthly_rows_created'] == 2
+        assert [row.date for row in NewsStats.query.all()] == [date(2024, 6, 10)]
+        march = NewsStatsMonthly.query.filter_by(month=date(2024, 3, 1)).one()
+        assert (march.days, march.views, march.likes, march.unique_views) == (2, 15, 2, 3)
+        assert march.avg_read_time == pytest.approx((10 * 10 + 5 * 5) / 15)
+
+    def test_rollups_accumulate_across_chunks_and_runs(self, news_app, make_news, cleanup):
+        """Days of one month spread over several transactions add up in one row"""
+        items = make_news(1)
+        db.session.add_all([
+            NewsStats(news_item_id=items[0].id, date=date(2024, 1, day), views=1)
+            for day in range(1, 11)
+        ])
+        db.session.commit()
+
+        report = cleanup.run(now=NOW)
+
+        assert report['chunks'] == 4
+        monthly = NewsStatsMonthly.query.one()
+        assert (monthly.days, monthly.views) == (10, 10)
+
+    def test_downsampling_can_be_disabled(self, news_app, make_news, cleanup):
+        """Without downsampling old rows are only deleted"""
+        items = make_news(1)
+        db.session.add(NewsStats(news_item_id=items[0].id, date=date(2023, 1, 1), views=3))
+        db.session.commit()
+        cleanup.downsample = False
+
+        assert cleanup.run(now=NOW)['stats_rows_removed'] == 1
+        assert NewsStatsMonthly.query.count() == 0
+
+
+@pytest.mark.unit
+class TestCommentPurge:
+    """Test purging deleted and spam comments"""
+
+    def test_only_old_deleted_or_spam_comments_are_removed(self, news_app, make_news, cleanup):
+        """Approved, recent and pending comments are kept"""
+        items = make_news(1)
+        _comment(items[0], 20, is_deleted=True)
+        _comment(items[0], 20, is_spam=True)
+        _comment(items[0], 2, is_spam=True)
+        _comment(items[0], 20, is_approved=True)
+        _comment(items[0], 20)
+        db.session.commit()
+
+        assert cleanup.run(now=NOW)['comments_removed'] == 2
+        assert NewsComment.query.count() == 3
+
+    def test_comments_with_kept_replies_stay(self, news_app, make_news, cleanup):
+        """A deleted parent is removed only after its replies are"""
+        items = make_news(1)
+        kept_parent = _comment(items[0], 20, is_deleted=True)
+        _comment(items[0], 20, parent=kept_parent, is_approved=True)
+        purged_parent = _comment(items[0], 20, is_deleted=True)
+        _comment(items[0], 20, parent=purged_parent, is_spam=True)
+        db.session.commit()
+        kept_id = kept_parent.id
+
+        assert cleanup.run(now=NOW)['comments_removed'] == 2
+        remaining = {comment.id for comment in NewsComment.query.all()}
+        assert kept_id in remaining and len(remaining) == 2
+
+
+@pytest.mark.unit
+class TestDryRun:
+    """Test counting without changes"""
+
+    def test_dry_run_reports_without_writing(self, news_app, make_news, cleanup):
+        """The dry run predicts the real run and leaves every row in place"""
+        items = make_news(1)
+        db.session.add_all([
+            NewsStats(news_item_id=items[0].id, date=date(2024, 2, day), views=1) for day in (1, 2)
+        ] + [NewsStats(news_item_id=items[0].id, date=date(2024, 3, 1), views=1)])
+        _comment(items[0], 20, is_spam=True)
+        db.session.commit()
+
+        preview = cleanup.run(now=NOW, dry_run=True)
+
+        assert NewsStats.query.count() == 3 and NewsComment.query.count() == 1
+        assert cleanup.last_report is None
+        report = cleanup.run(now=NOW)
+        for key in ('stats_rows_removed', 'monthly_rows_created', 'comments_removed'):
+            assert preview[key] == report[key]
+        assert report['max_chunk_ms'] > 0
@@ -0,0 +1,121 @@
+"""
+Unit tests for the Arabic-aware news search index
+"""
+
+import pytest
+
+from app.models import db
+from app.utils.search import NewsSearch, analyze, normalize_arabic
+
+
+@pytest.fixture(params=['fts5', 'python'])
+def news_search(news_app, request):
+    """Search index on the FTS5 backend and on the pure-Python fallback"""
+    news_app.config['SEARCH_BACKEND'] = request.param
+    return NewsSearch(news_app)
+
+
+def _ids(news_search, query, **kwargs):
+    ranked, _ = news_search.search(query, **kwargs)
+    return [news_item_id for news_item_id, _ in ranked]
+
+
+@pytest.mark.unit
+class TestArabicAnalysis:
+    """Test normalization and light stemming of search terms"""
+
+    def test_diacritics_and_letter_variants_are_folded(self):
+        """Tashkeel, tatweel and alef/yaa/taa marbuta variants normalize alike"""
+        assert normalize_arabic('مُـحَمَّد') == 'محمد'
+        assert normalize_arabic('أحمد إلى آخر') == 'احمد الي اخر'
+        assert normalize_arabic('مدرسة مستشفى') == 'مدرسه مستشفي'
+
+    def test_light_stemming_groups_word_forms(self):
+        """Definite article, conjunctions and plural suffixes are stripped"""
+        assert analyze('مبادرة') == analyze('المبادرات') == analyze('والمبادرة')
+        assert analyze('البرلمان') == analyze('برلمان')
+
+    def test_stop_words_are_dropped(self):
+        """Common particles do not become search terms"""
+        assert analyze('في من على the of') == []
+
+
+@pytest.mark.unit
+class TestNewsSearch:
+    """Test incremental indexing and BM25 ranking on both backends"""
+
+    def test_published_items_are_indexed_on_commit(self, news_search, make_news):
+        """New items are searchable with Arabic word variants"""
+        items = make_news(3)
+        items[1].title = 'إطلاق مبادرة جديدة للشباب'
+        db.session.commit()
+
+        assert _ids(news_search, 'المبادرات الجديدة') == [items[1].id]
+        assert _ids(news_search, 'مُبَادَرَة') == [items[1].id]
+
+    def test_edits_and_unpublishing_update_the_index(self, news_search, make_news):
+        """Old text is removed from the index, and unpublished items disappear"""
+        items = make_news(3)
+        items[0].title = 'ميزانية الصحة'
+        db.session.commit()
+        items[0].title = 'ميزانية التعليم'
+        db.session.commit()
+
+        assert _ids(news_search, 'الصحة') == []
+        assert _ids(news_search, 'التعليم') == [items[0].id]
+
+        items[0].is_published = False
+        db.session.commit()
+        assert _ids(news_search, 'التعليم') == []
+
+    def test_deleted_items_are_removed(self, news_search, make_news):
+        """Deleting an item removes its postings"""
+        items = make_news(2)
+        items[0].summary = 'جلسة طارئة'
+        db.session.commit()
+
+        db.session.delete(items[0])
+        db.session.commit()
+
+        assert _ids(news_search, 'طارئة') == []
+
+    def test_title_matches_rank_first(self, news_search, make_news):
+        """BM25 with field weights ranks title matches above content matches"""
+        items = make_news(4)
+        items[0].content = 'تقرير عن البرلمان والجلسات'
+        items[2].title = 'البرلمان يقر الموازنة'
+        items[3].title_en = 'Unrelated'
+        items[3].content_en = 'The parliament session'
+        db.session.commit()
+
+        assert _ids(news_search, 'برلمان') == [items[2].id, items[0].id]
+        assert _ids(news_search, 'parliament') == [items[3].id]
+
+    def test_all_terms_are_required_and_paginated(self, news_search, make_news):
+        """Every query term must match; offset and limit page the ranking"""
+        items = make_news(6)
+        for item in items:
+            item.summary = 'أخبار مجلس النواب'
+        items[5].summary = 'أخبار مجلس الشيوخ'
+        db.session.commit()
+
+        ranked, total = news_search.search('مجلس النواب', offset=0, limit=2)
+        following, _ = news_search.search('مجلس النواب', offset=2, limit=10)
+
+        assert total == 5
+        assert len(ranked) == 2 and len(following) == 3
+        assert items[5].id not in [news_item_id for news_item_id, _ in ranked + following]
+
+    def test_rebuild_indexes_existing_items(self, news_app, make_news):
+        """Items created before search was enabled are indexed by rebuild()"""
+        items = make_news(3)
+        news_search = NewsSearch(news_app)
+
+        assert _ids(news_search, 'خبر') == []
+        assert news_search.rebuild() == 3
+        assert sorted(_ids(news_search, 'خبر')) == sorted(item.id for item in items)
+
+    def test_empty_query_returns_nothing(self, news_search, make_news):
+        """A query made only of stop words matches nothing"""
+        make_news(2)
+        assert news_search.search('في من') == ([], 0)
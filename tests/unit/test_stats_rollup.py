@@ -0,0 +1,102 @@
+"""
+Unit tests for the engagement event roll-up into daily news stats
+"""
+
+import pytest
+from datetime import datetime, timedelta
+
+from app.models import db, NewsItem, NewsStats
+from app.utils.stats_rollup import EngagementAggregator, HyperLogLog, classify_referrer
+
+
+@pytest.mark.unit
+class TestHyperLogLog:
+    """Test the unique view estimator"""
+
+    def test_estimate_is_within_error_bounds(self):
+        """Cardinality estimates stay within a few percent"""
+        for cardinality in (10, 1000, 50000):
+            sketch = HyperLogLog()
+            for i in range(cardinality):
+                sketch.add(f'visitor-{i}')
+                sketch.add(f'visitor-{i}')
+            assert abs(sketch.count() - cardinality) <= max(2, cardinality * 0.08)
+
+    def test_merge_and_round_trip(self):
+        """Merged sketches estimate the union and survive serialization"""
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(600):
+            first.add(i)
+        for i in range(400, 1000):
+            second.add(i)
+
+        first.merge(second)
+        restored = HyperLogLog.from_bytes(first.to_bytes())
+
+        assert restored.count() == first.count()
+        assert abs(restored.count() - 1000) <= 80
+
+
+@pytest.mark.unit
+def test_classify_referrer():
+    """Referrers map onto the NewsStats traffic source columns"""
+    assert classify_referrer(None) == 'direct'
+    assert classify_referrer('https://naebak.com/news', own_host='naebak.com') == 'direct'
+    assert classify_referrer('https://m.facebook.com/story') == 'social'
+    assert classify_referrer('https://www.google.com.eg/search?q=x') == 'search'
+    assert classify_referrer('https://example.org/article') == 'referral'
+
+
+@pytest.mark.unit
+class TestEngagementAggregator:
+    """Test batching engagement events into news_stats rows"""
+
+    def test_flush_creates_and_accumulates_daily_rows(self, news_app, make_news):
+        """Repeated flushes add to the same (news item, day) row"""
+        items = make_news(2)
+        aggregator = EngagementAggregator(news_app)
+        now = datetime.utcnow()
+
+        for i in range(30):
+            aggregator.record(items[0].id, 'view', visitor_id=f'v{i % 10}', when=now)
+        aggregator.record(items[0].id, 'view', referrer='https://t.co/abc', when=now)
+        aggregator.record(items[1].id, 'view', when=now - timedelta(days=1))
+        assert aggregator.flush() == 2
+
+        for i in range(5):
+            aggregator.record(items[0].id, 'view', visitor_id=f'new{i}', when=now)
+        aggregator.record(items[0].id, 'like', when=now)
+        aggregator.record(items[0].id, 'share', when=now)
+        assert aggregator.flush() == 1
+
+        db.session.expire_all()
+        today = NewsStats.query.filter_by(news_item_id=items[0].id, date=now.date()).one()
+        assert today.views == 36
+        assert today.unique_views == 15
+        assert today.social_visits == 1
+        assert today.direct_visits == 35
+        assert (today.likes, today.shares) == (1, 1)
+        assert NewsStats.query.count() == 2
+
+        item = db.session.get(NewsItem, items[0].id)
+        assert (item.like_count, item.share_count) == (1, 1)
+
+    def test_events_of_deleted_items_are_dropped(self, news_app, make_news):
+        """Events for an item deleted or archived before the flush are not written nor requeued"""
+        items = make_news(2)
+        aggregator = EngagementAggregator(news_app)
+        deleted_id = items[1].id
+        aggregator.record(items[0].id, 'view')
+        aggregator.record(deleted_id, 'like')
+        db.session.delete(items[1])
+        db.session.commit()
+
+        assert aggregator.flush() == 1
+        assert [stats.news_item_id for stats in NewsStats.query.all()] == [items[0].id]
+        assert aggregator._buckets == {}
+
+    def test_unknown_event_type_is_rejected(self, news_app):
+        """Only view, like and share events are accepted"""
+        aggregator = EngagementAggregator(news_app)
+        with pytest.raises(ValueError):
+            aggregator.record(1, 'comment')
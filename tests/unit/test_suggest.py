@@ -0,0 +1,195 @@
+"""
+Unit tests for the search-as-you-type suggestions
+"""
+
+import random
+import threading
+
+import pytest
+
+from app.models import db, NewsItem, NewsTag
+from app.utils import suggest
+from app.utils.suggest import NewsSuggestions, PrefixIndex
+
+
+@pytest.fixture
+def suggestions(news_app):
+    return NewsSuggestions(news_app)
+
+
+def _titles(result):
+    return [entry['title'] for entry in result['news']]
+
+
+@pytest.mark.unit
+class TestPrefixIndex:
+    """Test the sorted word-start array"""
+
+    def test_matches_the_start_of_any_word(self):
+        """Prefixes match any word, after Arabic normalization"""
+        index = PrefixIndex()
+        index.build([
+            (1, 'إطلاق مبادرة الشباب', 'first', 0),
+            (2, 'مبادرات التعليم', 'second', 0),
+            (3, 'الموازنة العامة', 'third', 0),
+        ])
+
+        assert set(index.search('مبادر')) == {'first', 'second'}
+        assert index.search('اطلاق') == ['first']
+        assert index.search('شباب') == ['first']
+        assert index.search('موازنه') == ['third']
+        assert index.search('زراعة') == []
+
+    def test_prefix_of_the_whole_text_ranks_first(self):
+        """Texts starting with the prefix come before inner-word matches, then by rank"""
+        index = PrefixIndex()
+        index.build([
+            (1, 'جلسة البرلمان', 'inner', 100),
+            (2, 'برلمان الشباب', 'old', 1),
+            (3, 'برلمان جديد', 'new', 2),
+        ])
+
+        assert index.search('برلمان') == ['new', 'old', 'inner']
+        assert index.search('برلمان', limit=1) == ['new']
+
+    def test_add_replace_and_remove(self):
+        """Incremental updates keep the array consistent"""
+        index = PrefixIndex()
+        index.build([(1, 'خبر قديم', 'one', 0)])
+
+        index.add(2, 'خبر جديد', 'two')
+        index.add(1, 'عنوان معدل', 'one')
+        assert index.search('خبر') == ['two']
+        assert index.search('معدل') == ['one']
+
+        index.remove(2)
+        assert index.search('خبر') == []
+        assert len(index) == 1
+
+    def test_merges_keep_the_array_consistent(self, monkeypatch):
+        """Pending additions and removals merged into the main array match a full rebuild"""
+        monkeypatch.setattr(suggest, 'MERGE_THRESHOLD', 8)
+        rng = random.Random(3)
+        words = ['مجلس', 'النواب', 'الموازنة', 'وزير', 'الصحة', 'مبادرة', 'الشباب', 'قانون']
+        texts = {}
+        index = PrefixIndex()
+        index.build([])
+        for _ in range(300):
+            key = rng.randrange(40)
+            if rng.random() < 0.3:
+                texts.pop(key, None)
+                index.remove(key)
+            else:
+                texts[key] = ' '.join(rng.sample(words, 3))
+                index.add(key, texts[key], key)
+
+        rebuilt = PrefixIndex()
+        rebuilt.build([(key, text, key, 0) for key, text in texts.items()])
+        for word in words:
+            prefix = word[:3]
+            assert sorted(index.search(prefix, 100)) == sorted(rebuilt.search(prefix, 100))
+
+    def test_merges_reclaim_removed_slots(self, monkeypatch):
+        """Replacing the same texts over and over does not grow the slot lists"""
+        monkeypatch.setattr(suggest, 'MERGE_THRESHOLD', 8)
+        index = PrefixIndex()
+        index.build([(key, f'خبر رقم {key}', key, 0) for key in range(4)])
+        for i in range(1000):
+            index.add(i % 4, f'عنوان معدل {i}', i % 4)
+
+        assert len(index) == 4
+        assert len(index._texts) == len(index._payloads) == len(index._ranks) < 20
+        assert sorted(index.search('عنوان', 10)) == [0, 1, 2, 3]
+        assert index.search('معدل 999') == [3]
+
+
+@pytest.mark.unit
+class TestNewsSuggestions:
+    """Test building and refreshing the per-worker suggestions"""
+
+    def test_builds_from_published_titles_and_active_tags(self, news_app, make_news, suggestions):
+        """Drafts and inactive tags are not suggested"""
+        items = make_news(3)
+        items[2].is_published = False
+        db.session.commit()
+
+        result = suggestions.suggest('خبر')
+        assert sorted(_titles(result)) == ['خبر 0', 'خبر 1']
+        assert result['news'][0]['slug'].startswith('news-')
+        assert [tag['name'] for tag in suggestions.suggest('Tag 1')['tags']] == ['علامة 1']
+
+    def test_commits_update_the_index_immediately(self, news_app, make_news, suggestions):
+        """Publishing, renaming and deleting are applied after commit"""
+        items = make_news(2)
+        suggestions.suggest('خبر')
+
+        items[0].title = 'مؤتمر صحفي'
+        draft = NewsItem(title='مؤتمر المسودة', slug='draft', content='.', category=items[1].category)
+        db.session.add(draft)
+        db.session.add(NewsTag(name='مؤتمرات', name_en='Conferences'))
+        db.session.commit()
+        assert _titles(suggestions.suggest('مؤتمر')) == ['مؤتمر صحفي']
+        assert suggestions.suggest('مؤتمر')['tags'][0]['name'] == 'مؤتمرات'
+
+        draft.is_published = True
+        db.session.delete(items[0])
+        db.session.commit()
+        assert _titles(suggestions.suggest('مؤتمر')) == ['مؤتمر المسودة']
+
+    def test_rolled_back_changes_are_not_applied(self, news_app, make_news, suggestions):
+        """Suggestions only reflect committed changes"""
+        items = make_news(1)
+        suggestions.suggest('خبر')
+
+        items[0].title = 'عنوان ملغى'
+        db.session.flush()
+        db.session.rollback()
+
+        assert suggestions.suggest('عنوان') == {'news': [], 'tags': []}
+
+    def test_refresh_picks_up_changes_from_other_workers(self, news_app, make_news, suggestions):
+        """Changes committed elsewhere are synced after the refresh interval"""
+        items = make_news(1)
+        suggestions.suggest('خبر')
+
+        other_worker = news_app.extensions.pop('news_suggestions')
+        items[0].title = 'عنوان من عامل آخر'
+        db.session.commit()
+        news_app.extensions['news_suggestions'] = other_worker
+        assert _titles(suggestions.suggest('عنوان')) == []
+
+        suggestions.refresh_interval = 0
+        assert _titles(suggestions.suggest('عنوان')) == ['عنوان من عامل آخر']
+
+    def test_refresh_drops_items_deleted_elsewhere(self, news_app, make_news, suggestions):
+        """Rows deleted without ORM events, like archived items, leave on the next refresh"""
+        make_news(3)
+        suggestions.suggest('خبر')
+
+        db.session.execute(NewsItem.__table__.delete().where(NewsItem.__table__.c.slug == 'news-1'))
+        db.session.commit()
+        suggestions.refresh_interval = 0
+        assert sorted(_titles(suggestions.suggest('خبر'))) == ['خبر 0', 'خبر 2']
+
+    def test_refresh_runs_in_the_background(self, news_app, make_news, suggestions, monkeypatch):
+        """A stale index is still served while the refresh runs on the build thread"""
+        make_news(1)
+        suggestions.suggest('خبر')
+        started, release = threading.Event(), threading.Event()
+
+        def slow_refresh():
+            started.set()
+            release.wait(5)
+            suggestions._refreshed_at = float('inf')
+
+        monkeypatch.setattr(suggestions, 'refresh', slow_refresh)
+        suggestions.build_in_background = True
+        suggestions.refresh_interval = 0
+        assert _titles(suggestions.suggest('خبر')) == ['خبر 0']
+        assert started.wait(5)
+        assert _titles(suggestions.suggest('خبر')) == ['خبر 0']
+
+        thread = suggestions._build_thread
+        release.set()
+        thread.join(5)
+        assert suggestions._build_thread is None
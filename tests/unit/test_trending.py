@@ -0,0 +1,157 @@
+"""
+Unit tests for the time-decayed trending news ranking
+"""
+
+import random
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, NewsItem, NewsStats
+from app.utils import trending as trending_module
+from app.utils.trending import MemoryTrendingStore, RedisTrendingStore, TrendingNews
+
+HOUR = 3600
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the trending module"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(trending_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def trending(news_app, clock):
+    news_app.config['TRENDING_HALF_LIFE'] = 6 * HOUR
+    return TrendingNews(news_app)
+
+
+def _ids(ranking):
+    return [news_item_id for news_item_id, _ in ranking]
+
+
+@pytest.mark.unit
+class TestMemoryTrendingStore:
+    """Test the lazily cleaned max-heap"""
+
+    def test_top_matches_a_full_sort(self):
+        """Increments, removals and compactions keep the top entries exact"""
+        store = MemoryTrendingStore(max_items=10 ** 6)
+        rng = random.Random(11)
+        scores = {}
+        for _ in range(5000):
+            key = rng.randrange(300)
+            if rng.random() < 0.05:
+                store.remove(0, key)
+                scores.pop(key, None)
+            else:
+                amount = rng.random()
+                store.incr(0, key, amount)
+                scores[key] = scores.get(key, 0.0) + amount
+
+        expected = sorted(scores.items(), key=lambda item: -item[1])[:20]
+        for _ in range(2):
+            top = store.top(0, 20)
+            assert _ids(top) == _ids(expected)
+            assert [score for _, score in top] == pytest.approx([score for _, score in expected])
+
+    def test_keeps_the_highest_items_only(self):
+        """The store is trimmed to max_items, dropping the lowest scores"""
+        store = MemoryTrendingStore(max_items=5)
+        for key in range(20):
+            store.incr(0, key, float(key))
+
+        assert _ids(store.top(0, 3)) == [19, 18, 17]
+        assert len(store._scores) <= 10
+
+
+@pytest.mark.unit
+class TestTrendingNews:
+    """Test decayed scores and their ordering"""
+
+    def test_recent_events_outrank_older_ones(self, trending, clock):
+        """Ten views twelve hours ago weigh less than three views now"""
+        trending.record(1, 'view', when=clock[0] - 12 * HOUR)
+        for _ in range(10):
+            trending.record(2, 'view', when=clock[0] - 12 * HOUR)
+        for _ in range(3):
+            trending.record(3, 'view')
+
+        ranking = trending.top(3)
+        assert _ids(ranking) == [3, 2, 1]
+        assert ranking[1][1] == pytest.approx(10 * 0.25)
+
+    def test_event_types_are_weighted(self, trending):
+        """A share counts more than a like, which counts more than a view"""
+        trending.record(1, 'view')
+        trending.record(2, 'like')
+        trending.record(3, 'share')
+        trending.record(4, 'unknown')
+
+        assert dict(trending.top(10)) == pytest.approx({3: 5.0, 2: 3.0, 1: 1.0})
+        assert _ids(trending.top(10)) == [3, 2, 1]
+
+    def test_scores_decay_as_time_passes(self, trending, clock):
+        """Reading later returns the same order with halved scores"""
+        trending.record(1, 'like')
+        trending.record(2, 'view')
+
+        clock[0] += 6 * HOUR
+        assert dict(trending.top(2)) == pytest.approx({1: 1.5, 2: 0.5})
+
+    def test_new_generation_rescales_stored_scores(self, trending, clock):
+        """Crossing a generation keeps the decayed scores continuous"""
+        trending.record(1, 'share')
+        clock[0] += trending.generation_seconds
+        trending.record(2, 'view')
+
+        expected = 5.0 * 0.5 ** (trending.generation_seconds / trending.half_life)
+        ranking = dict(trending.top(2))
+        assert ranking[2] == pytest.approx(1.0)
+        assert ranking[1] == pytest.approx(expected)
+
+    def test_seeds_from_recent_daily_stats(self, news_app, make_news, clock):
+        """After a restart the ranking starts from the last days of stats"""
+        items = make_news(3)
+        today = datetime.utcfromtimestamp(clock[0]).date()
+        db.session.add_all([
+            NewsStats(news_item_id=items[0].id, date=today, views=2, likes=0, shares=0),
+            NewsStats(news_item_id=items[1].id, date=today, views=0, likes=0, shares=3),
+            NewsStats(news_item_id=items[2].id, date=today - timedelta(days=30), views=500, likes=0, shares=0),
+        ])
+        db.session.commit()
+
+        trending = TrendingNews(news_app)
+        assert _ids(trending.top(10)) == [items[1].id, items[0].id]
+
+    def test_unpublished_and_deleted_items_leave_after_commit(self, news_app, make_news, trending):
+        """Unpublishing or deleting an item removes it, but not before the commit succeeds"""
+        items = make_news(3)
+        for item in items:
+            trending.record(item.id, 'view')
+
+        items[0].is_published = False
+        db.session.flush()
+        db.session.rollback()
+        assert sorted(_ids(trending.top(10))) == sorted(item.id for item in items)
+
+        item_ids = [item.id for item in items]
+        items[0].is_published = False
+        db.session.delete(items[1])
+        items[2].title = 'عنوان جديد'
+        db.session.commit()
+        assert _ids(trending.top(10)) == [item_ids[2]]
+
+    def test_several_workers_default_to_redis(self, news_app, monkeypatch):
+        """Without TRENDING_BACKEND the ranking is shared through Redis when WEB_CONCURRENCY > 1"""
+        monkeypatch.setitem(sys.modules, 'redis', types.SimpleNamespace(Redis=lambda **kwargs: object()))
+        monkeypatch.setenv('WEB_CONCURRENCY', '2')
+        assert isinstance(TrendingNews(news_app).store, RedisTrendingStore)
+
+        monkeypatch.setenv('WEB_CONCURRENCY', '1')
+        assert isinstance(TrendingNews(news_app).store, MemoryTrendingStore)
+
@@ -0,0 +1,106 @@
+"""
+Unit tests for the buffered view counter
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.models import db, NewsItem
+from app.utils.view_counter import ViewCounterBuffer, MemoryCounterStore, RedisCounterStore
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@pytest.mark.unit
+class TestViewCounterBuffer:
+    """Test write-behind view counting"""
+
+    def _view_counts(self):
+        db.session.expire_all()
+        return {item.id: item.view_count for item in NewsItem.query.all()}
+
+    def test_increment_does_not_write(self, news_app, make_news):
+        """Views stay in the buffer until flushed"""
+        items = make_news(2)
+        counter = ViewCounterBuffer(news_app)
+
+        counter.increment(items[0].id)
+        counter.increment(items[0].id)
+
+        assert counter.pending(items[0].id) == 2
+        assert self._view_counts()[items[0].id] == 0
+
+    def test_flush_applies_deltas_in_one_batch(self, news_app, make_news):
+        """A flush adds every accumulated delta to the stored counts"""
+        items = make_news(3)
+        updated_at = items[0].updated_at
+        counter = ViewCounterBuffer(news_app)
+        for _ in range(5):
+            counter.increment(items[0].id)
+        counter.increment(items[2].id)
+
+        updated = counter.flush()
+
+        assert updated == 2
+        counts = self._view_counts()
+        assert counts[items[0].id] == 5
+        assert counts[items[1].id] == 0
+        assert counts[items[2].id] == 1
+        assert db.session.get(NewsItem, items[0].id).updated_at == updated_at
+        assert counter.pending(items[0].id) == 0
+        assert counter.flush() == 0
+
+    def test_failed_flush_keeps_deltas(self, news_app, make_news):
+        """Deltas are merged back into the store when the write fails"""
+        items = make_news(1)
+        store = MemoryCounterStore()
+        counter = ViewCounterBuffer(news_app, store=store)
+        counter.increment(items[0].id, 3)
+
+        with patch.object(db.session, 'execute', side_effect=RuntimeError('database is locked')):
+            assert counter.flush() == 0
+
+        assert counter.pending(items[0].id) == 3
+        assert counter.flush() == 1
+        assert self._view_counts()[items[0].id] == 3
+
+    def test_threshold_wakes_flusher(self, news_app):
+        """Reaching the event threshold signals the background flusher"""
+        news_app.config['VIEW_COUNTER_FLUSH_THRESHOLD'] = 3
+        counter = ViewCounterBuffer(news_app)
+
+        counter.increment(1)
+        counter.increment(1)
+        assert not counter._wake.is_set()
+        counter.increment(2)
+        assert counter._wake.is_set()
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(fakeredis is None, reason='fakeredis is not installed')
+class TestRedisCounterStore:
+    """Test draining the counters shared by several workers"""
+
+    def test_concurrent_drains_keep_every_view(self):
+        """A worker draining while another is between rename and read loses nothing"""
+        server = fakeredis.FakeServer()
+        first = RedisCounterStore(fakeredis.FakeRedis(server=server))
+        second = RedisCounterStore(fakeredis.FakeRedis(server=server))
+        drained = []
+        rename = first.client.rename
+
+        def rename_then_interleave(src, dst):
+            result = rename(src, dst)
+            second.incr(2, 5)
+            drained.append(second.drain())
+            return result
+
+        first.incr(1, 3)
+        with patch.object(first.client, 'rename', side_effect=rename_then_interleave):
+            drained.append(first.drain())
+
+        assert sorted(drained, key=len) == [{2: 5}, {1: 3}]
+        assert first.drain() == {}